@@ -0,0 +1,181 @@
+"""Keeps each worker's in-process read models in step with writes made by other workers.
+
+Every committed write (``WeddingMirror.bump_versions``) is also recorded in
+the ``cache_events`` collection. The record holds the wedding's new data
+version and, for single-row changes, the change itself. Every worker tails
+that collection and, for each event from another worker:
+
+* patches its cached models with the change when it is the next version of
+  a wedding it is known to be current on;
+* otherwise (bulk write, missed or out-of-order version, unknown starting
+  point) evicts that wedding, and the next read rebuilds it from Mongo.
+
+Tailing uses a change stream when Mongo is a replica set. Otherwise it polls
+the collection, re-reading a ``LOOKBACK_SECONDS`` window to tolerate clock
+skew and late commits. Events expire after ``EVENT_TTL_SECONDS``.
+
+``ensure_fresh`` closes the remaining window: the ETag middleware calls it
+with the version it has just read. A worker that has not seen that version
+yet drops its copy instead of serving it. To try the change-stream path
+locally, start a single-node replica set::
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017 &
+    mongosh --eval 'rs.initiate()'
+    MONGO_REPLSET_URL='mongodb://localhost:27017/?replicaSet=rs0' pytest tests/test_cache_coherence.py
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from wedding_mirror import RowChange, WeddingCache, WeddingMirror
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "cache_events"
+EVENT_TTL_SECONDS = 3600
+POLL_SECONDS = 0.2
+LOOKBACK_SECONDS = 5.0
+AUTO, WATCH, POLL, OFF = "auto", "watch", "poll", "off"
+
+
+class CacheCoherence:
+    def __init__(self, mirror: WeddingMirror, caches: Sequence[WeddingCache], mode: str = AUTO,
+                 poll_seconds: float = POLL_SECONDS):
+        self.mirror = mirror
+        self.caches = list(caches)
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Highest data version each wedding's cached models are known to reflect
+        self.versions: Dict[str, int] = {}
+        self.tailing: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        return self.mirror.db[EVENTS_COLLECTION]
+
+    async def ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            await self.collection.create_index([("at", 1)], expireAfterSeconds=EVENT_TTL_SECONDS)
+            self._indexes_ready = True
+
+    def _evict(self, user_id: str) -> None:
+        for cache in self.caches:
+            cache.invalidate(user_id)
+
+    async def advance(self, user_id: str, version: int, change: Optional[RowChange], patched: bool) -> None:
+        """Bring the local models of one wedding to ``version``; ``patched`` if the local bus already did."""
+        current = self.versions.get(user_id)
+        if current is not None and version <= current:
+            return
+        if current is None or version != current + 1 or change is None:
+            self._evict(user_id)
+        elif not patched:
+            for cache in self.caches:
+                await cache.on_change(change)
+        self.versions[user_id] = version
+
+    def ensure_fresh(self, user_id: str, version: int) -> None:
+        """Called with a freshly read data version: drop local models that may predate it."""
+        if self.versions.get(user_id, -1) < version:
+            self._evict(user_id)
+            self.versions[user_id] = version
+
+    async def on_commit(self, versions: Dict[str, int], change: Optional[RowChange]) -> None:
+        """Commit hook for writes made by this worker."""
+        if not versions:
+            return
+        for user_id, version in versions.items():
+            await self.advance(user_id, version, change, patched=True)
+        await self.ensure_indexes()
+        await self.collection.insert_one({
+            "origin": self.origin,
+            "at": datetime.now(timezone.utc),
+            "versions": [{"user_id": user_id, "version": version} for user_id, version in versions.items()],
+            "change": asdict(change) if change is not None else None,
+        })
+
+    async def handle(self, event: Dict[str, Any]) -> None:
+        if event.get("origin") == self.origin:
+            return
+        change = RowChange(**event["change"]) if event.get("change") else None
+        for entry in event["versions"]:
+            await self.advance(entry["user_id"], entry["version"], change, patched=False)
+
+    # Tailing
+
+    async def start(self) -> None:
+        if self.mode == OFF:
+            return
+        await self.ensure_indexes()
+        self.mirror.commit_hooks.append(self.on_commit)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.on_commit in self.mirror.commit_hooks:
+            self.mirror.commit_hooks.remove(self.on_commit)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        if self.mode in (AUTO, WATCH) and hasattr(self.collection, "watch"):
+            try:
+                await self._watch()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                if self.mode == WATCH:
+                    raise
+                # Standalone mongod: change streams need a replica set
+                logger.info("Change streams unavailable (%s); polling %s", exc, EVENTS_COLLECTION)
+        await self._poll()
+
+    async def _watch(self) -> None:
+        resume_after = None
+        while True:
+            try:
+                async with self.collection.watch([{"$match": {"operationType": "insert"}}],
+                                                 resume_after=resume_after) as stream:
+                    self.tailing = WATCH
+                    async for change in stream:
+                        resume_after = stream.resume_token
+                        await self.handle(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if resume_after is None:
+                    raise
+                logger.exception("Change stream on %s broke; resuming", EVENTS_COLLECTION)
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _poll(self) -> None:
+        self.tailing = POLL
+        seen: Dict[Any, datetime] = {}
+        since = datetime.now(timezone.utc)
+        while True:
+            try:
+                window = since - timedelta(seconds=LOOKBACK_SECONDS)
+                events: List[Dict[str, Any]] = await self.collection.find(
+                    {"at": {"$gte": window}}).sort([("at", 1)]).to_list(None)
+                for event in events:
+                    if event["_id"] not in seen:
+                        seen[event["_id"]] = event["at"]
+                        await self.handle(event)
+                    since = max(since, event["at"])
+                seen = {key: at for key, at in seen.items() if at >= window}
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Polling %s failed", EVENTS_COLLECTION)
+            await asyncio.sleep(self.poll_seconds)
@@ -0,0 +1,49 @@
+"""Lazily created MongoDB client.
+
+Importing this module does not import Motor/pymongo or open a connection;
+both happen on first access to ``Database.client``. That keeps worker boot and
+test collection free of driver start-up cost.
+"""
+
+from fastapi import Request
+
+from settings import Settings
+
+# Duplicated from memory_mongo so checking the URL does not import pymongo
+MEMORY_URL_SCHEME = "memory://"
+
+
+def create_client(mongo_url: str, slow_ms: float = 100.0):
+    # "memory://" swaps in the in-process stand-in used by the load tester and tests
+    if mongo_url.startswith(MEMORY_URL_SCHEME):
+        from memory_mongo import MemoryMongoClient
+        return MemoryMongoClient(mongo_url)
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from mongo_metrics import MongoCommandListener
+    return AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandListener(slow_ms)])
+
+
+class Database:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = create_client(self.settings.mongo_url, self.settings.mongo_slow_query_ms)
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.settings.db_name]
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+def get_db(request: Request):
+    """FastAPI dependency returning the app's Mongo database."""
+    return request.app.state.database.db
@@ -0,0 +1,131 @@
+"""Packed bitmaps keyed by facet value.
+
+Every row of a set owns one slot (bit position). Each facet keeps a matrix
+with one row of ``uint64`` words per value. Boolean filters are then a few
+vectorized ``&``/``|`` operations, and the counts for every value of a facet
+come from one popcount over the matrix. Nothing scans the rows themselves.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+WORD_BITS = 64
+
+if hasattr(np, "bitwise_count"):
+    def popcount_rows(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:  # NumPy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount_rows(words: np.ndarray) -> np.ndarray:
+        as_bytes = np.ascontiguousarray(words).view(np.uint8)
+        return _BYTE_COUNTS[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def popcount(words: np.ndarray) -> int:
+    return int(popcount_rows(words))
+
+
+class _Facet:
+    __slots__ = ("rows", "matrix", "free")
+
+    def __init__(self, words: int):
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((4, words), dtype=np.uint64)
+        self.free: List[int] = list(range(3, -1, -1))
+
+    def row(self, value: str) -> int:
+        row = self.rows.get(value)
+        if row is None:
+            if not self.free:
+                size = len(self.matrix)
+                self.matrix = np.vstack([self.matrix, np.zeros_like(self.matrix)])
+                self.free = list(range(2 * size - 1, size - 1, -1))
+            row = self.rows[value] = self.free.pop()
+        return row
+
+
+class FacetBitmaps:
+    def __init__(self, capacity: int = WORD_BITS):
+        self._words = max(1, -(-capacity // WORD_BITS))
+        self._facets: Dict[str, _Facet] = {}
+        self.alive = self.empty()
+
+    @property
+    def capacity(self) -> int:
+        return self._words * WORD_BITS
+
+    def empty(self) -> np.ndarray:
+        return np.zeros(self._words, dtype=np.uint64)
+
+    def ensure_capacity(self, slots: int) -> None:
+        if slots <= self.capacity:
+            return
+        words = self._words
+        while words * WORD_BITS < slots:
+            words *= 2
+        grow = words - self._words
+        self._words = words
+        self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=np.uint64)])
+        for facet in self._facets.values():
+            facet.matrix = np.hstack([facet.matrix, np.zeros((len(facet.matrix), grow), dtype=np.uint64)])
+
+    @staticmethod
+    def _position(slot: int) -> Tuple[int, np.uint64]:
+        return slot // WORD_BITS, np.uint64(1) << np.uint64(slot % WORD_BITS)
+
+    def set(self, slot: int, facet: str, value: str) -> None:
+        self.ensure_capacity(slot + 1)
+        state = self._facets.get(facet)
+        if state is None:
+            state = self._facets[facet] = _Facet(self._words)
+        row = state.row(value)      # may grow the matrix, so look it up first
+        word, bit = self._position(slot)
+        state.matrix[row, word] |= bit
+
+    def clear(self, slot: int, facet: str, value: str) -> None:
+        state = self._facets.get(facet)
+        row = state.rows.get(value) if state else None
+        if row is None:
+            return
+        word, bit = self._position(slot)
+        state.matrix[row, word] &= ~bit
+        if not state.matrix[row].any():
+            # The row is already all zeros, ready for the next new value
+            del state.rows[value]
+            state.free.append(row)
+
+    def set_alive(self, slot: int, alive: bool) -> None:
+        self.ensure_capacity(slot + 1)
+        word, bit = self._position(slot)
+        if alive:
+            self.alive[word] |= bit
+        else:
+            self.alive[word] &= ~bit
+
+    def values(self, facet: str) -> List[str]:
+        state = self._facets.get(facet)
+        return sorted(state.rows) if state else []
+
+    def any_of(self, facet: str, values: Iterable[str]) -> np.ndarray:
+        state = self._facets.get(facet)
+        rows = [state.rows[value] for value in values if value in state.rows] if state else []
+        if not rows:
+            return self.empty()
+        return np.bitwise_or.reduce(state.matrix[rows], axis=0)
+
+    def counts(self, facet: str, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Number of slots under ``mask`` (default: every live slot) holding each value."""
+        state = self._facets.get(facet)
+        if not state or not state.rows:
+            return {}
+        mask = self.alive if mask is None else mask
+        totals = popcount_rows(state.matrix & mask)
+        return {value: int(totals[row]) for value, row in state.rows.items()}
+
+    @staticmethod
+    def slots(mask: np.ndarray) -> np.ndarray:
+        """Slot numbers of the set bits, ascending."""
+        bits = np.unpackbits(mask.astype("<u8").view(np.uint8), bitorder="little")
+        return np.flatnonzero(bits)
@@ -0,0 +1,429 @@
+"""Write-behind buffer for floor-plan edits (table moves and seat assignments).
+
+A drag session on the floor plan sends many small edits. ``POST
+/api/floor-plan/edits`` takes an ordered list of operations:
+
+* ``{"op": "move", "table_id": 3, "x": 120, "y": 80}``
+* ``{"op": "assign", "guest_id": 41, "table_id": 3}``
+* ``{"op": "unassign", "guest_id": 41}``
+
+They are applied to an in-memory overlay and are not written straight
+through. Only the last state of each table position and each guest's seat
+is kept. The overlay is flushed to Supabase with the service-role key
+(one upsert of the moved ``tavoli`` rows, whose ``x``/``y`` columns come from
+``20261019130000_floor_plan_positions.sql``, and one of ``piani_salvati`` on
+its unique ``invitato_id``, so a retried flush never seats a guest twice)
+and then to the mirror, in one batch per collection. Without a write key
+the routes answer 503, and they only take edits from the wedding owner's
+Supabase session (see ``supabase_auth``). A flush happens once a wedding has been idle for
+``idle_seconds``, or ``flush_seconds`` after its oldest unflushed edit. A
+hundred drags of one table become one write.
+
+Versions: every accepted batch bumps the wedding's floor-plan version and
+the version of each entity it touched. An operation may carry
+``expected_version``. If that entity has moved on (another tab, another
+planner), the whole batch is rejected with 409 and the current versions.
+``GET /api/floor-plan`` returns the merged view to resync from.
+
+Crash safety: accepted batches are appended to a JSON-lines journal and
+fsync'd before the response. After each flush the journal is rewritten to
+hold only what is still unflushed, so a restart replays exactly the lost
+tail. The overlay and the versions are per process (versions are saved to
+``floor_plan_versions`` only at flush), so route each wedding's edits to
+one worker: concurrent edits through two workers are neither detected nor
+merged.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+
+from supabase_auth import require_wedding_owner
+from wedding_mirror import DELETE, INSERT, ROW_PROJECTION, UPDATE, RowChange, WeddingMirror
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "floor_plan_versions"
+FLUSH_SECONDS = 2.0
+IDLE_SECONDS = 0.5
+TICK_SECONDS = 0.1
+MOVE, ASSIGN, UNASSIGN = "move", "assign", "unassign"
+
+
+class EditError(ValueError):
+    pass
+
+
+class EditConflict(Exception):
+    def __init__(self, conflicts: List[Dict[str, Any]], version: int):
+        super().__init__(f"{len(conflicts)} stale operations")
+        self.conflicts = conflicts
+        self.version = version
+
+
+def entity_of(op: Dict[str, Any]) -> str:
+    return f"table:{op['table_id']}" if op.get("op") == MOVE else f"guest:{op['guest_id']}"
+
+
+@dataclass
+class WeddingPlan:
+    """One wedding's unflushed edits and versions."""
+
+    user_id: str
+    version: int = 0
+    entities: Dict[str, int] = field(default_factory=dict)
+    table_ids: Set[int] = field(default_factory=set)
+    guest_ids: Set[int] = field(default_factory=set)
+    moves: Dict[int, Tuple[float, float]] = field(default_factory=dict)
+    # guest -> table, None for unassigned
+    seats: Dict[int, Optional[int]] = field(default_factory=dict)
+    first_pending: Optional[float] = None
+    last_edit: float = 0.0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def pending(self) -> int:
+        return len(self.moves) + len(self.seats)
+
+    def apply(self, op: Dict[str, Any]) -> None:
+        if op["op"] == MOVE:
+            self.moves[op["table_id"]] = (op["x"], op["y"])
+        else:
+            self.seats[op["guest_id"]] = op["table_id"] if op["op"] == ASSIGN else None
+
+    def pending_ops(self) -> List[Dict[str, Any]]:
+        ops = [{"op": MOVE, "table_id": t, "x": x, "y": y} for t, (x, y) in self.moves.items()]
+        ops += [{"op": ASSIGN, "guest_id": g, "table_id": t} if t is not None else {"op": UNASSIGN, "guest_id": g}
+                for g, t in self.seats.items()]
+        return ops
+
+
+def validate(op: Dict[str, Any]) -> Dict[str, Any]:
+    kind = op.get("op")
+    required = {MOVE: ("table_id", "x", "y"), ASSIGN: ("guest_id", "table_id"), UNASSIGN: ("guest_id",)}.get(kind)
+    if required is None:
+        raise EditError(f"unknown operation {kind!r}")
+    missing = [name for name in required if op.get(name) is None]
+    if missing:
+        raise EditError(f"{kind} needs {', '.join(missing)}")
+    clean = {"op": kind, **{name: op[name] for name in required}}
+    for name in ("table_id", "guest_id"):
+        if name in clean:
+            clean[name] = int(clean[name])
+    if kind == MOVE:
+        clean["x"], clean["y"] = float(clean["x"]), float(clean["y"])
+    if op.get("expected_version") is not None:
+        clean["expected_version"] = int(op["expected_version"])
+    return clean
+
+
+class FloorPlanBuffer:
+    def __init__(self, mirror: WeddingMirror, journal_path: Optional[str] = None,
+                 flush_seconds: float = FLUSH_SECONDS, idle_seconds: float = IDLE_SECONDS,
+                 write_key: Optional[str] = None):
+        self.mirror = mirror
+        self.journal_path = Path(journal_path) if journal_path else None
+        self.flush_seconds = flush_seconds
+        self.idle_seconds = idle_seconds
+        self.write_key = write_key
+        self.plans: Dict[str, WeddingPlan] = {}
+        self.writes = 0
+        self._client = None
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self._journal_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def versions(self):
+        return self.mirror.db[VERSIONS_COLLECTION]
+
+    def client(self):
+        """The Supabase client flushes write through; edits are refused without a write key."""
+        if not self.write_key:
+            raise RuntimeError("floor-plan edits need SUPABASE_SERVICE_ROLE_KEY")
+        if self._client is None:
+            from supabase_rest import PostgrestClient
+            self._client = PostgrestClient(key=self.write_key)
+        return self._client
+
+    async def _plan(self, user_id: str) -> WeddingPlan:
+        if user_id in self.plans:
+            return self.plans[user_id]
+        # Concurrent first requests for a wedding must share one plan, or edits land on a discarded copy
+        lock = self._loading.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            if user_id not in self.plans:
+                plan = WeddingPlan(user_id)
+                stored = await self.versions.find_one({"user_id": user_id}, {"_id": 0})
+                if stored:
+                    plan.version, plan.entities = stored["version"], dict(stored["entities"])
+                await self._load_ids(plan)
+                self.plans[user_id] = plan
+        self._loading.pop(user_id, None)
+        return self.plans[user_id]
+
+    async def _load_ids(self, plan: WeddingPlan) -> None:
+        plan.table_ids = {row["id"] for row in await self.mirror.rows("tavoli", plan.user_id)}
+        plan.guest_ids = {row["id"] for row in await self.mirror.rows("invitati", plan.user_id)}
+
+    # Edits
+
+    async def submit(self, user_id: str, ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply a batch of operations atomically; raises ``EditError`` (bad input) or ``EditConflict``."""
+        ops = [validate(op) for op in ops]
+        plan = await self._plan(user_id)
+        async with plan.lock:
+            unknown = [op for op in ops if op.get("table_id") is not None and op["table_id"] not in plan.table_ids
+                       or op.get("guest_id") is not None and op["guest_id"] not in plan.guest_ids]
+            if unknown:
+                # Rows created since the plan was loaded
+                await self._load_ids(plan)
+                for op in unknown:
+                    if op.get("table_id") is not None and op["table_id"] not in plan.table_ids:
+                        raise EditError(f"table {op['table_id']} is not in this wedding")
+                    if op.get("guest_id") is not None and op["guest_id"] not in plan.guest_ids:
+                        raise EditError(f"guest {op['guest_id']} is not in this wedding")
+            conflicts = [{"entity": entity_of(op), "expected": op["expected_version"],
+                          "current": plan.entities.get(entity_of(op), 0)}
+                         for op in ops if "expected_version" in op
+                         and op["expected_version"] != plan.entities.get(entity_of(op), 0)]
+            if conflicts:
+                raise EditConflict(conflicts, plan.version)
+            if not ops:
+                return {"version": plan.version, "entities": {}, "pending": plan.pending}
+
+            touched: Dict[str, int] = {}
+            for op in ops:
+                plan.apply(op)
+                entity = entity_of(op)
+                plan.entities[entity] = touched[entity] = plan.entities.get(entity, 0) + 1
+            plan.version += 1
+            now = time.monotonic()
+            plan.last_edit = now
+            if plan.first_pending is None:
+                plan.first_pending = now
+            await self._journal_append({"user_id": user_id, "version": plan.version, "entities": touched,
+                                        "ops": [{k: v for k, v in op.items() if k != "expected_version"}
+                                                for op in ops]})
+            return {"version": plan.version, "entities": touched, "pending": plan.pending}
+
+    async def view(self, user_id: str) -> Dict[str, Any]:
+        """Tables and seats as the mirror has them with unflushed edits laid over."""
+        plan = await self._plan(user_id)
+        tables = await self.mirror.rows("tavoli", user_id)
+        seats = {row["invitato_id"]: row["tavolo_id"] for row in await self.mirror.rows("piani_salvati", user_id)}
+        for guest_id, table_id in plan.seats.items():
+            if table_id is None:
+                seats.pop(guest_id, None)
+            else:
+                seats[guest_id] = table_id
+        return {
+            "version": plan.version,
+            "pending": plan.pending,
+            "tables": [{"id": t["id"], "nome_tavolo": t.get("nome_tavolo"), "capacita_max": t.get("capacita_max"),
+                        "x": plan.moves.get(t["id"], (t.get("x"), t.get("y")))[0],
+                        "y": plan.moves.get(t["id"], (t.get("x"), t.get("y")))[1],
+                        "version": plan.entities.get(f"table:{t['id']}", 0)} for t in tables],
+            "assignments": [{"guest_id": g, "table_id": t, "version": plan.entities.get(f"guest:{g}", 0)}
+                            for g, t in sorted(seats.items())],
+        }
+
+    # Flushing
+
+    async def flush(self, user_id: str) -> int:
+        """Write one wedding's pending edits to Supabase and the mirror; returns the number of rows written."""
+        plan = self.plans.get(user_id)
+        if plan is None or not plan.pending:
+            return 0
+        async with plan.lock:
+            moves, seats = plan.moves, plan.seats
+            plan.moves, plan.seats, plan.first_pending = {}, {}, None
+            version, entities = plan.version, dict(plan.entities)
+        try:
+            written = await self._write(user_id, moves, seats)
+            await self.versions.update_one({"user_id": user_id},
+                                           {"$set": {"version": version, "entities": entities}}, upsert=True)
+        except Exception:
+            # Put the edits back under anything newer that arrived meanwhile
+            async with plan.lock:
+                plan.moves, plan.seats = {**moves, **plan.moves}, {**seats, **plan.seats}
+                plan.first_pending = plan.first_pending or time.monotonic()
+            raise
+        await self._journal_rewrite()
+        return written
+
+    async def _write(self, user_id: str, moves: Dict[int, Tuple[float, float]],
+                     seats: Dict[int, Optional[int]]) -> int:
+        from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+        db = self.mirror.db
+        client = self.client()
+        await self.mirror.ensure_indexes()
+        changes: List[RowChange] = []
+        if moves:
+            old = {row["id"]: row for row in await db.tavoli.find(
+                {"user_id": user_id, "id": {"$in": list(moves)}}, ROW_PROJECTION).to_list(None)}
+            # Whole rows, so the upsert's insert half satisfies tavoli's NOT NULL columns; one request for all moves
+            moved_tables = [dict(old[t], x=x, y=y) for t, (x, y) in moves.items() if t in old]
+            if moved_tables:
+                await asyncio.to_thread(client.upsert, "tavoli", moved_tables, ["id"])
+            await db.tavoli.bulk_write([UpdateOne({"id": table_id, "user_id": user_id}, {"$set": {"x": x, "y": y}})
+                                        for table_id, (x, y) in moves.items()], ordered=False)
+            changes += [RowChange("tavoli", UPDATE, new, old[new["id"]]) for new in moved_tables]
+        if seats:
+            current = {row["invitato_id"]: row for row in await db.piani_salvati.find(
+                {"user_id": user_id, "invitato_id": {"$in": list(seats)}}, ROW_PROJECTION).to_list(None)}
+            removed = [current[g] for g, t in seats.items() if t is None and g in current]
+            assigned = [{"invitato_id": g, "tavolo_id": t} for g, t in seats.items()
+                        if t is not None and (g not in current or current[g]["tavolo_id"] != t)]
+            if removed:
+                ids = ",".join(str(row["id"]) for row in removed)
+                await asyncio.to_thread(client.delete, "piani_salvati", {"id": f"in.({ids})"})
+            # One seat per guest (unique invitato_id): a retry after a partial flush updates the row it
+            # already created instead of adding a second one
+            stored = []
+            if assigned:
+                stored = [dict(row, user_id=user_id) for row in await asyncio.to_thread(
+                    client.upsert_returning, "piani_salvati", assigned, ["invitato_id"])]
+            # piani_salvati has no user_id in Postgres; the mirror keeps it resolved
+            requests = [DeleteOne({"id": row["id"]}) for row in removed]
+            requests += [ReplaceOne({"id": row["id"]}, row, upsert=True) for row in stored]
+            if requests:
+                await db.piani_salvati.bulk_write(requests, ordered=False)
+            changes += [RowChange("piani_salvati", DELETE, None, row) for row in removed]
+            changes += [RowChange("piani_salvati", UPDATE, row, current[row["invitato_id"]])
+                        if row["invitato_id"] in current else RowChange("piani_salvati", INSERT, row, None)
+                        for row in stored]
+        self.writes += bool(moves) + bool(seats)
+        for change in changes:
+            await self.mirror.bus.publish(change)
+        if changes:
+            await self.mirror.bump_versions([user_id])
+        return len(changes)
+
+    async def flush_due(self) -> None:
+        now = time.monotonic()
+        for user_id, plan in list(self.plans.items()):
+            if plan.pending and (now - plan.last_edit >= self.idle_seconds
+                                 or now - (plan.first_pending or now) >= self.flush_seconds):
+                try:
+                    await self.flush(user_id)
+                except Exception:
+                    logger.exception("Flushing floor-plan edits of %s failed", user_id)
+
+    async def flush_all(self) -> int:
+        return sum([await self.flush(user_id) for user_id in list(self.plans)])
+
+    # Journal
+
+    def _append_sync(self, line: str) -> None:
+        with self.journal_path.open("a", encoding="utf-8") as journal:
+            journal.write(line)
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _rewrite_sync(self, lines: str) -> None:
+        partial = self.journal_path.with_suffix(".tmp")
+        with partial.open("w", encoding="utf-8") as journal:
+            journal.write(lines)
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(partial, self.journal_path)
+
+    async def _journal_append(self, entry: Dict[str, Any]) -> None:
+        if self.journal_path is not None:
+            async with self._journal_lock:
+                await asyncio.to_thread(self._append_sync, json.dumps(entry) + "\n")
+
+    async def _journal_rewrite(self) -> None:
+        if self.journal_path is None:
+            return
+        async with self._journal_lock:
+            lines = "".join(json.dumps({"user_id": plan.user_id, "version": plan.version, "entities": plan.entities,
+                                        "ops": plan.pending_ops()}) + "\n"
+                            for plan in self.plans.values() if plan.pending)
+            await asyncio.to_thread(self._rewrite_sync, lines)
+
+    async def replay(self) -> int:
+        """Reload edits accepted but not flushed before the last shutdown; returns how many were found."""
+        if self.journal_path is None or not self.journal_path.exists():
+            return 0
+        replayed = 0
+        for line in self.journal_path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn final line from a crash mid-append; its request was never acknowledged
+                continue
+            plan = await self._plan(entry["user_id"])
+            for op in entry["ops"]:
+                plan.apply(op)
+                replayed += 1
+            plan.version = max(plan.version, entry["version"])
+            for entity, version in entry["entities"].items():
+                plan.entities[entity] = max(plan.entities.get(entity, 0), version)
+            plan.first_pending = plan.first_pending or time.monotonic()
+        return replayed
+
+    async def start(self) -> None:
+        if await self.replay():
+            try:
+                await self.flush_all()
+            except Exception:
+                # The edits stay in the overlay and the journal until a flush can succeed
+                logger.exception("Flushing replayed floor-plan edits failed; keeping the journal")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush_all()
+        except Exception:
+            logger.exception("Flushing floor-plan edits on shutdown failed; the journal keeps them")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(TICK_SECONDS)
+            await self.flush_due()
+
+
+floor_plan_router = APIRouter(prefix="/floor-plan")
+
+
+@floor_plan_router.get("")
+async def get_floor_plan(request: Request, user_id: str = Query(..., min_length=1)):
+    return await request.app.state.floor_plan.view(user_id)
+
+
+def _require_writes(request: Request, user_id: str) -> None:
+    if not request.app.state.settings.supabase_write_key:
+        raise HTTPException(status_code=503, detail="floor-plan edits need SUPABASE_SERVICE_ROLE_KEY")
+    require_wedding_owner(request, user_id)
+
+
+@floor_plan_router.post("/edits")
+async def submit_edits(request: Request, user_id: str = Query(..., min_length=1),
+                       ops: List[Dict[str, Any]] = Body(..., embed=True)):
+    _require_writes(request, user_id)
+    try:
+        return await request.app.state.floor_plan.submit(user_id, ops)
+    except (EditError, ValueError, TypeError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except EditConflict as exc:
+        raise HTTPException(status_code=409, detail={"conflicts": exc.conflicts, "version": exc.version})
+
+
+@floor_plan_router.post("/flush")
+async def flush_edits(request: Request, user_id: str = Query(..., min_length=1)):
+    _require_writes(request, user_id)
+    return {"written": await request.app.state.floor_plan.flush(user_id)}
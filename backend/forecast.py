@@ -0,0 +1,291 @@
+"""Monte Carlo forecast of final attendance for a wedding's pending guests.
+
+``GET /api/forecast`` simulates the pending ``invitati`` (``guest_status`` ==
+``pending``) tens of thousands of times. It returns headcount quantiles
+(confirmed guests plus simulated pending ones) and the probability that the
+headcount exceeds the total ``capacita_max`` of the wedding's tables.
+
+Probabilities are learned from the other weddings in the mirror. For each
+``gruppo``/``fascia_eta`` cell the rate is the share of such invitations
+that are confirmed. It is shrunk towards the ``gruppo`` rate, which is
+shrunk towards the overall rate, so sparse cells fall back gracefully.
+
+``invitati`` cannot tell a guest who declined from one who has not replied
+(both are ``confermato`` false), so the fit counts every unconfirmed guest
+as a decline. The wedding being forecast is therefore left out of its own
+fit: its pending guests are exactly the ones being predicted, and counting
+them as declines would pull its rates down. Other weddings still collecting
+replies carry the same bias; it is diluted across the whole history.
+
+Members of an ``unita_invito`` (a family, a couple) tend to answer
+together. In each simulation, with probability ``rho`` a unit decides as
+one: every member compares their own probability against one shared draw.
+Otherwise its members decide independently. Either way each guest's
+marginal probability is unchanged. ``rho`` is estimated from how often
+members of historical units agree beyond what independence predicts.
+
+The model is fitted from per-wedding counts that Mongo ``$group``s
+(``CELL_COUNTS`` and ``UNIT_COUNTS``), skipping soft-deleted guests by
+``attrs.deleted``, so no guest document crosses the wire. The counts are
+cached for ``MODEL_TTL_SECONDS`` and then refreshed in the background while
+requests keep the previous ones; each wedding's model is built from them
+once per refresh. The
+simulation runs in chunks of ``CHUNK_CELLS`` draws in a worker thread.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+from guest_attributes import ATTRS_FIELD
+from guest_rows import guest_category, guest_status
+from wedding_mirror import WeddingMirror
+
+logger = logging.getLogger(__name__)
+
+SIMULATIONS = 20_000
+MAX_SIMULATIONS = 200_000
+# Pseudo-observations pulling a cell towards its group, and a group towards the overall rate
+PRIOR_WEIGHT = 20.0
+MODEL_TTL_SECONDS = 600.0
+CHUNK_CELLS = 2_000_000
+QUANTILES = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+UNKNOWN_AGE = "unknown"
+CELL_FIELDS = {"gruppo": "$gruppo", "fascia_eta": "$fascia_eta", "confermato": "$confermato"}
+LIVE_GUESTS = {f"{ATTRS_FIELD}.deleted": {"$ne": True}}
+# Guests per (wedding, gruppo, fascia_eta, confermato)
+CELL_COUNTS = [
+    {"$match": LIVE_GUESTS},
+    {"$group": {"_id": {"user_id": "$user_id", **CELL_FIELDS}, "count": {"$sum": 1}}},
+]
+# The same counts for each unit of two or more live members
+UNIT_COUNTS = [
+    {"$match": {**LIVE_GUESTS, "unita_invito_id": {"$ne": None}}},
+    {"$group": {"_id": {"user_id": "$user_id", "unit": "$unita_invito_id", **CELL_FIELDS}, "count": {"$sum": 1}}},
+    {"$group": {"_id": {"user_id": "$_id.user_id", "unit": "$_id.unit"}, "members": {"$sum": "$count"},
+                "cells": {"$push": {"gruppo": "$_id.gruppo", "fascia_eta": "$_id.fascia_eta",
+                                    "confermato": "$_id.confermato", "count": "$count"}}}},
+    {"$match": {"members": {"$gte": 2}}},
+]
+
+Cell = Tuple[str, str]
+
+
+def guest_cell(row: Dict[str, Any]) -> Cell:
+    return guest_category(row), row.get("fascia_eta") or UNKNOWN_AGE
+
+
+class AttendanceModel:
+    """Smoothed confirmation rates per cell plus the within-unit correlation.
+
+    Built from ``counts`` of live guests per ``(cell, confirmed)`` and the same
+    counts for each ``unita_invito`` of two or more members.
+    """
+
+    def __init__(self, counts: Counter, units: Iterable[Counter], prior_weight: float = PRIOR_WEIGHT):
+        self.prior_weight = prior_weight
+        self.cells: Counter = Counter()
+        self.confirmed: Counter = Counter()
+        for (cell, confirmed), count in counts.items():
+            self.cells[cell] += count
+            self.confirmed[cell] += count if confirmed else 0
+        total, yes = sum(self.cells.values()), sum(self.confirmed.values())
+        self.overall = (yes + 1) / (total + 2)
+        self.groups: Dict[str, float] = {}
+        for group in {cell[0] for cell in self.cells}:
+            n = sum(count for cell, count in self.cells.items() if cell[0] == group)
+            k = sum(count for cell, count in self.confirmed.items() if cell[0] == group)
+            self.groups[group] = (k + prior_weight * self.overall) / (n + prior_weight)
+        self.guests = total
+        self.rho = self._unit_correlation(units)
+
+    @classmethod
+    def from_guests(cls, guests: List[Dict[str, Any]], prior_weight: float = PRIOR_WEIGHT) -> "AttendanceModel":
+        counts: Counter = Counter()
+        units: Dict[Any, Counter] = {}
+        for guest in guests:
+            status = guest_status(guest)
+            if status == "deleted":
+                continue
+            answer = (guest_cell(guest), status == "confirmed")
+            counts[answer] += 1
+            if guest.get("unita_invito_id") is not None:
+                units.setdefault((guest.get("user_id"), guest["unita_invito_id"]), Counter())[answer] += 1
+        return cls(counts, units.values(), prior_weight)
+
+    def probability(self, cell: Cell) -> float:
+        group_rate = self.groups.get(cell[0], self.overall)
+        return (self.confirmed[cell] + self.prior_weight * group_rate) / (self.cells[cell] + self.prior_weight)
+
+    def _unit_correlation(self, units: Iterable[Counter]) -> float:
+        # Agreement between members of one unit, against what independent answers would give:
+        # with E = P(agree) under independence and A the observed share, rho = (A - E) / (1 - E)
+        pairs = agree = expected = 0.0
+        for members in units:
+            n = sum(members.values())
+            if n < 2:
+                continue
+            k = sum(count for (_, confirmed), count in members.items() if confirmed)
+            p = sum(count * self.probability(cell) for (cell, _), count in members.items())
+            p2 = sum(count * self.probability(cell) ** 2 for (cell, _), count in members.items())
+            q, q2 = n - p, n - 2 * p + p2
+            pairs += n * (n - 1) / 2
+            agree += k * (k - 1) / 2 + (n - k) * (n - k - 1) / 2
+            expected += (p * p - p2) / 2 + (q * q - q2) / 2
+        if not pairs or expected >= pairs:
+            return 0.0
+        return min(1.0, max(0.0, (agree - expected) / (pairs - expected)))
+
+
+def simulate(probabilities, units, rho: float, simulations: int, seed: Optional[int] = None):
+    """Attending count per simulation for guests with ``probabilities`` grouped by ``units`` (0..U-1)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    # Single-precision draws: half the random bits, and 2**-24 resolution is ample for a probability
+    p = np.asarray(probabilities, dtype=np.float32)
+    units = np.asarray(units, dtype=np.int64)
+    counts = np.zeros(simulations, dtype=np.int64)
+    if not len(p):
+        return counts
+    n_units = int(units.max()) + 1
+    chunk = max(1, CHUNK_CELLS // (len(p) + n_units))
+    for start in range(0, simulations, chunk):
+        size = min(chunk, simulations - start)
+        own = rng.random((size, len(p)), dtype=np.float32)
+        shared = rng.random((size, n_units), dtype=np.float32)
+        together = rng.random((size, n_units), dtype=np.float32) < rho
+        draws = np.where(together[:, units], shared[:, units], own)
+        counts[start:start + size] = (draws < p).sum(axis=1)
+    return counts
+
+
+def _answer(row: Dict[str, Any]) -> Tuple[Cell, bool]:
+    return guest_cell(row), bool(row.get("confermato"))
+
+
+class History:
+    """Answer counts per wedding, and per unit within it, that models are fitted from."""
+
+    def __init__(self):
+        self.counts: Dict[str, Counter] = {}
+        self.units: Dict[str, List[Counter]] = {}
+
+    def model(self, exclude: Optional[str] = None, prior_weight: float = PRIOR_WEIGHT) -> AttendanceModel:
+        """Fit from every wedding but ``exclude``."""
+        counts: Counter = Counter()
+        for user_id, wedding in self.counts.items():
+            if user_id != exclude:
+                counts.update(wedding)
+        units = [unit for user_id, wedding in self.units.items() if user_id != exclude for unit in wedding]
+        return AttendanceModel(counts, units, prior_weight)
+
+
+async def load_history(db) -> History:
+    """Per-wedding counts that Mongo groups, rather than every guest document."""
+    history = History()
+    async for group in db.invitati.aggregate(CELL_COUNTS):
+        history.counts.setdefault(group["_id"]["user_id"], Counter())[_answer(group["_id"])] += group["count"]
+    async for unit in db.invitati.aggregate(UNIT_COUNTS):
+        members: Counter = Counter()
+        for group in unit["cells"]:
+            members[_answer(group)] += group["count"]
+        history.units.setdefault(unit["_id"]["user_id"], []).append(members)
+    return history
+
+
+class ForecastService:
+    """Serves models from the cached history; past the TTL, requests keep using it while one refresh runs."""
+
+    def __init__(self, mirror: WeddingMirror, ttl_seconds: float = MODEL_TTL_SECONDS):
+        self.mirror = mirror
+        self.ttl_seconds = ttl_seconds
+        self._history: Optional[History] = None
+        self._history_at = 0.0
+        self._models: Dict[Optional[str], AttendanceModel] = {}
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def _load(self) -> History:
+        await self.mirror.ensure_indexes()
+        history = await load_history(self.mirror.db)
+        self._history, self._history_at, self._models = history, time.monotonic(), {}
+        return history
+
+    def _refreshed(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Forecast model refresh failed", exc_info=task.exception())
+
+    async def history(self) -> History:
+        stale = self._history is None or time.monotonic() - self._history_at > self.ttl_seconds
+        if stale and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.create_task(self._load())
+            self._refresh.add_done_callback(self._refreshed)
+        if self._history is None:
+            # Only the very first requests wait, and they share the one load
+            return await asyncio.shield(self._refresh)
+        return self._history
+
+    async def model(self, user_id: Optional[str] = None) -> AttendanceModel:
+        """The model for forecasting ``user_id``'s wedding, fitted without that wedding's own guests."""
+        history = await self.history()
+        model = self._models.get(user_id) if history is self._history else None
+        if model is None:
+            model = await asyncio.to_thread(history.model, user_id)
+            if history is self._history:
+                self._models[user_id] = model
+        return model
+
+    async def forecast(self, user_id: str, simulations: int = SIMULATIONS,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+        import numpy as np
+
+        model = await self.model(user_id)
+        guests = await self.mirror.rows("invitati", user_id)
+        tables = await self.mirror.rows("tavoli", user_id)
+        capacity = sum(t.get("capacita_max") or 0 for t in tables)
+        statuses = [guest_status(g) for g in guests]
+        confirmed = statuses.count("confirmed")
+        pending = [g for g, status in zip(guests, statuses) if status == "pending"]
+
+        unit_index: Dict[Any, int] = {}
+        units = [unit_index.setdefault(g.get("unita_invito_id") or ("guest", g["id"]), len(unit_index))
+                 for g in pending]
+        probabilities = [model.probability(guest_cell(g)) for g in pending]
+        started = time.perf_counter()
+        counts = await asyncio.to_thread(simulate, probabilities, units, model.rho, simulations, seed)
+        headcount = counts + confirmed
+        elapsed = time.perf_counter() - started
+
+        cells = Counter(guest_cell(g) for g in pending)
+        return {
+            "user_id": user_id,
+            "simulations": simulations,
+            "confirmed": confirmed,
+            "pending": len(pending),
+            "capacity": capacity,
+            "expected": float(headcount.mean()),
+            "quantiles": {f"p{round(q * 100)}": int(v) for q, v in zip(QUANTILES, np.quantile(headcount, QUANTILES))},
+            "min": int(headcount.min()),
+            "max": int(headcount.max()),
+            "probability_over_capacity": float((headcount > capacity).mean()),
+            "unit_correlation": round(model.rho, 4),
+            "rates": [{"gruppo": cell[0], "fascia_eta": cell[1], "pending": count,
+                       "probability": round(model.probability(cell), 4), "observed": model.cells[cell]}
+                      for cell, count in sorted(cells.items())],
+            "history_guests": model.guests,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+
+
+forecast_router = APIRouter()
+
+
+@forecast_router.get("/forecast")
+async def get_forecast(request: Request, user_id: str = Query(..., min_length=1),
+                       simulations: int = Query(SIMULATIONS, ge=100, le=MAX_SIMULATIONS),
+                       seed: Optional[int] = None):
+    return await request.app.state.forecast.forecast(user_id, simulations, seed)
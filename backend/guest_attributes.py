@@ -0,0 +1,152 @@
+"""Typed, indexed guest attributes decoded from ``invitati.note``.
+
+``note`` packs allergies and the soft-delete marker ``deleted_at`` into a
+single text column (see ``guest_rows.parse_note``). Filtering on either one
+meant reading and parsing every guest of a wedding. The mirror now stores
+the decoded values next to each ``invitati`` row, under ``attrs``:
+
+* ``deleted`` (bool) and ``deleted_at`` (naive UTC datetime, None when the
+  marker carries no parseable time)
+* ``allergies`` (the original text) and ``allergens`` (folded tokens, one
+  per comma/semicolon/slash-separated item, for exact lookups)
+* ``has_allergies`` and ``version`` (``ATTRS_VERSION``, bumped when the
+  decoding rules change so the backfill redoes old rows)
+
+``WeddingMirror`` derives ``attrs`` on every write, so webhooks, pulls and
+bulk loads keep it in sync. Reads through ``WeddingMirror.rows`` strip it,
+so read models still see plain Supabase rows. Rows written before ``attrs``
+existed are filled by ``backfill``, run once at startup in batched
+``bulk_write`` calls.
+
+``GET /api/guests`` and ``GET /api/guests/allergies`` answer from compound
+indexes on ``user_id`` plus ``attrs.deleted``, ``attrs.has_allergies`` or
+``attrs.allergens`` (declared in ``index_advisor.MIRROR_INDEXES``), without
+parsing a note.
+"""
+
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import fold_text, parse_note
+
+logger = logging.getLogger(__name__)
+
+ATTRS_FIELD = "attrs"
+ATTRS_VERSION = 1
+BACKFILL_BATCH = 1000
+_ALLERGEN_SEPARATORS = re.compile(r"[,;/\n]+")
+
+
+def _timestamp(raw: Any) -> Optional[datetime]:
+    if not isinstance(raw, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(raw.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Stored the way Mongo hands datetimes back: naive UTC
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def allergen_tokens(text: Optional[str]) -> List[str]:
+    tokens = []
+    for item in _ALLERGEN_SEPARATORS.split(text or ""):
+        token = fold_text(item)
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def note_attributes(row: Dict[str, Any]) -> Dict[str, Any]:
+    note = parse_note(row.get("note"))
+    allergies = note.get("allergies") if isinstance(note.get("allergies"), str) else None
+    allergens = allergen_tokens(allergies)
+    return {
+        "deleted": bool(note.get("deleted_at")),
+        "deleted_at": _timestamp(note.get("deleted_at")),
+        "allergies": allergies.strip() if allergies and allergies.strip() else None,
+        "allergens": allergens,
+        "has_allergies": bool(allergens),
+        "version": ATTRS_VERSION,
+    }
+
+
+def stored_row(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """The document the mirror keeps for ``row``: guests gain their decoded ``attrs``."""
+    if table != "invitati":
+        return row
+    return {**row, ATTRS_FIELD: note_attributes(row)}
+
+
+async def backfill(mirror, batch_size: int = BACKFILL_BATCH) -> int:
+    """Derive ``attrs`` for every guest stored without it (or with an older version); returns rows updated."""
+    from pymongo import UpdateOne
+
+    await mirror.ensure_indexes()
+    stale = {f"{ATTRS_FIELD}.version": {"$ne": ATTRS_VERSION}}
+    updated = 0
+    while True:
+        batch = await mirror.db.invitati.find(stale, {"_id": 0, "id": 1, "note": 1}).limit(batch_size).to_list(None)
+        if not batch:
+            break
+        # Only onto the note the attrs were derived from: a write landing in between stores its own attrs
+        result = await mirror.db.invitati.bulk_write(
+            [UpdateOne({"id": row["id"], "note": row.get("note"), **stale},
+                       {"$set": {ATTRS_FIELD: note_attributes(row)}}) for row in batch],
+            ordered=False)
+        updated += result.matched_count
+    if updated:
+        logger.info("Backfilled guest attributes on %d rows", updated)
+        # Rows did not change as Supabase sees them, but cached responses may embed the old shape
+        await mirror.bump_versions(await mirror.db.invitati.distinct("user_id"))
+    return updated
+
+
+async def backfill_on_startup(mirror) -> None:
+    try:
+        await backfill(mirror)
+    except Exception:
+        # Writes keep new rows in sync; the next start (or the endpoint) retries the old ones
+        logger.exception("Backfilling guest attributes failed")
+
+
+async def find_guests(mirror, user_id: str, status: str = "active") -> List[Dict[str, Any]]:
+    query: Dict[str, Any] = {}
+    if status != "all":
+        query[f"{ATTRS_FIELD}.deleted"] = status == "deleted"
+    return await mirror.rows("invitati", user_id, query)
+
+
+async def find_allergic(mirror, user_id: str, allergen: Optional[str] = None,
+                        include_deleted: bool = False) -> List[Dict[str, Any]]:
+    if allergen:
+        query: Dict[str, Any] = {f"{ATTRS_FIELD}.allergens": fold_text(allergen)}
+    else:
+        query = {f"{ATTRS_FIELD}.has_allergies": True}
+    if not include_deleted:
+        query[f"{ATTRS_FIELD}.deleted"] = False
+    return await mirror.rows("invitati", user_id, query)
+
+
+guest_attributes_router = APIRouter(prefix="/guests")
+
+
+@guest_attributes_router.get("")
+async def list_guests(request: Request, user_id: str = Query(..., min_length=1),
+                      status: str = Query("active", pattern="^(active|deleted|all)$")):
+    return await find_guests(request.app.state.mirror, user_id, status)
+
+
+@guest_attributes_router.get("/allergies")
+async def list_allergic_guests(request: Request, user_id: str = Query(..., min_length=1),
+                               allergen: Optional[str] = Query(None, max_length=100), include_deleted: bool = False):
+    return await find_allergic(request.app.state.mirror, user_id, allergen, include_deleted)
+
+
+@guest_attributes_router.post("/attributes/backfill")
+async def backfill_guest_attributes(request: Request):
+    return {"updated": await backfill(request.app.state.mirror)}
@@ -0,0 +1,118 @@
+"""Duplicate-guest detection for one wedding.
+
+Names are folded (accents, case, punctuation) and their words sorted, so
+"Rossi Marco" and "Marco Rossì" share one key. Candidate pairs come from a
+trigram index with prefix filtering: each name indexes only its rarest
+``|T| - ceil(t * |T|) + 1`` trigrams, which any pair with trigram Jaccard
+``>= t`` must share. Candidate generation therefore stays near-linear in the
+number of guests instead of comparing every pair. Only the candidates are
+scored exactly.
+"""
+
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import guest_status, name_tokens
+
+DEFAULT_MIN_SCORE = 0.6
+
+
+def name_key(row: Dict[str, Any]) -> str:
+    """Order-insensitive folded name: the blocking key for exact matches."""
+    return " ".join(sorted(set(name_tokens(row))))
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class DuplicateSuggestion:
+    keep: Dict[str, Any]
+    duplicate: Dict[str, Any]
+    score: float
+    reasons: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def summary(row):
+            return {k: row.get(k) for k in ("id", "nome_visualizzato", "unita_invito_id", "gruppo", "confermato")}
+
+        return {"keep": summary(self.keep), "duplicate": summary(self.duplicate),
+                "score": round(self.score, 3), "reasons": self.reasons}
+
+
+def _keeper(a: Dict[str, Any], b: Dict[str, Any]):
+    """Keep the confirmed guest, else the unit's main guest, else the one entered first."""
+    rank_a = (not a.get("confermato"), not a.get("is_principale"), a.get("id"))
+    rank_b = (not b.get("confermato"), not b.get("is_principale"), b.get("id"))
+    return (a, b) if rank_a <= rank_b else (b, a)
+
+
+def find_duplicates(rows: Iterable[Dict[str, Any]], min_score: float = DEFAULT_MIN_SCORE,
+                    limit: Optional[int] = None) -> List[DuplicateSuggestion]:
+    """Ranked merge suggestions for guests whose names look alike across invitation units."""
+    if not 0 < min_score <= 1:
+        raise ValueError("min_score must be in (0, 1]")
+    guests = [row for row in rows if guest_status(row) != "deleted"]
+
+    # Guests sharing a folded name collapse into one key, so the index is built over distinct names
+    by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in guests:
+        key = name_key(row)
+        if key:
+            by_key[key].append(row)
+    keys = list(by_key)
+    grams: List[FrozenSet[str]] = [frozenset(trigrams(key)) for key in keys]
+
+    # Rarest trigrams first, so the indexed prefixes have short posting lists
+    frequency = Counter(gram for gs in grams for gram in gs)
+    index: Dict[str, List[int]] = defaultdict(list)
+    pairs: Dict[Tuple[int, int], float] = {(i, i): 1.0 for i in range(len(keys))}
+    for i, gs in enumerate(grams):
+        ordered = sorted(gs, key=lambda gram: (frequency[gram], gram))
+        # Tolerance keeps float error (0.6 * 5 == 3.0000000000000004) from shortening the prefix
+        prefix = len(ordered) - math.ceil(min_score * len(ordered) - 1e-9) + 1
+        low, high = min_score * len(ordered) - 1e-9, len(ordered) / min_score + 1e-9
+        candidates: Set[int] = set()
+        for gram in ordered[:prefix]:
+            candidates.update(index[gram])
+            index[gram].append(i)
+        for j in candidates:
+            if low <= len(grams[j]) <= high:
+                overlap = len(gs & grams[j])
+                score = overlap / (len(gs) + len(grams[j]) - overlap)
+                if score >= min_score:
+                    pairs[(j, i)] = score
+
+    suggestions = []
+    for (i, j), score in pairs.items():
+        reason = "same_name" if i == j else "similar_name"
+        group_a, group_b = by_key[keys[i]], by_key[keys[j]]
+        for x, a in enumerate(group_a):
+            for b in (group_a[x + 1:] if i == j else group_b):
+                if a.get("unita_invito_id") is not None and a.get("unita_invito_id") == b.get("unita_invito_id"):
+                    continue
+                reasons = [reason]
+                if a.get("gruppo") and a.get("gruppo") == b.get("gruppo"):
+                    reasons.append("same_group")
+                keep, duplicate = _keeper(a, b)
+                suggestions.append(DuplicateSuggestion(keep, duplicate, score, reasons))
+
+    suggestions.sort(key=lambda s: (-s.score, -len(s.reasons), s.keep.get("id"), s.duplicate.get("id")))
+    return suggestions[:limit] if limit else suggestions
+
+
+dedupe_router = APIRouter()
+
+
+@dedupe_router.get("/guests/duplicates")
+async def guest_duplicates(request: Request, user_id: str = Query(..., min_length=1),
+                           min_score: float = Query(DEFAULT_MIN_SCORE, gt=0, le=1),
+                           limit: int = Query(100, ge=1, le=1000)):
+    rows = await request.app.state.mirror.rows("invitati", user_id)
+    return [s.to_dict() for s in find_duplicates(rows, min_score, limit)]
@@ -0,0 +1,221 @@
+"""Faceted guest filtering over per-wedding bitmaps.
+
+Each guest of a wedding holds one slot in a ``FacetBitmaps`` set. It has one
+value per facet: category, status, age band, allergies, assigned table and
+that table's side. Plain queries OR the values picked inside a facet and AND
+across facets. Each facet's counts are taken with every *other* facet's
+selection applied, so the badges show what picking another value would
+return. Expression queries (``and``/``or``/``not``) return counts under the
+full expression. The bitmaps follow ``invitati``, ``tavoli`` and
+``piani_salvati`` through the change bus.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+
+from guest_rows import guest_category, guest_status, parse_note, table_side
+from wedding_mirror import DELETE, RowChange, WeddingCache
+
+FACETS = ("category", "status", "age", "allergies", "table", "side")
+AGE_BANDS = ("Adulto", "Ragazzo", "Bambino")
+UNASSIGNED = "unassigned"
+
+
+def guest_facets(row: Dict[str, Any]) -> Dict[str, str]:
+    """Facet values that come from the ``invitati`` row itself."""
+    fascia = row.get("fascia_eta")
+    return {
+        "category": guest_category(row),
+        "status": guest_status(row),
+        "age": fascia if fascia in AGE_BANDS else "unknown",
+        "allergies": "yes" if parse_note(row.get("note")).get("allergies") else "no",
+    }
+
+
+class WeddingFacets:
+    def __init__(self, guests=(), tables=(), seats=()):
+        from facet_bitmaps import FacetBitmaps
+
+        self.bitmaps = FacetBitmaps(max(64, len(guests) * 2))
+        self._slots: Dict[int, int] = {}
+        self._ids: List[Optional[int]] = []
+        self._free: List[int] = []
+        self._base: Dict[int, Dict[str, str]] = {}
+        self._values: Dict[int, Dict[str, str]] = {}
+        self._sides: Dict[int, str] = {}
+        self._seats: Dict[int, tuple] = {}          # piani_salvati id -> (guest id, table id)
+        self._table_of: Dict[int, int] = {}
+        self._seated: Dict[int, set] = {}           # table id -> guest ids
+        for table in tables:
+            self._sides[table["id"]] = table_side(table)
+        for seat in seats:
+            self.put_seat(seat)
+        for guest in guests:
+            self.put_guest(guest)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _refresh(self, guest_id: int) -> None:
+        slot = self._slots.get(guest_id)
+        if slot is None:
+            return
+        table_id = self._table_of.get(guest_id)
+        values = dict(self._base[guest_id],
+                      table=UNASSIGNED if table_id is None else str(table_id),
+                      side=self._sides.get(table_id, UNASSIGNED) if table_id is not None else UNASSIGNED)
+        previous = self._values.get(guest_id, {})
+        for facet, value in values.items():
+            if previous.get(facet) != value:
+                if facet in previous:
+                    self.bitmaps.clear(slot, facet, previous[facet])
+                self.bitmaps.set(slot, facet, value)
+        self._values[guest_id] = values
+
+    def put_guest(self, row: Dict[str, Any]) -> None:
+        guest_id = row["id"]
+        if guest_id not in self._slots:
+            slot = self._free.pop() if self._free else len(self._ids)
+            if slot == len(self._ids):
+                self._ids.append(None)
+            self._slots[guest_id] = slot
+            self._ids[slot] = guest_id
+            self.bitmaps.set_alive(slot, True)
+        self._base[guest_id] = guest_facets(row)
+        self._refresh(guest_id)
+
+    def remove_guest(self, guest_id: int) -> None:
+        slot = self._slots.pop(guest_id, None)
+        if slot is None:
+            return
+        for facet, value in self._values.pop(guest_id, {}).items():
+            self.bitmaps.clear(slot, facet, value)
+        self.bitmaps.set_alive(slot, False)
+        self._base.pop(guest_id, None)
+        self._ids[slot] = None
+        self._free.append(slot)
+
+    def put_table(self, row: Dict[str, Any]) -> None:
+        self._sides[row["id"]] = table_side(row)
+        for guest_id in self._seated.get(row["id"], ()):
+            self._refresh(guest_id)
+
+    def remove_table(self, table_id: int) -> None:
+        self._sides.pop(table_id, None)
+        for guest_id in self._seated.get(table_id, ()):
+            self._refresh(guest_id)
+
+    def put_seat(self, row: Dict[str, Any]) -> None:
+        self.remove_seat(row["id"])
+        guest_id, table_id = row.get("invitato_id"), row.get("tavolo_id")
+        self._seats[row["id"]] = (guest_id, table_id)
+        self._table_of[guest_id] = table_id
+        self._seated.setdefault(table_id, set()).add(guest_id)
+        self._refresh(guest_id)
+
+    def remove_seat(self, seat_id: int) -> None:
+        guest_id, table_id = self._seats.pop(seat_id, (None, None))
+        if guest_id is None:
+            return
+        self._seated.get(table_id, set()).discard(guest_id)
+        if self._table_of.get(guest_id) == table_id:
+            del self._table_of[guest_id]
+        self._refresh(guest_id)
+
+    def apply(self, change: RowChange, user_id: str) -> None:
+        old = change.old_record if (change.old_record or {}).get("user_id") == user_id else None
+        new = change.record if (change.record or {}).get("user_id") == user_id else None
+        put, remove = {"invitati": (self.put_guest, self.remove_guest),
+                       "tavoli": (self.put_table, self.remove_table),
+                       "piani_salvati": (self.put_seat, self.remove_seat)}[change.table]
+        if new is not None and change.type != DELETE:
+            put(new)
+        elif old is not None:
+            remove(old["id"])
+
+    # Queries
+
+    def _selection_mask(self, selection: Mapping[str, Sequence[str]], skip: Optional[str] = None):
+        mask = self.bitmaps.alive.copy()
+        for facet, values in selection.items():
+            if facet != skip and values:
+                mask &= self.bitmaps.any_of(facet, values)
+        return mask
+
+    def evaluate(self, expression: Mapping[str, Any]):
+        """Bitmap of an ``{"and"|"or": [...]}`` / ``{"not": e}`` / ``{"facet", "in"}`` tree."""
+        if not isinstance(expression, Mapping) or len(expression.keys() - {"in"}) != 1:
+            raise ValueError(f"invalid filter {expression!r}")
+        if "facet" in expression:
+            if expression["facet"] not in FACETS or not isinstance(expression.get("in"), list):
+                raise ValueError(f"invalid facet filter {expression!r}")
+            return self.bitmaps.any_of(expression["facet"], [str(v) for v in expression["in"]]) & self.bitmaps.alive
+        if "not" in expression:
+            return ~self.evaluate(expression["not"]) & self.bitmaps.alive
+        op = "and" if "and" in expression else "or" if "or" in expression else None
+        if op is None or not isinstance(expression[op], list):
+            raise ValueError(f"invalid filter {expression!r}")
+        mask = self.bitmaps.alive.copy() if op == "and" else self.bitmaps.empty()
+        for child in expression[op]:
+            if op == "and":
+                mask &= self.evaluate(child)
+            else:
+                mask |= self.evaluate(child)
+        return mask
+
+    def _result(self, mask, counts: Dict[str, Dict[str, int]], include_ids: bool) -> Dict[str, Any]:
+        from facet_bitmaps import popcount
+
+        result: Dict[str, Any] = {"total": popcount(mask), "facets": counts}
+        if include_ids:
+            result["ids"] = sorted(self._ids[slot] for slot in self.bitmaps.slots(mask))
+        return result
+
+    def query(self, selection: Mapping[str, Sequence[str]], include_ids: bool = False) -> Dict[str, Any]:
+        unknown = set(selection) - set(FACETS)
+        if unknown:
+            raise ValueError(f"unknown facets {sorted(unknown)}")
+        counts = {facet: self.bitmaps.counts(facet, self._selection_mask(selection, skip=facet)) for facet in FACETS}
+        return self._result(self._selection_mask(selection), counts, include_ids)
+
+    def query_expression(self, expression: Mapping[str, Any], include_ids: bool = False) -> Dict[str, Any]:
+        mask = self.evaluate(expression)
+        return self._result(mask, {facet: self.bitmaps.counts(facet, mask) for facet in FACETS}, include_ids)
+
+
+class GuestFacetService(WeddingCache[WeddingFacets]):
+    tables = ("invitati", "tavoli", "piani_salvati")
+
+    async def build(self, user_id: str) -> WeddingFacets:
+        return WeddingFacets(await self.mirror.rows("invitati", user_id),
+                             await self.mirror.rows("tavoli", user_id),
+                             await self.mirror.rows("piani_salvati", user_id))
+
+    def apply(self, facets: WeddingFacets, user_id: str, change: RowChange) -> None:
+        facets.apply(change, user_id)
+
+
+facets_router = APIRouter()
+
+
+@facets_router.get("/guests/facets")
+async def guest_facet_counts(request: Request, user_id: str = Query(..., min_length=1), include_ids: bool = False):
+    """``?category=friends&category=colleagues&side=sposa``: OR within a facet, AND across facets."""
+    selection = {facet: request.query_params.getlist(facet) for facet in FACETS if facet in request.query_params}
+    facets = await request.app.state.facets.get(user_id)
+    try:
+        return facets.query(selection, include_ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@facets_router.post("/guests/facets")
+async def guest_facet_expression(request: Request, user_id: str = Query(..., min_length=1),
+                                 expression: Dict[str, Any] = Body(..., embed=True, alias="filter"),
+                                 include_ids: bool = False):
+    facets = await request.app.state.facets.get(user_id)
+    try:
+        return facets.query_expression(expression, include_ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
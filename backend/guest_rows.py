@@ -0,0 +1,65 @@
+"""Python port of the frontend's ``invitati`` row helpers (see hooks/useGuests.ts).
+
+Keeping the rules in one place means every backend read model classifies a
+guest exactly the way the planner UI does.
+"""
+
+import json
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+GUEST_CATEGORIES = ("family-his", "family-hers", "friends", "colleagues")
+DEFAULT_CATEGORY = "friends"
+TABLE_SIDES = ("sposo", "sposa", "centro")
+DEFAULT_SIDE = "centro"
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def parse_note(note: Optional[str]) -> Dict[str, Any]:
+    """Decode ``invitati.note``: JSON ``{allergies, deleted_at}``, legacy ``deleted_at:<ts>``, or plain allergies."""
+    if not note:
+        return {}
+    try:
+        parsed = json.loads(note)
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+    if 'deleted_at:' in note:
+        timestamp = note.split('deleted_at:', 1)[1].strip()
+        return {'deleted_at': timestamp or None}
+    return {'allergies': note}
+
+
+def guest_category(row: Dict[str, Any]) -> str:
+    gruppo = row.get('gruppo')
+    return gruppo if gruppo in GUEST_CATEGORIES else DEFAULT_CATEGORY
+
+
+def guest_status(row: Dict[str, Any]) -> str:
+    """``deleted`` when the note carries ``deleted_at``, else ``confirmed``/``pending``."""
+    if parse_note(row.get('note')).get('deleted_at'):
+        return 'deleted'
+    return 'confirmed' if row.get('confermato') else 'pending'
+
+
+def table_side(row: Dict[str, Any]) -> str:
+    lato = row.get('lato')
+    return lato if lato in TABLE_SIDES else DEFAULT_SIDE
+
+
+def fold_text(text: Optional[str]) -> str:
+    """Lowercase, strip accents and punctuation: ``"D'Angelo Niccolò"`` -> ``"d angelo niccolo"``."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    return _NON_ALNUM.sub(' ', stripped).strip()
+
+
+def name_tokens(row: Dict[str, Any]) -> List[str]:
+    """Folded name words of a guest, from ``nome_visualizzato`` or else ``nome`` + ``cognome``."""
+    display = row.get('nome_visualizzato') or f"{row.get('nome') or ''} {row.get('cognome') or ''}"
+    return fold_text(display).split()
@@ -0,0 +1,228 @@
+"""Typeahead search over one wedding's guests.
+
+Each wedding gets an in-memory index, built from the mirror on first use and
+then kept current from the change bus. Terms are folded like guest names
+(``"nicco"`` finds "Niccolò"). A prefix trie answers word-start matches. A
+trigram index catches infixes and small typos, so ``"ossi"`` and ``"rosi"``
+both reach "Rossi". Every query word must match. Name hits outrank group
+and allergy hits, and the best ``limit`` guests are returned.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import fold_text, guest_category, guest_status, name_tokens, parse_note
+from wedding_mirror import RowChange, WeddingCache
+
+NAME, GROUP, ALLERGY = "name", "group", "allergy"
+FIELD_WEIGHTS = {NAME: 3.0, GROUP: 1.0, ALLERGY: 1.0}
+EXACT_BONUS = 0.5
+MIN_TRIGRAM_SIMILARITY = 0.6
+FUZZY_FACTOR = 0.8
+# No fuzzy hit can score above this, whatever its field
+FUZZY_CEILING = max(FIELD_WEIGHTS.values()) * FUZZY_FACTOR
+TOP_CACHE = 100
+SUMMARY_FIELDS = ("id", "nome_visualizzato", "unita_invito_id", "gruppo", "confermato")
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def guest_terms(row: Dict[str, Any]) -> Dict[str, str]:
+    """Searchable words of a guest mapped to the field they come from (name wins ties)."""
+    terms: Dict[str, str] = {}
+    allergies = parse_note(row.get("note")).get("allergies")
+    names = name_tokens(row) + fold_text(f"{row.get('nome') or ''} {row.get('cognome') or ''}").split()
+    for field, words in ((ALLERGY, fold_text(allergies).split()),
+                         (GROUP, fold_text(guest_category(row)).split()),
+                         (NAME, names)):
+        for word in words:
+            terms[word] = field
+    return terms
+
+
+class _TrieNode:
+    __slots__ = ("children", "docs", "exact", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.docs: Dict[int, float] = {}     # best field weight of any word through this node
+        self.exact: Dict[int, float] = {}    # field weight of words ending at this node
+        self.top: Optional[List[Tuple[int, float]]] = None
+
+    def score(self, doc_id: int) -> float:
+        exact = self.exact.get(doc_id)
+        prefix = self.docs[doc_id]
+        return prefix if exact is None else max(prefix, exact + EXACT_BONUS)
+
+
+class GuestSearchIndex:
+    """Prefix trie plus trigram postings over one wedding's active guests.
+
+    Trie nodes cache their best ``TOP_CACHE`` guests, so a one-word prefix
+    query is a walk down the trie plus a slice. Trigrams point at distinct
+    words rather than guests, which keeps fuzzy matching proportional to the
+    vocabulary.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = ()):
+        self._root = _TrieNode()
+        self._words: Dict[str, _TrieNode] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._docs: Dict[int, Tuple[Dict[str, Any], Dict[str, str], str]] = {}
+        for row in rows:
+            self.add(row)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        doc_id = row["id"]
+        self.remove(doc_id)
+        if guest_status(row) == "deleted":
+            return
+        terms = guest_terms(row)
+        self._docs[doc_id] = ({k: row.get(k) for k in SUMMARY_FIELDS}, terms, " ".join(name_tokens(row)))
+        for word, field in terms.items():
+            weight = FIELD_WEIGHTS[field]
+            node = self._root
+            for ch in word:
+                node = node.children.setdefault(ch, _TrieNode())
+                node.docs[doc_id] = max(node.docs.get(doc_id, 0.0), weight)
+                node.top = None
+            node.exact[doc_id] = weight
+            if word not in self._words:
+                self._words[word] = node
+                for gram in _trigrams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+
+    def remove(self, doc_id: int) -> None:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for word in doc[1]:
+            node = self._root
+            for ch in word:
+                node = node.children[ch]
+                node.docs.pop(doc_id, None)
+                node.top = None
+            node.exact.pop(doc_id, None)
+            if not node.exact:
+                del self._words[word]
+                for gram in _trigrams(word):
+                    words = self._grams[gram]
+                    words.discard(word)
+                    if not words:
+                        del self._grams[gram]
+        # Prune branches no guest uses any more, only once every word is out: one of the guest's
+        # words may run through another ("anna", "annamaria")
+        for word in doc[1]:
+            node, path = self._root, []
+            for ch in word:
+                if ch not in node.children:
+                    break
+                path.append((node, ch))
+                node = node.children[ch]
+            for parent, ch in reversed(path):
+                child = parent.children[ch]
+                if child.docs or child.exact or child.children:
+                    break
+                del parent.children[ch]
+
+    def _node(self, term: str) -> Optional[_TrieNode]:
+        node = self._root
+        for ch in term:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _rank_key(self, doc_id: int, score: float):
+        return -score, self._docs[doc_id][2], doc_id
+
+    def _top(self, node: _TrieNode) -> List[Tuple[int, float]]:
+        if node.top is None:
+            scored = ((doc_id, node.score(doc_id)) for doc_id in node.docs)
+            node.top = heapq.nsmallest(TOP_CACHE, scored, key=lambda item: self._rank_key(*item))
+        return node.top
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        """Best score each guest gets for one query word."""
+        node = self._node(term)
+        scores = {doc_id: node.score(doc_id) for doc_id in node.docs} if node else {}
+        if len(term) < 3:
+            return scores
+        grams = _trigrams(term)
+        # Infix hits lack the term's leading-space trigram, so containment uses the inner ones
+        inner = {gram for gram in grams if not gram.startswith(" ")} or grams
+        candidates: Set[str] = set()
+        for gram in grams:
+            candidates.update(self._grams.get(gram, ()))
+        for word in candidates:
+            if word.startswith(term):
+                continue
+            word_grams = _trigrams(word)
+            similarity = max(len(grams & word_grams) / len(grams | word_grams),
+                             len(inner & word_grams) / len(inner))
+            if similarity < MIN_TRIGRAM_SIMILARITY:
+                continue
+            for doc_id, weight in self._words[word].exact.items():
+                # Fuzzy and infix hits rank below any word-start hit in the same field
+                fuzzy = weight * similarity * FUZZY_FACTOR
+                if fuzzy > scores.get(doc_id, 0.0):
+                    scores[doc_id] = fuzzy
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        terms = sorted(set(fold_text(query).split()), key=len, reverse=True)
+        if not terms:
+            return []
+        limit = min(limit, TOP_CACHE)
+        if len(terms) == 1:
+            node = self._node(terms[0])
+            top = self._top(node)[:limit] if node else []
+            # Cached word-start hits are final unless fuzzy hits could still outrank the last of them
+            if len(terms[0]) < 3 or (len(top) == limit and top[-1][1] > FUZZY_CEILING):
+                return self._results(top)
+        totals: Optional[Dict[int, float]] = None
+        for term in terms:
+            scores = self._term_scores(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {doc_id: total + scores[doc_id] for doc_id, total in totals.items() if doc_id in scores}
+            if not totals:
+                return []
+        return self._results(heapq.nsmallest(limit, totals.items(), key=lambda item: self._rank_key(*item)))
+
+    def _results(self, ranked: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        return [dict(self._docs[doc_id][0], score=round(score, 3)) for doc_id, score in ranked]
+
+
+class GuestSearchService(WeddingCache[GuestSearchIndex]):
+    tables = ("invitati",)
+
+    async def build(self, user_id: str) -> GuestSearchIndex:
+        return GuestSearchIndex(await self.mirror.rows("invitati", user_id))
+
+    def apply(self, index: GuestSearchIndex, user_id: str, change: RowChange) -> None:
+        if change.old_record and change.old_record.get("user_id") == user_id:
+            index.remove(change.old_record["id"])
+        if change.record and change.record.get("user_id") == user_id:
+            index.add(change.record)
+
+    async def search(self, user_id: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        return (await self.get(user_id)).search(query, limit)
+
+
+search_router = APIRouter()
+
+
+@search_router.get("/guests/search")
+async def search_guests(request: Request, user_id: str = Query(..., min_length=1),
+                        q: str = Query(..., max_length=100), limit: int = Query(10, ge=1, le=TOP_CACHE)):
+    return await request.app.state.search.search(user_id, q, limit)
@@ -0,0 +1,209 @@
+"""Conditional GETs and response compression.
+
+``ConditionalGetMiddleware`` gives wedding-scoped GET routes (``?user_id=``)
+a strong ETag derived from the wedding's data version, which
+``WeddingMirror`` bumps after every write. The version is read *before* the
+handler runs, so a tag can only ever be older than the data it labels, never
+newer. A matching ``If-None-Match`` is answered with 304 from that one
+``find_one`` and the route's query is never run.
+
+``CompressionMiddleware`` encodes responses above ``minimum_size`` with
+brotli (when the ``brotli`` package is installed) or gzip, chunk by chunk as
+the body streams out. Encoded variants get the encoding appended to their
+ETag (``"…-br"``), as strong validators must differ per representation. The
+suffix is stripped from ``If-None-Match`` on the way in.
+"""
+
+import hashlib
+import zlib
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.datastructures import Headers, MutableHeaders
+
+# Wedding-scoped GET routes whose response depends only on the mirrored data and the query string
+VERSIONED_PATHS = ("/api/stats", "/api/guests/search", "/api/guests/facets", "/api/guests/duplicates")
+MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+SKIPPED_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def _etags(header: Optional[str]) -> List[str]:
+    return [tag.strip() for tag in (header or "").split(",") if tag.strip()]
+
+
+def entity_tag(path: str, query: str, version: int, build_id: str = "") -> str:
+    canonical = "&".join(f"{k}={v}" for k, v in sorted(parse_qsl(query, keep_blank_values=True)))
+    digest = hashlib.blake2b(f"{build_id}|{path}?{canonical}".encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+class ConditionalGetMiddleware:
+    def __init__(self, app, paths: Iterable[str] = VERSIONED_PATHS):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        query = scope.get("query_string", b"").decode("latin-1")
+        user_id = dict(parse_qsl(query)).get("user_id")
+        if not user_id:
+            await self.app(scope, receive, send)
+            return
+        state = scope["app"].state
+        version = await state.mirror.data_version(user_id)
+        coherence = getattr(state, "coherence", None)
+        if coherence is not None:
+            coherence.ensure_fresh(user_id, version)
+        etag = entity_tag(scope["path"], query, version, state.settings.build_id)
+        validators = [("etag", etag), ("cache-control", "private, no-cache")]
+        if {etag, "*"} & set(_etags(Headers(scope=scope).get("if-none-match"))):
+            await send({"type": "http.response.start", "status": 304,
+                        "headers": [(k.encode(), v.encode()) for k, v in validators]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for key, value in validators:
+                    headers[key] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = _brotli().Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def update(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+
+def negotiate(accept_encoding: Optional[str], brotli_available: bool) -> Optional[str]:
+    """Preferred coding the client accepts: ``br`` over ``gzip``, honouring ``q=0``."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    for coding in (("br", "gzip") if brotli_available else ("gzip",)):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def _strip_coding(header: str) -> Tuple[str, Optional[str]]:
+    """``If-None-Match`` without encoding suffixes, plus the suffix the client sent (if any)."""
+    tags, coding = [], None
+    for tag in _etags(header):
+        for suffix in ("-br", "-gzip"):
+            if tag.endswith(suffix + '"'):
+                tag, coding = tag[:-len(suffix) - 1] + '"', suffix[1:]
+                break
+        tags.append(tag)
+    return ", ".join(tags), coding
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_available = _brotli() is not None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        coding = negotiate(request_headers.get("accept-encoding"), self.brotli_available)
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        sent_coding = None
+        if "if-none-match" in request_headers:
+            stripped, sent_coding = _strip_coding(request_headers["if-none-match"])
+            scope = dict(scope, headers=[(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+                         + [(b"if-none-match", stripped.encode("latin-1"))])
+
+        start: Optional[dict] = None
+        encoder: Optional[_Encoder] = None
+
+        async def send_compressed(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message
+                if message["status"] == 304:
+                    # Revalidating the variant the client holds, which may be the identity one
+                    if sent_coding:
+                        self._tag(MutableHeaders(scope=start), sent_coding)
+                    await send(start)
+                    start = None
+                return
+            if message["type"] != "http.response.body" or start is None and encoder is None:
+                await send(message)
+                return
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if encoder is not None:
+                chunk = encoder.update(body) if more else encoder.finish(body)
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+                return
+            headers = MutableHeaders(scope=start)
+            content_type = headers.get("content-type", "")
+            if ("content-encoding" in headers or start["status"] < 200 or start["status"] in (204, 206)
+                    or content_type.startswith(SKIPPED_TYPES) or (not more and len(body) < self.minimum_size)):
+                await send(start)
+                start = None
+                await send(message)
+                return
+            encoder = _Encoder(coding)
+            headers["content-encoding"] = coding
+            headers.add_vary_header("Accept-Encoding")
+            self._tag(headers, coding)
+            if more:
+                # Length unknown until the stream ends: send chunked
+                del headers["content-length"]
+                payload = encoder.update(body)
+            else:
+                payload = encoder.finish(body)
+                headers["content-length"] = str(len(payload))
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": payload, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _tag(headers: MutableHeaders, coding: str) -> None:
+        etag = headers.get("etag")
+        if etag and etag.endswith('"') and not etag.startswith("W/"):
+            headers["etag"] = f'{etag[:-1]}-{coding}"'
@@ -0,0 +1,277 @@
+"""Per-wedding (``user_id``) indexes for the mirror, and a check that the hot queries use them.
+
+Every read the backend makes against the mirror is scoped to one wedding,
+through ``WeddingMirror.rows`` or an explicit ``user_id`` filter. Until now
+the collections only had single-field ``user_id`` indexes. Filters on a
+second column (``attrs.deleted``, ``id $in``, ``invitato_id $in``) had to
+fetch the whole wedding and filter it, and that work grows with each
+wedding's size.
+
+``MIRROR_INDEXES`` is the declarative index set. Compound indexes lead with
+``user_id`` and follow the equality, sort, range rule. They replace the
+single-field ``user_id_1`` indexes listed in ``RETIRED_INDEXES``.
+``migrate_indexes`` makes a database match the set and is safe to run again;
+``WeddingMirror.ensure_indexes`` runs it on first use.
+
+``HOT_QUERIES`` lists the query shapes the backend actually issues: the
+mirror's, and those of the outbox, job queue, cache events and status
+rollups, whose services create their own indexes on first use
+(``ensure_service_indexes`` runs them all). ``advise`` explains each one,
+reports the stage and index the planner picked, and for a collection scan
+suggests the index that would serve it. The forecast's cross-wedding
+aggregation reads every guest by design; it is reported but marked
+``full_scan``. It works with mongod and the ``memory://`` stand-in:
+
+    python backend/index_advisor.py [--apply] [--check]
+
+``--apply`` creates the mirror and service indexes first. ``--check`` exits
+1 when any other hot query falls back to a collection scan.
+``benchmarks/bench_query_plans.py`` runs the same check at scale. The
+Postgres indexes for the frontend's per-wedding queries (a different set:
+Postgres serves other reads) are in
+``frontend/supabase/migrations/20261019120000_tenant_indexes.sql``.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from guest_attributes import ATTRS_FIELD, ATTRS_VERSION
+
+Keys = Tuple[Tuple[str, int], ...]
+# pymongo's values, spelled out so importing this module (server.py does) does not load pymongo
+ASCENDING, DESCENDING = 1, -1
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Keys
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        # mongod's default name, so indexes created before the migration are recognised
+        return "_".join(f"{column}_{direction}" for column, direction in self.keys)
+
+
+def _index(collection: str, *columns: str, unique: bool = False) -> IndexSpec:
+    return IndexSpec(collection, tuple((column, ASCENDING) for column in columns), unique)
+
+
+MIRROR_INDEXES: Tuple[IndexSpec, ...] = (
+    _index("invitati", "id", unique=True),
+    _index("invitati", "user_id", "id"),
+    _index("invitati", "user_id", f"{ATTRS_FIELD}.deleted"),
+    _index("invitati", "user_id", f"{ATTRS_FIELD}.has_allergies"),
+    _index("invitati", "user_id", f"{ATTRS_FIELD}.allergens"),
+    _index("invitati", "unita_invito_id"),
+    _index("invitati", f"{ATTRS_FIELD}.version"),
+    _index("unita_invito", "id", unique=True),
+    _index("unita_invito", "user_id", "id"),
+    _index("tavoli", "id", unique=True),
+    _index("tavoli", "user_id", "id"),
+    _index("piani_salvati", "id", unique=True),
+    _index("piani_salvati", "user_id", "invitato_id"),
+    _index("piani_salvati", "user_id", "tavolo_id"),
+    _index("piani_salvati", "tavolo_id"),
+    _index("relazioni", "invitato_a_id", "invitato_b_id", unique=True),
+    _index("relazioni", "user_id", "invitato_a_id"),
+    _index("wedding_versions", "user_id", unique=True),
+)
+
+# Prefixes of a compound index above: the compound one serves every query they did
+RETIRED_INDEXES: Tuple[Tuple[str, str], ...] = tuple(
+    (table, "user_id_1") for table in ("invitati", "unita_invito", "tavoli", "piani_salvati", "relazioni"))
+
+# Stands in for the wedding a shape is bound to (see ``QueryShape.bind``)
+USER = "$user_id"
+# Any time will do for the time-window shapes: the plan does not depend on it
+MOMENT = datetime(2026, 1, 1)
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Tuple[Tuple[str, int], ...] = field(default=())
+    # Reads the whole collection on purpose (a cross-wedding aggregation): reported, never a ``--check`` failure
+    full_scan: bool = False
+
+    def bind(self, user_id: str) -> Dict[str, Any]:
+        return {key: user_id if value == USER else value for key, value in self.filter.items()}
+
+
+def _wedding_rows(table: str) -> QueryShape:
+    return QueryShape(f"{table} rows", table, {"user_id": USER})
+
+
+HOT_QUERIES: Tuple[QueryShape, ...] = (
+    *(_wedding_rows(table) for table in ("invitati", "unita_invito", "tavoli", "piani_salvati", "relazioni")),
+    QueryShape("active guests", "invitati", {"user_id": USER, f"{ATTRS_FIELD}.deleted": False}),
+    QueryShape("allergic guests", "invitati",
+               {"user_id": USER, f"{ATTRS_FIELD}.has_allergies": True, f"{ATTRS_FIELD}.deleted": False}),
+    QueryShape("guests by allergen", "invitati",
+               {"user_id": USER, f"{ATTRS_FIELD}.allergens": "glutine", f"{ATTRS_FIELD}.deleted": False}),
+    QueryShape("stale guest attributes", "invitati", {f"{ATTRS_FIELD}.version": {"$ne": ATTRS_VERSION}}),
+    QueryShape("unit members", "invitati", {"unita_invito_id": 1}),
+    QueryShape("guest owner", "invitati", {"id": 1}),
+    QueryShape("table owner", "tavoli", {"id": 1}),
+    QueryShape("floor plan tables", "tavoli", {"user_id": USER, "id": {"$in": [1, 2, 3]}}),
+    QueryShape("floor plan seats", "piani_salvati", {"user_id": USER, "invitato_id": {"$in": [1, 2, 3]}}),
+    QueryShape("seat by id", "piani_salvati", {"id": 1}),
+    QueryShape("relationship by key", "relazioni", {"invitato_a_id": 1, "invitato_b_id": 2}),
+    QueryShape("wedding version", "wedding_versions", {"user_id": USER}),
+    # The forecast model's $match: every live guest of every wedding, grouped in Mongo
+    QueryShape("forecast history", "invitati", {f"{ATTRS_FIELD}.deleted": {"$ne": True}}, full_scan=True),
+    # Service collections, indexed by the services that own them (see ``ensure_service_indexes``)
+    QueryShape("due notifications", "outbox",
+               {"status": "pending", "next_attempt_at": {"$lte": MOMENT}, "channel": {"$in": ["email"]}},
+               sort=(("next_attempt_at", ASCENDING),)),
+    QueryShape("expired notifications", "outbox", {"status": "sending", "lease_until": {"$lt": MOMENT}}),
+    QueryShape("notification claim", "outbox", {"claim": "claim"}),
+    QueryShape("notifications by id", "outbox", {"id": {"$in": ["a", "b"]}}),
+    QueryShape("wedding notifications", "outbox", {"user_id": USER}, sort=(("created_at", ASCENDING),)),
+    QueryShape("next queued job", "jobs", {"status": "queued"}, sort=(("created_at", ASCENDING),)),
+    QueryShape("stale jobs", "jobs", {"status": "running", "heartbeat_at": {"$lt": MOMENT}}),
+    QueryShape("worker jobs", "jobs", {"owner": "worker", "cancel_requested": True}),
+    QueryShape("job by id", "jobs", {"id": "job"}),
+    QueryShape("wedding jobs", "jobs", {"user_id": USER}, sort=(("created_at", DESCENDING),)),
+    QueryShape("recent cache events", "cache_events", {"at": {"$gte": MOMENT}}, sort=(("at", ASCENDING),)),
+    QueryShape("status summary", "status_rollups", {"granularity": "hour", "start": {"$gte": MOMENT, "$lte": MOMENT}},
+               sort=(("client_name", ASCENDING), ("start", ASCENDING))),
+)
+
+
+async def migrate_indexes(db, indexes: Iterable[IndexSpec] = MIRROR_INDEXES,
+                          retired: Iterable[Tuple[str, str]] = RETIRED_INDEXES) -> Dict[str, List[str]]:
+    """Create the missing ``indexes``, then drop the ``retired`` ones; returns ``collection.index`` names."""
+    existing: Dict[str, Dict[str, Any]] = {}
+
+    async def names(collection: str) -> Dict[str, Any]:
+        if collection not in existing:
+            existing[collection] = await db[collection].index_information()
+        return existing[collection]
+
+    report: Dict[str, List[str]] = {"created": [], "dropped": []}
+    for spec in indexes:
+        if spec.name not in await names(spec.collection):
+            options = {"unique": True} if spec.unique else {}
+            await db[spec.collection].create_index(list(spec.keys), name=spec.name, **options)
+            report["created"].append(f"{spec.collection}.{spec.name}")
+    # Only after their replacements exist, so no query is left without an index in between
+    for collection, name in retired:
+        if name in await names(collection):
+            await db[collection].drop_index(name)
+            report["dropped"].append(f"{collection}.{name}")
+    return report
+
+
+async def ensure_service_indexes(database) -> None:
+    """Create the indexes the outbox, job, cache event and status services make on first use."""
+    from cache_coherence import CacheCoherence
+    from jobs import JobRunner
+    from notifications import NotificationDispatcher
+    from status_series import StatusSeries
+    from wedding_mirror import WeddingMirror
+
+    await NotificationDispatcher(database, {}).ensure_indexes()
+    await JobRunner(database).ensure_indexes()
+    await CacheCoherence(WeddingMirror(database), []).ensure_indexes()
+    await StatusSeries(database, database.settings.status_ttl_days).ensure_ready()
+
+
+def _stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # mongod 7+ nests the classic tree under ``queryPlan`` when the slot-based engine runs the query
+    plan = plan.get("queryPlan", plan)
+    stages = [plan]
+    for child in [plan.get("inputStage")] + list(plan.get("inputStages", ())):
+        if child:
+            stages += _stages(child)
+    return stages
+
+
+def suggest_index(shape: QueryShape) -> Keys:
+    """An index for ``shape``: ``user_id`` first, other equality fields, sort fields, then range fields."""
+    equality, ranges = [], []
+    for column, condition in shape.filter.items():
+        if isinstance(condition, dict) and not set(condition) <= {"$eq", "$in"}:
+            ranges.append(column)
+        else:
+            equality.append(column)
+    equality.sort(key=lambda column: column != "user_id")
+    sort = [column for column, _ in shape.sort]
+    columns = equality + [c for c in sort if c not in equality] + [c for c in ranges if c not in sort]
+    directions = dict(shape.sort)
+    return tuple((column, directions.get(column, ASCENDING)) for column in columns)
+
+
+async def explain(db, shape: QueryShape, user_id: str = "advisor") -> Dict[str, Any]:
+    cursor = db[shape.collection].find(shape.bind(user_id))
+    if shape.sort:
+        cursor = cursor.sort(list(shape.sort))
+    plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+    stages = _stages(plan)
+    names = [stage["stage"] for stage in stages]
+    index = next((stage.get("indexName") for stage in stages if stage["stage"] == "IXSCAN"), None)
+    report = {"query": shape.name, "collection": shape.collection, "stages": names, "index": index,
+              "collscan": "COLLSCAN" in names, "blocking_sort": "SORT" in names, "full_scan": shape.full_scan}
+    if (report["collscan"] and not shape.full_scan) or report["blocking_sort"]:
+        report["suggested"] = IndexSpec(shape.collection, suggest_index(shape)).name
+    return report
+
+
+async def advise(db, shapes: Sequence[QueryShape] = HOT_QUERIES, user_id: str = "advisor") -> List[Dict[str, Any]]:
+    return [await explain(db, shape, user_id) for shape in shapes]
+
+
+def collection_scans(reports: Iterable[Dict[str, Any]]) -> List[str]:
+    return [report["query"] for report in reports if report["collscan"] and not report.get("full_scan")]
+
+
+def print_report(reports: Sequence[Dict[str, Any]], out=sys.stdout) -> None:
+    for report in reports:
+        plan = " <- ".join(report["stages"])
+        index = report["index"] or "-"
+        line = f"{report['query']:<24} {report['collection']:<16} {index:<36} {plan}"
+        if report.get("suggested"):
+            line += f"  (suggest {report['suggested']})"
+        elif report.get("full_scan"):
+            line += "  (full scan by design)"
+        print(line, file=out)
+
+
+async def _run(args) -> int:
+    from database import Database
+    from settings import Settings
+
+    database = Database(Settings.from_env())
+    try:
+        if args.apply:
+            print(json.dumps(await migrate_indexes(database.db), indent=2))
+            await ensure_service_indexes(database)
+        reports = await advise(database.db)
+    finally:
+        database.close()
+    print_report(reports)
+    scans = collection_scans(reports)
+    if args.check and scans:
+        print(f"collection scans: {', '.join(scans)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="create missing indexes and drop retired ones first")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a hot query scans its collection")
+    return asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""Background jobs for work too long for a request handler.
+
+A job is one document in the ``jobs`` collection, so any worker process can
+serve ``GET /api/jobs/{id}``. Each backend process runs a ``JobRunner`` with a
+fixed number of worker tasks. A worker claims the oldest queued job with an
+atomic ``find_one_and_update`` and calls its handler. The handler reports
+progress, intermediate best results and a resume checkpoint through
+``JobContext.report``.
+
+* Cancellation is cooperative. ``DELETE`` sets ``cancel_requested`` and the
+  next ``report`` call raises ``JobCancelled`` inside the handler.
+* Resume: owners refresh ``heartbeat_at`` while a job runs. A job whose
+  heartbeat goes stale (the process died) is queued again and restarts from
+  its last checkpoint. A graceful shutdown re-queues its jobs immediately.
+  After ``MAX_ATTEMPTS`` claims the job is failed instead.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from outbound import BATCH, lane
+from supabase_auth import require_wedding_owner
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+MAX_ATTEMPTS = 3
+HEARTBEAT_SECONDS = 5.0
+STALE_SECONDS = 30.0
+POLL_SECONDS = 2.0
+# Minimum gap between plain progress writes; results and checkpoints are always written
+REPORT_INTERVAL = 0.5
+
+JobHandler = Callable[["JobContext", Dict[str, Any]], Awaitable[Any]]
+JOB_KINDS: Dict[str, JobHandler] = {}
+# Kinds that write to Supabase with the service-role key unless ``dry_run``: only the wedding's owner may submit them
+SERVICE_WRITE_KINDS: Set[str] = set()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_kind(name: str, service_writes: bool = False) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        JOB_KINDS[name] = handler
+        if service_writes:
+            SERVICE_WRITE_KINDS.add(name)
+        return handler
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """What a handler sees of its job: app state, the resume checkpoint and ``report``."""
+
+    def __init__(self, runner: "JobRunner", job: Dict[str, Any]):
+        self.runner = runner
+        self.state = runner.state
+        self.job_id = job["id"]
+        self.checkpoint = job.get("checkpoint")
+        self.cancel_requested = bool(job.get("cancel_requested"))
+        self._last_report = 0.0
+
+    async def report(self, progress: Optional[float] = None, message: Optional[str] = None,
+                     best: Any = None, checkpoint: Any = None, force: bool = False) -> None:
+        """Persist progress (throttled); raises ``JobCancelled`` once cancellation was requested."""
+        if self.cancel_requested:
+            raise JobCancelled()
+        fields: Dict[str, Any] = {}
+        if progress is not None:
+            fields["progress"] = round(min(max(progress, 0.0), 1.0), 4)
+        if message is not None:
+            fields["message"] = message
+        if best is not None:
+            fields["best"] = best
+        if checkpoint is not None:
+            fields["checkpoint"] = self.checkpoint = checkpoint
+        if not force and best is None and checkpoint is None and time.monotonic() - self._last_report < REPORT_INTERVAL:
+            return
+        self._last_report = time.monotonic()
+        from pymongo import ReturnDocument
+
+        doc = await self.runner.collection.find_one_and_update(
+            {"id": self.job_id, "owner": self.runner.worker_id},
+            {"$set": dict(fields, heartbeat_at=_now(), updated_at=_now()), "$inc": {"version": 1}},
+            projection={"_id": 0, "cancel_requested": 1}, return_document=ReturnDocument.AFTER)
+        # No document: the job was re-queued and claimed by someone else, stop working on it
+        if doc is None or doc.get("cancel_requested"):
+            self.cancel_requested = True
+            raise JobCancelled()
+
+
+class JobRunner:
+    def __init__(self, database, state: Any = None, workers: int = 2):
+        self.database = database
+        self.state = state
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._active: Dict[str, JobContext] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        return self.database.db[JOBS_COLLECTION]
+
+    async def ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            await self.collection.create_index([("id", 1)], unique=True)
+            await self.collection.create_index([("status", 1), ("created_at", 1)])
+            await self.collection.create_index([("user_id", 1), ("created_at", -1)])
+            # A worker's own jobs: heartbeats, cancellation checks and the hand-back on stop
+            await self.collection.create_index([("owner", 1), ("status", 1)])
+            self._indexes_ready = True
+
+    # API side
+
+    async def submit(self, kind: str, params: Optional[Dict[str, Any]] = None,
+                     user_id: Optional[str] = None) -> Dict[str, Any]:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind {kind!r}")
+        await self.ensure_indexes()
+        now = _now()
+        job = {"id": str(uuid.uuid4()), "kind": kind, "params": params or {}, "user_id": user_id,
+               "status": QUEUED, "progress": 0.0, "message": None, "best": None, "result": None, "error": None,
+               "checkpoint": None, "cancel_requested": False, "attempts": 0, "owner": None, "version": 0,
+               "created_at": now, "updated_at": now, "started_at": None, "finished_at": None, "heartbeat_at": None}
+        await self.collection.insert_one(dict(job))
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0, "checkpoint": 0})
+
+    async def list(self, user_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = {} if user_id is None else {"user_id": user_id}
+        cursor = self.collection.find(query, {"_id": 0, "checkpoint": 0, "best": 0, "result": 0})
+        return await cursor.sort([("created_at", -1)]).limit(limit).to_list(limit)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job outright; ask a running one to stop at its next report."""
+        await self.collection.update_one(
+            {"id": job_id, "status": QUEUED},
+            {"$set": {"status": CANCELLED, "cancel_requested": True, "finished_at": _now(), "updated_at": _now()},
+             "$inc": {"version": 1}})
+        await self.collection.update_one(
+            {"id": job_id, "status": RUNNING},
+            {"$set": {"cancel_requested": True, "updated_at": _now()}, "$inc": {"version": 1}})
+        if job_id in self._active:
+            self._active[job_id].cancel_requested = True
+        return await self.get(job_id)
+
+    # Worker side
+
+    async def start(self) -> None:
+        await self.ensure_indexes()
+        await self.requeue_stale()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand unfinished jobs straight back to the queue rather than waiting for them to go stale. A graceful
+        # stop is not a lost worker, so the attempt is given back (requeue_stale fails jobs after MAX_ATTEMPTS)
+        await self.collection.update_many(
+            {"owner": self.worker_id, "status": RUNNING},
+            {"$set": {"status": QUEUED, "owner": None, "updated_at": _now()}, "$inc": {"attempts": -1, "version": 1}})
+
+    async def requeue_stale(self, stale_seconds: float = STALE_SECONDS) -> None:
+        cutoff = _now() - timedelta(seconds=stale_seconds)
+        stale = {"status": RUNNING, "heartbeat_at": {"$lt": cutoff}}
+        await self.collection.update_many(
+            dict(stale, attempts={"$gte": MAX_ATTEMPTS}),
+            {"$set": {"status": FAILED, "owner": None, "error": "abandoned after repeated worker loss",
+                      "finished_at": _now(), "updated_at": _now()}, "$inc": {"version": 1}})
+        await self.collection.update_many(
+            stale, {"$set": {"status": QUEUED, "owner": None, "updated_at": _now()}, "$inc": {"version": 1}})
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        from pymongo import ReturnDocument
+
+        now = _now()
+        return await self.collection.find_one_and_update(
+            {"status": QUEUED},
+            {"$set": {"status": RUNNING, "owner": self.worker_id, "started_at": now, "heartbeat_at": now,
+                      "updated_at": now}, "$inc": {"attempts": 1, "version": 1}},
+            projection={"_id": 0}, sort=[("created_at", 1)], return_document=ReturnDocument.AFTER)
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run(job)
+
+    async def run(self, job: Dict[str, Any]) -> None:
+        context = self._active[job["id"]] = JobContext(self, job)
+        fields: Dict[str, Any]
+        try:
+            # Job handlers' Supabase calls queue behind interactive ones
+            with lane(BATCH):
+                result = await JOB_KINDS[job["kind"]](context, job.get("params") or {})
+            fields = {"status": SUCCEEDED, "result": result, "progress": 1.0}
+        except JobCancelled:
+            fields = {"status": CANCELLED}
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job["id"], job["kind"])
+            fields = {"status": FAILED, "error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            self._active.pop(job["id"], None)
+        await self.collection.update_one(
+            {"id": job["id"], "owner": self.worker_id},
+            {"$set": dict(fields, owner=None, finished_at=_now(), updated_at=_now()), "$inc": {"version": 1}})
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                if self._active:
+                    await self.collection.update_many(
+                        {"owner": self.worker_id, "status": RUNNING}, {"$set": {"heartbeat_at": _now()}})
+                    # Pick up cancellations requested through another process
+                    async for doc in self.collection.find({"owner": self.worker_id, "cancel_requested": True},
+                                                          {"_id": 0, "id": 1}):
+                        if doc["id"] in self._active:
+                            self._active[doc["id"]].cancel_requested = True
+                await self.requeue_stale()
+            except Exception:
+                logger.exception("Job heartbeat failed")
+
+
+# Job kinds
+
+async def _load_wedding(context: JobContext, user_id: str):
+    from relationships import load_graph
+
+    mirror = context.state.mirror
+    return (await mirror.rows("invitati", user_id), await mirror.rows("tavoli", user_id),
+            await load_graph(mirror, user_id))
+
+
+@job_kind("seating.seed")
+async def seed_seating_job(context: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    from guest_rows import guest_status
+    from relationships import infer_relationships
+    from seating import refine_plan, seed_plan
+
+    guests, tables, graph = await _load_wedding(context, params["user_id"])
+    statuses = ("confirmed",) if params.get("confirmed_only") else ("confirmed", "pending")
+    if not len(graph):
+        # Inferred once here, so refining does not infer it again
+        graph = await asyncio.to_thread(infer_relationships, [g for g in guests if guest_status(g) in statuses])
+    await context.report(0.1, "clustering")
+    seeded = await asyncio.to_thread(seed_plan, guests, tables, graph, False, statuses)
+    if not params.get("refine", True):
+        return seeded.to_dict()
+    await context.report(0.5, "refining", best=seeded.to_dict())
+    return (await asyncio.to_thread(refine_plan, seeded, guests, tables, graph, statuses)).to_dict()
+
+
+@job_kind("seating.order")
+async def order_seats_job(context: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Seat order for the saved plan, a few tables at a time; finished tables survive a restart."""
+    from relationships import infer_relationships
+    from seat_order import ROUND, build_problems, order_tables
+
+    user_id = params["user_id"]
+    guests, tables, graph = await _load_wedding(context, user_id)
+    if not len(graph):
+        graph = await asyncio.to_thread(infer_relationships, guests)
+    rows = await context.state.mirror.rows("piani_salvati", user_id)
+    problems = build_problems({row["invitato_id"]: row["tavolo_id"] for row in rows}, tables, graph,
+                              default_shape=params.get("shape", ROUND))
+    done: List[Dict[str, Any]] = list((context.checkpoint or {}).get("tables", []))
+    finished = {table["id"] for table in done}
+    pending = [problem for problem in problems if problem.table_id not in finished]
+    batch = max(1, int(params.get("batch", 8)))
+    for start in range(0, len(pending), batch):
+        orders = await asyncio.to_thread(order_tables, pending[start:start + batch], 1)
+        done.extend(order.to_dict() for order in orders)
+        await context.report(len(done) / max(len(problems), 1), f"{len(done)}/{len(problems)} tables",
+                             checkpoint={"tables": done})
+    return {"tables": done}
+
+
+@job_kind("relationships.infer", service_writes=True)
+async def infer_relationships_job(context: JobContext, params: Dict[str, Any]) -> Dict[str, int]:
+    from relationships import infer_and_store
+
+    settings = context.state.settings
+    client = None
+    if settings.supabase_write_key and not params.get("dry_run"):
+        from supabase_rest import PostgrestClient
+        client = PostgrestClient(key=settings.supabase_write_key)
+    await context.report(0.0, "inferring", force=True)
+    return await infer_and_store(context.state.mirror, params["user_id"], client, dry_run=bool(params.get("dry_run")))
+
+
+jobs_router = APIRouter(prefix="/jobs")
+
+
+async def _job_or_404(request: Request, job_id: str) -> Dict[str, Any]:
+    job = await request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@jobs_router.post("", status_code=202)
+async def create_job(request: Request, kind: str = Body(...), params: Optional[Dict[str, Any]] = Body(None),
+                     user_id: Optional[str] = Body(None)):
+    params = dict(params or {}, user_id=user_id) if user_id else params
+    if (kind in SERVICE_WRITE_KINDS and request.app.state.settings.supabase_write_key
+            and not (params or {}).get("dry_run")):
+        require_wedding_owner(request, str((params or {}).get("user_id") or ""))
+    try:
+        return await request.app.state.jobs.submit(kind, params, user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@jobs_router.get("")
+async def list_jobs(request: Request, user_id: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return await request.app.state.jobs.list(user_id, limit)
+
+
+@jobs_router.get("/{job_id}")
+async def get_job(request: Request, job_id: str):
+    return await _job_or_404(request, job_id)
+
+
+@jobs_router.get("/{job_id}/events")
+async def job_events(request: Request, job_id: str, interval: float = Query(0.5, gt=0, le=10)):
+    """Server-sent events: the job document each time it changes, until it finishes."""
+    import orjson
+
+    await _job_or_404(request, job_id)
+    jobs = request.app.state.jobs
+
+    async def stream():
+        version = None
+        while True:
+            job = await jobs.get(job_id)
+            if job is None:
+                return
+            if job["version"] != version:
+                version = job["version"]
+                yield b"data: " + orjson.dumps(job) + b"\n\n"
+            if job["status"] in TERMINAL or await request.is_disconnected():
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+@jobs_router.delete("/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    await _job_or_404(request, job_id)
+    return await request.app.state.jobs.cancel(job_id)
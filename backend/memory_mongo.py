@@ -0,0 +1,608 @@
+"""In-memory stand-in for the subset of Motor used by the backend.
+
+Selected with ``MONGO_URL="memory://"`` so the server, the load tester and the
+tests can run on a laptop with no mongod and no network. Only the operations
+the backend actually issues are implemented; anything else raises
+``NotImplementedError`` instead of silently diverging from real MongoDB.
+"""
+
+import copy
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import CollectionInvalid, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+
+MEMORY_URL_SCHEME = "memory://"
+
+_MISSING = object()
+
+
+def is_memory_url(url: str) -> bool:
+    return url.startswith(MEMORY_URL_SCHEME)
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == '$exists':
+        return (value is not _MISSING) == bool(operand)
+    if op == '$in':
+        if isinstance(value, list):
+            return any(v in operand for v in value)
+        return (None if value is _MISSING else value) in operand
+    if op == '$nin':
+        return not _compare(value, '$in', operand)
+    if op == '$regex':
+        return isinstance(value, str) and re.search(operand, value) is not None
+    if op == '$ne':
+        return not _compare(value, '$eq', operand)
+    if op == '$eq':
+        if isinstance(value, list) and not isinstance(operand, list):
+            return operand in value
+        return (None if value is _MISSING else value) == operand
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == '$gt':
+            return value > operand
+        if op == '$gte':
+            return value >= operand
+        if op == '$lt':
+            return value < operand
+        if op == '$lte':
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Query operator {op} is not supported by the memory stand-in")
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """Return True when ``doc`` satisfies the MongoDB-style ``query``."""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(value, '$eq', condition):
+            return False
+    return True
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> None:
+    for op, fields in update.items():
+        if op == '$setOnInsert':
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(doc, path, copy.deepcopy(value))
+        elif op == '$set':
+            for path, value in fields.items():
+                _set_path(doc, path, copy.deepcopy(value))
+        elif op == '$unset':
+            for path in fields:
+                _unset_path(doc, path)
+        elif op == '$inc':
+            for path, amount in fields.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        elif op in ('$max', '$min'):
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                if current is _MISSING or (value > current if op == '$max' else value < current):
+                    _set_path(doc, path, value)
+        elif op == '$push':
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                items = [] if current is _MISSING else current
+                if isinstance(value, dict) and '$each' in value:
+                    items.extend(copy.deepcopy(value['$each']))
+                    if '$slice' in value:
+                        cut = value['$slice']
+                        items = items[cut:] if cut < 0 else items[:cut]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(doc, path, items)
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported by the memory stand-in")
+
+
+def _is_operator_update(update: Dict[str, Any]) -> bool:
+    return bool(update) and all(key.startswith('$') for key in update)
+
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    seed: Dict[str, Any] = {}
+    for key, value in (query or {}).items():
+        if key.startswith('$'):
+            continue
+        if isinstance(value, dict) and any(k.startswith('$') for k in value):
+            if '$eq' in value:
+                _set_path(seed, key, copy.deepcopy(value['$eq']))
+            continue
+        _set_path(seed, key, copy.deepcopy(value))
+    return seed
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != '_id'}
+    if include:
+        result = {}
+        for path in include:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(result, path, value)
+        if projection.get('_id', 1) and '_id' in doc:
+            result['_id'] = doc['_id']
+        return result
+    result = dict(doc)
+    for path, flag in projection.items():
+        if not flag:
+            _unset_path(result, path)
+    return result
+
+
+def _sort_key(value: Any):
+    # Mirror BSON ordering closely enough: missing/None first, then numbers, then strings.
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (4, str(value))
+
+
+def _predicate_fields(query: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Fields an index could bound for ``query``: ``eq`` (point/``$in``) or ``range``. ``$or`` is left unindexed."""
+    fields: Dict[str, str] = {}
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            for sub in condition:
+                fields.update(_predicate_fields(sub))
+        elif not key.startswith('$'):
+            if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+                fields[key] = 'eq' if set(condition) <= {'$eq', '$in'} else 'range'
+            else:
+                fields[key] = 'eq'
+    return fields
+
+
+def _evaluate(doc: Dict[str, Any], expression: Any) -> Any:
+    """An aggregation expression: ``"$path"``, an object of expressions, or a literal."""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _get_path(doc, expression[1:])
+    if isinstance(expression, dict):
+        if any(key.startswith('$') for key in expression):
+            raise NotImplementedError(f"Expression {expression!r} is not supported by the memory stand-in")
+        values = {key: _evaluate(doc, value) for key, value in expression.items()}
+        # Missing fields are left out of the object, as mongod does
+        return {key: value for key, value in values.items() if value is not _MISSING}
+    return expression
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for doc in docs:
+        key = _evaluate(doc, spec['_id'])
+        key = None if key is _MISSING else key
+        group = groups.setdefault(_freeze(key), {'_id': key})
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            (op, expression), = accumulator.items()
+            value = _evaluate(doc, expression)
+            if op == '$sum':
+                numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+                group[field] = group.get(field, 0) + (value if numeric else 0)
+            elif op == '$push':
+                group.setdefault(field, []).append(None if value is _MISSING else value)
+            else:
+                raise NotImplementedError(f"Accumulator {op} is not supported by the memory stand-in")
+    return list(groups.values())
+
+
+class MemoryCursor:
+    def __init__(self, docs: List[Dict[str, Any]], projection: Optional[Dict[str, Any]] = None,
+                 collection: Optional["MemoryCollection"] = None, query: Optional[Dict[str, Any]] = None):
+        self._docs = docs
+        self._projection = projection
+        self._collection = collection
+        self._query = query
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = ASCENDING) -> "MemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def _materialize(self) -> List[Dict[str, Any]]:
+        docs = list(self._docs)
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(copy.deepcopy(d), self._projection) for d in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._materialize()
+        return docs if length is None else docs[:length]
+
+    async def explain(self) -> Dict[str, Any]:
+        """A ``queryPlanner`` section like mongod's, from the index the real planner would pick."""
+        plan = self._collection._plan(self._query, self._sort) if self._collection else {'stage': 'COLLSCAN'}
+        return {'queryPlanner': {'namespace': self._collection.full_name if self._collection else None,
+                                 'parsedQuery': self._query or {}, 'winningPlan': plan}}
+
+    def __aiter__(self):
+        self._iter = iter(self._materialize())
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.options: Dict[str, Any] = {}
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self._docs: List[Dict[str, Any]] = []
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+
+    def _find(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [doc for doc in self._docs if matches(doc, query)]
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        self._docs.append(copy.deepcopy(document))
+        return document['_id']
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Any:
+        doc = _upsert_seed(query)
+        if _is_operator_update(update):
+            _apply_update(doc, update, inserting=True)
+        else:
+            doc.update(copy.deepcopy(update))
+        return self._insert(doc)
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs) -> InsertManyResult:
+        return InsertManyResult([self._insert(doc) for doc in documents], True)
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self._find(filter), projection, self, filter)
+        if 'sort' in kwargs:
+            cursor.sort(kwargs['sort'])
+        if kwargs.get('limit'):
+            cursor.limit(kwargs['limit'])
+        return cursor
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> Optional[Dict[str, Any]]:
+        docs = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=False)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=True)
+
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        if _is_operator_update(replacement):
+            raise ValueError("replacement can not include $ operators")
+        return self._update(filter, replacement, upsert, multi=False)
+
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool) -> UpdateResult:
+        targets = self._find(filter)
+        if not multi:
+            targets = targets[:1]
+        if not targets:
+            if upsert:
+                upserted_id = self._upsert(filter, update)
+                return UpdateResult({'n': 1, 'nModified': 0, 'upserted': upserted_id}, True)
+            return UpdateResult({'n': 0, 'nModified': 0}, True)
+        modified = 0
+        for doc in targets:
+            before = copy.deepcopy(doc)
+            if _is_operator_update(update):
+                _apply_update(doc, update)
+            else:
+                keep_id = doc['_id']
+                doc.clear()
+                doc.update(copy.deepcopy(update))
+                doc['_id'] = keep_id
+            modified += doc != before
+        return UpdateResult({'n': len(targets), 'nModified': modified}, True)
+
+    async def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any], projection: Optional[Dict[str, Any]] = None,
+                                  sort=None, upsert: bool = False, return_document: bool = ReturnDocument.BEFORE, **kwargs) -> Optional[Dict[str, Any]]:
+        cursor = MemoryCursor(self._find(filter))
+        if sort:
+            cursor.sort(sort)
+        ordered = cursor._materialize()
+        if not ordered:
+            if not upsert:
+                return None
+            new_id = self._upsert(filter, update)
+            if return_document == ReturnDocument.AFTER:
+                return await self.find_one({'_id': new_id}, projection)
+            return None
+        target = next(doc for doc in self._docs if doc['_id'] == ordered[0]['_id'])
+        before = _project(copy.deepcopy(target), projection)
+        _apply_update(target, update)
+        if return_document == ReturnDocument.AFTER:
+            return _project(copy.deepcopy(target), projection)
+        return before
+
+    async def delete_one(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=False)
+
+    async def delete_many(self, filter: Dict[str, Any], **kwargs) -> DeleteResult:
+        return self._delete(filter, multi=True)
+
+    def _delete(self, filter: Dict[str, Any], multi: bool) -> DeleteResult:
+        targets = self._find(filter)
+        if not multi:
+            targets = targets[:1]
+        doomed = {id(doc) for doc in targets}
+        self._docs = [doc for doc in self._docs if id(doc) not in doomed]
+        return DeleteResult({'n': len(targets)}, True)
+
+    async def count_documents(self, filter: Optional[Dict[str, Any]] = None, **kwargs) -> int:
+        return len(self._find(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Any]:
+        values: List[Any] = []
+        for doc in self._find(filter):
+            value = _get_path(doc, key)
+            if value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> MemoryCursor:
+        docs = self._docs
+        for stage in pipeline:
+            (op, spec), = stage.items()
+            if op == '$match':
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif op == '$group':
+                docs = _group(docs, spec)
+            else:
+                raise NotImplementedError(f"Pipeline stage {op} is not supported by the memory stand-in")
+        return MemoryCursor(docs)
+
+    async def create_index(self, keys, name: Optional[str] = None, **kwargs) -> str:
+        if isinstance(keys, str):
+            keys = [(keys, ASCENDING)]
+        name = name or '_'.join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes[name] = {'key': list(keys), **kwargs}
+        return name
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return {'_id_': {'key': [('_id', ASCENDING)]}, **{name: dict(spec) for name, spec in self.indexes.items()}}
+
+    async def drop_index(self, index_or_name, **kwargs) -> None:
+        if not isinstance(index_or_name, str):
+            index_or_name = '_'.join(f"{field}_{direction}" for field, direction in index_or_name)
+        if self.indexes.pop(index_or_name, None) is None:
+            raise OperationFailure(f"index not found with name [{index_or_name}]", 27)
+
+    def _plan(self, query: Optional[Dict[str, Any]], sort: List[tuple]) -> Dict[str, Any]:
+        """Index selection: the index bounding the most leading key fields; COLLSCAN when none applies."""
+        fields = _predicate_fields(query)
+        sort_fields = [field for field, _ in sort]
+        indexes = {'_id_': {'key': [('_id', ASCENDING)]}, **self.indexes}
+        best, best_score, best_equal = None, 0.0, 0
+        for name, spec in indexes.items():
+            partial = spec.get('partialFilterExpression') or {}
+            if any((query or {}).get(field) != value for field, value in partial.items()):
+                continue
+            keys = [field for field, _ in spec['key']]
+            score, equal = 0.0, 0
+            for field in keys:
+                if field not in fields:
+                    break
+                score += 1
+                if fields[field] == 'range':
+                    break
+                equal += 1
+            if not score and sort_fields and keys[:len(sort_fields)] == sort_fields:
+                score = 0.5
+            if score > best_score:
+                best, best_score, best_equal = name, score, equal
+        if best is None:
+            plan: Dict[str, Any] = {'stage': 'COLLSCAN', 'filter': query or {}, 'direction': 'forward'}
+            keys = []
+        else:
+            keys = [field for field, _ in indexes[best]['key']]
+            plan = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': best,
+                                                     'keyPattern': dict(indexes[best]['key'])}}
+        if sort_fields and keys[best_equal:best_equal + len(sort_fields)] != sort_fields:
+            plan = {'stage': 'SORT', 'sortPattern': dict(sort), 'inputStage': plan}
+        return plan
+
+    def _exists(self) -> bool:
+        # Collections spring into being on access here; the server only knows ones created or written to
+        return self.database._collections.get(self.name) is self and bool(self._docs or self.options or self.indexes)
+
+    async def rename(self, new_name: str, **kwargs) -> None:
+        collections = self.database._collections
+        if not self._exists():
+            raise OperationFailure(f"Source collection {self.full_name} does not exist", 26)
+        if new_name in collections and collections[new_name]._exists():
+            raise OperationFailure("target namespace exists", 48)
+        collections.pop(self.name, None)
+        self.name = new_name
+        collections[new_name] = self
+
+    async def bulk_write(self, requests: Iterable[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        summary = {'nInserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'nUpserted': 0, 'upserted': [], 'writeErrors': []}
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                summary['nInserted'] += 1
+            elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                result = self._update(request._filter, request._doc, request._upsert, multi=isinstance(request, UpdateMany))
+                if result.upserted_id is not None:
+                    summary['nUpserted'] += 1
+                    summary['upserted'].append({'index': index, '_id': result.upserted_id})
+                else:
+                    summary['nMatched'] += result.matched_count
+                    summary['nModified'] += result.modified_count
+            elif isinstance(request, (DeleteOne, DeleteMany)):
+                summary['nRemoved'] += self._delete(request._filter, multi=isinstance(request, DeleteMany)).deleted_count
+            else:
+                raise NotImplementedError(f"{type(request).__name__} is not supported by the memory stand-in")
+        return BulkWriteResult(summary, True)
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryMongoClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    async def create_collection(self, name: str, **options) -> MemoryCollection:
+        if name in self._collections and self._collections[name]._exists():
+            raise CollectionInvalid(f"collection {name} already exists")
+        collection = self[name]
+        collection.options = options
+        return collection
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return list(self._collections)
+
+    async def list_collections(self, filter: Optional[Dict[str, Any]] = None, **kwargs) -> MemoryCursor:
+        infos = [{'name': name, 'type': 'timeseries' if 'timeseries' in collection.options else 'collection',
+                  'options': dict(collection.options)} for name, collection in self._collections.items()
+                 if collection._exists()]
+        return MemoryCursor([info for info in infos if matches(info, filter)])
+
+    async def drop_collection(self, name: str, **kwargs) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, command, value: Any = 1, **kwargs) -> Dict[str, Any]:
+        if command in ('ping', {'ping': 1}):
+            return {'ok': 1.0}
+        if command == 'collMod' and value in self._collections:
+            self._collections[value].options.update(kwargs)
+            return {'ok': 1.0}
+        raise NotImplementedError(f"Command {command!r} is not supported by the memory stand-in")
+
+
+class MemoryMongoClient:
+    """Drop-in replacement for ``AsyncIOMotorClient`` backed by Python lists."""
+
+    def __init__(self, url: str = MEMORY_URL_SCHEME, **kwargs):
+        self.url = url
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    async def drop_database(self, name_or_database, **kwargs) -> None:
+        self._databases.pop(getattr(name_or_database, 'name', name_or_database), None)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,121 @@
+"""Prometheus metrics for HTTP requests and MongoDB commands.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no BaseHTTPMiddleware task
+hop) that records per-route latency, in-flight requests and response sizes.
+The Mongo collectors are fed by ``mongo_metrics.MongoCommandListener``, which
+lives apart so this module stays free of the pymongo import. Everything in
+``REGISTRY`` is exposed at ``GET /metrics``.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+    ["method", "route"], registry=REGISTRY,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size by route",
+    ["method", "route"], buckets=SIZE_BUCKETS, registry=REGISTRY,
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection",
+    ["command", "collection"], buckets=LATENCY_BUCKETS, registry=REGISTRY,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by collection",
+    ["command", "collection"], registry=REGISTRY,
+)
+MONGO_SLOW_COMMANDS = Counter(
+    "mongo_slow_commands_total", "MongoDB commands slower than the slow-query threshold",
+    ["command", "collection"], registry=REGISTRY,
+)
+APP_STARTUP_SECONDS = Gauge(
+    "app_startup_seconds", "Backend start-up time by phase",
+    ["phase"], registry=REGISTRY,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Records latency, in-flight count and response size labelled by route template.
+
+    Routes are labelled by their path template (``/api/status``), never the raw
+    path, so label cardinality stays bounded; unknown paths share one label.
+    """
+
+    def __init__(self, app, cache_size: int = 4096):
+        self.app = app
+        self.cache_size = cache_size
+        self._route_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+    def _route_label(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        label = self._route_cache.get(key)
+        if label is not None:
+            self._route_cache.move_to_end(key)
+            return label
+        label = UNMATCHED_ROUTE
+        router = scope["app"].router if "app" in scope else None
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                label = route.path
+                break
+            if match == Match.PARTIAL and label == UNMATCHED_ROUTE:
+                label = route.path
+        self._route_cache[key] = label
+        if len(self._route_cache) > self.cache_size:
+            self._route_cache.popitem(last=False)
+        return label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_label(scope)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+            in_flight.dec()
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
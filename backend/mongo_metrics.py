@@ -0,0 +1,52 @@
+"""pymongo ``CommandListener`` feeding the Mongo collectors in ``metrics``.
+
+Imported only when a real Motor client is created, so the pymongo import
+stays off the boot path.
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+from metrics import MONGO_COMMAND_FAILURES, MONGO_COMMAND_LATENCY, MONGO_SLOW_COMMANDS
+
+logger = logging.getLogger(__name__)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records per-collection command durations and logs slow commands."""
+
+    def __init__(self, slow_ms: float = 100.0):
+        self.slow_seconds = slow_ms / 1000
+        # request_id -> (collection, command document); populated on start, popped on finish
+        self._pending: Dict[Tuple[int, object], Tuple[str, dict]] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple[int, object]:
+        return (event.request_id, event.connection_id)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "<none>"
+        self._pending[self._key(event)] = (collection, event.command)
+
+    def _finish(self, event) -> Tuple[str, Optional[dict]]:
+        return self._pending.pop(self._key(event), ("<unknown>", None))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection, command = self._finish(event)
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMAND_LATENCY.labels(event.command_name, collection).observe(seconds)
+        if seconds >= self.slow_seconds:
+            MONGO_SLOW_COMMANDS.labels(event.command_name, collection).inc()
+            logger.warning(
+                "Slow Mongo command %s on %s took %.1f ms: %.500s",
+                event.command_name, collection, seconds * 1000, command,
+            )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection, _ = self._finish(event)
+        MONGO_COMMAND_LATENCY.labels(event.command_name, collection).observe(event.duration_micros / 1_000_000)
+        MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
@@ -0,0 +1,343 @@
+"""Outbound guest notifications through a Mongo outbox.
+
+Producers never talk to a provider. They write messages into the ``outbox``
+collection. Each message carries a ``dedupe_key`` under a unique index, and
+``enqueue`` upserts with ``$setOnInsert``, so re-running a campaign (or
+retrying a request that timed out) adds nothing already queued or sent.
+``enqueue`` takes a Motor ``session``: when it runs inside the transaction that
+makes the domain write, the message commits or rolls back with it.
+
+``NotificationDispatcher`` drains the outbox in each backend process:
+
+* it claims up to ``batch_size`` due messages with one conditional
+  ``update_many`` (``pending`` -> ``sending`` under a claim token), so two
+  dispatchers never claim the same message;
+* it groups the claim by channel into transport-sized batches and sends up to
+  ``concurrency`` batches at once;
+* it marks each message ``sent``, or back to ``pending`` with exponential
+  backoff, or ``failed`` after ``MAX_ATTEMPTS``;
+* it extends the lease of a batch while its transport is still sending, and
+  claims whose lease runs out (the process died mid-send) go back to
+  ``pending``;
+* ``stop`` stops claiming, gives the batches already handed to a transport
+  ``STOP_TIMEOUT_SECONDS`` to finish, and releases at once only the claimed
+  messages no transport has seen.
+
+A message can only be sent again after a crash between the provider accepting
+it and ``sent`` being recorded. Transports receive the ``dedupe_key`` to pass
+on as the provider's idempotency key; ``FileTransport`` (the local sink) drops
+keys it has already written.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence, Set, TextIO
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+
+from guest_rows import guest_status
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "outbox"
+PENDING, SENDING, SENT, FAILED = "pending", "sending", "sent", "failed"
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 500
+CONCURRENCY = 8
+LEASE_SECONDS = 60.0
+STOP_TIMEOUT_SECONDS = 10.0
+POLL_SECONDS = 1.0
+BASE_RETRY_SECONDS = 2.0
+CHANNELS = ("email", "sms", "whatsapp")
+SINK_FIELDS = ("dedupe_key", "channel", "user_id", "recipient", "template", "payload")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Transport(Protocol):
+    """Delivers messages for one channel. ``max_batch`` caps the messages per ``send_batch`` call."""
+
+    max_batch: int
+
+    async def send_batch(self, messages: Sequence[Dict[str, Any]]) -> List[Optional[str]]:
+        """One entry per message: ``None`` when delivered, else the error to retry on."""
+
+
+class FileTransport:
+    """Writes each message as a JSON line to a file (or stdout); the sink for development and tests."""
+
+    def __init__(self, path: Optional[str] = None, max_batch: int = 100, stream: Optional[TextIO] = None):
+        self.path = Path(path) if path else None
+        self.stream = stream
+        self.max_batch = max_batch
+        self.delivered: Set[str] = set()
+        if self.path is not None and self.path.exists():
+            with self.path.open(encoding="utf-8") as existing:
+                self.delivered.update(json.loads(line)["dedupe_key"] for line in existing if line.strip())
+
+    async def send_batch(self, messages: Sequence[Dict[str, Any]]) -> List[Optional[str]]:
+        fresh = [m for m in messages if m["dedupe_key"] not in self.delivered]
+        lines = "".join(json.dumps({key: m.get(key) for key in SINK_FIELDS}, default=str) + "\n" for m in fresh)
+        if lines:
+            if self.path is not None:
+                await asyncio.to_thread(self._append, lines)
+            else:
+                (self.stream or sys.stdout).write(lines)
+        self.delivered.update(m["dedupe_key"] for m in fresh)
+        return [None] * len(messages)
+
+    def _append(self, lines: str) -> None:
+        with self.path.open("a", encoding="utf-8") as sink:
+            sink.write(lines)
+
+
+def message(channel: str, dedupe_key: str, recipient: Dict[str, Any], template: str,
+            payload: Optional[Dict[str, Any]] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    if channel not in CHANNELS:
+        raise ValueError(f"unknown channel {channel!r}")
+    return {"channel": channel, "dedupe_key": dedupe_key, "recipient": recipient, "template": template,
+            "payload": payload or {}, "user_id": user_id}
+
+
+class NotificationDispatcher:
+    def __init__(self, database, transports: Dict[str, Transport], batch_size: int = BATCH_SIZE,
+                 concurrency: int = CONCURRENCY, poll_seconds: float = POLL_SECONDS):
+        self.database = database
+        self.transports = transports
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._claims: Set[str] = set()
+        # Ids handed to a transport whose outcome is not recorded yet; stop() leaves them to their lease
+        self._in_flight: Set[str] = set()
+        self._stopping = False
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        return self.database.db[OUTBOX_COLLECTION]
+
+    async def ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            await self.collection.create_index([("dedupe_key", 1)], unique=True)
+            await self.collection.create_index([("id", 1)], unique=True)
+            await self.collection.create_index([("claim", 1)])
+            await self.collection.create_index([("status", 1), ("next_attempt_at", 1)])
+            await self.collection.create_index([("user_id", 1), ("created_at", 1)])
+            self._indexes_ready = True
+
+    # Producer side
+
+    async def enqueue(self, messages: Iterable[Dict[str, Any]], session=None) -> Dict[str, int]:
+        """Queue messages not already in the outbox; returns ``{"queued": n, "duplicates": m}``."""
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        await self.ensure_indexes()
+        now = _now()
+        updates = [UpdateOne({"dedupe_key": m["dedupe_key"]}, {"$setOnInsert": dict(
+            m, id=str(uuid.uuid4()), status=PENDING, attempts=0, error=None, claim=None, lease_until=None,
+            created_at=now, next_attempt_at=now, sent_at=None)}, upsert=True) for m in messages]
+        if not updates:
+            return {"queued": 0, "duplicates": 0}
+        try:
+            result = await self.collection.bulk_write(updates, ordered=False, session=session)
+            queued = result.upserted_count
+        except BulkWriteError as exc:
+            # Two producers upserting one key at once: the loser hits the unique index, which is the point
+            if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+                raise
+            queued = exc.details.get("nUpserted", 0)
+        if self._wake is not None:
+            self._wake.set()
+        return {"queued": queued, "duplicates": len(updates) - queued}
+
+    async def list(self, user_id: Optional[str] = None, status: Optional[str] = None,
+                   limit: int = 100) -> List[Dict[str, Any]]:
+        query = {key: value for key, value in (("user_id", user_id), ("status", status)) if value is not None}
+        cursor = self.collection.find(query, {"_id": 0, "claim": 0})
+        return await cursor.sort([("created_at", 1)]).limit(limit).to_list(limit)
+
+    async def counts(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        query = {} if user_id is None else {"user_id": user_id}
+        return {status: await self.collection.count_documents(dict(query, status=status))
+                for status in (PENDING, SENDING, SENT, FAILED)}
+
+    # Dispatcher side
+
+    async def release_expired(self) -> None:
+        await self.collection.update_many({"status": SENDING, "lease_until": {"$lt": _now()}},
+                                          {"$set": {"status": PENDING, "claim": None, "lease_until": None}})
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        now = _now()
+        due = {"status": PENDING, "next_attempt_at": {"$lte": now}, "channel": {"$in": list(self.transports)}}
+        ids = [doc["id"] for doc in await self.collection.find(due, {"_id": 0, "id": 1}).sort(
+            [("next_attempt_at", 1)]).limit(self.batch_size).to_list(self.batch_size)]
+        if not ids:
+            return []
+        claim = uuid.uuid4().hex
+        # The status condition makes the claim exclusive even if another dispatcher read the same ids
+        await self.collection.update_many(
+            dict(due, id={"$in": ids}),
+            {"$set": {"status": SENDING, "claim": claim, "lease_until": now + timedelta(seconds=LEASE_SECONDS)},
+             "$inc": {"attempts": 1}})
+        return await self.collection.find({"claim": claim}, {"_id": 0}).to_list(None)
+
+    async def _renew_lease(self, batch: List[Dict[str, Any]]) -> None:
+        """Keep a slow send's claim from expiring under it (and being sent again by another dispatcher)."""
+        ids = [m["id"] for m in batch]
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                await self.collection.update_many(
+                    {"id": {"$in": ids}, "claim": batch[0]["claim"], "status": SENDING},
+                    {"$set": {"lease_until": _now() + timedelta(seconds=LEASE_SECONDS)}})
+            except Exception:
+                logger.exception("Extending the notification lease failed")
+
+    async def _deliver(self, transport: Transport, batch: List[Dict[str, Any]]) -> None:
+        ids = [m["id"] for m in batch]
+        self._in_flight.update(ids)
+        renewal = asyncio.create_task(self._renew_lease(batch))
+        try:
+            errors = await transport.send_batch(batch)
+        except Exception as exc:
+            logger.exception("Sending %d %s notifications failed", len(batch), batch[0]["channel"])
+            errors = [f"{type(exc).__name__}: {exc}"] * len(batch)
+        finally:
+            renewal.cancel()
+        from pymongo import UpdateMany, UpdateOne
+
+        now = _now()
+        sent = [m["id"] for m, error in zip(batch, errors) if error is None]
+        updates = [UpdateMany({"id": {"$in": sent}, "claim": batch[0]["claim"]},
+                              {"$set": {"status": SENT, "sent_at": now, "claim": None, "lease_until": None,
+                                        "error": None}})] if sent else []
+        for m, error in zip(batch, errors):
+            if error is None:
+                continue
+            retry = m["attempts"] < MAX_ATTEMPTS
+            updates.append(UpdateOne({"id": m["id"], "claim": m["claim"]}, {"$set": {
+                "status": PENDING if retry else FAILED, "error": error, "claim": None, "lease_until": None,
+                "next_attempt_at": now + timedelta(seconds=BASE_RETRY_SECONDS * 2 ** (m["attempts"] - 1))}}))
+        if updates:
+            await self.collection.bulk_write(updates, ordered=False)
+        self._in_flight.difference_update(ids)
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due messages and send it; returns how many were claimed."""
+        await self.ensure_indexes()
+        claimed = await self._claim()
+        if not claimed:
+            return 0
+        claim = claimed[0]["claim"]
+        self._claims.add(claim)
+        by_channel: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for m in claimed:
+            by_channel[m["channel"]].append(m)
+        batches = [(self.transports[channel], messages[start:start + self.transports[channel].max_batch])
+                   for channel, messages in by_channel.items()
+                   for start in range(0, len(messages), self.transports[channel].max_batch)]
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(transport: Transport, batch: List[Dict[str, Any]]) -> None:
+            async with limit:
+                # Once stopping, batches not yet handed over stay claimed for stop() to release
+                if not self._stopping:
+                    await self._deliver(transport, batch)
+
+        await asyncio.gather(*(bounded(transport, batch) for transport, batch in batches))
+        if not self._stopping:
+            self._claims.discard(claim)
+        return len(claimed)
+
+    async def drain(self) -> None:
+        """Dispatch until nothing is due (messages waiting out a retry delay stay queued)."""
+        while not self._stopping and await self.dispatch_once():
+            pass
+
+    async def start(self) -> None:
+        await self.ensure_indexes()
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = STOP_TIMEOUT_SECONDS) -> None:
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            # Sends already with a transport get to finish and record their outcome
+            done, _ = await asyncio.wait({self._task}, timeout=timeout)
+            if not done:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._claims:
+            # Hand back claims no transport has seen instead of waiting for their leases to run out.
+            # Ones cut off mid-send may have reached the provider; their lease expiry retries them
+            await self.collection.update_many(
+                {"status": SENDING, "claim": {"$in": list(self._claims)}, "id": {"$nin": list(self._in_flight)}},
+                {"$set": {"status": PENDING, "claim": None, "lease_until": None}, "$inc": {"attempts": -1}})
+            self._claims.clear()
+        self._in_flight.clear()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await self.release_expired()
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification dispatch failed")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+def reminder_messages(guests: Iterable[Dict[str, Any]], campaign: str, channel: str = "email",
+                      user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """One RSVP reminder per guest still pending; the key makes a campaign send at most once per guest."""
+    return [message(channel, f"{campaign}:{channel}:{guest['id']}",
+                    {"invitato_id": guest["id"], "nome_visualizzato": guest.get("nome_visualizzato")},
+                    "rsvp_reminder", {"campaign": campaign}, user_id or guest.get("user_id"))
+            for guest in guests if guest_status(guest) == "pending"]
+
+
+notifications_router = APIRouter(prefix="/notifications")
+
+
+@notifications_router.post("/reminders", status_code=202)
+async def queue_rsvp_reminders(request: Request, user_id: str = Query(..., min_length=1),
+                               campaign: str = Body(..., embed=True, min_length=1),
+                               channel: str = Body("email", embed=True)):
+    guests = await request.app.state.mirror.rows("invitati", user_id)
+    try:
+        messages = reminder_messages(guests, campaign, channel, user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return await request.app.state.notifications.enqueue(messages)
+
+
+@notifications_router.get("")
+async def list_notifications(request: Request, user_id: Optional[str] = None, status: Optional[str] = None,
+                             limit: int = Query(100, ge=1, le=1000)):
+    return await request.app.state.notifications.list(user_id, status, limit)
+
+
+@notifications_router.get("/summary")
+async def notification_counts(request: Request, user_id: Optional[str] = None):
+    return await request.app.state.notifications.counts(user_id)
@@ -0,0 +1,271 @@
+"""Rate-aware scheduling of the outbound PostgREST calls.
+
+Every request ``PostgrestClient`` sends passes through one process-wide
+``OutboundScheduler``, which enforces three limits:
+
+* a token bucket per endpoint (``host/table``), refilled at ``rate`` requests
+  per second with bursts up to ``burst``;
+* a cap of ``max_concurrency`` requests in flight. Batch work may only hold
+  ``batch_concurrency`` of those slots, so interactive calls always find a
+  free one;
+* two priority lanes. Waiters for the same endpoint are served interactive
+  first, then in arrival order, and batch calls leave a quarter of the burst
+  in the bucket for interactive ones.
+
+A 429 or 503 pauses the endpoint for ``Retry-After`` (or an exponential,
+jittered delay) and halves its rate. A 429 means the request was refused
+unread, so it is always retried; a 503 may come after the write landed, so
+only idempotent calls (reads, upserts) are retried on it. Each success
+gives back a tenth of the configured rate. Identical ``GET``s already in flight are coalesced:
+late callers wait for the first one and share its response.
+
+Calls are batch or interactive by their client's ``priority``, falling back
+to the lane of the calling context (``with lane(BATCH): ...``). ``asyncio.to_thread``
+copies that context, so a lane set in a coroutine covers the blocking calls
+it hands to threads.
+"""
+
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+INTERACTIVE, BATCH = 0, 1
+RETRY_STATUSES = (429, 503)
+# Statuses that guarantee the request was not acted on, so even non-idempotent calls retry them
+REFUSED_STATUSES = (429,)
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 40
+DEFAULT_CONCURRENCY = 8
+MAX_RETRIES = 5
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+MIN_RATE_FRACTION = 0.05
+RECOVERY_FRACTION = 0.1
+
+_lane: contextvars.ContextVar[int] = contextvars.ContextVar("outbound_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def lane(priority: int) -> Iterator[None]:
+    """Run the enclosed outbound calls (and threads started with ``to_thread``) in ``priority``'s lane."""
+    token = _lane.set(priority)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> int:
+    return _lane.get()
+
+
+def retry_after(response) -> Optional[float]:
+    """Seconds asked for by a ``Retry-After`` header, in either of its formats."""
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class TokenBucket:
+    max_rate: float
+    burst: float
+    rate: float = 0.0
+    tokens: float = 0.0
+    updated: float = 0.0
+    paused_until: float = 0.0
+
+    def __post_init__(self):
+        self.rate = self.rate or self.max_rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float, keep: float = 0.0) -> float:
+        """Seconds until a token can be taken leaving ``keep`` behind; refills as a side effect."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        need = 1 + keep
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def throttled(self, delay: float, now: float) -> None:
+        self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = max(self.paused_until, now + delay)
+
+    def succeeded(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION)
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    response: object = None
+    error: Optional[BaseException] = None
+
+
+class OutboundScheduler:
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 max_concurrency: int = DEFAULT_CONCURRENCY, batch_concurrency: Optional[int] = None,
+                 max_retries: int = MAX_RETRIES, base_backoff: float = BASE_BACKOFF):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max(1, max_concurrency)
+        # Slots batch work may hold; the rest are kept for interactive calls
+        self.batch_concurrency = max(1, batch_concurrency if batch_concurrency is not None
+                                     else self.max_concurrency - max(1, self.max_concurrency // 4))
+        # Tokens batch work leaves in each bucket, so an interactive call rarely waits for a refill
+        self.batch_reserve = burst // 4
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {}
+        self._tickets = itertools.count()
+        self._active = [0, 0]
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.stats = {"sent": 0, "retried": 0, "coalesced": 0}
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        with self._cond:
+            if endpoint not in self._buckets:
+                self._buckets[endpoint] = TokenBucket(self.rate, self.burst)
+            return self._buckets[endpoint]
+
+    def _slot_free(self, priority: int) -> bool:
+        if sum(self._active) >= self.max_concurrency:
+            return False
+        return priority == INTERACTIVE or self._active[BATCH] < self.batch_concurrency
+
+    def _acquire(self, endpoint: str, priority: int) -> None:
+        bucket = self.bucket(endpoint)
+        ticket = (priority, next(self._tickets))
+        with self._cond:
+            queue = self._waiting.setdefault(endpoint, [])
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if queue[0] == ticket and self._slot_free(priority):
+                        timeout = bucket.wait_time(time.monotonic(), self.batch_reserve if priority else 0.0)
+                        if timeout <= 0:
+                            bucket.take()
+                            heapq.heappop(queue)
+                            self._active[priority] += 1
+                            # The next waiter for this endpoint may be able to go too
+                            self._cond.notify_all()
+                            return
+                    self._cond.wait(timeout)
+            except BaseException:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+                raise
+
+    def _release(self, priority: int) -> None:
+        with self._cond:
+            self._active[priority] -= 1
+            self._cond.notify_all()
+
+    def _backoff(self, response, attempt: int) -> float:
+        delay = retry_after(response)
+        if delay is None:
+            delay = self.base_backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        return min(delay, MAX_BACKOFF)
+
+    def send(self, endpoint: str, call: Callable[[], object], priority: Optional[int] = None,
+             coalesce_key: Optional[Hashable] = None, idempotent: bool = True):
+        """Run ``call`` (one HTTP request returning a response) under the limits of ``endpoint``.
+
+        Retries on 429 (and on 503 when ``idempotent``) up to ``max_retries``
+        times and returns the last response; transport errors propagate. Calls
+        sharing a ``coalesce_key`` while one is in flight get that call's
+        response instead of their own.
+        """
+        retry_on = RETRY_STATUSES if idempotent else REFUSED_STATUSES
+        if coalesce_key is None:
+            return self._send(endpoint, call, current_lane() if priority is None else priority, retry_on)
+        with self._cond:
+            flight = self._flights.get(coalesce_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[coalesce_key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+        try:
+            flight.response = self._send(endpoint, call, current_lane() if priority is None else priority, retry_on)
+            return flight.response
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._cond:
+                self._flights.pop(coalesce_key, None)
+            flight.done.set()
+
+    def _send(self, endpoint: str, call: Callable[[], object], priority: int,
+              retry_on: Tuple[int, ...] = RETRY_STATUSES):
+        bucket = self.bucket(endpoint)
+        for attempt in range(self.max_retries + 1):
+            self._acquire(endpoint, priority)
+            try:
+                response = call()
+            finally:
+                self._release(priority)
+            with self._cond:
+                self.stats["sent"] += 1
+                if response.status_code not in RETRY_STATUSES:
+                    bucket.succeeded()
+                    return response
+                if response.status_code not in retry_on or attempt == self.max_retries:
+                    return response
+                self.stats["retried"] += 1
+                bucket.throttled(self._backoff(response, attempt), time.monotonic())
+                self._cond.notify_all()
+        return response
+
+
+_shared: Optional[OutboundScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> OutboundScheduler:
+    """The scheduler every client in this process uses unless handed its own."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = OutboundScheduler()
+        return _shared
+
+
+def configure_shared(rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                     max_concurrency: int = DEFAULT_CONCURRENCY) -> OutboundScheduler:
+    """Give the shared scheduler these limits (from ``Settings``); clients made afterwards use it."""
+    global _shared
+    with _shared_lock:
+        _shared = OutboundScheduler(rate, burst, max_concurrency)
+        return _shared
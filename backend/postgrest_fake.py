@@ -0,0 +1,282 @@
+"""In-process stand-in for the subset of PostgREST the project talks to.
+
+``FakePostgrest`` quacks like a ``requests.Session`` (``request``/``get``/
+``post``/``patch``/``delete``), so ``PostgrestClient(session=FakePostgrest())``
+and the converted integration tests run against it with no network. Rows live
+in plain dicts and are seeded from ``synthetic_data``. Supported:
+
+* ``/rest/v1/`` (table listing), ``/rest/v1/<table>`` and ``/auth/v1/settings``,
+  answering 401 without an ``apikey``;
+* filters ``eq neq gt gte lt lte like ilike in is``, optionally negated with
+  ``not.``;
+* ``select`` (plain columns), ``order`` (``col.asc|desc[.nullsfirst|nullslast]``),
+  ``limit`` and ``offset``;
+* ``POST`` inserts with ``on_conflict`` and ``Prefer: resolution=merge-duplicates``
+  or ``ignore-duplicates``, plus ``PATCH`` and ``DELETE`` over filters;
+* ``Prefer: return=representation`` and ``count=exact``.
+
+Anything else (embedded resources, ``or=``, RPC) answers 400 rather than
+silently diverging from the real server, as ``memory_mongo`` does for Motor.
+"""
+
+import copy
+import json as jsonlib
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from synthetic_data import generate_dataset
+
+DEFAULT_URL = "http://postgrest.local"
+# Tables without a serial ``id``
+PRIMARY_KEYS: Dict[str, Tuple[str, ...]] = {"relazioni": ("invitato_a_id", "invitato_b_id")}
+RESERVED_PARAMS = ("select", "order", "limit", "offset", "on_conflict", "columns")
+OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in", "is")
+
+Params = Union[None, Mapping[str, Any], Sequence[Tuple[str, Any]]]
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: Any = None, headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.content = b"" if payload is None else jsonlib.dumps(payload).encode()
+        self.headers = CaseInsensitiveDict(headers or {})
+        if payload is not None:
+            self.headers.setdefault("Content-Type", "application/json; charset=utf-8")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self) -> Any:
+        return jsonlib.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise RuntimeError(f"{self.status_code}: {self.text}")
+
+
+class _BadRequest(Exception):
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(message)
+        self.response = FakeResponse(status_code, {"code": code, "message": message, "details": None, "hint": None})
+
+
+def _coerce(raw: str, value: Any) -> Any:
+    """``raw`` filter text as the type of the stored ``value``, so ``id=eq.7`` matches ``7``."""
+    if isinstance(value, bool):
+        return raw.lower() == "true"
+    if isinstance(value, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return float(raw)
+    if isinstance(value, float):
+        return float(raw)
+    return raw
+
+
+def _like(pattern: str, flags: int = 0) -> "re.Pattern[str]":
+    return re.compile("".join(".*" if ch in "*%" else "." if ch == "_" else re.escape(ch) for ch in pattern) + r"\Z",
+                      flags | re.DOTALL)
+
+
+def _test(op: str, raw: str, value: Any) -> bool:
+    if op == "is":
+        if raw.lower() not in ("null", "true", "false"):
+            raise _BadRequest(400, "PGRST100", f"is.{raw} is not supported")
+        return value is {"null": None, "true": True, "false": False}[raw.lower()]
+    if value is None:
+        return False                         # SQL: NULL compares as unknown
+    if op == "in":
+        if not (raw.startswith("(") and raw.endswith(")")):
+            raise _BadRequest(400, "PGRST100", f"in.{raw} needs a parenthesised list")
+        return any(value == _coerce(item.strip().strip('"'), value) for item in raw[1:-1].split(",") if item.strip())
+    if op in ("like", "ilike"):
+        return bool(_like(raw, re.IGNORECASE if op == "ilike" else 0).match(str(value)))
+    other = _coerce(raw, value)
+    return {"eq": value == other, "neq": value != other, "gt": value > other, "gte": value >= other,
+            "lt": value < other, "lte": value <= other}[op]
+
+
+def _parse_filter(column: str, expression: str):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+    if op not in OPERATORS:
+        raise _BadRequest(400, "PGRST100", f"unsupported filter {column}={expression}")
+
+    def matches(row: Dict[str, Any]) -> bool:
+        return _test(op, raw, row.get(column)) != negate
+    return matches
+
+
+def _order(rows: List[Dict[str, Any]], spec: str) -> List[Dict[str, Any]]:
+    for term in reversed([term for term in spec.split(",") if term]):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _project(row: Dict[str, Any], columns: Optional[List[str]]) -> Dict[str, Any]:
+    return dict(row) if columns is None else {column: row.get(column) for column in columns}
+
+
+class FakePostgrest:
+    def __init__(self, tables: Optional[Mapping[str, Iterable[Dict[str, Any]]]] = None, url: str = DEFAULT_URL,
+                 api_keys: Optional[Iterable[str]] = None):
+        self.url = url.rstrip("/")
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        # None accepts any non-empty key
+        self.api_keys = set(api_keys) if api_keys is not None else None
+        self.calls: List[Tuple[str, str, Dict[str, str]]] = []
+        self._serial = {name: max((row.get("id") or 0 for row in rows), default=0) for name, rows in self.tables.items()
+                        if self._key(name) == ("id",)}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def seeded(cls, weddings: int = 1, guests_per_wedding: int = 150, seed: int = 0, **kwargs) -> "FakePostgrest":
+        """A fake holding ``synthetic_data.generate_dataset`` rows (same arguments)."""
+        url = kwargs.pop("url", DEFAULT_URL)
+        return cls(generate_dataset(weddings, guests_per_wedding, seed, **kwargs), url=url)
+
+    @staticmethod
+    def _key(table: str) -> Tuple[str, ...]:
+        return PRIMARY_KEYS.get(table, ("id",))
+
+    # requests.Session surface
+
+    def request(self, method: str, url: str, params: Params = None, json: Any = None, headers=None,
+                timeout: Optional[float] = None, data: Any = None, **_) -> FakeResponse:
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        query += list(params.items()) if isinstance(params, Mapping) else list(params or [])
+        query = [(key, str(value)) for key, value in query]
+        headers = CaseInsensitiveDict(headers or {})
+        if json is None and data:
+            json = jsonlib.loads(data)
+        with self._lock:
+            self.calls.append((method.upper(), parts.path, dict(query)))
+            try:
+                return self._handle(method.upper(), parts.path.rstrip("/"), query, headers, json)
+            except _BadRequest as exc:
+                return exc.response
+
+    def get(self, url: str, params: Params = None, **kwargs) -> FakeResponse:
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url: str, data: Any = None, json: Any = None, **kwargs) -> FakeResponse:
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def patch(self, url: str, data: Any = None, json: Any = None, **kwargs) -> FakeResponse:
+        return self.request("PATCH", url, data=data, json=json, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> FakeResponse:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    # Routing
+
+    def _handle(self, method: str, path: str, query: List[Tuple[str, str]], headers, body: Any) -> FakeResponse:
+        key = headers.get("apikey")
+        if not key or (self.api_keys is not None and key not in self.api_keys):
+            return FakeResponse(401, {"message": "No API key found in request", "hint": None})
+        if path == "/auth/v1/settings":
+            return FakeResponse(200, {"external": {"email": True}, "disable_signup": False})
+        if path == "/rest/v1":
+            return FakeResponse(200, {"swagger": "2.0", "paths": {f"/{name}": {} for name in sorted(self.tables)}})
+        if not path.startswith("/rest/v1/"):
+            return FakeResponse(404, {"message": f"no route for {path}"})
+        table = path[len("/rest/v1/"):]
+        if table not in self.tables:
+            raise _BadRequest(404, "42P01", f'relation "public.{table}" does not exist')
+
+        options = {name: value for name, value in query if name in RESERVED_PARAMS}
+        filters = [_parse_filter(name, value) for name, value in query if name not in RESERVED_PARAMS]
+        prefer = {item.strip() for item in headers.get("Prefer", "").split(",") if item.strip()}
+        columns = self._columns(options.get("select", "*"))
+
+        if method == "GET" or method == "HEAD":
+            rows = [row for row in self.tables[table] if all(match(row) for match in filters)]
+            total = len(rows)
+            if "order" in options:
+                rows = _order(rows, options["order"])
+            offset = int(options.get("offset", 0))
+            rows = rows[offset:offset + int(options["limit"])] if "limit" in options else rows[offset:]
+            extra = {}
+            if "count=exact" in prefer:
+                extra["Content-Range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+            return FakeResponse(200, [_project(row, columns) for row in rows], extra)
+        if method == "POST":
+            written = self._insert(table, body, options.get("on_conflict"), prefer)
+            return self._written(201, written, columns, prefer)
+        if method == "PATCH":
+            written = [row for row in self.tables[table] if all(match(row) for match in filters)]
+            for row in written:
+                row.update(body or {})
+            return self._written(200, written, columns, prefer)
+        if method == "DELETE":
+            kept, written = [], []
+            for row in self.tables[table]:
+                (written if all(match(row) for match in filters) else kept).append(row)
+            self.tables[table] = kept
+            return self._written(200, written, columns, prefer)
+        return FakeResponse(405, {"message": f"{method} not supported"})
+
+    @staticmethod
+    def _columns(select: str) -> Optional[List[str]]:
+        if select == "*":
+            return None
+        columns = [column.strip() for column in select.split(",") if column.strip()]
+        if any(not re.fullmatch(r"\w+", column) for column in columns):
+            raise _BadRequest(400, "PGRST100", f"select={select}: only plain columns are supported")
+        return columns
+
+    def _insert(self, table: str, body: Any, on_conflict: Optional[str], prefer: set) -> List[Dict[str, Any]]:
+        rows = body if isinstance(body, list) else [body]
+        key = tuple(on_conflict.split(",")) if on_conflict else self._key(table)
+        existing = {tuple(row.get(column) for column in key): row for row in self.tables[table]}
+        written = []
+        for incoming in rows:
+            row = copy.deepcopy(incoming)
+            match = existing.get(tuple(row.get(column) for column in key))
+            if match is not None:
+                if "resolution=ignore-duplicates" in prefer:
+                    continue
+                if "resolution=merge-duplicates" not in prefer:
+                    raise _BadRequest(409, "23505", f"duplicate key value violates unique constraint on {key}")
+                # Like ON CONFLICT DO UPDATE: only the columns sent change, the row keeps its id
+                match.update(row)
+                written.append(match)
+                continue
+            if self._key(table) == ("id",) and row.get("id") is None:
+                self._serial[table] = self._serial.get(table, 0) + 1
+                row["id"] = self._serial[table]
+            elif self._key(table) == ("id",):
+                self._serial[table] = max(self._serial.get(table, 0), row["id"])
+            self.tables[table].append(row)
+            existing[tuple(row.get(column) for column in key)] = row
+            written.append(row)
+        return written
+
+    @staticmethod
+    def _written(status: int, rows: List[Dict[str, Any]], columns: Optional[List[str]], prefer: set) -> FakeResponse:
+        if "return=representation" in prefer:
+            return FakeResponse(status, [_project(row, columns) for row in rows])
+        return FakeResponse(201 if status == 201 else 204)
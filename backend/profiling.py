@@ -0,0 +1,267 @@
+"""Opt-in request profiling.
+
+Disabled unless ``Settings.profile_secret`` (``PROFILE_SECRET``) is set. A
+request carrying ``X-Profile: <secret>`` (or ``?__profile=<secret>``) is
+served while a background thread samples the event-loop thread's stack every
+``PROFILE_INTERVAL_MS``. The profile is kept in the app's store
+(``app.state.profiles``) holding the ``PROFILE_BUFFER_SIZE`` slowest profiled
+requests and its id is returned in the
+``X-Profile-Id`` response header. Profiles are fetched from
+``/api/admin/profiles`` (same secret in ``X-Profile``) as collapsed stacks
+(flamegraph.pl / speedscope import) or speedscope JSON.
+
+Samples cover the whole event loop, so requests running concurrently with the
+profiled one show up too; profile under light traffic for clean results.
+Sync (``def``) endpoints run in the threadpool and only appear as the
+awaiting loop frames.
+"""
+
+import heapq
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "__profile"
+
+Stack = Tuple[str, ...]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+@dataclass
+class RequestProfile:
+    id: str
+    method: str
+    path: str
+    status: int
+    duration: float
+    interval: float
+    started_at: datetime
+    samples: Counter = field(repr=False)
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values()),
+            "started_at": self.started_at.isoformat(),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format: ``frame;frame;frame count``."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.samples.most_common())
+
+    def speedscope(self) -> dict:
+        frames: List[dict] = []
+        index: Dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    name, _, location = label.partition(" (")
+                    file, _, line = location.rstrip(")").rpartition(":")
+                    frames.append({"name": name, "file": file, "line": int(line) if line.isdigit() else None})
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(count * self.interval * 1000)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"{self.method} {self.path}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": f"{self.method} {self.path} {self.id}",
+            "exporter": "wedding-guest-backend",
+        }
+
+
+class SlowProfileStore:
+    """Keeps the ``size`` slowest profiles seen (min-heap on duration)."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: List[Tuple[float, int, RequestProfile]] = []
+        self._tiebreak = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> bool:
+        entry = (profile.duration, next(self._tiebreak), profile)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+                return True
+            if profile.duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+                return True
+            return False
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return [p for _, _, p in sorted(self._heap, key=lambda e: e[0], reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return next((p for p in self.list() if p.id == profile_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+def _authorized(secret: str, token: Optional[str]) -> bool:
+    return bool(secret) and token is not None and hmac.compare_digest(token.encode(), secret.encode())
+
+
+class ProfilingMiddleware:
+    """Profiles requests that present the profiling secret; everything else passes straight through.
+
+    The secret, sampling interval and store come from the app (``state.settings`` and ``state.profiles``).
+    """
+
+    def __init__(self, app, interval: Optional[float] = None, max_concurrent: int = 1):
+        self.app = app
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self._active = 0
+
+    @staticmethod
+    def _token(scope) -> Optional[str]:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER.encode():
+                return value.decode("latin-1")
+        if PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+            return values[0] if values else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = scope["app"].state
+        if not _authorized(state.settings.profile_secret, self._token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        if self._active >= self.max_concurrent:
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", []).append((b"x-profile-status", b"busy"))
+                await send(message)
+            await self.app(scope, receive, send_busy)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-id", profile_id.encode()))
+            await send(message)
+
+        interval = self.interval or state.settings.profile_interval_ms / 1000
+        self._active += 1
+        sampler = StackSampler(threading.get_ident(), interval)
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = sampler.stop()
+            self._active -= 1
+            state.profiles.add(RequestProfile(
+                id=profile_id, method=scope["method"], path=scope["path"], status=status,
+                duration=time.perf_counter() - start, interval=interval,
+                started_at=started_at, samples=samples,
+            ))
+
+
+profiles_router = APIRouter(prefix="/admin/profiles")
+
+
+def _store(request: Request, token: Optional[str]) -> SlowProfileStore:
+    # 404 rather than 401/403 so the admin surface is invisible without the secret
+    if not _authorized(request.app.state.settings.profile_secret, token):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return request.app.state.profiles
+
+
+@profiles_router.get("")
+async def list_profiles(request: Request, x_profile: Optional[str] = Header(None)):
+    return [p.summary() for p in _store(request, x_profile).list()]
+
+
+@profiles_router.get("/{profile_id}")
+async def get_profile(request: Request, profile_id: str,
+                      format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+                      x_profile: Optional[str] = Header(None)):
+    profile = _store(request, x_profile).get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.speedscope()
+
+
+@profiles_router.delete("")
+async def clear_profiles(request: Request, x_profile: Optional[str] = Header(None)):
+    _store(request, x_profile).clear()
+    return {"cleared": True}
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Affinity edges between guests, inferred into ``relazioni``.
+
+Signals, strongest first:
+
+* same ``unita_invito``: the people invited together;
+* same surname across units, for surnames shared by at most
+  ``MAX_SURNAME_UNITS`` units (a common surname says nothing);
+* same ``gruppo``, which only adds a bonus to edges found above. Group
+  membership is kept as a node label rather than a clique, so a 200-guest
+  "friends" group costs 200 labels, not 20k edges;
+* explicit rows: any ``relazioni`` row whose ``tipo_relazione`` is not one of
+  ours is an override. It always wins and is never rewritten.
+
+Inferred rows carry ``tipo_relazione = "auto:<reason>"``. Each run diffs the
+result against the rows already stored, upserts only what changed and deletes
+inferred edges that no longer hold, in chunks.
+
+    python backend/relationships.py --user-id <uuid> [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from itertools import combinations
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import fold_text, guest_category, guest_status
+from supabase_auth import require_wedding_owner
+
+AUTO_PREFIX = "auto:"
+SAME_UNIT, SAME_SURNAME = "stesso_invito", "stesso_cognome"
+SCORES = {SAME_UNIT: 10.0, SAME_SURNAME: 5.0}
+GROUP_BONUS = 2.0
+MAX_SURNAME_UNITS = 6
+DEFAULT_CHUNK_SIZE = 500
+PAIR_KEY = ("invitato_a_id", "invitato_b_id")
+
+Pair = Tuple[int, int]
+
+
+def _pair(a: int, b: int) -> Pair:
+    return (a, b) if a < b else (b, a)
+
+
+def is_inferred(row: Dict[str, Any]) -> bool:
+    return (row.get("tipo_relazione") or "").startswith(AUTO_PREFIX)
+
+
+class AffinityGraph:
+    """Sparse undirected weighted graph: adjacency dicts plus a group label per guest."""
+
+    def __init__(self):
+        self.adjacency: Dict[int, Dict[int, float]] = {}
+        self.kinds: Dict[Pair, str] = {}
+        self.groups: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add_node(self, guest_id: int, group: Optional[str] = None) -> None:
+        self.adjacency.setdefault(guest_id, {})
+        if group is not None:
+            self.groups[guest_id] = group
+
+    def set_edge(self, a: int, b: int, score: float, kind: str) -> None:
+        if a == b:
+            return
+        self.add_node(a)
+        self.add_node(b)
+        self.adjacency[a][b] = self.adjacency[b][a] = score
+        self.kinds[_pair(a, b)] = kind
+
+    def weight(self, a: int, b: int) -> float:
+        return self.adjacency.get(a, {}).get(b, 0.0)
+
+    def edges(self) -> Iterator[Tuple[int, int, float, str]]:
+        for (a, b), kind in self.kinds.items():
+            yield a, b, self.adjacency[a][b], kind
+
+    def to_csr(self, ids: Optional[Sequence[int]] = None):
+        """``(ids, indptr, indices, weights)`` NumPy arrays in CSR layout, rows in ``ids`` order."""
+        import numpy as np
+
+        ids = list(self.adjacency) if ids is None else list(ids)
+        position = {guest_id: i for i, guest_id in enumerate(ids)}
+        indptr, indices, weights = [0], [], []
+        for guest_id in ids:
+            for other, weight in self.adjacency.get(guest_id, {}).items():
+                if other in position:
+                    indices.append(position[other])
+                    weights.append(weight)
+            indptr.append(len(indices))
+        return (np.asarray(ids), np.asarray(indptr, dtype=np.int64),
+                np.asarray(indices, dtype=np.int64), np.asarray(weights, dtype=np.float64))
+
+
+def _surname(row: Dict[str, Any]) -> str:
+    if row.get("cognome"):
+        return fold_text(row["cognome"])
+    words = fold_text(row.get("nome_visualizzato")).split()
+    return words[-1] if len(words) > 1 else ""
+
+
+def infer_relationships(guests: Iterable[Dict[str, Any]], overrides: Iterable[Dict[str, Any]] = (),
+                        max_surname_units: int = MAX_SURNAME_UNITS) -> AffinityGraph:
+    """Affinity graph of a wedding's active guests; ``overrides`` are manual ``relazioni`` rows."""
+    guests = [g for g in guests if guest_status(g) != "deleted"]
+    graph = AffinityGraph()
+    by_unit: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+    by_surname: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for guest in guests:
+        graph.add_node(guest["id"], guest_category(guest))
+        if guest.get("unita_invito_id") is not None:
+            by_unit[guest["unita_invito_id"]].append(guest)
+        surname = _surname(guest)
+        if surname:
+            by_surname[surname].append(guest)
+
+    def add(a: Dict[str, Any], b: Dict[str, Any], reason: str) -> None:
+        score = SCORES[reason] + (GROUP_BONUS if graph.groups[a["id"]] == graph.groups[b["id"]] else 0.0)
+        if score > graph.weight(a["id"], b["id"]):
+            graph.set_edge(a["id"], b["id"], score, AUTO_PREFIX + reason)
+
+    for members in by_unit.values():
+        for a, b in combinations(members, 2):
+            add(a, b, SAME_UNIT)
+    for members in by_surname.values():
+        if 1 < len({m.get("unita_invito_id") for m in members}) <= max_surname_units:
+            for a, b in combinations(members, 2):
+                if a.get("unita_invito_id") != b.get("unita_invito_id"):
+                    add(a, b, SAME_SURNAME)
+
+    for row in overrides:
+        a, b = row["invitato_a_id"], row["invitato_b_id"]
+        if a in graph.adjacency and b in graph.adjacency:
+            graph.set_edge(a, b, float(row.get("punteggio") or 0.0), row.get("tipo_relazione") or "manuale")
+    return graph
+
+
+def inferred_rows(graph: AffinityGraph) -> Dict[Pair, Dict[str, Any]]:
+    return {(a, b): {"invitato_a_id": a, "invitato_b_id": b, "punteggio": score, "tipo_relazione": kind}
+            for a, b, score, kind in graph.edges() if kind.startswith(AUTO_PREFIX)}
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def delete_pairs(client, pairs: Sequence[Pair], chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """Delete ``relazioni`` rows by key, one ``or=(and(...),...)`` filter per chunk."""
+    for chunk in _chunks(list(pairs), chunk_size):
+        conditions = ",".join(f"and(invitato_a_id.eq.{a},invitato_b_id.eq.{b})" for a, b in chunk)
+        client.delete("relazioni", {"or": f"({conditions})"})
+
+
+async def load_graph(mirror, user_id: str) -> AffinityGraph:
+    """Graph of the stored ``relazioni`` rows (inferred and manual) plus group labels."""
+    graph = AffinityGraph()
+    for guest in await mirror.rows("invitati", user_id):
+        if guest_status(guest) != "deleted":
+            graph.add_node(guest["id"], guest_category(guest))
+    for row in await mirror.rows("relazioni", user_id):
+        a, b = row["invitato_a_id"], row["invitato_b_id"]
+        if a in graph.adjacency and b in graph.adjacency:
+            graph.set_edge(a, b, float(row.get("punteggio") or 0.0), row.get("tipo_relazione") or "manuale")
+    return graph
+
+
+async def infer_and_store(mirror, user_id: str, client=None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          dry_run: bool = False) -> Dict[str, int]:
+    """Recompute one wedding's inferred edges; write the diff to Supabase (if ``client``) and the mirror."""
+    guests = await mirror.rows("invitati", user_id)
+    stored = await mirror.rows("relazioni", user_id)
+    manual = [row for row in stored if not is_inferred(row)]
+    current = {_pair(row["invitato_a_id"], row["invitato_b_id"]): row for row in stored if is_inferred(row)}
+    desired = inferred_rows(infer_relationships(guests, manual))
+
+    changed = [row for pair, row in desired.items()
+               if pair not in current or (current[pair].get("punteggio"), current[pair].get("tipo_relazione"))
+               != (row["punteggio"], row["tipo_relazione"])]
+    stale = [pair for pair in current if pair not in desired]
+    report = {"guests": len(guests), "edges": len(desired), "manual": len(manual),
+              "upserted": len(changed), "deleted": len(stale)}
+    if dry_run:
+        return report
+    if client is not None:
+        await asyncio.to_thread(client.upsert, "relazioni", changed, PAIR_KEY, chunk_size)
+        await asyncio.to_thread(delete_pairs, client, stale, chunk_size)
+    await mirror.bulk_upsert("relazioni", [dict(row, user_id=user_id) for row in changed], chunk_size)
+    await mirror.bulk_delete("relazioni", [dict(zip(PAIR_KEY, pair)) for pair in stale], chunk_size)
+    return report
+
+
+relationships_router = APIRouter(prefix="/relationships")
+
+
+@relationships_router.post("/infer")
+async def infer_wedding_relationships(request: Request, user_id: str = Query(..., min_length=1),
+                                      dry_run: bool = False):
+    settings = request.app.state.settings
+    client = None
+    if settings.supabase_write_key and not dry_run:
+        from supabase_rest import PostgrestClient
+
+        require_wedding_owner(request, user_id)
+        client = PostgrestClient(key=settings.supabase_write_key)
+    return await infer_and_store(request.app.state.mirror, user_id, client, dry_run=dry_run)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import os
+
+    from database import Database
+    from settings import Settings
+    from supabase_rest import PostgrestClient
+    from wedding_mirror import WeddingMirror
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    async def run() -> Dict[str, int]:
+        # Work on a fresh in-memory mirror of this wedding, then write back to Supabase
+        database = Database(Settings(mongo_url="memory://", db_name="relationships"))
+        mirror = WeddingMirror(database)
+        await mirror.pull_wedding(PostgrestClient(), args.user_id)
+        key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        writer = PostgrestClient(key=key) if key and not args.dry_run else None
+        if writer is None and not args.dry_run:
+            raise SystemExit("SUPABASE_SERVICE_ROLE_KEY is required to write relazioni (or pass --dry-run)")
+        return await infer_and_store(mirror, args.user_id, writer, args.chunk_size, dry_run=args.dry_run)
+
+    for name, value in asyncio.run(run()).items():
+        print(f"{name:<10}{value:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+"""Seat numbers within each table, chosen to put friends next to each other.
+
+A table's guests get pairwise affinities (``relazioni`` weight plus the
+same-group bonus) and a seat layout:
+
+* round/square: seat ``i`` neighbours ``i±1``. A full table is a maximum
+  Hamiltonian cycle; a table with a free seat leaves the gap at one spot,
+  which makes it a maximum Hamiltonian path;
+* rectangular: guests sit along both long sides, next to ``i±1`` on their
+  side and facing the guest opposite (weighted ``ACROSS_WEIGHT``).
+
+Round tables with up to ``DP_MAX_GUESTS`` guests are solved exactly with a
+Held-Karp DP, vectorized one subset layer at a time. Larger round tables use
+greedy construction plus 2-opt. Rectangular tables are enumerated exactly up
+to ``EXACT_RECT_MAX_SEATS`` seats and improved by pairwise seat swaps beyond
+that. Batches of tables are spread over a process pool; the app owns one
+``SolverPool`` (``app.state.seat_pool``), started on the first large batch and
+shut down with the app, so requests never pay for (or fork) a pool of their own.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+
+from guest_rows import guest_status
+from relationships import AffinityGraph, infer_relationships, load_graph
+from seating import GROUP_AFFINITY
+
+ROUND, RECTANGULAR, SQUARE = "round", "rectangular", "square"
+DP_MAX_GUESTS = 13
+EXACT_RECT_MAX_SEATS = 8
+ACROSS_WEIGHT = 0.5
+MAX_PASSES = 32
+PARALLEL_MIN_TABLES = 24
+
+
+@dataclass
+class TableProblem:
+    table_id: int
+    guests: List[int]
+    weights: List[List[float]]         # symmetric, in ``guests`` order
+    seats: int
+    shape: str = ROUND
+
+
+@dataclass
+class TableOrder:
+    table_id: int
+    shape: str
+    seats: List[Optional[int]]
+    score: float
+    method: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.table_id, "shape": self.shape, "method": self.method, "score": round(self.score, 3),
+                "seats": [{"seat_number": i + 1, "invitato_id": g} for i, g in enumerate(self.seats) if g is not None]}
+
+
+def seat_adjacency(shape: str, seats: int) -> List[Tuple[int, int, float]]:
+    """Neighbouring seat pairs ``(s, t, weight)`` of a table layout."""
+    if seats < 2:
+        return []
+    if shape == RECTANGULAR:
+        side = (seats + 1) // 2
+        pairs = [(s, s + 1, 1.0) for s in range(side - 1)]
+        pairs += [(s, s + 1, 1.0) for s in range(side, seats - 1)]
+        pairs += [(s, side + s, ACROSS_WEIGHT) for s in range(seats - side)]
+        return pairs
+    if seats == 2:
+        return [(0, 1, 1.0)]
+    return [(s, (s + 1) % seats, 1.0) for s in range(seats)]
+
+
+def arrangement_score(problem: TableProblem, seats: Sequence[Optional[int]]) -> float:
+    index = {g: i for i, g in enumerate(problem.guests)}
+    score = 0.0
+    for s, t, weight in seat_adjacency(problem.shape, len(seats)):
+        if seats[s] is not None and seats[t] is not None:
+            score += weight * problem.weights[index[seats[s]]][index[seats[t]]]
+    return score
+
+
+@lru_cache(maxsize=None)
+def _held_karp_plan(n: int, cycle: bool):
+    """Per subset size and end node: the subsets to fill and their predecessors."""
+    import numpy as np
+
+    masks = np.arange(1 << n)
+    popcount = np.zeros(1 << n, dtype=np.int64)
+    for bit in range(n):
+        popcount += (masks >> bit) & 1
+    if cycle:
+        masks, popcount = masks[masks & 1 == 1], popcount[masks & 1 == 1]
+    plan = []
+    for layer in range(2, n + 1):
+        layer_masks = masks[popcount == layer]
+        for end in range(1 if cycle else 0, n):
+            chosen = layer_masks[(layer_masks >> end) & 1 == 1]
+            plan.append((end, chosen, chosen ^ (1 << end), np.arange(len(chosen))))
+    return plan
+
+
+def _held_karp(weights, cycle: bool) -> List[int]:
+    """Maximum-weight Hamiltonian cycle (starting at 0) or path over all nodes.
+
+    Subsets are filled one size at a time, each ``(size, end)`` step as one
+    vectorized gather/argmax over all subsets of that size.
+    """
+    import numpy as np
+
+    n = len(weights)
+    w = np.asarray(weights, dtype=np.float64)
+    best = np.full((1 << n, n), -np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    for start in ([0] if cycle else range(n)):
+        best[1 << start, start] = 0.0
+    for end, chosen, previous_masks, rows in _held_karp_plan(n, cycle):
+        candidates = best[previous_masks] + w[:, end]
+        previous = candidates.argmax(axis=1)
+        best[chosen, end] = candidates[rows, previous]
+        parent[chosen, end] = previous
+    full = (1 << n) - 1
+    closing = best[full] + (w[:, 0] if cycle else 0.0)
+    end = int(closing.argmax())
+    order, mask = [], full
+    while end >= 0:
+        order.append(end)
+        end, mask = int(parent[mask, end]), mask ^ (1 << end)
+    return order[::-1]
+
+
+def _two_opt(w: List[List[float]], order: List[int], cycle: bool) -> List[int]:
+    """Segment reversals while any improves a cycle or path."""
+    n = len(order)
+    for _ in range(MAX_PASSES):
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                if cycle and i == 0 and j == n - 1:
+                    continue
+                a = order[i - 1] if i > 0 or cycle else None
+                b, c = order[i], order[j]
+                d = order[(j + 1) % n] if j + 1 < n or cycle else None
+                before = (w[a][b] if a is not None else 0.0) + (w[c][d] if d is not None else 0.0)
+                after = (w[a][c] if a is not None else 0.0) + (w[b][d] if d is not None else 0.0)
+                if after > before + 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def _greedy_path(w: List[List[float]]) -> List[int]:
+    n = len(w)
+    start = max(range(n), key=lambda i: (sum(w[i]), -i))
+    order, left = [start], set(range(n)) - {start}
+    while left:
+        nxt = max(left, key=lambda j: (w[order[-1]][j], -j))
+        order.append(nxt)
+        left.discard(nxt)
+    return order
+
+
+def _solve_round(problem: TableProblem) -> Tuple[List[Optional[int]], str]:
+    n = len(problem.guests)
+    cycle = n == problem.seats
+    if n <= 2:
+        order, method = list(range(n)), "trivial"
+    elif n <= DP_MAX_GUESTS:
+        order, method = _held_karp(problem.weights, cycle), "held-karp"
+    else:
+        order, method = _two_opt(problem.weights, _greedy_path(problem.weights), cycle), "2-opt"
+    seats: List[Optional[int]] = [problem.guests[i] for i in order]
+    return seats + [None] * (problem.seats - n), method
+
+
+@lru_cache(maxsize=None)
+def _rectangular_layouts(seats: int):
+    """Every seating permutation, with the flat weight-matrix cell of each neighbour pair."""
+    import numpy as np
+
+    perms = np.array(list(itertools.permutations(range(seats))), dtype=np.int64)
+    pairs = seat_adjacency(RECTANGULAR, seats)
+    cells = np.stack([perms[:, s] * seats + perms[:, t] for s, t, _ in pairs], axis=1)
+    return perms, cells, np.array([weight for _, _, weight in pairs])
+
+
+def _solve_rectangular(problem: TableProblem) -> Tuple[List[Optional[int]], str]:
+    seats = problem.seats
+    n = len(problem.guests)
+    # Empty seats are guests with no affinity to anyone
+    w = [row + [0.0] * (seats - n) for row in problem.weights] + [[0.0] * seats for _ in range(seats - n)]
+    pairs = seat_adjacency(RECTANGULAR, seats)
+    if seats <= EXACT_RECT_MAX_SEATS:
+        import numpy as np
+
+        perms, cells, edge_weights = _rectangular_layouts(seats)
+        totals = np.asarray(w).ravel()[cells] @ edge_weights
+        best, method = list(perms[int(np.argmax(totals))]), "exhaustive"
+    else:
+        # Snake the greedy path down one side and back up the other, then swap seats while it helps
+        path = _greedy_path(w)
+        side = (seats + 1) // 2
+        best = path[:side] + path[:side - 1:-1]
+        neighbours: Dict[int, List[Tuple[int, float]]] = {s: [] for s in range(seats)}
+        for s, t, weight in pairs:
+            neighbours[s].append((t, weight))
+            neighbours[t].append((s, weight))
+        for _ in range(MAX_PASSES):
+            improved = False
+            for s in range(seats):
+                for t in range(s + 1, seats):
+                    a, b = best[s], best[t]
+                    delta = 0.0
+                    for other, weight in neighbours[s]:
+                        if other != t:
+                            delta += weight * (w[b][best[other]] - w[a][best[other]])
+                    for other, weight in neighbours[t]:
+                        if other != s:
+                            delta += weight * (w[a][best[other]] - w[b][best[other]])
+                    if delta > 1e-9:
+                        best[s], best[t] = b, a
+                        improved = True
+            if not improved:
+                break
+        method = "swap"
+    return [problem.guests[i] if i < n else None for i in best], method
+
+
+def solve_table(problem: TableProblem) -> TableOrder:
+    if problem.shape == RECTANGULAR and len(problem.guests) > 1:
+        seats, method = _solve_rectangular(problem)
+    else:
+        seats, method = _solve_round(problem)
+    return TableOrder(problem.table_id, problem.shape, seats, arrangement_score(problem, seats), method)
+
+
+def default_workers() -> int:
+    return min(4, os.cpu_count() or 1)
+
+
+class SolverPool:
+    """A process pool created on first use and reused until ``shutdown``."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or default_workers()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the server process runs an event loop and thread pools
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def order_tables(problems: Sequence[TableProblem], workers: Optional[int] = None,
+                 pool: Optional[SolverPool] = None) -> List[TableOrder]:
+    """Solve every table; large batches are spread over ``pool`` (or a pool of ``workers`` for this call)."""
+    if workers is None:
+        workers = (pool.workers if pool else default_workers()) if len(problems) >= PARALLEL_MIN_TABLES else 1
+    if workers <= 1:
+        return [solve_table(problem) for problem in problems]
+    # Biggest tables first so no worker is left with the long tail
+    ordered = sorted(range(len(problems)), key=lambda i: -len(problems[i].guests))
+    batch = [problems[i] for i in ordered]
+    solved: List[Optional[TableOrder]] = [None] * len(problems)
+    if pool is not None:
+        results = list(pool.executor().map(solve_table, batch, chunksize=4))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(solve_table, batch, chunksize=4))
+    for i, order in zip(ordered, results):
+        solved[i] = order
+    return solved
+
+
+def affinity_weights(guests: Sequence[int], graph: AffinityGraph) -> List[List[float]]:
+    return [[0.0 if a == b else graph.weight(a, b) + GROUP_AFFINITY * (graph.groups.get(a) == graph.groups.get(b))
+             for b in guests] for a in guests]
+
+
+def build_problems(assignments: Dict[int, int], tables: Sequence[Dict[str, Any]], graph: AffinityGraph,
+                   shapes: Optional[Dict[int, str]] = None, default_shape: str = ROUND) -> List[TableProblem]:
+    seated: Dict[int, List[int]] = {}
+    for guest_id, table_id in sorted(assignments.items()):
+        seated.setdefault(table_id, []).append(guest_id)
+    problems = []
+    for table in tables:
+        guests = seated.get(table["id"], [])
+        if guests:
+            problems.append(TableProblem(
+                table["id"], guests, affinity_weights(guests, graph),
+                max(int(table.get("capacita_max") or 0), len(guests)),
+                (shapes or {}).get(table["id"], default_shape)))
+    return problems
+
+
+seat_order_router = APIRouter(prefix="/seating")
+
+
+@seat_order_router.post("/order")
+async def order_seats(request: Request, user_id: str = Query(..., min_length=1),
+                      shape: str = Query(ROUND, pattern="^(round|rectangular|square)$"),
+                      assignments: Optional[Dict[int, int]] = Body(None, embed=True),
+                      shapes: Optional[Dict[int, str]] = Body(None, embed=True)):
+    """Seat numbers for the saved plan (``piani_salvati``) or for ``assignments`` given in the body."""
+    unknown = set((shapes or {}).values()) - {ROUND, RECTANGULAR, SQUARE}
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"unknown table shapes {sorted(unknown)}")
+    mirror = request.app.state.mirror
+    tables = await mirror.rows("tavoli", user_id)
+    guests = [g for g in await mirror.rows("invitati", user_id) if guest_status(g) != "deleted"]
+    if assignments is None:
+        assignments = {row["invitato_id"]: row["tavolo_id"] for row in await mirror.rows("piani_salvati", user_id)}
+    graph = await load_graph(mirror, user_id)
+    if not len(graph):
+        graph = infer_relationships(guests)
+    problems = build_problems(assignments, tables, graph, shapes, shape)
+    orders = await asyncio.to_thread(order_tables, problems, None, request.app.state.seat_pool)
+    return {"tables": [order.to_dict() for order in orders]}
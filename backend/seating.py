@@ -0,0 +1,318 @@
+"""Capacity-constrained clustering of the affinity graph into a seating plan.
+
+Three stages, all driven by the sparse ``relazioni`` graph:
+
+1. Agglomerate: invitation units start as clusters (their members stay
+   together). The best pair by average linkage is merged repeatedly,
+   provided the result still fits the largest table and does not put the
+   groom's family with the bride's.
+2. Pack: clusters go largest first to the compatible table with the most
+   affinity to whoever already sits there, best fit on ties. A cluster with
+   no table big enough is split along its weakest links.
+3. Refine: label-propagation sweeps move single guests to a table with a
+   free seat, or swap them with a guest of another table, whenever that
+   raises the plan score.
+
+The result can be saved as-is or used to warm-start the seat-order
+optimiser. Group membership counts as a weak implicit affinity
+(``GROUP_AFFINITY`` per same-group neighbour), so groups still pull together
+where no edges exist.
+"""
+
+import asyncio
+import heapq
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import guest_category, guest_status, table_side
+from relationships import AffinityGraph, infer_relationships, load_graph
+
+GROUP_AFFINITY = 1.0
+MAX_SWEEPS = 8
+# Family side each guest category belongs to; other categories can sit anywhere
+CATEGORY_SIDES = {"family-his": "sposo", "family-hers": "sposa"}
+NEUTRAL_SIDE = "centro"
+
+
+def guest_side(row: Dict[str, Any]) -> Optional[str]:
+    return CATEGORY_SIDES.get(guest_category(row))
+
+
+def sides_compatible(a: Optional[str], b: Optional[str]) -> bool:
+    return a is None or b is None or a == b
+
+
+def table_accepts(table_lato: str, side: Optional[str]) -> bool:
+    return side is None or table_lato == NEUTRAL_SIDE or table_lato == side
+
+
+@dataclass
+class _Cluster:
+    members: List[int]
+    side: Optional[str]
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+
+@dataclass
+class SeatingPlan:
+    assignments: Dict[int, int]
+    unseated: List[int]
+    score: float
+    tables: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"score": round(self.score, 3), "seated": len(self.assignments),
+                "unseated": self.unseated, "tables": self.tables}
+
+
+class _Planner:
+    def __init__(self, guests: List[Dict[str, Any]], tables: List[Dict[str, Any]], graph: AffinityGraph):
+        self.guests = {g["id"]: g for g in guests}
+        self.graph = graph
+        self.group = {gid: guest_category(g) for gid, g in self.guests.items()}
+        self.side = {gid: guest_side(g) for gid, g in self.guests.items()}
+        self.tables = {t["id"]: t for t in tables}
+        self.capacity = {t["id"]: int(t.get("capacita_max") or 0) for t in tables}
+        self.lato = {t["id"]: table_side(t) for t in tables}
+        self.table_of: Dict[int, int] = {}
+        self.occupants: Dict[int, set] = {tid: set() for tid in self.tables}
+        self.group_counts: Dict[int, Counter] = {tid: Counter() for tid in self.tables}
+
+    def weight(self, a: int, b: int) -> float:
+        return self.graph.weight(a, b)
+
+    # Stage 1
+
+    def _units(self) -> List[_Cluster]:
+        largest = max(self.capacity.values(), default=0)
+        units: Dict[Any, List[int]] = defaultdict(list)
+        for gid, guest in self.guests.items():
+            unit = guest.get("unita_invito_id")
+            units[("guest", gid) if unit is None else unit].append(gid)
+        clusters = []
+        for members in units.values():
+            sides = Counter(self.side[m] for m in members if self.side[m])
+            side = sides.most_common(1)[0][0] if sides else None
+            for start in range(0, len(members), max(largest, 1)):
+                clusters.append(_Cluster(members[start:start + max(largest, 1)], side))
+        return clusters
+
+    def agglomerate(self) -> List[_Cluster]:
+        clusters = dict(enumerate(self._units()))
+        largest = max(self.capacity.values(), default=0)
+        owner = {m: cid for cid, cluster in clusters.items() for m in cluster.members}
+        links: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for a, b, weight, _ in self.graph.edges():
+            ca, cb = owner.get(a), owner.get(b)
+            if ca is not None and cb is not None and ca != cb:
+                links[ca][cb] += weight
+                links[cb][ca] += weight
+
+        def priority(a: int, b: int) -> float:
+            return links[a][b] / (clusters[a].size * clusters[b].size)
+
+        heap = [(-priority(a, b), a, b) for a in links for b in links[a] if a < b and links[a][b] > 0]
+        heapq.heapify(heap)
+        while heap:
+            negative, a, b = heapq.heappop(heap)
+            if a not in clusters or b not in clusters or b not in links[a]:
+                continue
+            if -negative != priority(a, b):
+                if links[a][b] > 0:
+                    heapq.heappush(heap, (-priority(a, b), a, b))
+                continue
+            merged_side = clusters[a].side or clusters[b].side
+            if (clusters[a].size + clusters[b].size > largest
+                    or not sides_compatible(clusters[a].side, clusters[b].side)):
+                continue
+            clusters[a] = _Cluster(clusters[a].members + clusters[b].members, merged_side)
+            del clusters[b]
+            for other, weight in links.pop(b).items():
+                if other == a:
+                    continue
+                links[a][other] += weight
+                links[other][a] += weight
+                del links[other][b]
+            links[a].pop(b, None)
+            for other, weight in links[a].items():
+                if weight > 0:
+                    heapq.heappush(heap, (-priority(a, other), min(a, other), max(a, other)))
+        return sorted(clusters.values(), key=lambda c: (-c.size, min(c.members)))
+
+    # Stage 2
+
+    def affinity(self, gid: int, tid: int) -> float:
+        """Gain of ``gid`` sitting at ``tid`` with its current occupants (excluding itself)."""
+        edges = sum(w for other, w in self.graph.adjacency.get(gid, {}).items() if self.table_of.get(other) == tid)
+        same_group = self.group_counts[tid][self.group[gid]] - (1 if self.table_of.get(gid) == tid else 0)
+        return edges + GROUP_AFFINITY * same_group
+
+    def seat(self, gid: int, tid: int) -> None:
+        previous = self.table_of.get(gid)
+        if previous is not None:
+            self.occupants[previous].discard(gid)
+            self.group_counts[previous][self.group[gid]] -= 1
+        self.table_of[gid] = tid
+        self.occupants[tid].add(gid)
+        self.group_counts[tid][self.group[gid]] += 1
+
+    def free(self, tid: int) -> int:
+        return self.capacity[tid] - len(self.occupants[tid])
+
+    def _split(self, cluster: _Cluster, room: int) -> Tuple[List[int], List[int]]:
+        """Most tightly linked ``room`` members first, grown greedily from the best-connected one."""
+        members = set(cluster.members)
+        strength = {m: sum(self.weight(m, o) for o in members if o != m) for m in members}
+        chosen = [max(members, key=lambda m: (strength[m], -m))]
+        rest = members - set(chosen)
+        while len(chosen) < room and rest:
+            best = max(rest, key=lambda m: (sum(self.weight(m, c) for c in chosen), -m))
+            chosen.append(best)
+            rest.discard(best)
+        return chosen, sorted(rest)
+
+    def pack(self, clusters: List[_Cluster]) -> List[int]:
+        queue = deque(clusters)
+        unseated: List[int] = []
+        while queue:
+            cluster = queue.popleft()
+            options = [tid for tid in self.tables if table_accepts(self.lato[tid], cluster.side) and self.free(tid) > 0]
+            if not options:
+                unseated.extend(cluster.members)
+                continue
+            fitting = [tid for tid in options if self.free(tid) >= cluster.size]
+            if fitting:
+                # Affinity of the whole cluster to each table, from its members' links and groups
+                linked: Counter = Counter()
+                for m in cluster.members:
+                    for other, w in self.graph.adjacency.get(m, {}).items():
+                        if other in self.table_of:
+                            linked[self.table_of[other]] += w
+                groups = Counter(self.group[m] for m in cluster.members)
+
+                def gain(tid: int) -> float:
+                    counts = self.group_counts[tid]
+                    return linked[tid] + GROUP_AFFINITY * sum(counts[g] * n for g, n in groups.items())
+
+                target = max(fitting, key=lambda tid: (gain(tid), -(self.free(tid) - cluster.size), -tid))
+                members = cluster.members
+            else:
+                target = max(options, key=lambda tid: (self.free(tid), -tid))
+                members, rest = self._split(cluster, self.free(target))
+                queue.append(_Cluster(rest, cluster.side))
+            for gid in members:
+                self.seat(gid, target)
+        return unseated
+
+    # Stage 3
+
+    def _candidate_tables(self, gid: int) -> set:
+        tables = {self.table_of[o] for o in self.graph.adjacency.get(gid, {}) if o in self.table_of}
+        tables.discard(self.table_of[gid])
+        return {tid for tid in tables if table_accepts(self.lato[tid], self.side[gid])}
+
+    def refine(self, sweeps: int = MAX_SWEEPS) -> None:
+        for _ in range(sweeps):
+            improved = False
+            for gid in sorted(self.table_of):
+                home = self.table_of[gid]
+                stay = self.affinity(gid, home)
+                best_gain, best_move = 1e-9, None
+                for tid in self._candidate_tables(gid):
+                    there = self.affinity(gid, tid)
+                    if self.free(tid) > 0 and there - stay > best_gain:
+                        best_gain, best_move = there - stay, (tid, None)
+                    for other in self.occupants[tid]:
+                        if not table_accepts(self.lato[home], self.side[other]):
+                            continue
+                        # The pair itself is split before and after, so its own link drops out
+                        shared = self.weight(gid, other) + GROUP_AFFINITY * (self.group[gid] == self.group[other])
+                        gain = ((there - shared) + (self.affinity(other, home) - shared)
+                                - stay - self.affinity(other, tid))
+                        if gain > best_gain:
+                            best_gain, best_move = gain, (tid, other)
+                if best_move:
+                    tid, other = best_move
+                    self.seat(gid, tid)
+                    if other is not None:
+                        self.seat(other, home)
+                    improved = True
+            if not improved:
+                return
+
+    def score(self) -> float:
+        return plan_score(self.graph, self.table_of, self.group)
+
+    def plan(self, unseated: List[int]) -> SeatingPlan:
+        tables = []
+        for tid, table in self.tables.items():
+            occupants = sorted(self.occupants[tid])
+            tables.append({"id": tid, "nome_tavolo": table.get("nome_tavolo"), "lato": self.lato[tid],
+                           "capacita_max": self.capacity[tid], "guests": occupants,
+                           "score": round(plan_score(self.graph, {g: tid for g in occupants}, self.group), 3)})
+        return SeatingPlan(dict(self.table_of), sorted(unseated), self.score(), tables)
+
+
+def plan_score(graph: AffinityGraph, assignments: Dict[int, int], groups: Dict[int, str]) -> float:
+    """Sum of edge weights inside tables plus ``GROUP_AFFINITY`` per same-group pair at a table."""
+    score = 0.0
+    for a, b, weight, _ in graph.edges():
+        if a in assignments and assignments.get(b) == assignments[a]:
+            score += weight
+    per_table: Dict[int, Counter] = defaultdict(Counter)
+    for gid, tid in assignments.items():
+        per_table[tid][groups.get(gid)] += 1
+    for counts in per_table.values():
+        score += GROUP_AFFINITY * sum(n * (n - 1) / 2 for n in counts.values())
+    return score
+
+
+def _planner(guests: Iterable[Dict[str, Any]], tables: Iterable[Dict[str, Any]],
+             graph: Optional[AffinityGraph], statuses: Tuple[str, ...]) -> _Planner:
+    guests = [g for g in guests if guest_status(g) in statuses]
+    graph = graph if graph is not None and len(graph) else infer_relationships(guests)
+    return _Planner(guests, sorted(tables, key=lambda t: t["id"]), graph)
+
+
+def seed_plan(guests: Iterable[Dict[str, Any]], tables: Iterable[Dict[str, Any]],
+              graph: Optional[AffinityGraph] = None, refine: bool = True,
+              statuses: Tuple[str, ...] = ("confirmed", "pending")) -> SeatingPlan:
+    """Cluster ``guests`` (by default everyone not deleted) onto ``tables``."""
+    planner = _planner(guests, tables, graph, statuses)
+    unseated = planner.pack(planner.agglomerate())
+    if refine:
+        planner.refine()
+    return planner.plan(unseated)
+
+
+def refine_plan(plan: SeatingPlan, guests: Iterable[Dict[str, Any]], tables: Iterable[Dict[str, Any]],
+                graph: Optional[AffinityGraph] = None,
+                statuses: Tuple[str, ...] = ("confirmed", "pending")) -> SeatingPlan:
+    """Stage 3 alone: improve a ``seed_plan(..., refine=False)`` result without clustering again."""
+    planner = _planner(guests, tables, graph, statuses)
+    for gid, tid in plan.assignments.items():
+        planner.seat(gid, tid)
+    planner.refine()
+    return planner.plan(plan.unseated)
+
+
+seating_router = APIRouter(prefix="/seating")
+
+
+@seating_router.post("/seed")
+async def seed_seating(request: Request, user_id: str = Query(..., min_length=1), confirmed_only: bool = False,
+                       refine: bool = True):
+    mirror = request.app.state.mirror
+    guests = await mirror.rows("invitati", user_id)
+    tables = await mirror.rows("tavoli", user_id)
+    graph = await load_graph(mirror, user_id)
+    statuses = ("confirmed",) if confirmed_only else ("confirmed", "pending")
+    # Clustering a large wedding takes a few hundred ms of CPU; keep it off the event loop
+    plan = await asyncio.to_thread(seed_plan, guests, tables, graph, refine, statuses)
+    return plan.to_dict()
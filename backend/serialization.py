@@ -0,0 +1,49 @@
+"""Fast JSON response paths.
+
+FastAPI's ``response_model`` handling validates whatever the endpoint returns
+and then serializes it again through ``jsonable_encoder``/``json.dumps``. For
+list endpoints that means every document is validated twice. The helpers here
+return a ready ``Response`` so that pipeline is skipped entirely, while the
+``response_model`` on the route still documents the schema in OpenAPI.
+
+Reads of documents this backend wrote itself are trusted by default: they are
+projected to the model's fields in Mongo and dumped straight to JSON with
+orjson. Set ``VALIDATE_DB_READS=1`` (``Settings.validate_db_reads``) to
+validate them in one ``TypeAdapter(list[Model])`` pass instead.
+"""
+
+from typing import Any, Dict, Iterable, List, Type
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize an already validated model once, in Rust, without revalidation."""
+    return Response(model.__pydantic_serializer__.to_json(model), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+
+
+class ModelListSerializer:
+    """Bulk validation and serialization for lists of one model type."""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.adapter = TypeAdapter(List[model])
+        # Mongo projection returning exactly the model's fields, without _id
+        self.projection: Dict[str, int] = {name: 1 for name in model.model_fields}
+        self.projection['_id'] = 0
+
+    def validate(self, docs: Iterable[Dict[str, Any]]) -> List[BaseModel]:
+        return self.adapter.validate_python(list(docs))
+
+    def dump_json(self, items: List[BaseModel]) -> bytes:
+        return self.adapter.dump_json(items)
+
+    def response(self, docs: List[Dict[str, Any]], trusted: bool = True) -> Response:
+        """Build the list response; ``docs`` must come from a query using ``self.projection``."""
+        if trusted:
+            return ORJSONResponse(docs)
+        return Response(self.dump_json(self.validate(docs)), media_type=JSON_MEDIA_TYPE)
@@ -1,26 +1,52 @@
-from fastapi import FastAPI, APIRouter
-from dotenv import load_dotenv
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, APIRouter, Depends, Request
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
 import logging
-from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime
+from cache_coherence import CacheCoherence
+from database import Database, get_db
+from floor_plan import FloorPlanBuffer, floor_plan_router
+from forecast import ForecastService, forecast_router
+from guest_attributes import backfill_on_startup, guest_attributes_router
+from guest_dedupe import dedupe_router
+from guest_facets import GuestFacetService, facets_router
+from guest_search import GuestSearchService, search_router
+from http_cache import CompressionMiddleware, ConditionalGetMiddleware
+from jobs import JobRunner, jobs_router
+from metrics import APP_STARTUP_SECONDS, MetricsMiddleware, metrics_router
+from notifications import CHANNELS, FileTransport, NotificationDispatcher, notifications_router
+from outbound import configure_shared
+from profiling import ProfilingMiddleware, SlowProfileStore, profiles_router
+from relationships import relationships_router
+from seat_order import SolverPool, seat_order_router
+from seating import seating_router
+from serialization import ModelListSerializer, model_response
+from settings import Settings
+from stats_service import StatsService, stats_router
+from status_series import StatusSeries, status_router
+from table_mix import table_mix_router
+from wedding_mirror import WeddingMirror, webhook_router
 
+# Heavy optional libraries (pandas, numpy) are imported inside the functions
+# that use them, never at module level, so they stay off the boot path.
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+_IMPORTS_DONE = time.perf_counter()
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app without a prefix
-app = FastAPI()
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -35,41 +61,149 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+status_check_list = ModelListSerializer(StatusCheck)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
 
 @api_router.post("/status", response_model=StatusCheck)
-async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
+async def create_status_check(input: StatusCheckCreate, request: Request):
+    status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
-    return status_obj
+    await request.app.state.status.record(status_obj.model_dump())
+    return model_response(status_obj)
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
-
-# Include the router in the main app
-app.include_router(api_router)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+async def get_status_checks(request: Request, db=Depends(get_db)):
+    await request.app.state.status.ensure_ready()
+    status_checks = await db.status_checks.find({}, status_check_list.projection).to_list(1000)
+    return status_check_list.response(status_checks, trusted=not request.app.state.settings.validate_db_reads)
+
+api_router.include_router(profiles_router)
+api_router.include_router(webhook_router)
+api_router.include_router(stats_router)
+api_router.include_router(dedupe_router)
+api_router.include_router(search_router)
+api_router.include_router(facets_router)
+api_router.include_router(relationships_router)
+api_router.include_router(seating_router)
+api_router.include_router(seat_order_router)
+api_router.include_router(jobs_router)
+api_router.include_router(status_router)
+api_router.include_router(notifications_router)
+api_router.include_router(floor_plan_router)
+api_router.include_router(forecast_router)
+api_router.include_router(table_mix_router)
+api_router.include_router(guest_attributes_router)
+
+
+def _report_startup(app: FastAPI) -> None:
+    report = app.state.startup_report
+    report['ready_ms'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+    for phase, ms in report.items():
+        APP_STARTUP_SECONDS.labels(phase.removesuffix('_ms')).set(ms / 1000)
+    logger.info("Startup: imports %(imports_ms)s ms, app build %(build_ms)s ms, ready after %(ready_ms)s ms", report)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _report_startup(app)
+    settings = app.state.settings
+    tasks = [asyncio.create_task(backfill_on_startup(app.state.mirror))]
+    if settings.stats_reconcile_seconds > 0:
+        client = None
+        if settings.reconcile_from_supabase:
+            from outbound import BATCH
+            from supabase_rest import PostgrestClient
+            client = PostgrestClient(priority=BATCH)
+        tasks.append(asyncio.create_task(app.state.stats.run_reconciliation(settings.stats_reconcile_seconds, client)))
+    await app.state.coherence.start()
+    if settings.job_workers > 0:
+        await app.state.jobs.start()
+    if settings.notification_sink != "off":
+        await app.state.notifications.start()
+    await app.state.floor_plan.start()
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await app.state.floor_plan.stop()
+    if settings.notification_sink != "off":
+        await app.state.notifications.stop()
+    if settings.job_workers > 0:
+        await app.state.jobs.stop()
+    await app.state.coherence.stop()
+    await asyncio.to_thread(app.state.seat_pool.shutdown)
+    app.state.database.close()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the application. No database connection is made until first use."""
+    build_started = time.perf_counter()
+    settings = settings or Settings.from_env()
+
+    # Create the main app without a prefix
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.state.settings = settings
+    configure_shared(settings.supabase_rate, settings.supabase_burst, settings.supabase_max_concurrency)
+    app.state.database = Database(settings)
+    app.state.mirror = WeddingMirror(app.state.database)
+    app.state.stats = StatsService(app.state.mirror)
+    app.state.mirror.bus.subscribe(app.state.stats.on_change)
+    app.state.search = GuestSearchService(app.state.mirror)
+    app.state.mirror.bus.subscribe(app.state.search.on_change)
+    app.state.facets = GuestFacetService(app.state.mirror)
+    app.state.mirror.bus.subscribe(app.state.facets.on_change)
+    app.state.coherence = CacheCoherence(app.state.mirror, [app.state.search, app.state.facets],
+                                         settings.cache_coherence)
+    app.state.jobs = JobRunner(app.state.database, app.state, settings.job_workers)
+    app.state.status = StatusSeries(app.state.database, settings.status_ttl_days)
+    # Every channel goes to the local sink until a provider transport is configured
+    sink = FileTransport(None if settings.notification_sink in ("stdout", "off") else settings.notification_sink)
+    app.state.notifications = NotificationDispatcher(app.state.database, {channel: sink for channel in CHANNELS})
+    app.state.forecast = ForecastService(app.state.mirror)
+    app.state.profiles = SlowProfileStore(settings.profile_buffer_size)
+    app.state.seat_pool = SolverPool()
+    app.state.floor_plan = FloorPlanBuffer(app.state.mirror, settings.floor_plan_journal or None,
+                                           settings.floor_plan_flush_seconds,
+                                           write_key=settings.supabase_write_key)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+    app.include_router(metrics_router)
+
+    # Inside CORS so 304s still carry the CORS headers
+    app.add_middleware(ConditionalGetMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=list(settings.cors_origins),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.add_middleware(CompressionMiddleware)
+
+    app.add_middleware(ProfilingMiddleware)
+
+    # Outermost so latency includes every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    app.state.startup_report = {
+        'imports_ms': round((_IMPORTS_DONE - _IMPORT_STARTED) * 1000, 1),
+        'build_ms': round((time.perf_counter() - build_started) * 1000, 1),
+    }
+    return app
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+def __getattr__(name):
+    # `uvicorn server:app` keeps working, but importing this module (tests,
+    # tooling) no longer reads .env or builds an app as a side effect.
+    if name == 'app':
+        app = create_app()
+        globals()['app'] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
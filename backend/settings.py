@@ -0,0 +1,89 @@
+"""Backend configuration, resolved from the environment (and backend/.env) on demand."""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+@dataclass(frozen=True)
+class Settings:
+    mongo_url: str
+    db_name: str
+    cors_origins: Tuple[str, ...] = ('*',)
+    # Seconds between stats reconciliation passes; 0 disables the job
+    stats_reconcile_seconds: float = 900.0
+    # Re-pull each wedding from Supabase before recounting (otherwise recount the local mirror)
+    reconcile_from_supabase: bool = False
+    # Service-role key for backend writes to Supabase (RLS blocks the anon key); None keeps writes local
+    supabase_write_key: Optional[str] = None
+    # Outbound PostgREST limits per endpoint (requests/second, burst) and in flight (see outbound.py)
+    supabase_rate: float = 20.0
+    supabase_burst: int = 40
+    supabase_max_concurrency: int = 8
+    # Background job workers in this process; 0 only queues jobs for other processes to run
+    job_workers: int = 2
+    # Part of every ETag; set per deploy so cached responses from an older build are not revalidated
+    build_id: str = ""
+    # How workers learn of each other's writes: "auto" (change stream, else polling), "watch", "poll" or "off"
+    cache_coherence: str = "auto"
+    # Days raw status check pings are kept; their hourly/daily rollups outlive them
+    status_ttl_days: float = 30.0
+    # Where this process delivers outbox notifications: "stdout", a JSON-lines file path, or "off" (queue only)
+    notification_sink: str = "off"
+    # Longest a floor-plan edit waits in memory before it is written (idle weddings flush sooner)
+    floor_plan_flush_seconds: float = 2.0
+    # Journal of accepted but unflushed floor-plan edits, replayed on startup; "" keeps them in memory only
+    floor_plan_journal: str = ""
+    # Shared secret Supabase database webhooks send in X-Webhook-Secret; "" rejects every call
+    supabase_webhook_secret: str = ""
+    # Project JWT secret verifying the caller's session before service-role writes; "" rejects those calls
+    supabase_jwt_secret: str = ""
+    # Request profiling (see profiling.py): off while the secret is ""
+    profile_secret: str = ""
+    profile_buffer_size: int = 20
+    profile_interval_ms: float = 1.0
+    # Validate documents read back from Mongo instead of trusting what this backend wrote
+    validate_db_reads: bool = False
+    # Mongo commands slower than this are logged and counted
+    mongo_slow_query_ms: float = 100.0
+    # Where snapshot.py keeps its Arrow files
+    snapshot_dir: str = str(ROOT_DIR / 'snapshots')
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv(ROOT_DIR / '.env')
+        return cls(
+            mongo_url=os.environ['MONGO_URL'],
+            db_name=os.environ['DB_NAME'],
+            cors_origins=tuple(os.environ.get('CORS_ORIGINS', '*').split(',')),
+            stats_reconcile_seconds=float(os.environ.get('STATS_RECONCILE_SECONDS', '900')),
+            reconcile_from_supabase=_flag(os.environ.get('RECONCILE_FROM_SUPABASE', '')),
+            supabase_write_key=os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or None,
+            supabase_rate=float(os.environ.get('SUPABASE_RATE', '20')),
+            supabase_burst=int(os.environ.get('SUPABASE_BURST', '40')),
+            supabase_max_concurrency=int(os.environ.get('SUPABASE_MAX_CONCURRENCY', '8')),
+            job_workers=int(os.environ.get('JOB_WORKERS', '2')),
+            build_id=os.environ.get('APP_BUILD_ID', ''),
+            cache_coherence=os.environ.get('CACHE_COHERENCE', 'auto'),
+            status_ttl_days=float(os.environ.get('STATUS_TTL_DAYS', '30')),
+            notification_sink=os.environ.get('NOTIFICATION_SINK', 'off'),
+            floor_plan_flush_seconds=float(os.environ.get('FLOOR_PLAN_FLUSH_SECONDS', '2')),
+            floor_plan_journal=os.environ.get('FLOOR_PLAN_JOURNAL', str(ROOT_DIR / 'floor_plan.journal')),
+            supabase_webhook_secret=os.environ.get('SUPABASE_WEBHOOK_SECRET', ''),
+            supabase_jwt_secret=os.environ.get('SUPABASE_JWT_SECRET', ''),
+            profile_secret=os.environ.get('PROFILE_SECRET', ''),
+            profile_buffer_size=int(os.environ.get('PROFILE_BUFFER_SIZE', '20')),
+            profile_interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', '1')),
+            validate_db_reads=_flag(os.environ.get('VALIDATE_DB_READS', '')),
+            mongo_slow_query_ms=float(os.environ.get('MONGO_SLOW_QUERY_MS', '100')),
+            snapshot_dir=os.environ.get('SNAPSHOT_DIR', str(ROOT_DIR / 'snapshots')),
+        )
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Columnar snapshots of the wedding tables.
+
+Pages every Supabase table once through PostgREST and writes it to an
+uncompressed Arrow IPC file, which later analysis memory-maps instead of
+re-downloading. Tables with ``created_at`` refresh incrementally: rows at or
+after the stored watermark are fetched and merged by ``id`` (``gte``, so rows
+sharing the watermark's timestamp are not lost). Deleted rows are dropped
+by diffing against the table's current ``id`` set. The tables carry no
+``updated_at``, so rows edited in place keep their old snapshot values until
+the next full refresh. That happens on ``--full``, or automatically once the
+last one is older than ``FULL_REFRESH_AFTER``.
+
+    python backend/snapshot.py refresh [--full] [--table invitati]
+    python backend/snapshot.py inspect
+    python backend/snapshot.py export-parquet out/
+"""
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from outbound import configure_shared
+from settings import Settings
+from supabase_rest import DEFAULT_PAGE_SIZE, PostgrestClient
+
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent / "snapshots"
+MANIFEST = "manifest.json"
+# Longest an incremental snapshot goes without a full re-download (the only way in-place edits arrive)
+FULL_REFRESH_AFTER = timedelta(days=1)
+
+_TS = pa.timestamp("us", tz="UTC")
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    schema: pa.Schema
+    key: Optional[str] = "id"
+    order: Tuple[str, ...] = ()
+    incremental: bool = True
+
+
+TABLES: Dict[str, TableSpec] = {spec.name: spec for spec in (
+    TableSpec("invitati", pa.schema([
+        ("id", pa.int64()), ("unita_invito_id", pa.int64()), ("user_id", pa.string()),
+        ("nome_visualizzato", pa.string()), ("nome", pa.string()), ("cognome", pa.string()),
+        ("gruppo", pa.string()), ("fascia_eta", pa.string()), ("confermato", pa.bool_()),
+        ("is_principale", pa.bool_()), ("note", pa.string()), ("created_at", _TS),
+    ])),
+    TableSpec("unita_invito", pa.schema([
+        ("id", pa.int64()), ("user_id", pa.string()), ("created_at", _TS),
+    ])),
+    TableSpec("tavoli", pa.schema([
+        ("id", pa.int64()), ("user_id", pa.string()), ("nome_tavolo", pa.string()),
+        ("capacita_max", pa.int64()), ("lato", pa.string()), ("created_at", _TS),
+    ])),
+    TableSpec("piani_salvati", pa.schema([
+        ("id", pa.int64()), ("invitato_id", pa.int64()), ("tavolo_id", pa.int64()), ("created_at", _TS),
+    ])),
+    TableSpec("relazioni", pa.schema([
+        ("invitato_a_id", pa.int64()), ("invitato_b_id", pa.int64()),
+        ("punteggio", pa.float64()), ("tipo_relazione", pa.string()),
+    ]), key=None, order=("invitato_a_id", "invitato_b_id"), incremental=False),
+    TableSpec("profiles", pa.schema([
+        ("id", pa.string()), ("user_id", pa.string()), ("email", pa.string()), ("full_name", pa.string()),
+        ("is_wedding_organizer", pa.bool_()), ("created_at", _TS), ("updated_at", _TS),
+    ])),
+)}
+
+
+def _parse_timestamp(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def rows_to_table(spec: TableSpec, rows: Iterable[dict]) -> pa.Table:
+    """Build a table with the spec's fixed schema; unknown columns are dropped."""
+    columns: Dict[str, list] = {field.name: [] for field in spec.schema}
+    timestamps = {field.name for field in spec.schema if pa.types.is_timestamp(field.type)}
+    for row in rows:
+        for name, values in columns.items():
+            value = row.get(name)
+            values.append(_parse_timestamp(value) if name in timestamps else value)
+    return pa.Table.from_pydict(columns, schema=spec.schema)
+
+
+class SnapshotStore:
+    def __init__(self, directory: Path = DEFAULT_SNAPSHOT_DIR):
+        self.directory = Path(directory)
+
+    def path(self, table: str) -> Path:
+        return self.directory / f"{table}.arrow"
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.directory / MANIFEST
+
+    def manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {}
+        return json.loads(self.manifest_path.read_text())
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        os.replace(tmp, self.manifest_path)
+
+    def exists(self, table: str) -> bool:
+        return self.path(table).exists()
+
+    def open(self, table: str) -> pa.Table:
+        """Memory-map a snapshot; column buffers are read lazily from the page cache."""
+        source = pa.memory_map(str(self.path(table)), "r")
+        return ipc.open_file(source).read_all()
+
+    def to_pandas(self, table: str, columns: Optional[List[str]] = None):
+        data = self.open(table)
+        return (data.select(columns) if columns else data).to_pandas()
+
+    def write(self, table: str, data: pa.Table) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.path(table).with_suffix(".arrow.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, data.schema) as writer:
+            writer.write_table(data)
+        os.replace(tmp, self.path(table))
+
+    def refresh(self, client: PostgrestClient, tables: Optional[Iterable[str]] = None, full: bool = False,
+                page_size: int = DEFAULT_PAGE_SIZE,
+                full_after: Optional[timedelta] = FULL_REFRESH_AFTER) -> Dict[str, dict]:
+        """Bring the snapshots up to date; returns per-table ``{"fetched", "deleted", "rows", "mode"}``."""
+        manifest = self.manifest()
+        now = datetime.now(timezone.utc)
+        report = {}
+        for name in tables or TABLES:
+            spec = TABLES[name]
+            entry = manifest.get(name, {})
+            watermark = entry.get("watermark")
+            last_full = entry.get("full_refreshed_at")
+            full_due = full_after is not None and (
+                not last_full or now - datetime.fromisoformat(last_full) >= full_after)
+            incremental = bool(spec.incremental and not full and not full_due and watermark and self.exists(name))
+            params = {"created_at": f"gte.{watermark}"} if incremental else {}
+
+            fetched = [row for page in client.paginate(name, params, key=spec.key, order=spec.order,
+                                                       page_size=page_size) for row in page]
+            new = rows_to_table(spec, fetched)
+            deleted = 0
+            if incremental:
+                current = self.open(name)
+                live = pa.array([row[spec.key] for page in client.paginate(name, {"select": spec.key}, key=spec.key,
+                                                                           page_size=page_size) for row in page],
+                                type=current.schema.field(spec.key).type)
+                keep = pc.is_in(current[spec.key], value_set=live)
+                deleted = current.num_rows - pc.sum(keep).as_py() if current.num_rows else 0
+                # Refetched rows replace their snapshot copies, so the gte overlap is not duplicated
+                keep = pc.and_(keep, pc.invert(pc.is_in(current[spec.key], value_set=new[spec.key])))
+                data = pa.concat_tables([current.filter(keep), new]).combine_chunks()
+            else:
+                data = new
+                last_full = now.isoformat()
+
+            if not incremental or new.num_rows or deleted:
+                self.write(name, data)
+
+            if "created_at" in data.column_names and data.num_rows:
+                latest = pc.max(data["created_at"]).as_py()
+                watermark = latest.isoformat() if latest else watermark
+            manifest[name] = {
+                "rows": data.num_rows,
+                "watermark": watermark,
+                "refreshed_at": now.isoformat(),
+                "full_refreshed_at": last_full,
+            }
+            report[name] = {"fetched": len(fetched), "deleted": deleted, "rows": data.num_rows,
+                            "mode": "incremental" if incremental else "full"}
+        self._write_manifest(manifest)
+        return report
+
+    def export_parquet(self, out_dir: Path) -> List[Path]:
+        import pyarrow.parquet as pq
+
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name in TABLES:
+            if self.exists(name):
+                target = out_dir / f"{name}.parquet"
+                pq.write_table(self.open(name), target, compression="zstd")
+                written.append(target)
+        return written
+
+
+def guest_stats(store: SnapshotStore) -> dict:
+    """The counts database_inspection.py prints, computed on the columnar snapshot."""
+    guests = store.open("invitati")
+    confermato = guests["confermato"]
+    confirmed = pc.sum(pc.equal(confermato, True)).as_py() or 0
+    unconfirmed = pc.sum(pc.equal(confermato, False)).as_py() or 0
+    by_group = {
+        item["values"] or "<null>": item["counts"]
+        for item in pc.value_counts(guests["gruppo"]).to_pylist()
+    }
+    by_user = {
+        item["values"]: item["counts"]
+        for item in pc.value_counts(guests["user_id"]).to_pylist()
+    }
+    stats = {
+        "total": guests.num_rows,
+        "confirmed": confirmed,
+        "unconfirmed": unconfirmed,
+        "unknown": confermato.null_count,
+        "by_group": by_group,
+        "by_user": by_user,
+    }
+    for name in ("unita_invito", "tavoli", "profiles", "relazioni", "piani_salvati"):
+        if store.exists(name):
+            stats[f"{name}_rows"] = store.open(name).num_rows
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, help="snapshot directory (default: SNAPSHOT_DIR)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="download new rows (or everything with --full)")
+    refresh.add_argument("--full", action="store_true")
+    refresh.add_argument("--table", action="append", choices=sorted(TABLES))
+    refresh.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    sub.add_parser("inspect", help="print guest statistics from the snapshot")
+    export = sub.add_parser("export-parquet", help="write zstd Parquet copies for other tools")
+    export.add_argument("out_dir", type=Path)
+    args = parser.parse_args(argv)
+
+    settings = Settings.from_env()
+    configure_shared(settings.supabase_rate, settings.supabase_burst, settings.supabase_max_concurrency)
+    store = SnapshotStore(args.dir or settings.snapshot_dir)
+    if args.command == "refresh":
+        report = store.refresh(PostgrestClient(), args.table, full=args.full, page_size=args.page_size)
+        for name, item in report.items():
+            print(f"{name:<15} {item['mode']:<12} fetched {item['fetched']:>7}  deleted {item['deleted']:>7}"
+                  f"  rows {item['rows']:>7}")
+    elif args.command == "inspect":
+        print(json.dumps(guest_stats(store), indent=2))
+    else:
+        for path in store.export_parquet(args.out_dir):
+            print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
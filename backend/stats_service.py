@@ -0,0 +1,210 @@
+"""Materialized guest and table statistics per wedding (``user_id``).
+
+The counters behind ``GuestStats`` and ``TableStats`` live in one
+``wedding_stats`` document per wedding and are moved with a single ``$inc``
+for every mirrored row change, so ``GET /api/stats`` is one indexed
+``find_one``. A periodic reconciliation recomputes each wedding from the
+mirror (optionally pulled fresh from Supabase first) and overwrites any drift.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Query, Request
+
+from guest_rows import GUEST_CATEGORIES, TABLE_SIDES, guest_category, guest_status, table_side
+from wedding_mirror import RowChange, WeddingMirror
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "wedding_stats"
+GUEST_STATUSES = ("confirmed", "pending", "deleted")
+
+
+def row_counters(table: str, row: Optional[Dict[str, Any]]) -> Counter:
+    """Counter contributions of one row; a change moves counters by new minus old."""
+    counters: Counter = Counter()
+    if not row:
+        return counters
+    if table == "invitati":
+        status = guest_status(row)
+        counters[f"guests.{status}"] += 1
+        if status != "deleted":
+            counters[f"guests.byCategory.{guest_category(row)}"] += 1
+    elif table == "tavoli":
+        counters["tables.total"] += 1
+        counters["tables.totalCapacity"] += row.get("capacita_max") or 0
+        counters[f"tables.bySide.{table_side(row)}"] += 1
+    elif table == "piani_salvati":
+        counters["tables.occupiedSeats"] += 1
+    return counters
+
+
+def _nest(counters: Counter) -> Dict[str, Any]:
+    nested: Dict[str, Any] = {}
+    for path, value in counters.items():
+        target = nested
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return nested
+
+
+def format_stats(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape a counters document like the frontend's ``GuestStats``/``TableStats``."""
+    doc = doc or {}
+    guests = doc.get("guests", {})
+    tables = doc.get("tables", {})
+    by_category = guests.get("byCategory", {})
+    by_side = tables.get("bySide", {})
+    confirmed, pending = guests.get("confirmed", 0), guests.get("pending", 0)
+    total_capacity, occupied = tables.get("totalCapacity", 0), tables.get("occupiedSeats", 0)
+    return {
+        "guests": {
+            "total": guests.get("total", 0),
+            "confirmed": confirmed,
+            "pending": pending,
+            "deleted": guests.get("deleted", 0),
+            "byCategory": {category: by_category.get(category, 0) for category in GUEST_CATEGORIES},
+            "totalWithCompanions": confirmed + pending,
+        },
+        "tables": {
+            "total": tables.get("total", 0),
+            "totalCapacity": total_capacity,
+            "occupiedSeats": occupied,
+            "availableSeats": total_capacity - occupied,
+            "bySide": {side: by_side.get(side, 0) for side in TABLE_SIDES},
+        },
+        "updatedAt": doc.get("updated_at"),
+    }
+
+
+class StatsService:
+    def __init__(self, mirror: WeddingMirror):
+        self.mirror = mirror
+        self._indexes_ready = False
+
+    @property
+    def collection(self):
+        return self.mirror.db[STATS_COLLECTION]
+
+    async def _ensure_indexes(self) -> None:
+        if not self._indexes_ready:
+            await self.collection.create_index([("user_id", 1)], unique=True)
+            self._indexes_ready = True
+
+    async def _unit_delta(self, change: RowChange, user_id: str) -> int:
+        """Change in the number of invitation units that still have at least one guest."""
+        old_unit = (change.old_record or {}).get("unita_invito_id")
+        new_unit = (change.record or {}).get("unita_invito_id")
+        if old_unit == new_unit and (change.old_record or {}).get("user_id") == (change.record or {}).get("user_id"):
+            return 0
+        delta = 0
+        for unit, row, sign in ((new_unit, change.record, 1), (old_unit, change.old_record, -1)):
+            if unit is None or not row or row.get("user_id") != user_id:
+                continue
+            remaining = await self.mirror.db.invitati.count_documents({"unita_invito_id": unit})
+            # Unit appeared (0 -> 1 guests) or disappeared (1 -> 0)
+            if (sign > 0 and remaining == 1) or (sign < 0 and remaining == 0):
+                delta += sign
+        return delta
+
+    async def on_change(self, change: RowChange) -> None:
+        if change.table not in ("invitati", "tavoli", "piani_salvati"):
+            return
+        await self._ensure_indexes()
+        for user_id in change.user_ids:
+            new = row_counters(change.table, change.record if (change.record or {}).get("user_id") == user_id else None)
+            old = row_counters(change.table, change.old_record if (change.old_record or {}).get("user_id") == user_id else None)
+            delta = {path: new[path] - old[path] for path in set(new) | set(old) if new[path] != old[path]}
+            if change.table == "invitati":
+                units = await self._unit_delta(change, user_id)
+                if units:
+                    delta["guests.total"] = units
+            if delta:
+                await self.collection.update_one(
+                    {"user_id": user_id},
+                    {"$inc": delta, "$set": {"updated_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        await self._ensure_indexes()
+        return format_stats(await self.collection.find_one({"user_id": user_id}, {"_id": 0}))
+
+    async def recompute(self, user_id: str) -> Counter:
+        counters: Counter = Counter()
+        guests = await self.mirror.rows("invitati", user_id)
+        for table, rows in (("invitati", guests),
+                            ("tavoli", await self.mirror.rows("tavoli", user_id)),
+                            ("piani_salvati", await self.mirror.rows("piani_salvati", user_id))):
+            for row in rows:
+                counters.update(row_counters(table, row))
+        counters["guests.total"] = len({g.get("unita_invito_id") for g in guests})
+        return counters
+
+    async def reconcile(self, user_id: str) -> Dict[str, int]:
+        """Overwrite one wedding's counters with a full recount; returns the drift found."""
+        await self._ensure_indexes()
+        expected = await self.recompute(user_id)
+        current = await self.collection.find_one({"user_id": user_id}, {"_id": 0}) or {}
+        stored = Counter()
+        for section in ("guests", "tables"):
+            for key, value in current.get(section, {}).items():
+                if isinstance(value, dict):
+                    stored.update({f"{section}.{key}.{k}": v for k, v in value.items()})
+                else:
+                    stored[f"{section}.{key}"] = value
+        drift = {path: expected[path] - stored[path] for path in set(expected) | set(stored)
+                 if expected[path] != stored[path]}
+        if drift or not current:
+            document = _nest(+expected)
+            await self.collection.replace_one(
+                {"user_id": user_id},
+                {"user_id": user_id, "guests": document.get("guests", {}), "tables": document.get("tables", {}),
+                 "updated_at": datetime.now(timezone.utc), "reconciled_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        if drift:
+            await self.mirror.bump_versions([user_id])
+            logger.warning("Stats drift corrected for %s: %s", user_id, drift)
+        return drift
+
+    async def reconcile_all(self, client=None) -> Dict[str, Dict[str, int]]:
+        """Reconcile every known wedding, pulling each one from Supabase first when ``client`` is given."""
+        drifts = {}
+        for user_id in await self.mirror.user_ids():
+            if client is not None:
+                await self.mirror.pull_wedding(client, user_id)
+            drift = await self.reconcile(user_id)
+            if drift:
+                drifts[user_id] = drift
+        return drifts
+
+    async def run_reconciliation(self, interval: float, client=None) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile_all(client)
+            except Exception:
+                logger.exception("Stats reconciliation failed")
+
+
+stats_router = APIRouter()
+
+
+@stats_router.get("/stats")
+async def get_stats(request: Request, user_id: str = Query(..., min_length=1)):
+    return await request.app.state.stats.get(user_id)
+
+
+@stats_router.post("/stats/reconcile")
+async def reconcile_stats(request: Request, user_id: Optional[str] = None):
+    service: StatsService = request.app.state.stats
+    if user_id:
+        return {user_id: await service.reconcile(user_id)}
+    return await service.reconcile_all()
@@ -0,0 +1,259 @@
+"""Status check pings as a time series, with hourly and daily rollups.
+
+``status_checks`` is a MongoDB time-series collection. ``client_name`` is
+its meta field, so pings from one client are stored together, bucketed by
+time. Raw points expire after ``Settings.status_ttl_days``. Every insert also
+``$inc``s the client's hourly and daily documents in ``status_rollups``.
+``GET /api/status/summary`` reads only those: a month of hourly data for a
+handful of clients is a few thousand small documents, however many pings
+there were. Hourly rollups expire after ``HOURLY_ROLLUP_TTL_DAYS``; daily
+ones are kept.
+
+A plain ``status_checks`` collection from older deploys is converted on
+first use. It is renamed to ``status_checks_legacy``, its documents are
+copied into the time-series collection and rolled up, and it is dropped.
+One worker at a time does this, under a lease in ``migrations``. Every step
+can be repeated: copies skip ``_id``s already present and legacy counts are
+``$set`` (as ``legacy_count``) rather than added, so a worker that finds
+``status_checks_legacy`` on startup simply finishes the job.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Query, Request
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "status_checks"
+LEGACY_COLLECTION = "status_checks_legacy"
+ROLLUPS_COLLECTION = "status_rollups"
+MIGRATIONS_COLLECTION = "migrations"
+HOUR, DAY = "hour", "day"
+HOURLY_ROLLUP_TTL_DAYS = 90
+DEFAULT_WINDOWS = {HOUR: timedelta(hours=48), DAY: timedelta(days=30)}
+MIGRATION_BATCH = 1000
+MIGRATION_LEASE = timedelta(minutes=5)
+NAMESPACE_NOT_FOUND = 26
+INDEX_NOT_FOUND = 27
+# Served the upserts but not the summary's sort; replaced by granularity_1_client_name_1_start_1
+RETIRED_ROLLUP_INDEX = "client_name_1_granularity_1_start_1"
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    # Mongo hands back naive UTC datetimes; keep every comparison in that form
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    moment = _naive_utc(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == DAY else moment
+
+
+def _rollup_updates(counts: Dict[Tuple[str, datetime], Tuple[int, datetime, datetime]]) -> List[Any]:
+    from pymongo import UpdateOne
+
+    updates = []
+    for (client_name, moment), (count, first, last) in counts.items():
+        for granularity in (HOUR, DAY):
+            updates.append(UpdateOne(
+                {"client_name": client_name, "granularity": granularity, "start": bucket_start(moment, granularity)},
+                {"$inc": {"count": count}, "$min": {"first": first}, "$max": {"last": last}}, upsert=True))
+    return updates
+
+
+class _LeaseLost(Exception):
+    pass
+
+
+def _legacy_rollup_updates(counts: Dict[Tuple[str, datetime], Tuple[int, datetime, datetime]]) -> List[Any]:
+    from pymongo import UpdateOne
+
+    # Whole-history totals, so they are $set: running the conversion again leaves them unchanged
+    totals: Dict[Tuple[str, str, datetime], Tuple[int, datetime, datetime]] = {}
+    for (client_name, moment), (count, first, last) in counts.items():
+        for granularity in (HOUR, DAY):
+            key = (client_name, granularity, bucket_start(moment, granularity))
+            total, low, high = totals.get(key, (0, first, last))
+            totals[key] = (total + count, min(low, first), max(high, last))
+    return [UpdateOne({"client_name": client_name, "granularity": granularity, "start": start},
+                      {"$set": {"legacy_count": total}, "$min": {"first": first}, "$max": {"last": last}},
+                      upsert=True)
+            for (client_name, granularity, start), (total, first, last) in totals.items()]
+
+
+class StatusSeries:
+    def __init__(self, database, ttl_days: float = 30.0):
+        self.database = database
+        self.ttl_seconds = int(ttl_days * 86400)
+        self._ready = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def db(self):
+        return self.database.db
+
+    async def _collection_info(self, name: str) -> Optional[Dict[str, Any]]:
+        cursor = await self.db.list_collections(filter={"name": name})
+        found = await cursor.to_list(1)
+        return found[0] if found else None
+
+    async def ensure_ready(self) -> None:
+        """Create (or convert to) the time-series collection and the rollup indexes, once per process."""
+        if self._ready:
+            return
+        from pymongo.errors import CollectionInvalid, OperationFailure
+
+        async with self._lock:
+            if self._ready:
+                return
+            info = await self._collection_info(COLLECTION)
+            if info is not None and info.get("type") != "timeseries":
+                try:
+                    await self.db[COLLECTION].rename(LEGACY_COLLECTION)
+                except OperationFailure as exc:
+                    # Another worker renamed it first and is (or was) migrating it
+                    if exc.code != NAMESPACE_NOT_FOUND:
+                        raise
+                info = await self._collection_info(COLLECTION)
+            if info is None:
+                try:
+                    await self.db.create_collection(
+                        COLLECTION, timeseries={"timeField": "timestamp", "metaField": "client_name",
+                                                "granularity": "minutes"},
+                        expireAfterSeconds=self.ttl_seconds)
+                except CollectionInvalid:
+                    pass  # created by another worker in the meantime
+            elif info.get("options", {}).get("expireAfterSeconds") != self.ttl_seconds:
+                await self.db.command("collMod", COLLECTION, expireAfterSeconds=self.ttl_seconds)
+            rollups = self.db[ROLLUPS_COLLECTION]
+            # Granularity first: a summary then reads its (client_name, start) order straight off the index
+            await rollups.create_index([("granularity", 1), ("client_name", 1), ("start", 1)],
+                                       unique=True)
+            if RETIRED_ROLLUP_INDEX in await rollups.index_information():
+                try:
+                    await rollups.drop_index(RETIRED_ROLLUP_INDEX)
+                except OperationFailure as exc:
+                    if exc.code != INDEX_NOT_FOUND:  # dropped by another worker in the meantime
+                        raise
+            await rollups.create_index([("start", 1)], name="hourly_ttl",
+                                       expireAfterSeconds=HOURLY_ROLLUP_TTL_DAYS * 86400,
+                                       partialFilterExpression={"granularity": HOUR})
+            # Also picks up a conversion an earlier process started but did not finish
+            if await self._collection_info(LEGACY_COLLECTION) is not None:
+                await self._migrate_legacy()
+            self._ready = True
+
+    async def _lease(self, owner: str) -> bool:
+        """Take or extend the migration lease; False while another live worker holds it."""
+        from pymongo.errors import DuplicateKeyError
+
+        locks = self.db[MIGRATIONS_COLLECTION]
+        now = datetime.now(timezone.utc)
+        try:
+            await locks.update_one({"_id": LEGACY_COLLECTION},
+                                   {"$setOnInsert": {"owner": None, "expires_at": now}}, upsert=True)
+        except DuplicateKeyError:
+            pass  # concurrent upsert of the same lock document
+        held = await locks.find_one_and_update(
+            {"_id": LEGACY_COLLECTION, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + MIGRATION_LEASE}})
+        return held is not None
+
+    async def _copy(self, batch: List[Dict[str, Any]], owner: str) -> int:
+        if not await self._lease(owner):
+            raise _LeaseLost()
+        if not batch:
+            return 0
+        # Skip points a previous, interrupted run already copied; the time range keeps the lookup to a few buckets
+        moments = [doc["timestamp"] for doc in batch]
+        present = await self.db[COLLECTION].find(
+            {"timestamp": {"$gte": min(moments), "$lte": max(moments)},
+             "_id": {"$in": [doc["_id"] for doc in batch]}}, {"_id": 1}).to_list(None)
+        seen = {doc["_id"] for doc in present}
+        missing = [doc for doc in batch if doc["_id"] not in seen]
+        if missing:
+            await self.db[COLLECTION].insert_many(missing, ordered=False)
+        return len(missing)
+
+    async def _migrate_legacy(self) -> None:
+        owner = uuid.uuid4().hex
+        if not await self._lease(owner):
+            logger.info("Another worker is converting %s; serving without its history meanwhile", LEGACY_COLLECTION)
+            return
+        legacy = self.db[LEGACY_COLLECTION]
+        copied, batch = 0, []
+        counts: Dict[Tuple[str, datetime], Tuple[int, datetime, datetime]] = {}
+        try:
+            async for doc in legacy.find({}).sort("_id", 1):
+                moment = doc.get("timestamp")
+                if not isinstance(moment, datetime):
+                    continue
+                key = (doc["client_name"], bucket_start(moment, HOUR))
+                count, first, last = counts.get(key, (0, moment, moment))
+                counts[key] = (count + 1, min(first, moment), max(last, moment))
+                batch.append(doc)
+                if len(batch) == MIGRATION_BATCH:
+                    copied, batch = copied + await self._copy(batch, owner), []
+            # Also renews the lease once more before the rollups and the drop
+            copied += await self._copy(batch, owner)
+        except _LeaseLost:
+            logger.warning("Lost the %s migration lease; leaving the rest to its holder", LEGACY_COLLECTION)
+            return
+        if counts:
+            await self.db[ROLLUPS_COLLECTION].bulk_write(_legacy_rollup_updates(counts), ordered=False)
+        await self.db.drop_collection(LEGACY_COLLECTION)
+        await self.db[MIGRATIONS_COLLECTION].delete_one({"_id": LEGACY_COLLECTION, "owner": owner})
+        logger.info("Converted %s to a time-series collection (%d points)", COLLECTION, copied)
+
+    async def record(self, check: Dict[str, Any]) -> None:
+        """Store one ping (``client_name``, ``timestamp``, ...) and count it in its rollups."""
+        await self.ensure_ready()
+        await self.db[COLLECTION].insert_one(dict(check))
+        moment = check["timestamp"]
+        await self.db[ROLLUPS_COLLECTION].bulk_write(
+            _rollup_updates({(check["client_name"], moment): (1, moment, moment)}), ordered=False)
+
+    async def summary(self, granularity: str = HOUR, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None, client_name: Optional[str] = None) -> Dict[str, Any]:
+        await self.ensure_ready()
+        until = _naive_utc(until or datetime.now(timezone.utc))
+        since = _naive_utc(since) if since else until - DEFAULT_WINDOWS[granularity]
+        query: Dict[str, Any] = {"granularity": granularity,
+                                 "start": {"$gte": bucket_start(since, granularity), "$lte": until}}
+        if client_name:
+            query["client_name"] = client_name
+        rows = await self.db[ROLLUPS_COLLECTION].find(query, {"_id": 0}).sort(
+            [("client_name", 1), ("start", 1)]).to_list(None)
+
+        clients: Dict[str, Dict[str, Any]] = {}
+        totals: Counter = Counter()
+        for row in rows:
+            entry = clients.setdefault(row["client_name"], {
+                "client_name": row["client_name"], "total": 0, "first_seen": row["first"], "last_seen": row["last"],
+                "buckets": []})
+            count = row.get("count", 0) + row.get("legacy_count", 0)
+            entry["buckets"].append({"start": row["start"], "count": count})
+            entry["first_seen"] = min(entry["first_seen"], row["first"])
+            entry["last_seen"] = max(entry["last_seen"], row["last"])
+            totals[row["client_name"]] += count
+        for name, entry in clients.items():
+            entry["total"] = totals[name]
+        return {"granularity": granularity, "since": bucket_start(since, granularity), "until": until,
+                "clients": list(clients.values())}
+
+
+status_router = APIRouter(prefix="/status")
+
+
+@status_router.get("/summary")
+async def get_status_summary(request: Request, granularity: str = Query(HOUR, pattern="^(hour|day)$"),
+                             since: Optional[datetime] = None, until: Optional[datetime] = None,
+                             client_name: Optional[str] = None):
+    return await request.app.state.status.summary(granularity, since, until, client_name)
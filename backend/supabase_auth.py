@@ -0,0 +1,46 @@
+"""Who is calling: the Supabase session behind a write made with the service-role key.
+
+The service-role key bypasses row-level security, so an endpoint that writes
+with it on behalf of a wedding first checks the caller's own Supabase access
+token (``Authorization: Bearer <jwt>``, as supabase-js holds it). The token
+must be signed with the project's JWT secret (``SUPABASE_JWT_SECRET``, HS256),
+unexpired, issued to the ``authenticated`` role, and its ``sub`` must be the
+wedding's ``user_id``. With the secret unset every such call is rejected.
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+AUDIENCE = "authenticated"
+
+
+class AuthError(Exception):
+    pass
+
+
+def verified_user(secret: str, authorization: Optional[str]) -> str:
+    """The ``sub`` of the bearer token in ``authorization``; raises ``AuthError`` unless it verifies."""
+    import jwt
+
+    if not secret:
+        raise AuthError("SUPABASE_JWT_SECRET is not set")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise AuthError("missing bearer token")
+    try:
+        claims = jwt.decode(token.strip(), secret, algorithms=["HS256"], audience=AUDIENCE,
+                            options={"require": ["exp", "sub"]})
+    except jwt.InvalidTokenError as exc:
+        raise AuthError(str(exc)) from exc
+    return claims["sub"]
+
+
+def require_wedding_owner(request: Request, user_id: str) -> None:
+    """401 unless the request carries a valid Supabase session, 403 unless it is ``user_id``'s."""
+    try:
+        caller = verified_user(request.app.state.settings.supabase_jwt_secret, request.headers.get("authorization"))
+    except AuthError as exc:
+        raise HTTPException(status_code=401, detail=str(exc), headers={"WWW-Authenticate": "Bearer"})
+    if caller != user_id:
+        raise HTTPException(status_code=403, detail="not this wedding's owner")
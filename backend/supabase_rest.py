@@ -0,0 +1,168 @@
+"""Minimal PostgREST client for the wedding tables held in Supabase.
+
+Wraps the raw ``requests`` calls the maintenance scripts make against
+``/rest/v1`` and adds keyset pagination so whole tables can be read in
+bounded pages instead of one unbounded ``select=*``. Every request goes
+through an ``outbound.OutboundScheduler`` (rate limits, priority lanes,
+retries on 429, and on 503 for idempotent calls).
+"""
+
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import requests
+
+from outbound import OutboundScheduler, shared_scheduler
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+class PostgrestError(Exception):
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"PostgREST returned {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.body = body
+
+
+class PostgrestClient:
+    def __init__(self, url: Optional[str] = None, key: Optional[str] = None,
+                 session: Optional[requests.Session] = None, timeout: float = 30.0,
+                 scheduler: Optional[OutboundScheduler] = None, priority: Optional[int] = None):
+        url = url or os.environ.get("SUPABASE_URL")
+        key = key or os.environ.get("SUPABASE_KEY")
+        # No built-in project: a missing variable must not point a script at someone else's data
+        if not url or not key:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set (or url/key passed explicitly)")
+        self.url = url.rstrip("/")
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.scheduler = scheduler or shared_scheduler()
+        # outbound.INTERACTIVE or BATCH; None follows the caller's ``outbound.lane``
+        self.priority = priority
+        self.headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+        }
+
+    def _endpoint(self, table: str) -> str:
+        return f"{self.url}/rest/v1/{table}"
+
+    def _request(self, method: str, table: str, params: Dict[str, str], headers: Dict[str, str],
+                 json: Any = None) -> requests.Response:
+        url = self._endpoint(table)
+
+        def call() -> requests.Response:
+            return self.session.request(method, url, params=params, json=json, headers=headers, timeout=self.timeout)
+
+        # Identical reads in flight at once share one response
+        coalesce = ((url, tuple(sorted(params.items())), headers.get("apikey"), headers.get("Accept"))
+                    if method == "GET" else None)
+        # A 503 may arrive after a plain insert landed; only reads and upserts are safe to resend
+        idempotent = method == "GET" or "resolution=" in headers.get("Prefer", "")
+        return self.scheduler.send(url, call, self.priority, coalesce, idempotent)
+
+    def select(self, table: str, params: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Single ``GET`` with raw PostgREST query params, e.g. ``{"confermato": "eq.true"}``."""
+        query = {"select": "*", **(params or {})}
+        response = self._request("GET", table, query, self.headers)
+        if response.status_code != 200:
+            raise PostgrestError(response.status_code, response.text)
+        return response.json()
+
+    def plan(self, table: str, params: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+        """Postgres ``EXPLAIN`` (JSON) of the ``select`` these params would run; needs ``db-plan-enabled``."""
+        headers = {**self.headers, "Accept": "application/vnd.pgrst.plan+json"}
+        response = self._request("GET", table, {"select": "*", **(params or {})}, headers)
+        if response.status_code != 200:
+            raise PostgrestError(response.status_code, response.text)
+        return response.json()
+
+    def paginate(self, table: str, params: Optional[Dict[str, str]] = None, key: str = "id",
+                 order: Optional[Sequence[str]] = None, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of rows.
+
+        With a unique ``key`` column pages are fetched by keyset (``key=gt.<last>``),
+        which stays cheap however deep the scan goes. Pass ``key=None`` for tables
+        without one (``relazioni``); they fall back to ``offset`` over ``order``.
+        """
+        params = dict(params or {})
+        if key:
+            last = None
+            while True:
+                query = {**params, "order": f"{key}.asc", "limit": str(page_size)}
+                if last is not None:
+                    query[key] = f"gt.{last}"
+                rows = self.select(table, query)
+                if rows:
+                    yield rows
+                if len(rows) < page_size:
+                    return
+                last = rows[-1][key]
+        else:
+            offset = 0
+            order_by = ",".join(f"{column}.asc" for column in (order or ()))
+            while True:
+                query = {**params, "limit": str(page_size), "offset": str(offset)}
+                if order_by:
+                    query["order"] = order_by
+                rows = self.select(table, query)
+                if rows:
+                    yield rows
+                if len(rows) < page_size:
+                    return
+                offset += page_size
+
+    def upsert(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: Sequence[str],
+               chunk_size: int = DEFAULT_PAGE_SIZE) -> int:
+        """Insert-or-merge ``rows`` in chunks of ``chunk_size``, one ``POST`` each; returns rows sent."""
+        self._upsert(table, rows, on_conflict, chunk_size, "return=minimal")
+        return len(rows)
+
+    def upsert_returning(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: Sequence[str],
+                         chunk_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Like ``upsert``, but returns the stored rows (ids included, new or kept)."""
+        return self._upsert(table, rows, on_conflict, chunk_size, "return=representation")
+
+    def _upsert(self, table: str, rows: Sequence[Dict[str, Any]], on_conflict: Sequence[str], chunk_size: int,
+                returning: str) -> List[Dict[str, Any]]:
+        headers = {**self.headers, "Prefer": f"resolution=merge-duplicates,{returning}"}
+        params = {"on_conflict": ",".join(on_conflict)}
+        stored: List[Dict[str, Any]] = []
+        for start in range(0, len(rows), chunk_size):
+            response = self._request("POST", table, params, headers, json=list(rows[start:start + chunk_size]))
+            if response.status_code not in (200, 201, 204):
+                raise PostgrestError(response.status_code, response.text)
+            if returning == "return=representation":
+                stored.extend(response.json())
+        return stored
+
+    def insert(self, table: str, rows: Sequence[Dict[str, Any]],
+               chunk_size: int = DEFAULT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Insert ``rows`` in chunks, one ``POST`` each; returns the stored rows with their generated ids."""
+        headers = {**self.headers, "Prefer": "return=representation"}
+        stored: List[Dict[str, Any]] = []
+        for start in range(0, len(rows), chunk_size):
+            response = self._request("POST", table, {}, headers, json=list(rows[start:start + chunk_size]))
+            if response.status_code not in (200, 201):
+                raise PostgrestError(response.status_code, response.text)
+            stored.extend(response.json())
+        return stored
+
+    def update(self, table: str, params: Dict[str, str], values: Dict[str, Any]) -> None:
+        """``PATCH`` ``values`` onto the rows matching raw PostgREST filters (never called without one)."""
+        if not params:
+            raise ValueError("refusing to update without a filter")
+        headers = {**self.headers, "Prefer": "return=minimal"}
+        response = self._request("PATCH", table, params, headers, json=values)
+        if response.status_code not in (200, 204):
+            raise PostgrestError(response.status_code, response.text)
+
+    def delete(self, table: str, params: Dict[str, str]) -> None:
+        """``DELETE`` the rows matching raw PostgREST filters (never called without one)."""
+        if not params:
+            raise ValueError("refusing to delete without a filter")
+        headers = {**self.headers, "Prefer": "return=minimal"}
+        response = self._request("DELETE", table, params, headers)
+        if response.status_code not in (200, 204):
+            raise PostgrestError(response.status_code, response.text)
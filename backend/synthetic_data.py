@@ -0,0 +1,135 @@
+"""Synthetic wedding data shaped exactly like the Supabase rows.
+
+Used by tests, benchmarks and the local stand-ins so they never need the live
+project. Output is deterministic for a given seed.
+"""
+
+import json
+import math
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+FIRST_NAMES = (
+    "Marco", "Giulia", "Luca", "Francesca", "Alessandro", "Chiara", "Matteo", "Sara", "Lorenzo", "Martina",
+    "Andrea", "Elena", "Davide", "Valentina", "Simone", "Federica", "Niccolò", "Beatrice", "Tommaso", "Alessia",
+    "Gabriele", "Giorgia", "Riccardo", "Anna", "Edoardo", "Sofia", "Filippo", "Aurora", "Stefano", "Ilaria",
+    "Pietro", "Noemi", "Giacomo", "Camilla", "Emanuele", "Lucrezia", "Fabio", "Gaia", "Raffaele", "Marta",
+)
+SURNAMES = (
+    "Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Romano", "Colombo", "Ricci", "Marino", "Greco",
+    "Bruno", "Gallo", "Conti", "De Luca", "Mancini", "Costa", "Giordano", "Rizzo", "Lombardi", "Moretti",
+    "Barbieri", "Fontana", "Santoro", "Mariani", "Rinaldi", "Caruso", "Ferrara", "Galli", "Martini", "Leone",
+    "Longo", "Gentile", "Martinelli", "Vitale", "Lombardo", "Serra", "Coppola", "De Santis", "D'Angelo", "Marchetti",
+    "Parisi", "Villa", "Conte", "Ferraro", "Ferri", "Fabbri", "Bianco", "Marini", "Grasso", "Valentini",
+    "Messina", "Sala", "De Angelis", "Gatti", "Pellegrini", "Palumbo", "Sanna", "Farina", "Rizzi", "Monti",
+    "Cattaneo", "Morelli", "Amato", "Silvestri", "Mazza", "Testa", "Grassi", "Pellegrino", "Carbone", "Giuliani",
+    "Benedetti", "Barone", "Rossetti", "Caputo", "Montanari", "Guerra", "Palmieri", "Bernardi", "Martino", "Fiore",
+    "Pagano", "Nicolosi", "Dalla Costa", "Ferrè", "Cantù", "Mazzù", "Lucà", "Bellò", "Zanè", "Nardò",
+)
+GROUPS = ("family-his", "family-hers", "friends", "colleagues")
+GROUP_WEIGHTS = (0.3, 0.3, 0.28, 0.12)
+ALLERGIES = ("glutine", "lattosio", "frutta a guscio", "crostacei", "uova", "vegano", "vegetariano")
+SIDES = ("sposo", "sposa", "centro")
+UNIT_SIZES = (1, 2, 3, 4, 5)
+UNIT_SIZE_WEIGHTS = (0.3, 0.4, 0.1, 0.15, 0.05)
+
+
+class IdSequence:
+    """Per-table serial ids, like Postgres ``bigserial``."""
+
+    def __init__(self):
+        self._next: Dict[str, int] = {}
+
+    def next(self, table: str) -> int:
+        value = self._next.get(table, 1)
+        self._next[table] = value + 1
+        return value
+
+
+def build_note(allergies: Optional[str] = None, deleted_at: Optional[str] = None) -> str:
+    """Same JSON the frontend's ``buildNote`` writes into ``invitati.note``."""
+    return json.dumps({"allergies": allergies, "deleted_at": deleted_at})
+
+
+def generate_wedding(rng: random.Random, ids: IdSequence, guests: int = 150, user_id: Optional[str] = None,
+                     start: Optional[datetime] = None, assign: bool = True,
+                     deleted_rate: float = 0.03, allergy_rate: float = 0.12) -> Dict[str, List[dict]]:
+    user_id = user_id or str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    start = start or datetime(2025, 9, 1, tzinfo=timezone.utc)
+    clock = start
+    rows: Dict[str, List[dict]] = {"unita_invito": [], "invitati": [], "tavoli": [], "piani_salvati": [],
+                                   "relazioni": [], "profiles": []}
+    rows["profiles"].append({
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "user_id": user_id,
+        "email": f"sposi-{user_id[:8]}@example.com", "full_name": "Sposi Test", "is_wedding_organizer": True,
+        "created_at": start.isoformat(), "updated_at": start.isoformat(),
+    })
+
+    created = 0
+    while created < guests:
+        size = min(rng.choices(UNIT_SIZES, UNIT_SIZE_WEIGHTS)[0], guests - created)
+        clock += timedelta(minutes=rng.randint(1, 240))
+        unit_id = ids.next("unita_invito")
+        rows["unita_invito"].append({"id": unit_id, "user_id": user_id, "created_at": clock.isoformat()})
+        gruppo = rng.choices(GROUPS, GROUP_WEIGHTS)[0]
+        family_name = rng.choice(SURNAMES)
+        confirmed = rng.choices((True, False, None), (0.6, 0.25, 0.15))[0]
+        for member in range(size):
+            nome = rng.choice(FIRST_NAMES)
+            cognome = family_name if member == 0 or rng.random() < 0.7 else rng.choice(SURNAMES)
+            fascia = "Adulto" if member < 2 else rng.choice(("Adulto", "Ragazzo", "Bambino"))
+            deleted_at = (clock + timedelta(days=1)).isoformat() if rng.random() < deleted_rate else None
+            allergies = rng.choice(ALLERGIES) if rng.random() < allergy_rate else None
+            rows["invitati"].append({
+                "id": ids.next("invitati"),
+                "unita_invito_id": unit_id,
+                "user_id": user_id,
+                "nome_visualizzato": f"{nome} {cognome}",
+                "nome": nome,
+                "cognome": cognome,
+                "gruppo": gruppo,
+                "fascia_eta": fascia,
+                "confermato": confirmed,
+                "is_principale": member == 0,
+                "note": build_note(allergies, deleted_at) if (allergies or deleted_at or rng.random() < 0.5) else None,
+                "created_at": clock.isoformat(),
+            })
+            created += 1
+
+    for index in range(math.ceil(guests / 9) + 2):
+        clock += timedelta(minutes=5)
+        rows["tavoli"].append({
+            "id": ids.next("tavoli"), "user_id": user_id, "nome_tavolo": f"Tavolo {index + 1}",
+            "capacita_max": rng.choice((8, 10, 12)), "lato": SIDES[index % len(SIDES)],
+            "created_at": clock.isoformat(),
+        })
+
+    if assign:
+        tables = iter(rows["tavoli"])
+        table = next(tables)
+        free = table["capacita_max"]
+        for guest in rows["invitati"]:
+            if not guest["confermato"] or rng.random() < 0.3:
+                continue
+            if free == 0:
+                table = next(tables, None)
+                if table is None:
+                    break
+                free = table["capacita_max"]
+            rows["piani_salvati"].append({"id": ids.next("piani_salvati"), "invitato_id": guest["id"],
+                                          "tavolo_id": table["id"], "created_at": clock.isoformat()})
+            free -= 1
+    return rows
+
+
+def generate_dataset(weddings: int = 1, guests_per_wedding: int = 150, seed: int = 0, **kwargs) -> Dict[str, List[dict]]:
+    """Rows for ``weddings`` independent weddings, keyed by Supabase table name."""
+    rng = random.Random(seed)
+    ids = IdSequence()
+    dataset: Dict[str, List[dict]] = {}
+    for _ in range(weddings):
+        for table, rows in generate_wedding(rng, ids, guests_per_wedding, **kwargs).items():
+            dataset.setdefault(table, []).extend(rows)
+    return dataset
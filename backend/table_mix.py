@@ -0,0 +1,397 @@
+"""Table-mix planner: which tables to rent for a wedding, and bulk creation.
+
+Treats sizing the room as bin packing over invitation units. Items are the
+``unita_invito`` groups (members stay together); bins are tables of the
+offered shapes and seat counts, each available in unlimited or a limited
+number. The objective is lexicographic: fewest tables, then fewest empty
+seats. Sides follow the seating planner: a unit with the groom's family
+(``family-his``) needs a ``sposo`` or ``centro`` table, the bride's a
+``sposa`` or ``centro`` one, and everyone else can sit anywhere.
+
+The solver is greedy with repair, which is enough at wedding sizes (1k
+guests plan in about 10 ms):
+
+1. Pack: side-bound units first, then the rest, each largest first. Every
+   unit goes best-fit into an open compatible table or opens the largest
+   table still available that seats it; with none left it is ``unplaced``.
+2. Consolidate: the emptiest tables are dissolved whenever all of their
+   units fit in the spare seats elsewhere.
+3. Right-size: each table, fullest first, becomes the smallest available
+   type that still seats its load.
+4. Repack pairs: two tables with empty seats between them pool their units
+   and split them again by subset sum, whenever two smaller tables (or
+   one) would seat the same guests.
+5. Balance ``lato``: tables with only free-seating guests are given to the
+   lighter of the two sides while that narrows the seat gap between
+   ``sposo`` and ``sposa``; the rest stay ``centro``.
+
+Group sizes come from confirmed guests, all live guests, or the attendance
+forecast (confirmed members plus the expected pending ones). The result is
+checked against a capacity lower bound, so a plan that is provably minimal
+in table count says so. ``POST /api/tables/plan/apply`` creates the planned
+``tavoli`` in Supabase (ids come from there, so it needs the service-role
+key, answers 503 without one and only serves the wedding owner's Supabase
+session), then in the mirror through
+``WeddingMirror.bulk_upsert``. New tables are named "Tavolo N" with the
+lowest numbers no table of the wedding uses yet.
+Supabase has no shape column, so shapes only appear in the plan.
+"""
+
+import asyncio
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+
+from forecast import guest_cell
+from guest_rows import guest_status
+from seating import NEUTRAL_SIDE, guest_side
+from supabase_auth import require_wedding_owner
+from wedding_mirror import INSERT, RowChange
+
+SHAPES = ("round", "rectangular", "square")
+SIDES = ("sposo", "sposa")
+# Seat limits enforced by AddTableForm
+MIN_SEATS, MAX_SEATS = 2, 20
+SOURCES = ("confirmed", "all", "forecast")
+MAX_REPACK_PASSES = 4
+
+
+@dataclass(frozen=True)
+class TableType:
+    shape: str
+    seats: int
+    # None: rent as many as needed
+    available: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.shape} {self.seats}"
+
+
+DEFAULT_TABLE_TYPES = (TableType("round", 8), TableType("round", 10), TableType("round", 12),
+                       TableType("rectangular", 16), TableType("square", 4))
+
+
+@dataclass
+class Unit:
+    key: Any
+    size: int
+    side: Optional[str] = None
+
+
+@dataclass
+class _Table:
+    capacity: int
+    side: Optional[str] = None
+    units: List[Unit] = field(default_factory=list)
+    load: int = 0
+    type: Optional[TableType] = None
+
+    @property
+    def room(self) -> int:
+        return self.capacity - self.load
+
+    def accepts(self, unit: Unit) -> bool:
+        return unit.size <= self.room and (unit.side is None or self.side in (None, unit.side))
+
+    def add(self, unit: Unit) -> None:
+        self.units.append(unit)
+        self.load += unit.size
+        self.side = self.side or unit.side
+
+
+def parse_table_types(raw: Sequence[Dict[str, Any]]) -> List[TableType]:
+    types = []
+    for entry in raw:
+        shape, seats = entry.get("shape"), entry.get("seats")
+        if shape not in SHAPES:
+            raise ValueError(f"shape must be one of {', '.join(SHAPES)}")
+        if not isinstance(seats, int) or not MIN_SEATS <= seats <= MAX_SEATS:
+            raise ValueError(f"seats must be an integer between {MIN_SEATS} and {MAX_SEATS}")
+        available = entry.get("available")
+        if available is not None and (not isinstance(available, int) or available < 0):
+            raise ValueError("available must be a non-negative integer")
+        types.append(TableType(shape, seats, available))
+    if not types:
+        raise ValueError("at least one table type is needed")
+    return types
+
+
+class _Stock:
+    """Remaining count of each table type."""
+
+    def __init__(self, types: Sequence[TableType]):
+        self.types = sorted(types, key=lambda t: -t.seats)
+        self.left = {t: (math.inf if t.available is None else t.available) for t in self.types}
+
+    def largest(self, load: int = 0) -> Optional[TableType]:
+        """The largest type still available, among those seating at least ``load``."""
+        return next((t for t in self.types if self.left[t] > 0 and t.seats >= load), None)
+
+    def smallest_fitting(self, load: int) -> Optional[TableType]:
+        return next((t for t in reversed(self.types) if t.seats >= load and self.left[t] > 0), None)
+
+    def pair(self, a: int, b: int) -> Optional[Tuple[Optional[TableType], Optional[TableType]]]:
+        """Smallest types for loads ``a`` and ``b`` taken together; an empty load needs no table."""
+        first = self.smallest_fitting(a) if a else None
+        if a and first is None:
+            return None
+        if first is not None:
+            self.left[first] -= 1
+        second = self.smallest_fitting(b) if b else None
+        if first is not None:
+            self.left[first] += 1
+        return None if b and second is None else (first, second)
+
+
+def _seats(kind: Optional[TableType]) -> int:
+    return kind.seats if kind else 0
+
+
+def _subset_with_sum(sizes: Sequence[int], target: int) -> List[int]:
+    reached: Dict[int, List[int]] = {0: []}
+    for index, size in enumerate(sizes):
+        for total, chosen in list(reached.items()):
+            if total + size <= target and total + size not in reached:
+                reached[total + size] = chosen + [index]
+    return reached[target]
+
+
+def _repack(first: "_Table", second: "_Table", stock: _Stock) -> bool:
+    """Split the units of two tables anew if that needs fewer seats; True when it did."""
+    pooled = first.units + second.units
+    total = first.load + second.load
+    sums = 1
+    for unit in pooled:
+        sums |= sums << unit.size
+    stock.left[first.type] += 1
+    stock.left[second.type] += 1
+    best, best_seats = None, first.capacity + second.capacity
+    for load in range(total // 2, total + 1):
+        if sums >> load & 1:
+            kinds = stock.pair(load, total - load)
+            if kinds and _seats(kinds[0]) + _seats(kinds[1]) < best_seats:
+                best, best_seats = (load, kinds), _seats(kinds[0]) + _seats(kinds[1])
+    if best is None:
+        stock.left[first.type] -= 1
+        stock.left[second.type] -= 1
+        return False
+    load, kinds = best
+    chosen = set(_subset_with_sum([u.size for u in pooled], load))
+    for table, kind, units in ((first, kinds[0], [u for i, u in enumerate(pooled) if i in chosen]),
+                               (second, kinds[1], [u for i, u in enumerate(pooled) if i not in chosen])):
+        table.units, table.load, table.type = units, sum(u.size for u in units), kind
+        table.capacity = _seats(kind)
+        table.side = next((u.side for u in units if u.side), None)
+        if kind is not None:
+            stock.left[kind] -= 1
+    return True
+
+
+def _best_fit(tables: List[_Table], unit: Unit, skip: Optional[_Table] = None) -> Optional[_Table]:
+    fits = [t for t in tables if t is not skip and t.accepts(unit)]
+    return min(fits, key=lambda t: (t.room - unit.size, t.side is None)) if fits else None
+
+
+def lower_bound(guests: int, types: Sequence[TableType]) -> int:
+    """Fewest tables whose seats add up to ``guests`` (ignores keeping units whole)."""
+    count, seats = 0, 0
+    stock = _Stock(types)
+    while seats < guests:
+        table = stock.largest()
+        if table is None:
+            break
+        stock.left[table] -= 1
+        count, seats = count + 1, seats + table.seats
+    return count
+
+
+def plan_tables(units: Sequence[Unit], types: Sequence[TableType] = DEFAULT_TABLE_TYPES) -> Dict[str, Any]:
+    stock = _Stock(types)
+    biggest = stock.types[0].seats
+    # A unit bigger than any table is seated in table-sized parts
+    parts, split = [], []
+    for unit in units:
+        if unit.size > biggest:
+            split.append(unit.key)
+            for start in range(0, unit.size, biggest):
+                parts.append(Unit(unit.key, min(biggest, unit.size - start), unit.side))
+        elif unit.size > 0:
+            parts.append(unit)
+
+    tables: List[_Table] = []
+    unplaced: List[Unit] = []
+    for unit in sorted(parts, key=lambda u: (u.side is None, -u.size)):
+        table = _best_fit(tables, unit)
+        if table is None:
+            kind = stock.largest(unit.size)
+            if kind is None:
+                unplaced.append(unit)
+                continue
+            stock.left[kind] -= 1
+            table = _Table(kind.seats)
+            tables.append(table)
+        table.add(unit)
+
+    # Dissolve the emptiest tables into the spare seats of the others
+    changed = True
+    while changed:
+        changed = False
+        for table in sorted(tables, key=lambda t: t.load):
+            moves: List[Tuple[Unit, _Table]] = []
+            for unit in sorted(table.units, key=lambda u: -u.size):
+                target = _best_fit(tables, unit, skip=table)
+                if target is None:
+                    break
+                target.add(unit)
+                moves.append((unit, target))
+            if len(moves) == len(table.units):
+                tables.remove(table)
+                changed = True
+                break
+            for unit, target in moves:
+                target.units.remove(unit)
+                target.load -= unit.size
+                target.side = next((u.side for u in target.units if u.side), None)
+
+    # Smallest sufficient type, fullest tables first (nested fits keep this feasible)
+    stock = _Stock(types)
+    for table in sorted(tables, key=lambda t: -t.load):
+        table.type = stock.smallest_fitting(table.load)
+        stock.left[table.type] -= 1
+        table.capacity = table.type.seats
+
+    for _ in range(MAX_REPACK_PASSES):
+        improved = False
+        for i, first in enumerate(tables):
+            for second in tables[i + 1:]:
+                if first.type is None or second.type is None or first.room + second.room == 0:
+                    continue
+                if first.side and second.side and first.side != second.side:
+                    continue
+                improved |= _repack(first, second, stock)
+        tables = [t for t in tables if t.type is not None]
+        if not improved:
+            break
+
+    seats = Counter()
+    for table in tables:
+        if table.side:
+            seats[table.side] += table.capacity
+    for table in sorted((t for t in tables if t.side is None), key=lambda t: -t.capacity):
+        gap = seats["sposo"] - seats["sposa"]
+        if table.capacity < 2 * abs(gap):
+            table.side = "sposa" if gap > 0 else "sposo"
+            seats[table.side] += table.capacity
+
+    tables.sort(key=lambda t: (SIDES.index(t.side) if t.side in SIDES else len(SIDES), -t.capacity))
+    guests = sum(u.size for u in parts)
+    placed = sum(t.load for t in tables)
+    minimum = lower_bound(placed, types)
+    return {
+        "guests": guests,
+        "units": len(units),
+        "tables": [{"shape": t.type.shape, "capacita_max": t.capacity, "lato": t.side or NEUTRAL_SIDE,
+                    "guests": t.load, "units": [u.key for u in t.units]} for t in tables],
+        "summary": {
+            "tables": len(tables),
+            "seats": sum(t.capacity for t in tables),
+            "empty_seats": sum(t.room for t in tables),
+            "by_type": dict(Counter(t.type.label for t in tables)),
+            "by_side": {side: sum(t.capacity for t in tables if (t.side or NEUTRAL_SIDE) == side)
+                        for side in (*SIDES, NEUTRAL_SIDE)},
+        },
+        "lower_bound": minimum,
+        "minimal": len(tables) == minimum,
+        "split_units": split,
+        "unplaced": [{"unit": u.key, "size": u.size} for u in unplaced],
+    }
+
+
+def wedding_units(guests: Sequence[Dict[str, Any]], source: str = "confirmed", model=None) -> List[Unit]:
+    """Invitation units with their expected headcount; guests without a unit form their own."""
+    members: Dict[Any, List[Dict[str, Any]]] = {}
+    for guest in guests:
+        status = guest_status(guest)
+        if status == "deleted" or (source == "confirmed" and status != "confirmed"):
+            continue
+        members.setdefault(guest.get("unita_invito_id") or f"guest-{guest['id']}", []).append(guest)
+    units = []
+    for key, rows in members.items():
+        if source == "forecast":
+            confirmed = sum(guest_status(g) == "confirmed" for g in rows)
+            expected = sum(model.probability(guest_cell(g)) for g in rows if guest_status(g) != "confirmed")
+            size = confirmed + round(expected)
+        else:
+            size = len(rows)
+        sides = Counter(side for side in map(guest_side, rows) if side)
+        units.append(Unit(key, size, sides.most_common(1)[0][0] if sides else None))
+    return units
+
+
+async def _plan(request: Request, user_id: str, source: str, table_types) -> Dict[str, Any]:
+    state = request.app.state
+    try:
+        types = parse_table_types(table_types) if table_types else DEFAULT_TABLE_TYPES
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    guests = await state.mirror.rows("invitati", user_id)
+    model = await state.forecast.model(user_id) if source == "forecast" else None
+    plan = plan_tables(wedding_units(guests, source, model), types)
+    return dict(plan, user_id=user_id, source=source)
+
+
+def table_names(taken: Sequence[Optional[str]], count: int) -> List[str]:
+    """``count`` names "Tavolo N", N counting up from 1 past the names already in the wedding."""
+    names, number = [], 0
+    taken = set(taken)
+    while len(names) < count:
+        number += 1
+        if f"Tavolo {number}" not in taken:
+            names.append(f"Tavolo {number}")
+    return names
+
+
+async def create_tables(state, user_id: str, planned: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert planned tables into Supabase, then the mirror; returns the stored rows with Supabase's ids."""
+    from supabase_rest import PostgrestClient
+
+    if not planned:
+        return []
+    mirror = state.mirror
+    names = table_names([row.get("nome_tavolo") for row in await mirror.rows("tavoli", user_id)], len(planned))
+    rows = [{"nome_tavolo": name, "capacita_max": table["capacita_max"], "lato": table["lato"], "user_id": user_id}
+            for name, table in zip(names, planned)]
+    client = PostgrestClient(key=state.settings.supabase_write_key)
+    rows = await asyncio.to_thread(client.insert, "tavoli", rows)
+    await mirror.bulk_upsert("tavoli", rows)
+    for row in rows:
+        await mirror.bus.publish(RowChange("tavoli", INSERT, row))
+    return rows
+
+
+table_mix_router = APIRouter(prefix="/tables")
+
+
+@table_mix_router.post("/plan")
+async def plan_table_mix(request: Request, user_id: str = Query(..., min_length=1),
+                         source: str = Query("confirmed", pattern="^(confirmed|all|forecast)$"),
+                         table_types: Optional[List[Dict[str, Any]]] = Body(None, embed=True)):
+    return await _plan(request, user_id, source, table_types)
+
+
+@table_mix_router.post("/plan/apply", status_code=201)
+async def apply_table_mix(request: Request, user_id: str = Query(..., min_length=1),
+                          source: str = Query("confirmed", pattern="^(confirmed|all|forecast)$"),
+                          table_types: Optional[List[Dict[str, Any]]] = Body(None, embed=True)):
+    if not request.app.state.settings.supabase_write_key:
+        raise HTTPException(status_code=503, detail="creating tables needs SUPABASE_SERVICE_ROLE_KEY")
+    require_wedding_owner(request, user_id)
+    plan = await _plan(request, user_id, source, table_types)
+    created = await create_tables(request.app.state, user_id, plan["tables"])
+    for table, row in zip(plan["tables"], created):
+        table.update(id=row["id"], nome_tavolo=row["nome_tavolo"])
+    return plan
@@ -0,0 +1,330 @@
+"""Local mirror of the Supabase wedding tables and the change feed built on it.
+
+Supabase stays the source of truth. Row changes reach the backend as Supabase
+database-webhook calls on ``POST /api/webhooks/supabase`` (or from the
+backend's own writes through ``WeddingMirror.ingest``). Each change is applied
+to a Mongo collection of the same name, then published on the ``ChangeBus``
+with ``old_record`` taken from the mirror. That way subscribers (stats, indexes,
+caches) get an exact before/after even when the webhook only carries the
+primary key.
+
+Every mirrored row carries ``user_id``; ``piani_salvati`` and ``relazioni`` have
+none in Postgres, so it is resolved from the referenced table/guest.
+"""
+
+import asyncio
+import hmac
+import logging
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from guest_attributes import ATTRS_FIELD, stored_row
+from index_advisor import migrate_indexes
+
+logger = logging.getLogger(__name__)
+
+# Primary key columns of each mirrored table
+TABLE_KEYS: Dict[str, Tuple[str, ...]] = {
+    "invitati": ("id",),
+    "unita_invito": ("id",),
+    "tavoli": ("id",),
+    "piani_salvati": ("id",),
+    "relazioni": ("invitato_a_id", "invitato_b_id"),
+}
+
+INSERT, UPDATE, DELETE = "INSERT", "UPDATE", "DELETE"
+# One counter per wedding, bumped after every write to its rows (backs the HTTP ETags)
+VERSIONS_COLLECTION = "wedding_versions"
+# Mirrored rows as Supabase has them, without the fields the mirror derives
+ROW_PROJECTION = {"_id": 0, ATTRS_FIELD: 0}
+
+
+@dataclass
+class RowChange:
+    table: str
+    type: str
+    record: Optional[Dict[str, Any]] = None
+    old_record: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_webhook(cls, payload: Dict[str, Any]) -> "RowChange":
+        change = cls(payload["table"], payload["type"].upper(), payload.get("record"), payload.get("old_record"))
+        if change.table not in TABLE_KEYS:
+            raise ValueError(f"unsupported table {change.table!r}")
+        if change.type not in (INSERT, UPDATE, DELETE):
+            raise ValueError(f"unsupported change type {change.type!r}")
+        if (change.record if change.type != DELETE else change.old_record) is None:
+            raise ValueError("change without a row")
+        return change
+
+    @property
+    def row(self) -> Dict[str, Any]:
+        """The row that identifies the change: new row, or old row for deletes."""
+        return self.old_record if self.type == DELETE else self.record
+
+    @property
+    def key(self) -> Dict[str, Any]:
+        return {column: self.row[column] for column in TABLE_KEYS[self.table]}
+
+    @property
+    def user_ids(self) -> List[str]:
+        """Weddings touched by this change (two if a row moved between users)."""
+        ids = []
+        for row in (self.old_record, self.record):
+            if row and row.get("user_id") and row["user_id"] not in ids:
+                ids.append(row["user_id"])
+        return ids
+
+
+Subscriber = Callable[[RowChange], Awaitable[None]]
+CommitHook = Callable[[Dict[str, int], Optional[RowChange]], Awaitable[None]]
+
+
+class ChangeBus:
+    """In-process fan-out of mirrored row changes to read models."""
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.append(subscriber)
+
+    async def publish(self, change: RowChange) -> None:
+        for subscriber in self._subscribers:
+            try:
+                await subscriber(change)
+            except Exception:
+                # One broken read model must not block the others; reconciliation repairs it
+                logger.exception("Change subscriber %r failed on %s %s", subscriber, change.type, change.table)
+
+
+class WeddingMirror:
+    def __init__(self, database, bus: Optional[ChangeBus] = None):
+        self.database = database
+        self.bus = bus or ChangeBus()
+        # Called with the new data versions after every write (see ``bump_versions``)
+        self.commit_hooks: List[CommitHook] = []
+        self._indexes_ready = False
+
+    @property
+    def db(self):
+        return self.database.db
+
+    async def ensure_indexes(self) -> None:
+        if self._indexes_ready:
+            return
+        # Primary keys plus per-wedding compound indexes (see ``index_advisor.MIRROR_INDEXES``)
+        await migrate_indexes(self.db)
+        self._indexes_ready = True
+
+    async def _resolve_user_id(self, table: str, row: Dict[str, Any]) -> Optional[str]:
+        if row.get("user_id"):
+            return row["user_id"]
+        if table == "piani_salvati":
+            owner = await self.db.tavoli.find_one({"id": row.get("tavolo_id")}, {"user_id": 1})
+        elif table == "relazioni":
+            owner = await self.db.invitati.find_one({"id": row.get("invitato_a_id")}, {"user_id": 1})
+        else:
+            owner = None
+        return owner["user_id"] if owner else None
+
+    async def apply(self, change: RowChange) -> RowChange:
+        """Write the change to the mirror; returns it with the mirror's ``old_record``."""
+        await self.ensure_indexes()
+        collection = self.db[change.table]
+        previous = await collection.find_one(change.key, ROW_PROJECTION)
+        if change.type == DELETE:
+            await collection.delete_one(change.key)
+            record = None
+        else:
+            record = dict(change.record)
+            record["user_id"] = await self._resolve_user_id(change.table, record) or (previous or {}).get("user_id")
+            await collection.replace_one(change.key, stored_row(change.table, record), upsert=True)
+        if previous is None and change.type == DELETE:
+            previous = change.old_record
+        return RowChange(change.table, change.type, record, previous)
+
+    async def ingest(self, change: RowChange) -> RowChange:
+        applied = await self.apply(change)
+        await self.bus.publish(applied)
+        await self.bump_versions(applied.user_ids, applied)
+        return applied
+
+    async def data_version(self, user_id: str) -> int:
+        await self.ensure_indexes()
+        doc = await self.db[VERSIONS_COLLECTION].find_one({"user_id": user_id}, {"_id": 0, "version": 1})
+        return doc["version"] if doc else 0
+
+    async def bump_versions(self, user_ids: Iterable[str], change: Optional[RowChange] = None) -> Dict[str, int]:
+        """Advance each wedding's data version and run the commit hooks.
+
+        Call only once the write is visible to readers. ``change`` is the row
+        change behind the bump, or None for bulk writes.
+        """
+        from pymongo import ReturnDocument
+
+        versions = {}
+        for user_id in user_ids:
+            if user_id:
+                doc = await self.db[VERSIONS_COLLECTION].find_one_and_update(
+                    {"user_id": user_id}, {"$inc": {"version": 1}}, projection={"_id": 0, "version": 1},
+                    upsert=True, return_document=ReturnDocument.AFTER)
+                versions[user_id] = doc["version"]
+        for hook in self.commit_hooks:
+            try:
+                await hook(versions, change)
+            except Exception:
+                logger.exception("Commit hook %r failed", hook)
+        return versions
+
+    async def rows(self, table: str, user_id: str, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        await self.ensure_indexes()
+        return await self.db[table].find({"user_id": user_id, **(query or {})}, ROW_PROJECTION).to_list(None)
+
+    async def user_ids(self) -> List[str]:
+        await self.ensure_indexes()
+        users = set(await self.db.invitati.distinct("user_id"))
+        users.update(await self.db.tavoli.distinct("user_id"))
+        return sorted(u for u in users if u)
+
+    async def replace_wedding(self, user_id: str, tables: Dict[str, Iterable[Dict[str, Any]]]) -> None:
+        """Overwrite one wedding's mirrored rows, e.g. after a full pull from Supabase."""
+        await self.ensure_indexes()
+        for table, rows in tables.items():
+            rows = [stored_row(table, dict(row, user_id=user_id)) for row in rows]
+            await self.db[table].delete_many({"user_id": user_id})
+            if rows:
+                await self.db[table].insert_many(rows)
+        await self.bump_versions([user_id])
+
+    async def bulk_upsert(self, table: str, rows: List[Dict[str, Any]], chunk_size: int = 1000) -> None:
+        """Replace-or-insert rows by primary key in ``bulk_write`` chunks, without publishing on the bus."""
+        from pymongo import ReplaceOne
+
+        await self.ensure_indexes()
+        key = TABLE_KEYS[table]
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            await self.db[table].bulk_write(
+                [ReplaceOne({column: row[column] for column in key}, stored_row(table, row), upsert=True)
+                 for row in chunk],
+                ordered=False)
+        await self.bump_versions({row.get("user_id") for row in rows})
+
+    async def bulk_delete(self, table: str, keys: List[Dict[str, Any]], chunk_size: int = 1000) -> None:
+        from pymongo import DeleteOne
+
+        await self.ensure_indexes()
+        owners = set()
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            owners.update(await self.db[table].distinct("user_id", {"$or": chunk}))
+            await self.db[table].bulk_write([DeleteOne(key) for key in chunk], ordered=False)
+        await self.bump_versions(owners)
+
+    async def pull_wedding(self, client, user_id: str) -> None:
+        """Refresh one wedding from Supabase (blocking PostgREST calls run in a thread)."""
+        def fetch() -> Dict[str, List[Dict[str, Any]]]:
+            owned = {"user_id": f"eq.{user_id}"}
+            tables = {name: [row for page in client.paginate(name, owned) for row in page]
+                      for name in ("invitati", "unita_invito", "tavoli")}
+            table_ids = ",".join(str(t["id"]) for t in tables["tavoli"])
+            guest_ids = ",".join(str(g["id"]) for g in tables["invitati"])
+            tables["piani_salvati"] = [row for page in client.paginate(
+                "piani_salvati", {"tavolo_id": f"in.({table_ids})"}) for row in page] if table_ids else []
+            tables["relazioni"] = [row for page in client.paginate(
+                "relazioni", {"invitato_a_id": f"in.({guest_ids})"}, key=None,
+                order=("invitato_a_id", "invitato_b_id")) for row in page] if guest_ids else []
+            return tables
+
+        await self.replace_wedding(user_id, await asyncio.to_thread(fetch))
+
+
+Model = TypeVar("Model")
+
+
+class WeddingCache(Generic[Model]):
+    """Per-wedding in-memory read models, built from the mirror and patched from the bus.
+
+    Subclasses name the ``tables`` they follow and implement ``build`` and
+    ``apply``. Models are built on first use and evicted least recently used
+    first. Changes published while a model is being built are replayed onto it.
+    """
+
+    tables: Tuple[str, ...] = ()
+
+    def __init__(self, mirror: WeddingMirror, max_weddings: int = 256):
+        self.mirror = mirror
+        self.max_weddings = max_weddings
+        self._models: "OrderedDict[str, Model]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self._pending: Dict[str, List[RowChange]] = {}
+
+    async def build(self, user_id: str) -> Model:
+        raise NotImplementedError
+
+    def apply(self, model: Model, user_id: str, change: RowChange) -> None:
+        raise NotImplementedError
+
+    def cached(self, user_id: str) -> Optional[Model]:
+        return self._models.get(user_id)
+
+    async def get(self, user_id: str) -> Model:
+        if user_id in self._models:
+            self._models.move_to_end(user_id)
+            return self._models[user_id]
+        lock = self._loading.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            if user_id not in self._models:
+                self._pending[user_id] = []
+                try:
+                    model = await self.build(user_id)
+                finally:
+                    pending = self._pending.pop(user_id)
+                for change in pending:
+                    self.apply(model, user_id, change)
+                self._models[user_id] = model
+                while len(self._models) > self.max_weddings:
+                    self._models.popitem(last=False)
+        self._loading.pop(user_id, None)
+        return self._models[user_id]
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        if user_id is None:
+            self._models.clear()
+        else:
+            self._models.pop(user_id, None)
+
+    async def on_change(self, change: RowChange) -> None:
+        if change.table not in self.tables:
+            return
+        # Only weddings in memory are patched; the others build fresh on next use
+        for user_id in change.user_ids:
+            if user_id in self._models:
+                self.apply(self._models[user_id], user_id, change)
+            elif user_id in self._pending:
+                self._pending[user_id].append(change)
+
+
+webhook_router = APIRouter(prefix="/webhooks")
+
+
+@webhook_router.post("/supabase")
+async def supabase_webhook(request: Request, x_webhook_secret: Optional[str] = Header(None)):
+    """Receiver for Supabase database webhooks (one event, or a list of events)."""
+    secret = request.app.state.settings.supabase_webhook_secret
+    if not secret or x_webhook_secret is None or not hmac.compare_digest(x_webhook_secret.encode(), secret.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    payload = await request.json()
+    events = payload if isinstance(payload, list) else [payload]
+    try:
+        changes = [RowChange.from_webhook(event) for event in events]
+    except (KeyError, ValueError, AttributeError) as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid webhook payload: {exc}")
+    mirror: WeddingMirror = request.app.state.mirror
+    for change in changes:
+        await mirror.ingest(change)
+    return {"applied": len(changes)}
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: duplicate-guest detection on one large synthetic wedding.
+
+Plants re-entered guests (swapped word order, dropped accents, one-letter
+typos) in fresh invitation units, then times ``find_duplicates`` and reports
+how many of the planted pairs were ranked.
+
+    python benchmarks/bench_dedupe.py [--guests 10000] [--duplicates 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from guest_dedupe import find_duplicates  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+def reentered(rng: random.Random, guest: dict, new_id: int, unit_id: int) -> dict:
+    nome, cognome = guest["nome"], guest["cognome"]
+    variant = rng.randrange(3)
+    if variant == 0:
+        display = f"{cognome} {nome}"
+    elif variant == 1:
+        display = f"{nome} {cognome}".upper().replace("È", "E").replace("Ò", "O").replace("Ù", "U")
+    else:
+        pos = rng.randrange(1, len(cognome))
+        display = f"{nome} {cognome[:pos]}{cognome[pos - 1]}{cognome[pos:]}"
+    return dict(guest, id=new_id, unita_invito_id=unit_id, nome_visualizzato=display, note=None)
+
+
+def plant_duplicates(guests: list, count: int, seed: int = 1):
+    rng = random.Random(seed)
+    next_id = max(g["id"] for g in guests) + 1
+    next_unit = max(g["unita_invito_id"] for g in guests) + 1
+    planted = []
+    for original in rng.sample(guests, count):
+        copy = reentered(rng, original, next_id, next_unit)
+        planted.append((original["id"], copy["id"]))
+        guests.append(copy)
+        next_id += 1
+        next_unit += 1
+    return planted
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=10000)
+    parser.add_argument("--duplicates", type=int, default=200)
+    parser.add_argument("--min-score", type=float, default=0.6)
+    args = parser.parse_args(argv)
+
+    guests = generate_dataset(1, args.guests, deleted_rate=0)["invitati"]
+    planted = plant_duplicates(guests, args.duplicates)
+
+    start = time.perf_counter()
+    suggestions = find_duplicates(guests, args.min_score)
+    seconds = time.perf_counter() - start
+
+    found = {frozenset((s.keep["id"], s.duplicate["id"])) for s in suggestions}
+    recall = sum(frozenset(pair) in found for pair in planted) / len(planted)
+    print(f"{len(guests)} guests, {len(planted)} planted duplicates")
+    print(f"{'find_duplicates':<24}{seconds * 1000:>10.1f} ms")
+    print(f"{'suggestions':<24}{len(suggestions):>10}")
+    print(f"{'planted pairs found':<24}{recall:>10.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: facet counts from per-wedding bitmaps vs a linear scan.
+
+The scan is what the client does today: walk every guest, test the filter and
+tally each facet value. The bitmap path answers the same query, including
+the other-facets-applied counts for every badge, from ``WeddingFacets``.
+
+    python benchmarks/bench_facets.py [--guests 20000] [--repeat 50]
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from guest_facets import FACETS, WeddingFacets, guest_facets  # noqa: E402
+from guest_rows import table_side  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+SELECTION = {"category": ["friends", "colleagues"], "status": ["confirmed", "pending"], "side": ["sposa"]}
+
+
+def scan(data):
+    sides = {t["id"]: table_side(t) for t in data["tavoli"]}
+    seats = {s["invitato_id"]: s["tavolo_id"] for s in data["piani_salvati"]}
+    counts = {facet: Counter() for facet in FACETS}
+    total = 0
+    for guest in data["invitati"]:
+        table = seats.get(guest["id"])
+        values = dict(guest_facets(guest), table=str(table) if table else "unassigned",
+                      side=sides[table] if table else "unassigned")
+        misses = [f for f, chosen in SELECTION.items() if values[f] not in chosen]
+        total += not misses
+        for facet in FACETS:
+            if not misses or misses == [facet]:
+                counts[facet][values[facet]] += 1
+    return total, counts
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    data = generate_dataset(1, args.guests, allergy_rate=0.2)
+    start = time.perf_counter()
+    facets = WeddingFacets(data["invitati"], data["tavoli"], data["piani_salvati"])
+    build = time.perf_counter() - start
+
+    (total, counts), scan_seconds = timed(lambda: scan(data), max(1, args.repeat // 10))
+    result, bitmap_seconds = timed(lambda: facets.query(SELECTION), args.repeat)
+    assert result["total"] == total
+    assert all({k: v for k, v in result["facets"][f].items() if v} == dict(counts[f]) for f in FACETS)
+
+    print(f"{args.guests} guests, {len(data['tavoli'])} tables; bitmaps built in {build * 1000:.0f} ms")
+    print(f"{'linear scan':<24}{scan_seconds * 1000:>10.2f} ms")
+    print(f"{'bitmaps':<24}{bitmap_seconds * 1000:>10.2f} ms")
+    print(f"{'speedup':<24}{scan_seconds / bitmap_seconds:>10.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
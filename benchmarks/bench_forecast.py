@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Monte Carlo attendance forecast.
+
+Learns attendance rates from a synthetic mirror of many weddings, then
+times the vectorized simulation of one wedding's pending guests.
+
+    python benchmarks/bench_forecast.py [--guests 400] [--simulations 20000 50000 200000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from forecast import AttendanceModel, guest_cell, simulate  # noqa: E402
+from guest_rows import guest_status  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weddings", type=int, default=50)
+    parser.add_argument("--guests", type=int, default=400)
+    parser.add_argument("--simulations", type=int, nargs="+", default=[20_000, 50_000, 200_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = generate_dataset(args.weddings, args.guests, seed=args.seed)
+    start = time.perf_counter()
+    model = AttendanceModel.from_guests(data["invitati"])
+    print(f"model from {model.guests} guests in {(time.perf_counter() - start) * 1000:.1f} ms (rho {model.rho:.2f})")
+
+    user_id = data["invitati"][0]["user_id"]
+    pending = [g for g in data["invitati"] if g["user_id"] == user_id and guest_status(g) == "pending"]
+    units = {}
+    unit_of = [units.setdefault(g["unita_invito_id"], len(units)) for g in pending]
+    probabilities = [model.probability(guest_cell(g)) for g in pending]
+    print(f"{len(pending)} pending guests in {len(units)} units")
+    print(f"{'simulations':>12}{'ms':>10}{'p50':>8}{'p95':>8}")
+    for simulations in args.simulations:
+        start = time.perf_counter()
+        counts = simulate(probabilities, unit_of, model.rho, simulations, seed=args.seed)
+        elapsed = time.perf_counter() - start
+        counts.sort()
+        print(f"{simulations:>12}{elapsed * 1000:>10.1f}{counts[len(counts) // 2]:>8}"
+              f"{counts[int(len(counts) * 0.95)]:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
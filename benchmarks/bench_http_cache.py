@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bytes on the wire and latency of a repeated guest payload.
+
+Loads one synthetic wedding into an in-process app and fetches the facet
+payload with guest ids (``/api/guests/facets?include_ids=true``) as a plain
+200, gzip-encoded, brotli-encoded (if installed), and as a 304 revalidation.
+
+    python benchmarks/bench_http_cache.py [--guests 5000] [--repeat 50]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+from http_cache import _brotli  # noqa: E402
+from settings import Settings  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+from load_test import percentile  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    data = generate_dataset(1, args.guests, seed=0)
+    app = server.create_app(Settings(mongo_url="memory://", db_name="bench_http_cache", stats_reconcile_seconds=0,
+                                     job_workers=0, supabase_webhook_secret="bench"))
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "bench"},
+                    json=[{"type": "INSERT", "table": table, "record": row}
+                          for table in ("invitati", "tavoli", "piani_salvati") for row in data[table]])
+        url = "/api/guests/facets"
+        params = {"user_id": data["invitati"][0]["user_id"], "include_ids": "true"}
+        etag = client.get(url, params=params, headers={"Accept-Encoding": "identity"}).headers["etag"]
+        cases = [("200 identity", {"Accept-Encoding": "identity"}), ("200 gzip", {"Accept-Encoding": "gzip"})]
+        if _brotli() is not None:
+            cases.append(("200 br", {"Accept-Encoding": "br"}))
+        cases.append(("304", {"Accept-Encoding": "identity", "If-None-Match": etag}))
+
+        print(f"{args.guests} guests, {url}?include_ids=true")
+        print(f"{'response':<16}{'bytes':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, headers in cases:
+            samples, size = [], 0
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                with client.stream("GET", url, params=params, headers=headers) as response:
+                    size = sum(len(chunk) for chunk in response.iter_raw())
+                samples.append(time.perf_counter() - start)
+            samples.sort()
+            p50, p99 = percentile(samples, 50) * 1000, percentile(samples, 99) * 1000
+            print(f"{label:<16}{size:>10}{p50:>10.2f}{p99:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: interactive latency and 429s while a batch upload floods Supabase.
+
+Simulates a PostgREST server that allows ``--server-rate`` requests per
+second (429 with ``Retry-After`` above that) and takes ``--latency`` seconds
+per call. A batch job upserts ``--chunks`` chunks from several threads. Meanwhile
+an interactive caller reads once every 50 ms. Runs once unscheduled (every
+call straight to the server, as the old scripts did) and once through
+``OutboundScheduler``.
+
+    python benchmarks/bench_outbound.py [--chunks 200] [--server-rate 40]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from outbound import BATCH, INTERACTIVE, OutboundScheduler  # noqa: E402
+from load_test import percentile  # noqa: E402
+
+
+class RateLimitedServer:
+    def __init__(self, rate: float, latency: float):
+        self.rate, self.latency = rate, latency
+        self.window, self.count, self.rejected = 0.0, 0, 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.window >= 1.0:
+                self.window, self.count = now, 0
+            self.count += 1
+            limited = self.count > self.rate
+            self.rejected += limited
+        time.sleep(self.latency)
+        return _Response(429, {"Retry-After": "0.2"}) if limited else _Response(200, {})
+
+
+class _Response:
+    def __init__(self, status_code, headers):
+        self.status_code, self.headers = status_code, headers
+
+
+def run(server: RateLimitedServer, chunks: int, scheduler: OutboundScheduler = None):
+    def call(priority):
+        if scheduler is None:
+            return server()
+        return scheduler.send("supabase", server, priority)
+
+    done = threading.Event()
+    samples, failed = [], 0
+
+    def interactive():
+        nonlocal failed
+        while not done.is_set():
+            start = time.perf_counter()
+            failed += call(INTERACTIVE).status_code != 200
+            samples.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+    reader = threading.Thread(target=interactive)
+    reader.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(lambda _: call(BATCH).status_code, range(chunks)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader.join()
+    samples.sort()
+    return {"batch s": elapsed, "batch failed": sum(s != 200 for s in statuses), "429s": server.rejected,
+            "read p50 ms": percentile(samples, 50) * 1000, "read p99 ms": percentile(samples, 99) * 1000,
+            "reads failed": failed}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--server-rate", type=float, default=40)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    rows = [("unscheduled", run(RateLimitedServer(args.server_rate, args.latency), args.chunks)),
+            ("scheduled", run(RateLimitedServer(args.server_rate, args.latency), args.chunks,
+                              OutboundScheduler(rate=args.server_rate * 0.9, burst=int(args.server_rate / 4))))]
+    columns = list(rows[0][1])
+    print(f"{'':<14}" + "".join(f"{name:>14}" for name in columns))
+    for label, result in rows:
+        print(f"{label:<14}" + "".join(f"{result[name]:>14.1f}" if isinstance(result[name], float)
+                                       else f"{result[name]:>14}" for name in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
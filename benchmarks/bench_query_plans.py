@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-wedding query plans as the platform grows.
+
+For each tenant count, seeds that many synthetic weddings into the mirror and
+runs ``index_advisor.migrate_indexes`` and ``ensure_service_indexes``. It then
+explains every hot query shape (``index_advisor.HOT_QUERIES``) and times one
+wedding's reads. Exits 1 if any hot query falls back to a collection scan
+(``full_scan`` shapes excepted). Per-wedding latency should
+stay flat as the tenant count grows.
+
+    python benchmarks/bench_query_plans.py [--weddings 10 1000] [--guests 150]
+        [--mongo-url mongodb://localhost:27017] [--supabase USER_ID]
+
+The ``memory://`` stand-in (default) reports the plans mongod would pick.
+Its reads scan in Python, so its timings grow with the tenant count; pass
+``--mongo-url`` for timings that mean something. The database named
+``bench_query_plans`` is dropped and rebuilt there.
+
+``--supabase`` also asks PostgREST for the Postgres plan of the frontend's
+per-wedding queries. This needs ``db-plan-enabled``, ``SUPABASE_URL`` and
+``SUPABASE_KEY``. Any ``Seq Scan`` fails the run. Run it against a populated
+database: Postgres scans tiny tables whatever their indexes.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from database import Database  # noqa: E402
+from guest_attributes import stored_row  # noqa: E402
+from index_advisor import (HOT_QUERIES, advise, collection_scans, ensure_service_indexes,  # noqa: E402
+                           migrate_indexes, print_report)
+from settings import Settings  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+from wedding_mirror import TABLE_KEYS, WeddingMirror  # noqa: E402
+
+DB_NAME = "bench_query_plans"
+
+# The frontend's per-wedding reads, as PostgREST params (see frontend/src/hooks)
+SUPABASE_QUERIES = [
+    ("invitati", {"user_id": "eq.{user}", "order": "created_at.desc"}),
+    ("invitati", {"user_id": "eq.{user}", "confermato": "eq.true", "order": "nome_visualizzato.asc"}),
+    ("invitati", {"unita_invito_id": "eq.1", "is_principale": "eq.true"}),
+    ("tavoli", {"user_id": "eq.{user}", "order": "created_at.asc"}),
+    ("unita_invito", {"user_id": "eq.{user}"}),
+    ("piani_salvati", {"tavolo_id": "eq.1"}),
+    ("piani_salvati", {"invitato_id": "eq.1"}),
+]
+
+
+async def seed(db, weddings: int, guests: int, seed_value: int) -> list:
+    data = generate_dataset(weddings, guests, seed=seed_value)
+    # piani_salvati rows carry no user_id in Postgres; the mirror takes it from their table
+    owners = {row["id"]: row["user_id"] for row in data["tavoli"]}
+    for row in data["piani_salvati"]:
+        row["user_id"] = owners[row["tavolo_id"]]
+    for table in TABLE_KEYS:
+        rows = [stored_row(table, row) for row in data.get(table, ())]
+        if rows:
+            await db[table].insert_many(rows)
+    return sorted({row["user_id"] for row in data["invitati"]})
+
+
+async def time_reads(mirror: WeddingMirror, users: list, samples: int) -> float:
+    """Median milliseconds to read one wedding's guests, tables and seats."""
+    timings = []
+    for user_id in random.Random(0).sample(users, min(samples, len(users))):
+        start = time.perf_counter()
+        for table in ("invitati", "tavoli", "piani_salvati"):
+            await mirror.rows(table, user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+async def run(args) -> int:
+    database = Database(Settings(mongo_url=args.mongo_url, db_name=DB_NAME))
+    failures = []
+    try:
+        print(f"{'weddings':>9}{'docs':>10}{'read ms':>10}{'scans':>7}")
+        for weddings in args.weddings:
+            await database.client.drop_database(DB_NAME)
+            users = await seed(database.db, weddings, args.guests, args.seed)
+            await migrate_indexes(database.db)
+            await ensure_service_indexes(database)
+            reports = await advise(database.db, HOT_QUERIES, users[0])
+            scans = collection_scans(reports)
+            failures += scans
+            docs = await database.db.invitati.count_documents({})
+            read_ms = await time_reads(WeddingMirror(database), users, args.samples)
+            print(f"{weddings:>9}{docs:>10}{read_ms:>10.2f}{len(scans):>7}")
+        print()
+        print_report(reports)
+        await database.client.drop_database(DB_NAME)
+    finally:
+        database.close()
+    if args.supabase:
+        failures += supabase_scans(args.supabase)
+    if failures:
+        print(f"sequential scans: {', '.join(sorted(set(failures)))}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _seq_scans(node: dict) -> list:
+    found = [node.get("Relation Name", "?")] if node.get("Node Type") == "Seq Scan" else []
+    for child in node.get("Plans", ()):
+        found += _seq_scans(child)
+    return found
+
+
+def supabase_scans(user_id: str) -> list:
+    from supabase_rest import PostgrestClient
+
+    client = PostgrestClient()
+    scans = []
+    for table, params in SUPABASE_QUERIES:
+        params = {key: value.format(user=user_id) for key, value in params.items()}
+        plan = client.plan(table, params)
+        root = (plan[0] if isinstance(plan, list) else plan)["Plan"]
+        found = _seq_scans(root)
+        print(f"postgres {table:<14} {root['Node Type']:<16} {params}")
+        scans += [f"postgres {relation}" for relation in found]
+    return scans
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weddings", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--guests", type=int, default=150)
+    parser.add_argument("--samples", type=int, default=50, help="weddings timed per tenant count")
+    parser.add_argument("--mongo-url", default="memory://")
+    parser.add_argument("--supabase", metavar="USER_ID", help="also check the Postgres plans for this wedding")
+    parser.add_argument("--seed", type=int, default=0)
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: typeahead queries against one wedding's in-memory guest index.
+
+Builds the index from a synthetic wedding, then replays every prefix of a set
+of names (as a user typing) plus infix and misspelled queries, reporting
+per-query latency percentiles next to the browser-style substring scan.
+
+    python benchmarks/bench_search.py [--guests 2000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from guest_search import GuestSearchIndex  # noqa: E402
+from load_test import percentile  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+def typed_queries(guests, count, rng):
+    queries = []
+    for guest in rng.sample(guests, count):
+        name = guest["nome_visualizzato"]
+        queries.extend(name[:end] for end in range(1, len(name) + 1))
+        queries.append(guest["cognome"][1:])                          # infix
+        queries.append(guest["cognome"].replace(guest["cognome"][2], "", 1))  # dropped letter
+    return queries
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50, help="names to type out")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    guests = generate_dataset(1, args.guests, allergy_rate=0.2)["invitati"]
+    start = time.perf_counter()
+    index = GuestSearchIndex(guests)
+    build_seconds = time.perf_counter() - start
+    queries = typed_queries(guests, args.queries, random.Random(7))
+
+    def timings(fn):
+        samples = []
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def substring_scan(query):
+        needle = query.lower()
+        return [g for g in guests if needle in (g["nome_visualizzato"] or "").lower()][:args.limit]
+
+    print(f"{len(guests)} guests, index built in {build_seconds * 1000:.0f} ms, {len(queries)} queries")
+    print(f"{'':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, fn in (("index", lambda q: index.search(q, args.limit)), ("substring scan", substring_scan)):
+        samples = sorted(timings(fn))
+        print(f"{label:<20}" + "".join(f"{value:>10.3f}" for value in (
+            percentile(samples, 50), percentile(samples, 95), percentile(samples, 99), samples[-1])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
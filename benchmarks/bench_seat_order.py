@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: seat ordering for a whole seating plan.
+
+Seeds a plan with the clustering planner, then orders the guests around every
+table. Compares the affinity between neighbours against entry order and
+times the solver serially and over the process pool.
+
+    python benchmarks/bench_seat_order.py [--guests 600] [--shape round]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from guest_rows import guest_status  # noqa: E402
+from relationships import infer_relationships  # noqa: E402
+from seat_order import arrangement_score, build_problems, order_tables  # noqa: E402
+from seating import seed_plan  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=600)
+    parser.add_argument("--shape", choices=("round", "rectangular"), default="round")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = generate_dataset(1, args.guests, seed=args.seed, assign=False)
+    guests = [g for g in data["invitati"] if guest_status(g) != "deleted"]
+    graph = infer_relationships(guests)
+    plan = seed_plan(guests, data["tavoli"], graph)
+    problems = build_problems(plan.assignments, data["tavoli"], graph, default_shape=args.shape)
+    baseline = sum(arrangement_score(p, p.guests + [None] * (p.seats - len(p.guests))) for p in problems)
+
+    print(f"{len(plan.assignments)} guests at {len(problems)} {args.shape} tables")
+    print(f"{'solver':<22}{'score':>10}{'ms':>10}")
+    print(f"{'entry order':<22}{baseline:>10.0f}{'':>10}")
+    for label, workers in (("serial", 1), (f"{args.workers} processes", args.workers)):
+        start = time.perf_counter()
+        orders = order_tables(problems, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22}{sum(o.score for o in orders):>10.0f}{elapsed * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
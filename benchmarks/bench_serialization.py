@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-item cost of serializing a 1000-item status check list.
+
+Compares the old FastAPI path (StatusCheck(**doc) per document, response_model
+validation, json.dumps) with the bulk TypeAdapter path and the trusted orjson
+path used by GET /api/status.
+
+    python benchmarks/bench_serialization.py [--items 1000] [--repeat 50]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from pydantic import BaseModel, Field  # noqa: E402
+
+from serialization import ModelListSerializer  # noqa: E402
+
+
+class StatusCheck(BaseModel):
+    # Same shape as server.StatusCheck; redefined so the benchmark needs no Mongo/.env
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    client_name: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+def make_docs(count: int) -> List[dict]:
+    base = datetime(2025, 9, 1)
+    return [{"id": str(uuid.uuid4()), "client_name": f"client-{i}", "timestamp": base + timedelta(seconds=i)}
+            for i in range(count)]
+
+
+def bench(fn, repeat: int) -> float:
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    docs = make_docs(args.items)
+    field = create_response_field(name="response", type_=List[StatusCheck])
+    serializer = ModelListSerializer(StatusCheck)
+    loop = asyncio.new_event_loop()
+
+    def legacy():
+        models = [StatusCheck(**doc) for doc in docs]
+        content = loop.run_until_complete(serialize_response(field=field, response_content=models))
+        return JSONResponse(content).body
+
+    def type_adapter():
+        return serializer.response(docs, trusted=False).body
+
+    def trusted_orjson():
+        return ORJSONResponse(docs).body
+
+    assert len(legacy()) > 0 and type_adapter() == trusted_orjson()
+
+    results = [
+        ("per-doc models + response_model + json", bench(legacy, args.repeat)),
+        ("bulk TypeAdapter validate + dump_json", bench(type_adapter, args.repeat)),
+        ("trusted read, orjson only", bench(trusted_orjson, args.repeat)),
+    ]
+    baseline = results[0][1]
+    print(f"{args.items} items, best of {args.repeat}")
+    print(f"{'path':<42}{'total ms':>10}{'us/item':>10}{'speedup':>9}")
+    for name, seconds in results:
+        print(f"{name:<42}{seconds * 1000:>10.2f}{seconds / args.items * 1e6:>10.2f}{baseline / seconds:>8.1f}x")
+    loop.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
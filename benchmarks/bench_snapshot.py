@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: guest statistics from REST-style JSON vs the memory-mapped snapshot.
+
+The JSON path mirrors database_inspection.py (parse the payload, then one list
+comprehension per count); the snapshot path opens the Arrow file and runs
+vectorized kernels.
+
+    python benchmarks/bench_snapshot.py [--weddings 200] [--guests 150]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from snapshot import TABLES, SnapshotStore, guest_stats, rows_to_table  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weddings", type=int, default=200)
+    parser.add_argument("--guests", type=int, default=150)
+    args = parser.parse_args(argv)
+
+    dataset = generate_dataset(args.weddings, args.guests)
+    payload = json.dumps(dataset["invitati"])
+
+    def from_json():
+        guests = json.loads(payload)
+        confirmed = [g for g in guests if g.get("confermato") is True]
+        unconfirmed = [g for g in guests if g.get("confermato") is False]
+        unknown = [g for g in guests if g.get("confermato") is None]
+        groups = {}
+        for g in guests:
+            groups[g.get("gruppo")] = groups.get(g.get("gruppo"), 0) + 1
+        return len(guests), len(confirmed), len(unconfirmed), len(unknown)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(Path(directory))
+        store.write("invitati", rows_to_table(TABLES["invitati"], dataset["invitati"]))
+        size = store.path("invitati").stat().st_size
+
+        json_counts, json_seconds = timed(from_json)
+        stats, snapshot_seconds = timed(lambda: guest_stats(store))
+        assert json_counts == (stats["total"], stats["confirmed"], stats["unconfirmed"], stats["unknown"])
+
+    print(f"{len(dataset['invitati'])} guests; JSON payload {len(payload) / 1e6:.1f} MB, Arrow file {size / 1e6:.1f} MB")
+    print(f"{'REST JSON + list comprehensions':<36}{json_seconds * 1000:>10.1f} ms")
+    print(f"{'memory-mapped Arrow + compute':<36}{snapshot_seconds * 1000:>10.1f} ms")
+    print(f"{'speedup':<36}{json_seconds / snapshot_seconds:>10.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
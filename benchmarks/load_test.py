@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Offline load-testing harness for the FastAPI backend.
+
+Starts backend/server.py under uvicorn on 127.0.0.1 against a local mongod or
+the in-memory stand-in (MONGO_URL=memory://), then drives it with an
+open-loop asyncio client at a fixed request rate and reports latency
+percentiles, a latency histogram and throughput per endpoint.
+
+Latency is measured from the *scheduled* send time, so a server that falls
+behind shows up as growing latency instead of a silently lower request rate.
+
+Examples:
+    python benchmarks/load_test.py --rps 200 --duration 10
+    python benchmarks/load_test.py --mongo-url mongodb://localhost:27017 -e GET:/api/status:3 -e POST:/api/status:1
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8001 --json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Request bodies for endpoints that need one; keyed by (METHOD, path)
+PAYLOADS: Dict[tuple, Callable[[int], dict]] = {
+    ("POST", "/api/status"): lambda i: {"client_name": f"loadtest-{i}"},
+}
+
+
+@dataclass
+class Endpoint:
+    method: str
+    path: str
+    weight: float = 1.0
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.path}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Endpoint":
+        """Parse ``METHOD:PATH[:WEIGHT]``, e.g. ``GET:/api/status:3``."""
+        parts = spec.split(":")
+        if len(parts) not in (2, 3):
+            raise argparse.ArgumentTypeError(f"invalid endpoint spec: {spec!r}")
+        weight = float(parts[2]) if len(parts) == 3 else 1.0
+        return cls(parts[0].upper(), parts[1], weight)
+
+
+DEFAULT_MIX = [
+    Endpoint("GET", "/api/status", 4),
+    Endpoint("POST", "/api/status", 1),
+    Endpoint("GET", "/api/", 1),
+]
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    latency: float
+    status: int
+    size: int = 0
+
+
+@dataclass
+class Summary:
+    count: int
+    errors: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+    mean: float
+    histogram: List[tuple] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "throughput_rps": round(self.throughput, 2),
+            "p50_ms": round(self.p50 * 1000, 3),
+            "p95_ms": round(self.p95 * 1000, 3),
+            "p99_ms": round(self.p99 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "mean_ms": round(self.mean * 1000, 3),
+            "histogram": [{"le_ms": round(le * 1000, 3), "count": n} for le, n in self.histogram],
+        }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def histogram(values: List[float], start: float = 0.0005, factor: float = 2.0) -> List[tuple]:
+    """Bucket latencies into log-spaced buckets (upper bound, count)."""
+    if not values:
+        return []
+    buckets = []
+    bound = start
+    remaining = sorted(values)
+    index = 0
+    while index < len(remaining):
+        count = 0
+        while index < len(remaining) and remaining[index] <= bound:
+            count += 1
+            index += 1
+        buckets.append((bound, count))
+        bound *= factor
+    return buckets
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Summary:
+    latencies = sorted(s.latency for s in samples)
+    errors = sum(1 for s in samples if s.status == 0 or s.status >= 400)
+    return Summary(
+        count=len(samples),
+        errors=errors,
+        throughput=len(samples) / elapsed if elapsed > 0 else 0.0,
+        p50=percentile(latencies, 50),
+        p95=percentile(latencies, 95),
+        p99=percentile(latencies, 99),
+        max=latencies[-1] if latencies else 0.0,
+        mean=sum(latencies) / len(latencies) if latencies else 0.0,
+        histogram=histogram(latencies),
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackendProcess:
+    """Runs backend/server.py under uvicorn in a child process."""
+
+    def __init__(self, mongo_url: str, db_name: str, port: Optional[int] = None, workers: int = 1):
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.port = port or free_port()
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 20.0) -> None:
+        env = dict(os.environ, MONGO_URL=self.mongo_url, DB_NAME=self.db_name)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"backend exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.base_url}/api/", timeout=0.5).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        self.stop()
+        raise RuntimeError("backend did not become ready in time")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def __enter__(self) -> "BackendProcess":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+async def _send(client: httpx.AsyncClient, endpoint: Endpoint, i: int, scheduled: float,
+                samples: List[Sample], semaphore: asyncio.Semaphore) -> None:
+    async with semaphore:
+        payload = PAYLOADS.get((endpoint.method, endpoint.path))
+        try:
+            response = await client.request(endpoint.method, endpoint.path,
+                                            json=payload(i) if payload else None)
+            status, size = response.status_code, len(response.content)
+        except httpx.HTTPError:
+            status, size = 0, 0
+        samples.append(Sample(endpoint.label, time.perf_counter() - scheduled, status, size))
+
+
+async def seed(base_url: str, count: int) -> None:
+    """Insert ``count`` status checks so list endpoints return realistic payloads."""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for i in range(count):
+            await client.post("/api/status", json={"client_name": f"seed-{i}"})
+
+
+async def run_load(base_url: str, endpoints: List[Endpoint], rps: float, duration: float,
+                   concurrency: int, rng: Optional[random.Random] = None) -> tuple:
+    """Fire requests open-loop at ``rps`` for ``duration`` seconds; return (samples, elapsed)."""
+    rng = rng or random.Random(0)
+    weights = [e.weight for e in endpoints]
+    total = max(1, int(rps * duration))
+    samples: List[Sample] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            tasks.append(asyncio.create_task(_send(client, endpoint, i, scheduled, samples, semaphore)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def format_report(samples: List[Sample], elapsed: float) -> str:
+    lines = []
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample.endpoint, []).append(sample)
+    overall = summarize(samples, elapsed)
+    lines.append(f"{'endpoint':<28}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, group in sorted(groups.items()) + [("TOTAL", samples)]:
+        s = overall if label == "TOTAL" else summarize(group, elapsed)
+        lines.append(f"{label:<28}{s.count:>8}{s.errors:>6}{s.throughput:>9.1f}"
+                     f"{s.p50 * 1000:>10.2f}{s.p95 * 1000:>10.2f}{s.p99 * 1000:>10.2f}{s.max * 1000:>10.2f}")
+    lines.append("")
+    lines.append("latency histogram (all endpoints)")
+    peak = max((n for _, n in overall.histogram), default=0) or 1
+    for bound, n in overall.histogram:
+        lines.append(f"  <= {bound * 1000:>9.2f} ms {n:>7} {'#' * round(40 * n / peak)}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=100.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=64, help="max in-flight requests")
+    parser.add_argument("-e", "--endpoint", type=Endpoint.parse, action="append",
+                        help="METHOD:PATH[:WEIGHT], repeatable (default: status mix)")
+    parser.add_argument("--mongo-url", default="memory://", help="memory:// or a local mongodb:// URL")
+    parser.add_argument("--db-name", default="loadtest")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (with memory:// each worker has its own store)")
+    parser.add_argument("--base-url", help="drive an already running backend instead of spawning one")
+    parser.add_argument("--seed", type=int, default=100, help="status checks to insert before the run")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args(argv)
+    endpoints = args.endpoint or DEFAULT_MIX
+
+    backend = None
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+    else:
+        backend = BackendProcess(args.mongo_url, args.db_name, workers=args.workers)
+        backend.start()
+        base_url = backend.base_url
+    try:
+        if args.seed:
+            asyncio.run(seed(base_url, args.seed))
+        samples, elapsed = asyncio.run(run_load(base_url, endpoints, args.rps, args.duration, args.concurrency))
+    finally:
+        if backend:
+            backend.stop()
+
+    if args.json:
+        groups: Dict[str, List[Sample]] = {}
+        for sample in samples:
+            groups.setdefault(sample.endpoint, []).append(sample)
+        result = {"elapsed_s": round(elapsed, 3), "total": summarize(samples, elapsed).to_dict(),
+                  "endpoints": {k: summarize(v, elapsed).to_dict() for k, v in groups.items()}}
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_report(samples, elapsed))
+    return 0 if not any(s.status == 0 or s.status >= 400 for s in samples) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -90,7 +90,7 @@ export type Database = {
           {
             foreignKeyName: "piani_salvati_invitato_id_fkey"
             columns: ["invitato_id"]
-            isOneToOne: false
+            isOneToOne: true
             referencedRelation: "invitati"
             referencedColumns: ["id"]
           },
@@ -177,6 +177,8 @@ export type Database = {
           lato: string | null
           nome_tavolo: string | null
           user_id: string
+          x: number | null
+          y: number | null
         }
         Insert: {
           capacita_max: number
@@ -185,6 +187,8 @@ export type Database = {
           lato?: string | null
           nome_tavolo?: string | null
           user_id: string
+          x?: number | null
+          y?: number | null
         }
         Update: {
           capacita_max?: number
@@ -193,6 +197,8 @@ export type Database = {
           lato?: string | null
           nome_tavolo?: string | null
           user_id?: string
+          x?: number | null
+          y?: number | null
         }
         Relationships: []
       }
@@ -0,0 +1,23 @@
+-- Per-wedding indexes: RLS limits every read to one user_id, so each index leads with it
+-- (equality columns first, then the ORDER BY column). These serve the frontend's PostgREST
+-- queries (benchmarks/bench_query_plans.py SUPABASE_QUERIES); the Mongo mirror's indexes in
+-- backend/index_advisor.py are a different set, for the backend's reads.
+
+-- Guest list (RLS user_id, ORDER BY created_at DESC)
+CREATE INDEX IF NOT EXISTS idx_invitati_user_created_at ON public.invitati (user_id, created_at DESC);
+
+-- Confirmed guests for seating (user_id, confermato, ORDER BY nome_visualizzato)
+CREATE INDEX IF NOT EXISTS idx_invitati_user_confermato ON public.invitati (user_id, confermato, nome_visualizzato);
+
+-- Members of an invitation unit, and its main guest
+CREATE INDEX IF NOT EXISTS idx_invitati_unita_principale ON public.invitati (unita_invito_id, is_principale);
+
+CREATE INDEX IF NOT EXISTS idx_unita_invito_user_id ON public.unita_invito (user_id, id);
+
+-- Tables of a wedding (ORDER BY created_at)
+CREATE INDEX IF NOT EXISTS idx_tavoli_user_created_at ON public.tavoli (user_id, created_at);
+
+-- piani_salvati and relazioni carry no user_id; they are reached through their foreign keys
+CREATE INDEX IF NOT EXISTS idx_piani_salvati_tavolo_id ON public.piani_salvati (tavolo_id);
+CREATE INDEX IF NOT EXISTS idx_piani_salvati_invitato_id ON public.piani_salvati (invitato_id);
+CREATE INDEX IF NOT EXISTS idx_relazioni_invitato_b_id ON public.relazioni (invitato_b_id);
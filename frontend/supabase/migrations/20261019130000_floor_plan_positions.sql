@@ -0,0 +1,15 @@
+-- Floor-plan positions, written by the backend's floor-plan buffer (backend/floor_plan.py)
+ALTER TABLE public.tavoli
+  ADD COLUMN IF NOT EXISTS x double precision,
+  ADD COLUMN IF NOT EXISTS y double precision;
+
+-- One seat per guest: the frontend reads a guest's seat with .single(), and the backend upserts
+-- seats on invitato_id so a retried flush updates the row it created. Keep the newest duplicate.
+DELETE FROM public.piani_salvati AS older
+  USING public.piani_salvati AS newer
+  WHERE older.invitato_id = newer.invitato_id AND older.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS piani_salvati_invitato_id_key ON public.piani_salvati (invitato_id);
+
+-- Covered by the unique index above
+DROP INDEX IF EXISTS public.idx_piani_salvati_invitato_id;
@@ -0,0 +1,42 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+# Signs the sessions ``bearer`` builds; every test app verifies them with it
+JWT_SECRET = "supabase-jwt-secret-for-the-tests"
+
+# backend/ is run as a flat module directory (uvicorn server:app), mirror that here
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "memory://")
+os.environ.setdefault("DB_NAME", "test_database")
+
+
+@pytest.fixture
+def app_factory():
+    """``create_app`` on the memory stand-in with background workers off; pass settings to opt back in."""
+    import server
+    from settings import Settings
+
+    def build(db_name: str = "test_database", **overrides):
+        defaults = dict(mongo_url="memory://", db_name=db_name, stats_reconcile_seconds=0, job_workers=0,
+                        notification_sink="off", supabase_jwt_secret=JWT_SECRET)
+        return server.create_app(Settings(**{**defaults, **overrides}))
+
+    return build
+
+
+@pytest.fixture
+def bearer():
+    """``Authorization`` headers for a Supabase session of ``user_id``, signed with ``secret``."""
+    import time
+
+    import jwt
+
+    def build(user_id: str, secret: str = JWT_SECRET, expires_in: float = 60.0):
+        claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "exp": int(time.time() + expires_in)}
+        return {"Authorization": f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}"}
+
+    return build
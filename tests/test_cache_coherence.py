@@ -0,0 +1,107 @@
+import asyncio
+import os
+
+import pytest
+
+from cache_coherence import POLL, WATCH, CacheCoherence
+from database import Database
+from guest_facets import GuestFacetService
+from settings import Settings
+from synthetic_data import generate_dataset
+from wedding_mirror import INSERT, UPDATE, RowChange, WeddingMirror
+
+
+def worker(database, mode):
+    mirror = WeddingMirror(database)
+    facets = GuestFacetService(mirror)
+    mirror.bus.subscribe(facets.on_change)
+    return mirror, facets, CacheCoherence(mirror, [facets], mode=mode, poll_seconds=0.01)
+
+
+async def settle(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "workers did not converge"
+        await asyncio.sleep(0.01)
+
+
+async def two_workers(database, mode):
+    data = generate_dataset(1, 60, seed=4)
+    user_id = data["invitati"][0]["user_id"]
+    mirror_a, _, coherence_a = worker(database, mode)
+    mirror_b, facets_b, coherence_b = worker(database, mode)
+    for table in ("tavoli", "invitati", "piani_salvati"):
+        for row in data[table]:
+            await mirror_a.ingest(RowChange(table, INSERT, row))
+    await coherence_a.start()
+    await coherence_b.start()
+    try:
+        # As the ETag middleware does: read the version, then serve
+        coherence_b.ensure_fresh(user_id, await mirror_b.data_version(user_id))
+        cached = await facets_b.get(user_id)
+
+        # A single-row change on A is patched into B's cached model, not rebuilt
+        guest = dict(data["invitati"][0], gruppo="colleagues")
+        await mirror_a.ingest(RowChange("invitati", UPDATE, guest))
+        await settle(lambda: cached.query({"category": ["colleagues"]}, include_ids=True)["ids"].count(guest["id"]))
+        assert facets_b.cached(user_id) is cached
+        assert coherence_b.versions[user_id] == await mirror_b.data_version(user_id)
+
+        # A bulk write has no row change to replay: B evicts and rebuilds from Mongo on next use
+        await mirror_a.bulk_upsert("invitati", [dict(guest, gruppo="friends")])
+        await settle(lambda: facets_b.cached(user_id) is None)
+        rebuilt = await facets_b.get(user_id)
+        assert guest["id"] in rebuilt.query({"category": ["friends"]}, include_ids=True)["ids"]
+        return coherence_b.tailing
+    finally:
+        await coherence_a.stop()
+        await coherence_b.stop()
+
+
+def test_workers_patch_and_evict_through_the_event_log():
+    database = Database(Settings(mongo_url="memory://", db_name="coherence"))
+    assert asyncio.run(two_workers(database, "auto")) == POLL
+
+
+def test_versions_gate_patches():
+    async def scenario():
+        database = Database(Settings(mongo_url="memory://", db_name="coherence_versions"))
+        mirror, facets, coherence = worker(database, "poll")
+        data = generate_dataset(1, 10, seed=1)
+        user_id = data["invitati"][0]["user_id"]
+        await mirror.replace_wedding(user_id, {"invitati": data["invitati"]})
+        coherence.ensure_fresh(user_id, await mirror.data_version(user_id))
+        model = await facets.get(user_id)
+        version = coherence.versions[user_id]
+        moved = RowChange("invitati", UPDATE, dict(data["invitati"][1], gruppo="colleagues", user_id=user_id))
+
+        await coherence.handle({"origin": "other", "versions": [{"user_id": user_id, "version": version}],
+                                "change": None})
+        assert facets.cached(user_id) is model                      # already seen
+        await coherence.handle({"origin": "other", "versions": [{"user_id": user_id, "version": version + 1}],
+                                "change": moved.__dict__})
+        assert facets.cached(user_id) is model and model.query({"category": ["colleagues"]})["total"] >= 1
+        await coherence.handle({"origin": "other", "versions": [{"user_id": user_id, "version": version + 3}],
+                                "change": moved.__dict__})
+        assert facets.cached(user_id) is None                       # a version was skipped
+        coherence.ensure_fresh(user_id, version + 3)
+        await facets.get(user_id)
+        coherence.ensure_fresh(user_id, version + 4)
+        assert facets.cached(user_id) is None                       # the store is ahead of what we saw
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not os.environ.get("MONGO_REPLSET_URL"), reason="needs MONGO_REPLSET_URL (single-node replica set)")
+def test_change_streams_on_a_replica_set():
+    database = Database(Settings(mongo_url=os.environ["MONGO_REPLSET_URL"], db_name="coherence_test"))
+
+    async def scenario():
+        for name in await database.db.list_collection_names():
+            await database.db.drop_collection(name)
+        return await two_workers(database, "watch")
+
+    try:
+        assert asyncio.run(scenario()) == WATCH
+    finally:
+        database.close()
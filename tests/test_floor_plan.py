@@ -0,0 +1,235 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from floor_plan import EditConflict, FloorPlanBuffer
+from postgrest_fake import FakePostgrest
+from settings import Settings
+from synthetic_data import generate_dataset
+from wedding_mirror import WeddingMirror
+
+
+def wedding(name, seed=46):
+    mirror = WeddingMirror(Database(Settings(mongo_url="memory://", db_name=name)))
+    data = generate_dataset(1, 30, seed=seed)
+    return mirror, data, data["invitati"][0]["user_id"]
+
+
+def supabase(monkeypatch, data):
+    """A fake Supabase holding ``data`` that PostgrestClients built from then on talk to."""
+    fake = FakePostgrest({table: data[table] for table in ("tavoli", "invitati", "piani_salvati")})
+    monkeypatch.setenv("SUPABASE_URL", fake.url)
+    monkeypatch.setattr("supabase_rest.requests.Session", lambda: fake)
+    return fake
+
+
+def test_a_drag_session_becomes_one_write_per_collection(monkeypatch):
+    mirror, data, user_id = wedding("floor_coalesce")
+    table, other = data["tavoli"][0]["id"], data["tavoli"][1]["id"]
+    seated = {row["invitato_id"] for row in data["piani_salvati"]}
+    guest = next(g["id"] for g in data["invitati"] if g["id"] not in seated)
+    dropped = data["piani_salvati"][0]
+    fake = supabase(monkeypatch, data)
+    buffer = FloorPlanBuffer(mirror, write_key="service")
+    changes = []
+
+    async def record(change):
+        changes.append(change)
+
+    mirror.bus.subscribe(record)
+
+    async def run():
+        await mirror.replace_wedding(user_id, data)
+        for step in range(200):
+            await buffer.submit(user_id, [{"op": "move", "table_id": table, "x": step, "y": step * 2}])
+        await buffer.submit(user_id, [{"op": "assign", "guest_id": guest, "table_id": table}])
+        await buffer.submit(user_id, [{"op": "assign", "guest_id": guest, "table_id": other},
+                                      {"op": "unassign", "guest_id": dropped["invitato_id"]}])
+        view = await buffer.view(user_id)
+        assert await mirror.db.tavoli.find_one({"id": table}, {"_id": 0, "x": 1}) == {}
+        written = await buffer.flush(user_id)
+        stored = await mirror.db.tavoli.find_one({"id": table}, {"_id": 0})
+        seats = await mirror.rows("piani_salvati", user_id, {"invitato_id": guest})
+        return view, written, stored, seats
+
+    view, written, stored, seats = asyncio.run(run())
+    assert view["pending"] == 3 and view["version"] == 202
+    assert next(t for t in view["tables"] if t["id"] == table)["x"] == 199
+    assert buffer.writes == 2 and written == len(changes) == 3
+    assert (stored["x"], stored["y"]) == (199, 398)
+    assert [s["tavolo_id"] for s in seats] == [other]
+    # Supabase has the same rows, and the new seat carries the id it gave out
+    remote_table = next(row for row in fake.tables["tavoli"] if row["id"] == table)
+    assert (remote_table["x"], remote_table["y"]) == (199, 398)
+    remote_seats = {row["invitato_id"]: row for row in fake.tables["piani_salvati"]}
+    assert remote_seats[guest]["id"] == seats[0]["id"] and "user_id" not in remote_seats[guest]
+    assert dropped["invitato_id"] not in remote_seats
+
+
+def test_stale_expected_version_rejects_the_whole_batch():
+    mirror, data, user_id = wedding("floor_conflict")
+    table, guest = data["tavoli"][0]["id"], data["invitati"][0]["id"]
+    buffer = FloorPlanBuffer(mirror)
+
+    async def run():
+        await mirror.replace_wedding(user_id, data)
+        first = await buffer.submit(user_id, [{"op": "move", "table_id": table, "x": 1, "y": 1,
+                                               "expected_version": 0}])
+        try:
+            await buffer.submit(user_id, [{"op": "assign", "guest_id": guest, "table_id": table},
+                                          {"op": "move", "table_id": table, "x": 9, "y": 9, "expected_version": 0}])
+        except EditConflict as exc:
+            return first, exc, await buffer.view(user_id)
+
+    first, conflict, view = asyncio.run(run())
+    assert first["entities"] == {f"table:{table}": 1}
+    assert conflict.conflicts == [{"entity": f"table:{table}", "expected": 0, "current": 1}]
+    assert view["pending"] == 1 and view["version"] == 1
+
+
+def test_unflushed_edits_survive_a_crash(tmp_path, monkeypatch):
+    journal = tmp_path / "floor.journal"
+    mirror, data, user_id = wedding("floor_crash")
+    table, guest = data["tavoli"][0]["id"], data["piani_salvati"][0]["invitato_id"]
+    fake = supabase(monkeypatch, data)
+
+    async def crash():
+        await mirror.replace_wedding(user_id, data)
+        buffer = FloorPlanBuffer(mirror, str(journal), write_key="service")
+        await buffer.submit(user_id, [{"op": "move", "table_id": table, "x": 5, "y": 6}])
+        await buffer.submit(user_id, [{"op": "move", "table_id": table, "x": 7, "y": 8},
+                                      {"op": "unassign", "guest_id": guest}])
+        # Process dies here without flushing; the last append was torn
+        with journal.open("a") as handle:
+            handle.write('{"user_id": "')
+
+    async def restart():
+        buffer = FloorPlanBuffer(mirror, str(journal), write_key="service")
+        await buffer.start()
+        await buffer.stop()
+        return (await mirror.db.tavoli.find_one({"id": table}, {"_id": 0}),
+                await mirror.rows("piani_salvati", user_id, {"invitato_id": guest}),
+                (await buffer.view(user_id))["version"])
+
+    asyncio.run(crash())
+    assert len(journal.read_text().splitlines()) == 3
+    stored, seats, version = asyncio.run(restart())
+    assert (stored["x"], stored["y"]) == (7, 8) and seats == [] and version == 2
+    assert journal.read_text() == ""
+    assert all(row["invitato_id"] != guest for row in fake.tables["piani_salvati"])
+
+
+def test_first_requests_share_one_plan(monkeypatch):
+    mirror, data, user_id = wedding("floor_first")
+    tables = [t["id"] for t in data["tavoli"][:4]]
+    supabase(monkeypatch, data)
+    buffer = FloorPlanBuffer(mirror, write_key="service")
+    versions, find_one = buffer.versions, buffer.versions.find_one
+
+    async def round_trip(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await find_one(*args, **kwargs)
+
+    versions.find_one = round_trip
+
+    async def run():
+        await mirror.replace_wedding(user_id, data)
+        await asyncio.gather(*(buffer.submit(user_id, [{"op": "move", "table_id": t, "x": 1, "y": 1}])
+                               for t in tables))
+        return await buffer.view(user_id)
+
+    view = asyncio.run(run())
+    assert view["version"] == 4 and view["pending"] == 4
+
+
+def test_route_flushes_on_idle_and_reports_conflicts(tmp_path, monkeypatch, app_factory, bearer):
+    data = generate_dataset(1, 30, seed=7)
+    user_id = data["invitati"][0]["user_id"]
+    table = data["tavoli"][0]["id"]
+    supabase(monkeypatch, data)
+    readonly = app_factory("floor_readonly")
+    with TestClient(readonly) as client:
+        assert client.post("/api/floor-plan/edits", params={"user_id": user_id},
+                           json={"ops": [{"op": "move", "table_id": table, "x": 1, "y": 1}]}).status_code == 503
+
+    app = app_factory("floor_api", floor_plan_journal=str(tmp_path / "j"), supabase_write_key="service")
+    with TestClient(app, headers=bearer(user_id)) as client:
+        client.portal.call(app.state.mirror.replace_wedding, user_id, data)
+        params = {"user_id": user_id}
+        move = {"ops": [{"op": "move", "table_id": table, "x": 5, "y": 5}]}
+        # The service key writes for whoever asks, so only the wedding's own session may
+        assert client.post("/api/floor-plan/edits", params=params, json=move, headers={"Authorization": ""}
+                           ).status_code == 401
+        assert client.post("/api/floor-plan/edits", params=params, json=move, headers=bearer("someone-else")
+                           ).status_code == 403
+        forged = bearer(user_id, "not-the-supabase-jwt-secret-of-this-app")
+        assert client.post("/api/floor-plan/flush", params=params, headers=forged).status_code == 401
+        moved = client.post("/api/floor-plan/edits", params=params,
+                            json={"ops": [{"op": "move", "table_id": table, "x": 10, "y": 20}]})
+        assert moved.status_code == 200 and moved.json()["pending"] == 1
+        stale = client.post("/api/floor-plan/edits", params=params,
+                            json={"ops": [{"op": "move", "table_id": table, "x": 0, "y": 0, "expected_version": 0}]})
+        assert stale.status_code == 409 and stale.json()["detail"]["conflicts"][0]["current"] == 1
+        assert client.post("/api/floor-plan/edits", params=params,
+                           json={"ops": [{"op": "spin", "table_id": table}]}).status_code == 422
+        assert client.post("/api/floor-plan/edits", params=params,
+                           json={"ops": [{"op": "move", "table_id": 10 ** 9, "x": 0, "y": 0}]}).status_code == 422
+        for _ in range(100):
+            if client.get("/api/floor-plan", params=params).json()["pending"] == 0:
+                break
+            client.portal.call(asyncio.sleep, 0.05)
+        stored = client.portal.call(app.state.mirror.db.tavoli.find_one, {"id": table}, {"_id": 0})
+        assert (stored["x"], stored["y"]) == (10, 20)
+        view = client.get("/api/floor-plan", params=params).json()
+        assert next(t for t in view["tables"] if t["id"] == table)["version"] == 1
+
+
+def test_a_retried_flush_does_not_seat_a_guest_twice(monkeypatch):
+    mirror, data, user_id = wedding("floor_retry")
+    seated = {row["invitato_id"] for row in data["piani_salvati"]}
+    guest = next(g["id"] for g in data["invitati"] if g["id"] not in seated)
+    fake = supabase(monkeypatch, data)
+    buffer = FloorPlanBuffer(mirror, write_key="service")
+    seats = mirror.db.piani_salvati
+    bulk_write = seats.bulk_write
+
+    async def fails_once(*args, **kwargs):
+        seats.bulk_write = bulk_write
+        raise ConnectionError("mirror unavailable")
+
+    async def run():
+        await mirror.replace_wedding(user_id, data)
+        await buffer.submit(user_id, [{"op": "assign", "guest_id": guest, "table_id": data["tavoli"][0]["id"]}])
+        seats.bulk_write = fails_once
+        try:
+            await buffer.flush(user_id)
+        except ConnectionError:
+            pass
+        # Supabase took the seat, the mirror did not: the retry must update that row
+        assert (await buffer.view(user_id))["pending"] == 1
+        await buffer.flush(user_id)
+        return await mirror.rows("piani_salvati", user_id, {"invitato_id": guest})
+
+    stored = asyncio.run(run())
+    remote = [row for row in fake.tables["piani_salvati"] if row["invitato_id"] == guest]
+    assert len(remote) == 1 and [row["id"] for row in stored] == [remote[0]["id"]]
+
+
+def test_replayed_edits_without_a_write_key_stay_in_the_journal(tmp_path):
+    journal = tmp_path / "floor.journal"
+    mirror, data, user_id = wedding("floor_nokey")
+    table = data["tavoli"][0]["id"]
+    journal.write_text(json.dumps({"user_id": user_id, "version": 1, "entities": {f"table:{table}": 1},
+                                   "ops": [{"op": "move", "table_id": table, "x": 3, "y": 4}]}) + "\n")
+
+    async def run():
+        await mirror.replace_wedding(user_id, data)
+        buffer = FloorPlanBuffer(mirror, str(journal))
+        await buffer.start()
+        await buffer.stop()
+        return (await buffer.view(user_id))["pending"]
+
+    assert asyncio.run(run()) == 1
+    assert json.loads(journal.read_text())["ops"][0]["x"] == 3
@@ -0,0 +1,83 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from forecast import AttendanceModel, ForecastService, simulate
+from guest_rows import guest_status
+from settings import Settings
+from synthetic_data import generate_dataset
+from wedding_mirror import WeddingMirror
+
+
+def test_units_move_together_without_changing_each_guests_odds():
+    probabilities, units = [0.3, 0.3, 0.3, 0.3, 0.8], [0, 0, 0, 0, 1]
+    apart = simulate(probabilities, units, rho=0.0, simulations=50_000, seed=1)
+    together = simulate(probabilities, units, rho=1.0, simulations=50_000, seed=1)
+    assert abs(apart.mean() - 2.0) < 0.03 and abs(together.mean() - 2.0) < 0.03
+    # The four-member unit contributes all or none of its guests
+    assert set(together.tolist()) <= {0, 1, 4, 5}
+    assert together.var() > 2 * apart.var()
+
+
+def test_rates_are_learned_per_cell_and_units_found_correlated():
+    guests = [{"id": i, "unita_invito_id": i // 2, "gruppo": "friends", "fascia_eta": "Adulto",
+               "confermato": (i // 2) % 4 != 0} for i in range(400)]
+    guests += [{"id": 1000 + i, "unita_invito_id": 1000 + i, "gruppo": "colleagues", "fascia_eta": "Adulto",
+                "confermato": i % 5 == 0} for i in range(100)]
+    model = AttendanceModel.from_guests(guests)
+    assert abs(model.probability(("friends", "Adulto")) - 0.75) < 0.02
+    assert abs(model.probability(("colleagues", "Adulto")) - 0.2) < 0.05
+    # An unseen cell borrows its group's rate
+    assert abs(model.probability(("friends", "Bambino")) - model.groups["friends"]) < 1e-9
+    assert model.rho > 0.95
+
+
+def test_forecast_route_is_fast_and_consistent(app_factory):
+    app = app_factory("forecast")
+    data = generate_dataset(4, 300, seed=47)
+    user_id = data["invitati"][0]["user_id"]
+    with TestClient(app) as client:
+        for uid in {g["user_id"] for g in data["invitati"]}:
+            client.portal.call(app.state.mirror.replace_wedding, uid,
+                               {table: [r for r in rows if r.get("user_id") == uid] for table, rows in data.items()})
+        forecast = client.get("/api/forecast", params={"user_id": user_id, "seed": 3}).json()
+        again = client.get("/api/forecast", params={"user_id": user_id, "seed": 3}).json()
+        assert client.get("/api/forecast", params={"user_id": user_id, "simulations": 10 ** 7}).status_code == 422
+
+    mine = [g for g in data["invitati"] if g["user_id"] == user_id]
+    assert forecast["confirmed"] == sum(guest_status(g) == "confirmed" for g in mine)
+    assert forecast["pending"] == sum(guest_status(g) == "pending" for g in mine) > 0
+    quantiles = list(forecast["quantiles"].values())
+    assert quantiles == sorted(quantiles) and forecast["confirmed"] <= forecast["min"]
+    assert forecast["max"] <= forecast["confirmed"] + forecast["pending"]
+    assert 0.0 <= forecast["probability_over_capacity"] <= 1.0
+    # Fitted from the other three weddings only: this one's pending guests are not yet declines
+    others = [g for g in data["invitati"] if g["user_id"] != user_id and guest_status(g) != "deleted"]
+    assert forecast["history_guests"] == len(others) and forecast["unit_correlation"] > 0.5
+    assert forecast["quantiles"] == again["quantiles"] and forecast["elapsed_ms"] < 1000
+
+
+def test_model_from_grouped_counts_matches_the_guest_list():
+    mirror = WeddingMirror(Database(Settings(mongo_url="memory://", db_name="forecast_counts")))
+    data = generate_dataset(3, 120, seed=48)
+    service = ForecastService(mirror, ttl_seconds=0.0)
+
+    async def run():
+        for uid in {g["user_id"] for g in data["invitati"]}:
+            await mirror.replace_wedding(uid, {table: [r for r in rows if r.get("user_id") == uid]
+                                               for table, rows in data.items()})
+        first = await service.model()
+        # Past the TTL the cached model is still served while the refresh runs
+        stale = await service.model()
+        await service._refresh
+        return first, stale, await service.model(), await service.model(user_id)
+
+    user_id = data["invitati"][0]["user_id"]
+    first, stale, refreshed, theirs = asyncio.run(run())
+    others = [g for g in data["invitati"] if g["user_id"] != user_id]
+    for model, guests in ((first, data["invitati"]), (theirs, others)):
+        expected = AttendanceModel.from_guests(guests)
+        assert model.cells == expected.cells and model.confirmed == expected.confirmed
+        assert abs(model.rho - expected.rho) < 1e-9 and model.guests == expected.guests
+    assert stale is first and refreshed is not first
@@ -0,0 +1,35 @@
+"""The data flow frontend_integration_test.py traced (auth settings, planner query, mapping), on ``FakePostgrest``."""
+
+from postgrest_fake import FakePostgrest
+
+KEY = "anon-test-key"
+HEADERS = {"apikey": KEY, "Authorization": f"Bearer {KEY}", "Content-Type": "application/json"}
+# The query useSupabaseConfirmedGuests.ts sends
+HOOK_QUERY = {"select": "id,nome_visualizzato,cognome,note,gruppo,confermato,user_id,unita_invito_id",
+              "confermato": "eq.true", "order": "nome_visualizzato"}
+
+
+def confirmed_guests(supabase):
+    response = supabase.get(f"{supabase.url}/rest/v1/invitati", params=HOOK_QUERY, headers=HEADERS, timeout=10)
+    assert response.status_code == 200
+    return [{"id": str(g["id"]), "name": g["nome_visualizzato"], "category": g["gruppo"] or "Altri invitati",
+             "dietaryRestrictions": g["note"], "tableId": None, "seatNumber": None, "user_id": g["user_id"],
+             "confermato": True} for g in response.json()]
+
+
+def test_auth_settings_endpoint_needs_the_anon_key():
+    supabase = FakePostgrest(api_keys=[KEY])
+    assert supabase.get(f"{supabase.url}/auth/v1/settings", headers={"apikey": KEY}).status_code == 200
+    assert supabase.get(f"{supabase.url}/auth/v1/settings", headers={"apikey": "wrong"}).status_code == 401
+
+
+def test_planner_receives_real_guests_sorted_by_name():
+    guests = confirmed_guests(FakePostgrest.seeded(1, 80, seed=7))
+    assert guests
+    names = [guest["name"] for guest in guests]
+    assert names == sorted(names)
+
+
+def test_empty_wedding_leaves_the_planner_without_guests():
+    # The "mock data" report: an empty invitati table, not a broken query
+    assert confirmed_guests(FakePostgrest({"invitati": []})) == []
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from guest_attributes import ATTRS_FIELD, backfill, note_attributes
+from guest_rows import guest_status, parse_note
+from settings import Settings
+from synthetic_data import build_note, generate_dataset
+from wedding_mirror import RowChange, WeddingMirror
+
+
+def test_notes_decode_into_typed_attributes():
+    json_note = note_attributes({"note": build_note("Glutine, Lattosio; frutta a guscio", "2025-09-02T10:00:00+02:00")})
+    assert json_note["deleted"] and json_note["deleted_at"] == datetime(2025, 9, 2, 8, 0)
+    assert json_note["allergens"] == ["glutine", "lattosio", "frutta a guscio"] and json_note["has_allergies"]
+    legacy = note_attributes({"note": "deleted_at:2025-09-03T00:00:00Z"})
+    assert legacy["deleted"] and legacy["deleted_at"] == datetime(2025, 9, 3) and not legacy["has_allergies"]
+    plain = note_attributes({"note": "Crostacei"})
+    assert not plain["deleted"] and plain["allergies"] == "Crostacei" and plain["allergens"] == ["crostacei"]
+    assert note_attributes({"note": None}) == dict(note_attributes({"note": ""}), deleted=False, allergens=[])
+
+
+def test_backfill_fills_legacy_rows_in_batches():
+    mirror = WeddingMirror(Database(Settings(mongo_url="memory://", db_name="attrs_backfill")))
+    guests = generate_dataset(2, 150, seed=49)["invitati"]
+
+    async def run():
+        # Rows as an older mirror stored them, without attrs
+        await mirror.db.invitati.insert_many([dict(g) for g in guests])
+        updated = await backfill(mirror, batch_size=64)
+        again = await backfill(mirror)
+        stored = await mirror.db.invitati.find({ATTRS_FIELD: {"$exists": False}}).to_list(None)
+        rows = await mirror.rows("invitati", guests[0]["user_id"])
+        return updated, again, stored, rows
+
+    updated, again, missing, rows = asyncio.run(run())
+    assert (updated, again, missing) == (len(guests), 0, [])
+    assert all(ATTRS_FIELD not in row for row in rows)
+
+
+def test_backfill_does_not_overwrite_a_note_written_meanwhile():
+    mirror = WeddingMirror(Database(Settings(mongo_url="memory://", db_name="attrs_backfill_race")))
+    guests = generate_dataset(1, 20, seed=49)["invitati"]
+    guest = dict(guests[0], note="Crostacei")
+    collection = mirror.db.invitati
+    bulk_write = collection.bulk_write
+
+    async def webhook_first(*args, **kwargs):
+        # A webhook lands between the backfill's read and its write
+        collection.bulk_write = bulk_write
+        await mirror.bulk_upsert("invitati", [guest])
+        return await bulk_write(*args, **kwargs)
+
+    async def run():
+        await collection.insert_many([dict(g, note=None) for g in guests])
+        collection.bulk_write = webhook_first
+        updated = await backfill(mirror)
+        return updated, await collection.find_one({"id": guest["id"]})
+
+    updated, stored = asyncio.run(run())
+    assert updated == len(guests) - 1
+    assert stored["note"] == "Crostacei" and stored[ATTRS_FIELD]["allergens"] == ["crostacei"]
+
+
+def test_filters_follow_writes_and_match_parsing(app_factory):
+    app = app_factory("attrs_api")
+    data = generate_dataset(1, 200, seed=50)
+    user_id = data["invitati"][0]["user_id"]
+    guests = data["invitati"]
+    with TestClient(app) as client:
+        client.portal.call(app.state.mirror.replace_wedding, user_id, data)
+        params = {"user_id": user_id}
+        active = client.get("/api/guests", params=params).json()
+        deleted = client.get("/api/guests", params=dict(params, status="deleted")).json()
+        allergic = client.get("/api/guests/allergies", params=params).json()
+        gluten = client.get("/api/guests/allergies", params=dict(params, allergen="GLUTINE")).json()
+
+        target = next(g for g in guests if guest_status(g) != "deleted")
+        change = RowChange("invitati", "UPDATE", dict(target, note=build_note("uova", "2025-10-01T00:00:00Z")))
+        client.portal.call(app.state.mirror.ingest, change)
+        after = {g["id"] for g in client.get("/api/guests", params=dict(params, status="deleted")).json()}
+        eggs = client.get("/api/guests/allergies", params=dict(params, allergen="uova", include_deleted=True)).json()
+        indexes = app.state.database.db.invitati.indexes
+
+    assert {g["id"] for g in active} == {g["id"] for g in guests if guest_status(g) != "deleted"}
+    assert {g["id"] for g in deleted} == {g["id"] for g in guests if guest_status(g) == "deleted"}
+    live = [g for g in guests if guest_status(g) != "deleted"]
+    assert {g["id"] for g in allergic} == {g["id"] for g in live if parse_note(g.get("note")).get("allergies")}
+    assert gluten and {g["id"] for g in gluten} == {
+        g["id"] for g in live if parse_note(g.get("note")).get("allergies") == "glutine"}
+    assert all(ATTRS_FIELD not in g for g in active)
+    assert target["id"] in after and target["id"] in {g["id"] for g in eggs}
+    assert "user_id_1_attrs.deleted_1" in indexes and "user_id_1_attrs.allergens_1" in indexes
@@ -0,0 +1,58 @@
+from itertools import combinations
+
+from fastapi.testclient import TestClient
+
+from guest_dedupe import find_duplicates, name_key, trigrams
+from synthetic_data import build_note, generate_dataset
+
+
+def guest(i, name, unit=None, **extra):
+    return {"id": i, "unita_invito_id": unit or i, "user_id": "u1", "nome_visualizzato": name,
+            "gruppo": "friends", "confermato": None, **extra}
+
+
+def test_reordered_accented_and_misspelled_names_are_suggested():
+    rows = [
+        guest(1, "Marco Rossi"),
+        guest(2, "ROSSI Marco", confermato=True),
+        guest(3, "Niccolò D'Angelo"),
+        guest(4, "Niccolo D Angelo"),
+        guest(5, "Giulia Bianchi"),
+        guest(6, "Giulia Bianchii"),
+        guest(7, "Marco Rossi", unit=1),             # companion in the same unit: not a duplicate
+        guest(8, "Marco Rossi", note=build_note(deleted_at="2025-09-01")),
+        guest(9, "Sara Conti"),
+    ]
+    suggestions = find_duplicates(rows)
+    pairs = [(s.keep["id"], s.duplicate["id"]) for s in suggestions]
+
+    assert (2, 1) in pairs and (2, 7) in pairs    # confirmed guest is the one to keep
+    assert (3, 4) in pairs and (5, 6) in pairs
+    assert (1, 7) not in pairs and not any(8 in pair or 9 in pair for pair in pairs)
+    assert suggestions[-1].reasons == ["similar_name", "same_group"]
+    assert all(a.score >= b.score for a, b in zip(suggestions, suggestions[1:]))
+
+
+def test_prefix_filter_finds_every_pair_a_full_comparison_finds():
+    rows = generate_dataset(1, 400, seed=5, deleted_rate=0)["invitati"]
+    expected = set()
+    for a, b in combinations(rows, 2):
+        ga, gb = trigrams(name_key(a)), trigrams(name_key(b))
+        if a["unita_invito_id"] != b["unita_invito_id"] and len(ga & gb) / len(ga | gb) >= 0.5:
+            expected.add(frozenset((a["id"], b["id"])))
+    found = {frozenset((s.keep["id"], s.duplicate["id"])) for s in find_duplicates(rows, 0.5)}
+    assert found == expected
+
+
+def test_duplicates_endpoint(app_factory):
+    app = app_factory("dedupe", supabase_webhook_secret="hook")
+    events = [{"type": "INSERT", "table": "invitati", "record": row}
+              for row in (guest(1, "Marco Rossi"), guest(2, "Rossi Marco"), guest(3, "Anna Gallo"))]
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"}, json=events)
+        body = client.get("/api/guests/duplicates", params={"user_id": "u1"}).json()
+    assert body == [{"keep": {"id": 1, "nome_visualizzato": "Marco Rossi", "unita_invito_id": 1,
+                              "gruppo": "friends", "confermato": None},
+                     "duplicate": {"id": 2, "nome_visualizzato": "Rossi Marco", "unita_invito_id": 2,
+                                   "gruppo": "friends", "confermato": None},
+                     "score": 1.0, "reasons": ["same_name", "same_group"]}]
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from guest_facets import FACETS, WeddingFacets, guest_facets
+from guest_rows import table_side
+from synthetic_data import generate_dataset
+
+
+def brute_force(data, predicate):
+    sides = {t["id"]: table_side(t) for t in data["tavoli"]}
+    seat = {s["invitato_id"]: s["tavolo_id"] for s in data["piani_salvati"]}
+    matched = []
+    for guest in data["invitati"]:
+        table = seat.get(guest["id"])
+        values = dict(guest_facets(guest), table=str(table) if table else "unassigned",
+                      side=sides[table] if table else "unassigned")
+        if predicate(values):
+            matched.append((guest["id"], values))
+    return matched
+
+
+@pytest.fixture(scope="module")
+def data():
+    return generate_dataset(1, 500, seed=21, deleted_rate=0.05, allergy_rate=0.2)
+
+
+def test_selection_counts_are_disjunctive(data):
+    facets = WeddingFacets(data["invitati"], data["tavoli"], data["piani_salvati"])
+    selection = {"category": ["friends", "colleagues"], "status": ["confirmed"], "side": ["sposa", "centro"]}
+    result = facets.query(selection, include_ids=True)
+
+    def picks(values, skip=None):
+        return all(values[f] in chosen for f, chosen in selection.items() if f != skip)
+
+    matched = brute_force(data, picks)
+    assert result["total"] == len(matched) and result["ids"] == sorted(i for i, _ in matched)
+    for facet in FACETS:
+        expected = {}
+        for _, values in brute_force(data, lambda v: picks(v, skip=facet)):
+            expected[values[facet]] = expected.get(values[facet], 0) + 1
+        assert {k: v for k, v in result["facets"][facet].items() if v} == expected
+
+
+def test_expressions_and_incremental_changes(data):
+    facets = WeddingFacets(data["invitati"], data["tavoli"], data["piani_salvati"])
+    expression = {"or": [{"and": [{"facet": "allergies", "in": ["yes"]}, {"not": {"facet": "age", "in": ["Adulto"]}}]},
+                         {"facet": "table", "in": ["unassigned"]}]}
+    result = facets.query_expression(expression, include_ids=True)
+    expected = brute_force(data, lambda v: (v["allergies"] == "yes" and v["age"] != "Adulto")
+                           or v["table"] == "unassigned")
+    assert result["ids"] == sorted(i for i, _ in expected)
+    assert sum(result["facets"]["status"].values()) == result["total"]
+
+    # Move a table to another side, unseat someone, drop and re-add guests
+    table = dict(data["tavoli"][0], lato="sposa" if data["tavoli"][0]["lato"] != "sposa" else "sposo")
+    facets.put_table(table)
+    facets.remove_seat(data["piani_salvati"][-1]["id"])
+    rng = random.Random(3)
+    gone = rng.sample(data["invitati"], 40)
+    for guest in gone:
+        facets.remove_guest(guest["id"])
+    for guest in gone[:20]:
+        facets.put_guest(dict(guest, gruppo="colleagues"))
+
+    gone_ids = {g["id"] for g in gone[20:]}
+    changed = dict(data, tavoli=[table] + data["tavoli"][1:], piani_salvati=data["piani_salvati"][:-1],
+                   invitati=[dict(g, gruppo="colleagues") if g in gone[:20] else g
+                             for g in data["invitati"] if g["id"] not in gone_ids])
+    fresh = WeddingFacets(changed["invitati"], changed["tavoli"], changed["piani_salvati"])
+    assert len(facets) == len(fresh)
+    assert facets.query({}, include_ids=True) == fresh.query({}, include_ids=True)
+    assert facets.query_expression(expression) == fresh.query_expression(expression)
+    with pytest.raises(ValueError):
+        facets.query_expression({"facet": "colour", "in": ["red"]})
+
+
+def test_facets_endpoints_follow_webhooks(app_factory):
+    app = app_factory("facets", supabase_webhook_secret="hook")
+    guest = {"id": 1, "unita_invito_id": 1, "user_id": "u1", "nome_visualizzato": "Anna Gallo",
+             "gruppo": "friends", "fascia_eta": "Adulto", "confermato": True, "note": None}
+    with TestClient(app) as client:
+        def hook(table, record, type_="INSERT"):
+            client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"},
+                        json={"type": type_, "table": table, "record": record})
+
+        hook("invitati", guest)
+        params = {"user_id": "u1", "status": "confirmed", "side": "sposa"}
+        assert client.get("/api/guests/facets", params=params).json()["total"] == 0
+        hook("tavoli", {"id": 7, "user_id": "u1", "nome_tavolo": "T7", "capacita_max": 8, "lato": "sposa"})
+        hook("piani_salvati", {"id": 3, "invitato_id": 1, "tavolo_id": 7})
+        body = client.get("/api/guests/facets", params=dict(params, include_ids="true")).json()
+        assert body["total"] == 1 and body["ids"] == [1] and body["facets"]["table"] == {"7": 1}
+
+        expression = {"filter": {"not": {"facet": "side", "in": ["sposa"]}}}
+        assert client.post("/api/guests/facets", params={"user_id": "u1"}, json=expression).json()["total"] == 0
+        assert client.post("/api/guests/facets", params={"user_id": "u1"},
+                           json={"filter": {"xor": []}}).status_code == 422
+        assert client.get("/api/guests/facets", params={"user_id": "u1", "status": "x"}).json()["total"] == 0
@@ -0,0 +1,83 @@
+from fastapi.testclient import TestClient
+
+from guest_search import GuestSearchIndex
+from synthetic_data import build_note, generate_dataset
+
+
+def guest(i, name, gruppo="friends", allergies=None, **extra):
+    return {"id": i, "unita_invito_id": i, "user_id": "u1", "nome_visualizzato": name, "gruppo": gruppo,
+            "confermato": True, "note": build_note(allergies) if allergies else None, **extra}
+
+
+def ids(results):
+    return [r["id"] for r in results]
+
+
+def test_prefix_accent_infix_typo_and_ranking():
+    index = GuestSearchIndex([
+        guest(1, "Niccolò Ferrè"),
+        guest(2, "Marco Rossi"),
+        guest(3, "Marta Russo", allergies="lattosio"),
+        guest(4, "Lucia Marchetti", gruppo="colleagues"),
+        guest(5, "Carlo Lattanzi"),
+        guest(6, "Mario Rossi", note=build_note(deleted_at="2025-09-01")),
+    ])
+    assert ids(index.search("nicco")) == [1]
+    assert ids(index.search("FERRE")) == [1]
+    assert ids(index.search("mar")) == [4, 2, 3]        # name hits, ordered by name on ties
+    assert ids(index.search("ossi")) == [2]             # infix
+    assert ids(index.search("rosi")) == [2]             # dropped letter
+    assert ids(index.search("latt")) == [5, 3]          # name before allergy
+    assert ids(index.search("colleag")) == [4]
+    assert ids(index.search("marco rossi")) == [2]
+    assert ids(index.search("rossi marco")) == [2]
+    assert index.search("zzz") == [] and index.search("  ") == []
+    assert ids(index.search("m", limit=2)) == [4, 2]
+
+
+def test_incremental_updates_match_a_fresh_build():
+    rows = generate_dataset(1, 300, seed=11)["invitati"]
+    removed, readded = rows[::3], [dict(r, nome_visualizzato=r["nome_visualizzato"] + " Bis") for r in rows[::6]]
+    index = GuestSearchIndex(rows)
+    for row in removed:
+        index.remove(row["id"])
+    for row in readded:
+        index.add(row)
+    removed_ids = {r["id"] for r in removed}
+    fresh = GuestSearchIndex([r for r in rows if r["id"] not in removed_ids] + readded)
+    assert len(index) == len(fresh)
+    for query in ("a", "ma", "ros", "bis", "esposito", "glutine", "family", "fede"):
+        assert index.search(query, limit=50) == fresh.search(query, limit=50)
+    assert index._root.children.keys() == fresh._root.children.keys()
+
+
+def test_updating_a_guest_whose_words_share_a_prefix():
+    index = GuestSearchIndex([guest(1, "Anna Annamaria"), guest(2, "Marco Marconi")])
+    index.add(guest(1, "Anna Annamaria Bis"))
+    index.add(guest(2, "Marco Rossi"))
+    assert ids(index.search("annamaria")) == [1] and ids(index.search("anna")) == [1]
+    assert ids(index.search("marconi")) == [] and ids(index.search("marco")) == [2]
+    index.remove(1)
+    assert index.search("anna") == [] and "a" not in index._root.children
+
+
+def test_search_endpoint_follows_webhook_writes(app_factory):
+    app = app_factory("search", supabase_webhook_secret="hook")
+    headers = {"X-Webhook-Secret": "hook"}
+    with TestClient(app) as client:
+        def hook(type_, record=None, old_record=None):
+            client.post("/api/webhooks/supabase", headers=headers,
+                        json={"type": type_, "table": "invitati", "record": record, "old_record": old_record})
+
+        def search(q):
+            return ids(client.get("/api/guests/search", params={"user_id": "u1", "q": q}).json())
+
+        hook("INSERT", guest(1, "Giulia Bianchi"))
+        assert search("giu") == [1]
+        hook("INSERT", guest(2, "Giulio Verdi"))
+        hook("UPDATE", guest(1, "Giulia Neri"))
+        assert search("giuli") == [1, 2] and search("bianchi") == [] and search("neri") == [1]
+        hook("UPDATE", guest(2, "Giulio Verdi", note=build_note(deleted_at="2025-09-02")))
+        hook("DELETE", old_record={"id": 1})
+        assert search("giu") == []
+        assert client.get("/api/guests/search", params={"user_id": "u1"}).status_code == 422
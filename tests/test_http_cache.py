@@ -0,0 +1,76 @@
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from http_cache import CompressionMiddleware, negotiate
+from synthetic_data import generate_dataset
+
+HOOK = {"X-Webhook-Secret": "hook"}
+
+
+def test_etag_revalidation_skips_the_query(app_factory):
+    data = generate_dataset(1, 300, seed=5)
+    app = app_factory("http_cache", supabase_webhook_secret="hook")
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers=HOOK,
+                    json=[{"type": "INSERT", "table": table, "record": row}
+                          for table in ("invitati", "tavoli", "piani_salvati") for row in data[table]])
+        user_id = data["invitati"][0]["user_id"]
+        url = f"/api/guests/facets?user_id={user_id}&include_ids=true"
+
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        etag = plain.headers["etag"]
+        assert plain.status_code == 200 and "content-encoding" not in plain.headers
+        assert client.get(f"/api/guests/facets?include_ids=true&user_id={user_id}",
+                          headers={"Accept-Encoding": "identity"}).headers["etag"] == etag
+
+        zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert zipped.headers["content-encoding"] == "gzip" and zipped.headers["etag"] == etag[:-1] + '-gzip"'
+        assert zipped.json() == plain.json() and int(zipped.headers["content-length"]) < len(plain.content)
+
+        facets, app.state.facets = app.state.facets, None          # a 304 must not touch the read model
+        for tag, coding in ((etag, "identity"), (zipped.headers["etag"], "gzip")):
+            cached = client.get(url, headers={"If-None-Match": tag, "Accept-Encoding": coding})
+            assert cached.status_code == 304 and cached.content == b"" and cached.headers["etag"] == tag
+        app.state.facets = facets
+
+        guest = dict(data["invitati"][0], nome_visualizzato="Renamed")
+        client.post("/api/webhooks/supabase", headers=HOOK, json={"type": "UPDATE", "table": "invitati",
+                                                                  "record": guest})
+        assert client.get("/api/stats", params={"user_id": user_id},
+                          headers={"If-None-Match": etag}).status_code == 200
+        fresh = client.get(url, headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+        assert fresh.status_code == 200 and fresh.headers["etag"] != etag
+
+
+def test_streamed_bodies_are_compressed_chunk_by_chunk():
+    async def numbers(request):
+        async def chunks():
+            for i in range(200):
+                yield f"{i:>8}\n".encode() * 20
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    async def events(request):
+        async def chunks():
+            yield b"data: {}\n\n" * 200
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    app = CompressionMiddleware(Starlette(routes=[Route("/numbers", numbers), Route("/events", events)]))
+    with TestClient(app) as client:
+        response = client.get("/numbers", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+        assert response.text == "".join(f"{i:>8}\n" * 20 for i in range(200))
+        with client.stream("GET", "/numbers", headers={"Accept-Encoding": "gzip"}) as raw:
+            assert gzip.decompress(b"".join(raw.iter_raw())).startswith(b"       0\n")
+        assert "content-encoding" not in client.get("/events", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_negotiate():
+    assert negotiate("gzip, deflate, br", brotli_available=True) == "br"
+    assert negotiate("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.5", brotli_available=True) == "gzip"
+    assert negotiate("*;q=0", brotli_available=True) is None
+    assert negotiate(None, brotli_available=True) is None
@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import pytest
+
+from database import Database
+from index_advisor import HOT_QUERIES, MIRROR_INDEXES, advise, collection_scans, ensure_service_indexes, migrate_indexes
+from memory_mongo import MemoryMongoClient
+from settings import Settings
+from synthetic_data import generate_dataset
+from wedding_mirror import WeddingMirror
+
+
+def test_migration_creates_compound_indexes_once_and_retires_user_id():
+    db = MemoryMongoClient()["advisor"]
+
+    async def run():
+        # Indexes as the mirror created them before the migration set
+        await db.invitati.create_index([("id", 1)], unique=True)
+        await db.invitati.create_index([("user_id", 1)])
+        await db.tavoli.create_index([("user_id", 1)])
+        first = await migrate_indexes(db)
+        again = await migrate_indexes(db)
+        return first, again, await db.invitati.index_information(), await db.tavoli.index_information()
+
+    first, again, guests, tables = asyncio.run(run())
+    assert "invitati.id_1" not in first["created"] and len(first["created"]) == len(MIRROR_INDEXES) - 1
+    assert sorted(first["dropped"]) == ["invitati.user_id_1", "tavoli.user_id_1"]
+    assert again == {"created": [], "dropped": []}
+    assert "user_id_1" not in guests and guests["user_id_1_id_1"]["key"] == [("user_id", 1), ("id", 1)]
+    assert "user_id_1" not in tables and "user_id_1_id_1" in tables
+
+
+def test_collection_scans_are_reported_with_a_tenant_first_suggestion():
+    db = MemoryMongoClient()["advisor"]
+    reports = {report["query"]: report for report in asyncio.run(advise(db))}
+    assert set(collection_scans(reports.values())) == {shape.name for shape in HOT_QUERIES if not shape.full_scan}
+    assert reports["forecast history"]["collscan"] and "suggested" not in reports["forecast history"]
+    assert reports["floor plan seats"]["suggested"] == "user_id_1_invitato_id_1"
+    assert reports["active guests"]["suggested"] == "user_id_1_attrs.deleted_1"
+
+
+def populated_reports(database, reset=False):
+    """Advise on one seeded wedding, with the mirror's and the services' indexes in place."""
+    mirror = WeddingMirror(database)
+    data = generate_dataset(3, 80, seed=50)
+    user_id = data["invitati"][0]["user_id"]
+
+    async def run():
+        if reset:
+            await database.client.drop_database(database.settings.db_name)
+        await mirror.replace_wedding(user_id, {table: [r for r in rows if r.get("user_id") in (None, user_id)]
+                                               for table, rows in data.items() if table != "profiles"})
+        await ensure_service_indexes(database)
+        return await advise(mirror.db, HOT_QUERIES, user_id), await mirror.db.invitati.index_information()
+
+    return asyncio.run(run())
+
+
+def test_every_hot_query_uses_an_index_on_a_populated_mirror():
+    reports, indexes = populated_reports(Database(Settings(mongo_url="memory://", db_name="advisor_mirror")))
+    assert collection_scans(reports) == []
+    assert not any(report["blocking_sort"] for report in reports)
+    by_name = {report["query"]: report["index"] for report in reports}
+    assert by_name["floor plan tables"] == "user_id_1_id_1"
+    assert by_name["floor plan seats"] == "user_id_1_invitato_id_1"
+    assert by_name["due notifications"] == "status_1_next_attempt_at_1"
+    assert by_name["worker jobs"] == "owner_1_status_1"
+    assert by_name["status summary"] == "granularity_1_client_name_1_start_1"
+    assert "user_id_1" not in indexes
+
+
+@pytest.mark.skipif(not os.environ.get("MONGO_REPLSET_URL"), reason="needs MONGO_REPLSET_URL (any mongod)")
+def test_every_hot_query_uses_an_index_on_mongod():
+    database = Database(Settings(mongo_url=os.environ["MONGO_REPLSET_URL"], db_name="advisor_test"))
+    try:
+        reports, _ = populated_reports(database, reset=True)
+    finally:
+        database.close()
+    assert collection_scans(reports) == []
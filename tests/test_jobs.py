@@ -0,0 +1,106 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from jobs import CANCELLED, QUEUED, RUNNING, SUCCEEDED, JobRunner, job_kind
+from settings import Settings
+from synthetic_data import generate_dataset
+
+
+@job_kind("test.count")
+async def count_job(context, params):
+    start = (context.checkpoint or {}).get("step", 0)
+    seen = []
+    for step in range(start, params["steps"]):
+        seen.append(step)
+        await context.report(step / params["steps"], best={"step": step}, checkpoint={"step": step + 1})
+        await asyncio.sleep(params.get("delay", 0))
+    return {"seen": seen}
+
+
+def wait_for(client, job_id, statuses, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_jobs_run_report_and_cancel(app_factory):
+    data = generate_dataset(1, 40, seed=2, assign=False)
+    app = app_factory("jobs", supabase_webhook_secret="hook", job_workers=2)
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"},
+                    json=[{"type": "INSERT", "table": table, "record": row}
+                          for table in ("invitati", "tavoli") for row in data[table]])
+        user_id = data["invitati"][0]["user_id"]
+
+        created = client.post("/api/jobs", json={"kind": "seating.seed", "user_id": user_id})
+        assert created.status_code == 202 and created.json()["status"] == "queued"
+        seeded = wait_for(client, created.json()["id"], ("succeeded", "failed"))
+        assert seeded["status"] == SUCCEEDED and seeded["progress"] == 1.0 and seeded["attempts"] == 1
+        assert seeded["result"]["unseated"] == [] and seeded["best"]["score"] <= seeded["result"]["score"]
+
+        slow = client.post("/api/jobs", json={"kind": "test.count", "params": {"steps": 10_000, "delay": 0.005}}).json()
+        wait_for(client, slow["id"], (RUNNING,))
+        assert client.delete(f"/api/jobs/{slow['id']}").json()["cancel_requested"] is True
+        cancelled = wait_for(client, slow["id"], (CANCELLED,))
+        assert 0 <= cancelled["best"]["step"] < 10_000
+
+        events = client.get(f"/api/jobs/{slow['id']}/events").text
+        assert events.startswith("data: ") and '"status":"cancelled"' in events
+
+        assert client.post("/api/jobs", json={"kind": "nope"}).status_code == 422
+        assert client.get("/api/jobs/missing").status_code == 404
+        assert {job["kind"] for job in client.get("/api/jobs").json()} == {"seating.seed", "test.count"}
+
+
+def test_stale_jobs_resume_from_checkpoint():
+    async def scenario():
+        database = Database(Settings(mongo_url="memory://", db_name="jobs_resume"))
+        crashed = JobRunner(database, workers=0)
+        job = await crashed.submit("test.count", {"steps": 5})
+        claimed = await crashed._claim()
+        assert claimed["id"] == job["id"] and claimed["status"] == RUNNING
+        # The owner dies after checkpointing step 3
+        await crashed.collection.update_one({"id": job["id"]}, {"$set": {
+            "checkpoint": {"step": 3}, "heartbeat_at": datetime.now(timezone.utc) - timedelta(minutes=5)}})
+
+        runner = JobRunner(database, workers=1)
+        await runner.start()
+        for _ in range(200):
+            done = await runner.get(job["id"])
+            if done["status"] == SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+        await runner.stop()
+        return done
+
+    done = asyncio.run(scenario())
+    assert done["status"] == SUCCEEDED and done["attempts"] == 2
+    assert done["result"] == {"seen": [3, 4]}
+
+
+def test_graceful_restarts_do_not_use_up_attempts():
+    async def scenario():
+        database = Database(Settings(mongo_url="memory://", db_name="jobs_restart"))
+        job = await JobRunner(database, workers=0).submit("test.count", {"steps": 1000, "delay": 0.01})
+        for _ in range(4):
+            runner = JobRunner(database, workers=1)
+            await runner.start()
+            while (await runner.get(job["id"]))["status"] != RUNNING:
+                await asyncio.sleep(0.01)
+            await runner.stop()
+        # Stale as if every worker had died; a job restarted gracefully must not be failed for it
+        await runner.collection.update_one({"id": job["id"]}, {"$set": {
+            "status": RUNNING, "heartbeat_at": datetime.now(timezone.utc) - timedelta(minutes=5)}})
+        await runner.requeue_stale()
+        return await runner.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == QUEUED and job["attempts"] == 0
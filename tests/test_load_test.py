@@ -0,0 +1,31 @@
+import asyncio
+
+from benchmarks.load_test import BackendProcess, Endpoint, histogram, percentile, run_load, summarize
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_histogram_buckets_cover_all_samples():
+    values = [0.0001, 0.0007, 0.003, 0.003, 0.2]
+    buckets = histogram(values)
+    assert sum(n for _, n in buckets) == len(values)
+    assert buckets[0] == (0.0005, 1)
+
+
+def test_endpoint_parse():
+    assert Endpoint.parse("get:/api/status:3") == Endpoint("GET", "/api/status", 3.0)
+
+
+def test_short_run_against_memory_backend():
+    with BackendProcess("memory://", "loadtest") as backend:
+        endpoints = [Endpoint("GET", "/api/status", 1), Endpoint("POST", "/api/status", 1)]
+        samples, elapsed = asyncio.run(run_load(backend.base_url, endpoints, rps=50, duration=0.4, concurrency=8))
+    summary = summarize(samples, elapsed)
+    assert summary.count == 20
+    assert summary.errors == 0
+    assert 0 < summary.p50 <= summary.p95 <= summary.p99
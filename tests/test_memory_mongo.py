@@ -0,0 +1,44 @@
+import asyncio
+
+from pymongo import ReturnDocument, UpdateOne
+
+from memory_mongo import MemoryMongoClient, matches
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_matches_supports_operators_and_dotted_paths():
+    doc = {"a": 5, "b": {"c": "x"}, "tags": ["p", "q"]}
+    assert matches(doc, {"a": {"$gte": 5, "$lt": 6}, "b.c": "x"})
+    assert matches(doc, {"tags": "q"})
+    assert matches(doc, {"$or": [{"a": 1}, {"missing": {"$exists": False}}]})
+    assert not matches(doc, {"a": {"$in": [1, 2]}})
+
+
+def test_insert_find_sort_and_projection():
+    db = MemoryMongoClient()["db"]
+    run(db.items.insert_many([{"n": 3}, {"n": 1}, {"n": 2}]))
+    docs = run(db.items.find({}, {"_id": 0}).sort("n", -1).limit(2).to_list(10))
+    assert docs == [{"n": 3}, {"n": 2}]
+
+
+def test_upsert_and_bulk_write():
+    db = MemoryMongoClient()["db"]
+    run(db.counters.update_one({"key": "a"}, {"$inc": {"v": 2}}, upsert=True))
+    result = run(db.counters.bulk_write([
+        UpdateOne({"key": "a"}, {"$inc": {"v": 1}}),
+        UpdateOne({"key": "b"}, {"$set": {"v": 7}}, upsert=True),
+    ]))
+    assert result.modified_count == 1 and result.upserted_count == 1
+    doc = run(db.counters.find_one_and_update({"key": "a"}, {"$inc": {"v": 1}}, return_document=ReturnDocument.AFTER))
+    assert doc["v"] == 4
+
+
+def test_returned_documents_are_copies():
+    db = MemoryMongoClient()["db"]
+    run(db.items.insert_one({"n": 1}))
+    doc = run(db.items.find_one({"n": 1}))
+    doc["n"] = 99
+    assert run(db.items.count_documents({"n": 1})) == 1
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import REGISTRY, MetricsMiddleware, metrics_router
+from mongo_metrics import MongoCommandListener
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    app.include_router(metrics_router)
+    app.add_middleware(MetricsMiddleware)
+    labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+    before = _sample("http_request_duration_seconds_count", labels)
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/nope")
+
+    assert _sample("http_request_duration_seconds_count", labels) == before + 2
+    assert _sample("http_requests_in_flight", {"method": "GET", "route": "/items/{item_id}"}) == 0
+    body = client.get("/metrics").text
+    assert 'route="<unmatched>"' in body
+    assert "http_response_size_bytes_bucket" in body
+
+
+def test_command_listener_records_collection_and_slow_queries(caplog):
+    listener = MongoCommandListener(slow_ms=5)
+    started = SimpleNamespace(request_id=1, connection_id=("h", 1), command_name="find",
+                              command={"find": "status_checks", "filter": {}})
+    listener.started(started)
+    listener.succeeded(SimpleNamespace(request_id=1, connection_id=("h", 1), command_name="find",
+                                       duration_micros=20_000))
+    labels = {"command": "find", "collection": "status_checks"}
+    assert _sample("mongo_command_duration_seconds_count", labels) >= 1
+    assert _sample("mongo_slow_commands_total", labels) >= 1
+    assert "Slow Mongo command find on status_checks" in caplog.text
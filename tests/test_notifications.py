@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+import notifications
+from database import Database
+from guest_rows import guest_status
+from notifications import FAILED, PENDING, SENDING, SENT, FileTransport, NotificationDispatcher, reminder_messages
+from settings import Settings
+from synthetic_data import generate_dataset
+
+
+def pending_guests(count):
+    return [{"id": i, "user_id": "u1", "nome_visualizzato": f"Ospite {i}", "confermato": False if i % 2 else None}
+            for i in range(count)] + [{"id": 10_000, "user_id": "u1", "confermato": True}]
+
+
+def dispatcher(name, transport, **kwargs):
+    return NotificationDispatcher(Database(Settings(mongo_url="memory://", db_name=name)), {"email": transport},
+                                  **kwargs)
+
+
+class RecordingTransport:
+    def __init__(self, max_batch=50, fail_every=0):
+        self.max_batch = max_batch
+        self.fail_every = fail_every
+        self.sent = Counter()
+        self.calls = 0
+
+    async def send_batch(self, messages):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        errors = []
+        for m in messages:
+            if self.fail_every and int(m["dedupe_key"].rsplit(":", 1)[1]) % self.fail_every == 0 and self.calls < 5:
+                errors.append("provider timeout")
+            else:
+                self.sent[m["dedupe_key"]] += 1
+                errors.append(None)
+        return errors
+
+
+def test_reminding_500_guests_sends_each_once_even_when_rerun(tmp_path):
+    sink = tmp_path / "outbox.jsonl"
+    outbox = dispatcher("notify_500", FileTransport(str(sink)))
+    messages = reminder_messages(pending_guests(500), "rsvp-1")
+    assert len(messages) == 500
+
+    async def run():
+        started = time.perf_counter()
+        first = await outbox.enqueue(messages)
+        await outbox.drain()
+        elapsed = time.perf_counter() - started
+        again = await outbox.enqueue(reminder_messages(pending_guests(500), "rsvp-1"))
+        await outbox.drain()
+        return first, again, elapsed, await outbox.counts("u1")
+
+    first, again, elapsed, counts = asyncio.run(run())
+    assert first == {"queued": 500, "duplicates": 0} and again == {"queued": 0, "duplicates": 500}
+    assert counts[SENT] == 500 and elapsed < 5
+    lines = [json.loads(line) for line in sink.read_text().splitlines()]
+    assert len(lines) == len({line["dedupe_key"] for line in lines}) == 500
+    # A fresh sink over the same file knows what it already wrote
+    assert len(FileTransport(str(sink)).delivered) == 500
+
+
+def test_failed_sends_are_retried_with_backoff(monkeypatch):
+    monkeypatch.setattr(notifications, "BASE_RETRY_SECONDS", 0.0)
+    transport = RecordingTransport(max_batch=20, fail_every=3)
+    outbox = dispatcher("notify_retry", transport, concurrency=2)
+
+    async def run():
+        await outbox.enqueue(reminder_messages(pending_guests(60), "rsvp-2"))
+        for _ in range(10):
+            await outbox.drain()
+        return await outbox.counts(), await outbox.list(status=SENT, limit=1000)
+
+    counts, sent = asyncio.run(run())
+    assert counts[SENT] == 60 and set(transport.sent.values()) == {1}
+    assert any(m["attempts"] > 1 for m in sent)
+
+
+def test_messages_give_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(notifications, "BASE_RETRY_SECONDS", 0.0)
+
+    class Down:
+        max_batch = 10
+
+        async def send_batch(self, messages):
+            raise ConnectionError("provider down")
+
+    outbox = dispatcher("notify_down", Down())
+
+    async def run():
+        await outbox.enqueue(reminder_messages(pending_guests(3), "rsvp-3"))
+        for _ in range(notifications.MAX_ATTEMPTS + 2):
+            await outbox.dispatch_once()
+        return await outbox.list(status=FAILED)
+
+    failed = asyncio.run(run())
+    assert len(failed) == 3 and all(m["attempts"] == notifications.MAX_ATTEMPTS for m in failed)
+    assert failed[0]["error"] == "ConnectionError: provider down"
+
+
+def test_competing_dispatchers_never_double_send():
+    database = Database(Settings(mongo_url="memory://", db_name="notify_race"))
+    transport = RecordingTransport(max_batch=25)
+    first, second = (NotificationDispatcher(database, {"email": transport}, batch_size=40) for _ in range(2))
+
+    async def run():
+        await first.enqueue(reminder_messages(pending_guests(300), "rsvp-4"))
+        await asyncio.gather(first.drain(), second.drain())
+
+    asyncio.run(run())
+    assert len(transport.sent) == 300 and set(transport.sent.values()) == {1}
+
+
+def test_reminder_route_queues_pending_guests_and_dispatches(tmp_path, app_factory):
+    sink = tmp_path / "sink.jsonl"
+    app = app_factory("notify_api", notification_sink=str(sink))
+    data = generate_dataset(1, 40, seed=45)
+    user_id = data["invitati"][0]["user_id"]
+    with TestClient(app) as client:
+        client.portal.call(app.state.mirror.replace_wedding, user_id, data)
+        queued = client.post("/api/notifications/reminders", params={"user_id": user_id},
+                             json={"campaign": "save-the-date"})
+        assert queued.status_code == 202
+        pending = sum(1 for g in data["invitati"] if guest_status(g) == "pending")
+        assert queued.json()["queued"] == pending > 0
+        assert client.post("/api/notifications/reminders", params={"user_id": user_id},
+                           json={"campaign": "x", "channel": "pigeon"}).status_code == 422
+        for _ in range(100):
+            if client.get("/api/notifications/summary", params={"user_id": user_id}).json()["sent"] == pending:
+                break
+            time.sleep(0.02)
+        assert client.get("/api/notifications/summary", params={"user_id": user_id}).json()["sent"] == pending
+    assert len(sink.read_text().splitlines()) == pending
+
+
+class SlowTransport:
+    max_batch = 10
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.started = asyncio.Event()
+        self.sent = Counter()
+
+    async def send_batch(self, messages):
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        self.sent.update(m["dedupe_key"] for m in messages)
+        return [None] * len(messages)
+
+
+def test_stop_finishes_sends_in_flight_and_releases_only_untouched_claims():
+    async def run(delay, timeout):
+        transport = SlowTransport(delay)
+        outbox = dispatcher(f"notify_stop_{timeout}", transport, concurrency=1)
+        await outbox.enqueue(reminder_messages(pending_guests(30), "rsvp-5"))
+        await outbox.start()
+        await transport.started.wait()
+        await outbox.stop(timeout)
+        messages = await outbox.list(limit=100)
+        return transport, Counter((m["status"], m["attempts"]) for m in messages)
+
+    # The batch with the transport completes; the two still queued behind it go straight back
+    transport, states = asyncio.run(run(0.05, 5.0))
+    assert sum(transport.sent.values()) == 10
+    assert states == {(SENT, 1): 10, (PENDING, 0): 20}
+    # A send that outlives the timeout may still reach the provider, so it is left to its lease
+    transport, states = asyncio.run(run(10.0, 0.05))
+    assert states == {(SENDING, 1): 10, (PENDING, 0): 20}
+
+
+def test_slow_sends_keep_their_lease(monkeypatch):
+    monkeypatch.setattr(notifications, "LEASE_SECONDS", 0.06)
+    transport = SlowTransport(0.2)
+    database = Database(Settings(mongo_url="memory://", db_name="notify_lease"))
+    sender, other = (NotificationDispatcher(database, {"email": transport}) for _ in range(2))
+
+    async def run():
+        await sender.enqueue(reminder_messages(pending_guests(4), "rsvp-6"))
+        sending = asyncio.create_task(sender.dispatch_once())
+        for _ in range(6):
+            await asyncio.sleep(0.03)
+            # Another dispatcher sweeping expired leases must not take a batch that is still being sent
+            await other.release_expired()
+            await other.dispatch_once()
+        await sending
+
+    asyncio.run(run())
+    assert len(transport.sent) == 4 and set(transport.sent.values()) == {1}
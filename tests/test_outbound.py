@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from outbound import BATCH, INTERACTIVE, OutboundScheduler, lane
+from supabase_rest import PostgrestClient, PostgrestError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload if payload is not None else []
+        self.headers = headers or {}
+        self.text = str(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+class ScriptedSession:
+    """Answers with queued statuses first, then 200s, after ``delay`` seconds."""
+
+    def __init__(self, statuses=(), delay=0.0, headers=None):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.headers = headers or {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, params=None, json=None, headers=None, timeout=None):
+        with self.lock:
+            self.calls.append((method, url, dict(params or {})))
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(self.delay)
+        return FakeResponse(status, [{"id": 1}], self.headers if status != 200 else {})
+
+
+def test_token_bucket_paces_each_endpoint_separately():
+    scheduler = OutboundScheduler(rate=50, burst=5, max_concurrency=8)
+    ok = FakeResponse()
+    started = time.perf_counter()
+    for _ in range(15):
+        scheduler.send("a", lambda: ok)
+    paced = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(5):
+        scheduler.send("b", lambda: ok)
+    assert paced >= (15 - 5) / 50 * 0.9
+    # Within its burst "b" is not paced at all; half of "a"'s pacing leaves room for a busy runner
+    assert time.perf_counter() - started < paced / 2
+
+
+def test_429_is_retried_after_retry_after_and_slows_the_endpoint():
+    session = ScriptedSession(statuses=[429, 503], headers={"Retry-After": "0.05"})
+    scheduler = OutboundScheduler(rate=100, burst=10)
+    client = PostgrestClient(url="http://supabase.test", key="k", session=session, scheduler=scheduler)
+
+    started = time.perf_counter()
+    assert client.select("invitati") == [{"id": 1}]
+    assert time.perf_counter() - started >= 0.1
+    assert len(session.calls) == 3 and scheduler.stats["retried"] == 2
+    assert scheduler.bucket("http://supabase.test/rest/v1/invitati").rate < 100
+
+
+def test_503_is_only_retried_for_idempotent_writes():
+    session = ScriptedSession(statuses=[503, 503, 429], headers={"Retry-After": "0"})
+    client = PostgrestClient(url="http://supabase.test", key="k", session=session,
+                             scheduler=OutboundScheduler(rate=100, burst=10))
+    # The first insert may have landed before the 503; resending it could duplicate the rows
+    try:
+        client.insert("tavoli", [{"nome_tavolo": "T1"}])
+    except PostgrestError as exc:
+        assert exc.status_code == 503
+    else:
+        raise AssertionError("insert retried a 503")
+    assert len(session.calls) == 1
+    # An upsert lands the same rows however often it is sent; a 429 was never read at all
+    assert client.upsert("tavoli", [{"id": 1}], ["id"]) == 1
+    assert client.insert("tavoli", [{"nome_tavolo": "T2"}]) == [{"id": 1}]
+    assert len(session.calls) == 5
+
+
+def test_identical_reads_in_flight_are_coalesced():
+    session = ScriptedSession(delay=0.1)
+    client = PostgrestClient(url="http://supabase.test", key="k", session=session,
+                             scheduler=OutboundScheduler())
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda _: client.select("tavoli", {"user_id": "eq.u1"}), range(5)))
+        other = pool.submit(client.select, "tavoli", {"user_id": "eq.u2"}).result()
+    assert all(rows == [{"id": 1}] for rows in results) and other == [{"id": 1}]
+    assert len(session.calls) == 2
+    # Writes are never shared
+    client.delete("tavoli", {"id": "eq.1"})
+    client.delete("tavoli", {"id": "eq.1"})
+    assert len(session.calls) == 4
+
+
+def test_interactive_calls_skip_the_batch_queue():
+    scheduler = OutboundScheduler(rate=1000, burst=1000, max_concurrency=2)
+    ok = FakeResponse()
+    finished = []
+
+    def slow(tag):
+        def call():
+            time.sleep(0.1)
+            finished.append(tag)
+            return ok
+        return call
+
+    def batch_call(i):
+        with lane(BATCH):
+            scheduler.send("relazioni", slow("batch"))
+
+    with ThreadPoolExecutor(12) as pool:
+        batch = [pool.submit(batch_call, i) for i in range(10)]
+        time.sleep(0.02)
+        started = time.perf_counter()
+        scheduler.send("relazioni", slow("interactive"), INTERACTIVE)
+        waited = time.perf_counter() - started
+        for future in batch:
+            future.result()
+    # Batch holds one of the two slots, so the interactive call neither waits for a slot nor queues behind it;
+    # queued behind the batch it would wait about 1 s, so 0.5 s keeps the check meaningful on a busy runner
+    assert waited < 0.5
+    assert finished.index("interactive") <= 2
+    assert scheduler._active == [0, 0]
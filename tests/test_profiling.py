@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from profiling import ProfilingMiddleware, RequestProfile, SlowProfileStore, profiles_router
+from settings import Settings
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.state.settings = Settings(mongo_url="memory://", db_name="profiling", profile_secret="s3cret")
+    app.state.profiles = SlowProfileStore(20)
+
+    @app.get("/api/slow")
+    def slow():
+        end = time.perf_counter() + 0.03
+        while time.perf_counter() < end:
+            pass
+        return {"ok": True}
+
+    api = APIRouter(prefix="/api")
+    api.include_router(profiles_router)
+    app.include_router(api)
+    app.add_middleware(ProfilingMiddleware, interval=0.001)
+    return TestClient(app)
+
+
+def test_requests_without_secret_are_not_profiled(client):
+    response = client.get("/api/slow", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    assert client.get("/api/admin/profiles").status_code == 404
+
+
+def test_profiled_request_is_stored_and_exported(client):
+    response = client.get("/api/slow?__profile=s3cret")
+    profile_id = response.headers["x-profile-id"]
+    headers = {"X-Profile": "s3cret"}
+
+    listed = client.get("/api/admin/profiles", headers=headers).json()
+    assert [p["id"] for p in listed] == [profile_id]
+
+    speedscope = client.get(f"/api/admin/profiles/{profile_id}", headers=headers).json()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    assert speedscope["shared"]["frames"]
+
+    collapsed = client.get(f"/api/admin/profiles/{profile_id}?format=collapsed", headers=headers).text
+    assert collapsed.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_store_keeps_only_the_slowest():
+    store = SlowProfileStore(2)
+    for i, duration in enumerate([0.1, 0.5, 0.2, 0.05]):
+        store.add(RequestProfile(str(i), "GET", "/", 200, duration, 0.001, None, samples={}))
+    assert [p.id for p in store.list()] == ["1", "2"]
@@ -0,0 +1,92 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from relationships import AUTO_PREFIX, GROUP_BONUS, SCORES, infer_and_store, infer_relationships, load_graph
+from settings import Settings
+from synthetic_data import build_note, generate_dataset
+from wedding_mirror import RowChange, WeddingMirror
+
+
+def guest(i, unit, nome, cognome, gruppo="friends", **extra):
+    return {"id": i, "unita_invito_id": unit, "user_id": "u1", "nome": nome, "cognome": cognome,
+            "nome_visualizzato": f"{nome} {cognome}", "gruppo": gruppo, "confermato": True, **extra}
+
+
+GUESTS = [
+    guest(1, 10, "Marco", "Ferrè"), guest(2, 10, "Anna", "Gallo"),
+    guest(3, 11, "Luca", "Ferre", gruppo="colleagues"),
+    guest(4, 12, "Sara", "Conti"),
+    guest(5, 13, "Elia", "Conti", note=build_note(deleted_at="2025-09-01")),
+] + [guest(100 + i, 200 + i, "Pietro", "Rossi") for i in range(8)]   # too common to mean family
+
+
+class RecordingClient:
+    def __init__(self):
+        self.upserts, self.deletes = [], []
+
+    def upsert(self, table, rows, on_conflict, chunk_size):
+        self.upserts.append((table, list(rows), tuple(on_conflict), chunk_size))
+        return len(rows)
+
+    def delete(self, table, params):
+        self.deletes.append((table, params))
+
+
+def test_inferred_edges_are_sparse_and_overrides_win():
+    graph = infer_relationships(GUESTS, overrides=[{"invitato_a_id": 2, "invitato_b_id": 3, "punteggio": -10,
+                                                     "tipo_relazione": "separare"}])
+    assert graph.weight(1, 2) == SCORES["stesso_invito"] + GROUP_BONUS
+    assert graph.weight(1, 3) == SCORES["stesso_cognome"]                # accent-folded surname, other group
+    assert graph.weight(2, 3) == -10 and graph.kinds[(2, 3)] == "separare"
+    assert graph.weight(4, 5) == 0 and 5 not in graph.adjacency          # deleted guest
+    assert graph.weight(100, 101) == 0 and graph.groups[100] == "friends"
+    assert len(graph) == 3
+
+    ids, indptr, indices, weights = graph.to_csr([1, 2, 3])
+    assert list(indptr) == [0, 2, 4, 6] and sorted(weights[indptr[1]:indptr[2]]) == [-10, 12]
+
+    rows = generate_dataset(1, 2000, seed=4)["invitati"]
+    assert len(infer_relationships(rows)) < 5 * len(rows)
+
+
+def test_infer_and_store_writes_only_the_diff_in_chunks():
+    async def scenario():
+        mirror = WeddingMirror(Database(Settings(mongo_url="memory://", db_name="rel")))
+        for row in GUESTS:
+            await mirror.ingest(RowChange("invitati", "INSERT", row))
+        await mirror.ingest(RowChange("relazioni", "INSERT", {"invitato_a_id": 3, "invitato_b_id": 4,
+                                                              "punteggio": 7, "tipo_relazione": "amici"}))
+        client = RecordingClient()
+        first = await infer_and_store(mirror, "u1", client, chunk_size=2)
+        again = await infer_and_store(mirror, "u1", client, chunk_size=2)
+        # Luca leaves: his surname edge to Marco is now stale
+        await mirror.ingest(RowChange("invitati", "DELETE", old_record={"id": 3}))
+        after = await infer_and_store(mirror, "u1", client, chunk_size=2)
+        stored = await mirror.rows("relazioni", "u1")
+        graph = await load_graph(mirror, "u1")
+        return first, again, after, client, stored, graph
+
+    first, again, after, client, stored, graph = asyncio.run(scenario())
+    assert first == {"guests": len(GUESTS), "edges": 2, "manual": 1, "upserted": 2, "deleted": 0}
+    assert again["upserted"] == 0 and again["deleted"] == 0
+    assert after["deleted"] == 1 and after["edges"] == 1
+    table, rows, on_conflict, chunk_size = client.upserts[0]
+    assert (table, on_conflict, chunk_size) == ("relazioni", ("invitato_a_id", "invitato_b_id"), 2)
+    assert all(row["tipo_relazione"].startswith(AUTO_PREFIX) and row["invitato_a_id"] < row["invitato_b_id"]
+               for row in rows)
+    assert client.deletes == [("relazioni", {"or": "(and(invitato_a_id.eq.1,invitato_b_id.eq.3))"})]
+    assert {(r["invitato_a_id"], r["invitato_b_id"]) for r in stored} == {(1, 2), (3, 4)}
+    assert graph.weight(1, 2) == 12 and 3 not in graph.adjacency
+
+
+def test_infer_endpoint_dry_run(app_factory):
+    app = app_factory("rel", supabase_webhook_secret="hook")
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"},
+                    json=[{"type": "INSERT", "table": "invitati", "record": row} for row in GUESTS[:3]])
+        report = client.post("/api/relationships/infer", params={"user_id": "u1", "dry_run": "true"}).json()
+        assert report == {"guests": 3, "edges": 2, "manual": 0, "upserted": 2, "deleted": 0}
+        assert client.post("/api/relationships/infer", params={"user_id": "u1"}).json()["upserted"] == 2
+        assert client.post("/api/relationships/infer", params={"user_id": "u1"}).json()["upserted"] == 0
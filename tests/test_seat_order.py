@@ -0,0 +1,76 @@
+import itertools
+import random
+
+from fastapi.testclient import TestClient
+
+from seat_order import SolverPool, TableProblem, arrangement_score, order_tables, seat_adjacency, solve_table
+from synthetic_data import generate_dataset
+
+
+def random_problem(rng, guests, seats, shape):
+    weights = [[0.0] * guests for _ in range(guests)]
+    for a, b in itertools.combinations(range(guests), 2):
+        weights[a][b] = weights[b][a] = rng.choice([0, 0, 1, 2, 5, 10])
+    return TableProblem(rng.randrange(1000), [100 + i for i in range(guests)], weights, seats, shape)
+
+
+def brute_force(problem):
+    padded = problem.guests + [None] * (problem.seats - len(problem.guests))
+    return max(arrangement_score(problem, list(seats)) for seats in itertools.permutations(padded))
+
+
+def test_layouts():
+    assert seat_adjacency("round", 4) == [(0, 1, 1.0), (1, 2, 1.0), (2, 3, 1.0), (3, 0, 1.0)]
+    assert sorted(seat_adjacency("rectangular", 5)) == [(0, 1, 1.0), (0, 3, 0.5), (1, 2, 1.0),
+                                                        (1, 4, 0.5), (3, 4, 1.0)]
+
+
+def test_exact_solvers_match_brute_force():
+    rng = random.Random(4)
+    for guests, seats, shape in [(6, 6, "round"), (6, 8, "round"), (7, 7, "square"),
+                                 (5, 6, "rectangular"), (6, 7, "rectangular")]:
+        problem = random_problem(rng, guests, seats, shape)
+        order = solve_table(problem)
+        assert order.method in ("held-karp", "exhaustive")
+        assert sorted(g for g in order.seats if g is not None) == problem.guests and len(order.seats) == seats
+        assert order.score == brute_force(problem)
+
+
+def test_heuristics_beat_entry_order_and_pool_matches_serial():
+    rng = random.Random(8)
+    problems = [random_problem(rng, 16, 18, "round"), random_problem(rng, 14, 14, "rectangular")]
+    problems += [random_problem(rng, n, 10, rng.choice(["round", "rectangular"])) for n in range(2, 10)]
+    serial = order_tables(problems, workers=1)
+    assert [o.method for o in serial[:2]] == ["2-opt", "swap"]
+    for problem, order in zip(problems, serial):
+        entry = problem.guests + [None] * (problem.seats - len(problem.guests))
+        assert order.score >= arrangement_score(problem, entry)
+    assert [o.to_dict() for o in order_tables(problems, workers=2)] == [o.to_dict() for o in serial]
+    pool = SolverPool(2)
+    try:
+        assert [o.to_dict() for o in order_tables(problems, 2, pool)] == [o.to_dict() for o in serial]
+        executor = pool.executor()
+        order_tables(problems[:3], 2, pool)
+        assert pool.executor() is executor
+    finally:
+        pool.shutdown()
+
+
+def test_order_endpoint(app_factory):
+    data = generate_dataset(1, 40, seed=2)
+    app = app_factory("seat_order", supabase_webhook_secret="hook")
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"},
+                    json=[{"type": "INSERT", "table": table, "record": row}
+                          for table in ("invitati", "tavoli", "piani_salvati") for row in data[table]])
+        user_id = data["invitati"][0]["user_id"]
+        body = client.post("/api/seating/order", params={"user_id": user_id, "shape": "rectangular"}).json()
+        first = data["tavoli"][0]["id"]
+        custom = client.post("/api/seating/order", params={"user_id": user_id},
+                             json={"assignments": {"1": first, "2": first}}).json()
+    seated = {s["invitato_id"]: s["seat_number"] for t in body["tables"] for s in t["seats"]}
+    assert set(seated) == {row["invitato_id"] for row in data["piani_salvati"]}
+    capacity = {t["id"]: t["capacita_max"] for t in data["tavoli"]}
+    assert all(1 <= s["seat_number"] <= capacity[t["id"]] for t in body["tables"] for s in t["seats"])
+    assert {t["shape"] for t in body["tables"]} == {"rectangular"}
+    assert [(t["id"], len(t["seats"])) for t in custom["tables"]] == [(first, 2)]
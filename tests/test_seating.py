@@ -0,0 +1,78 @@
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+from guest_rows import guest_category, guest_status
+from relationships import infer_relationships
+from seating import guest_side, plan_score, refine_plan, seed_plan, table_accepts
+from synthetic_data import generate_dataset
+
+
+def check_constraints(plan, guests, tables):
+    capacity = {t["id"]: t["capacita_max"] for t in tables}
+    lato = {t["id"]: t["lato"] for t in tables}
+    by_id = {g["id"]: g for g in guests}
+    assert all(n <= capacity[tid] for tid, n in Counter(plan.assignments.values()).items())
+    assert all(table_accepts(lato[tid], guest_side(by_id[gid])) for gid, tid in plan.assignments.items())
+
+
+def test_units_sides_and_overrides_are_respected():
+    def guest(i, unit, cognome, gruppo):
+        return {"id": i, "unita_invito_id": unit, "nome_visualizzato": f"Ospite {cognome}", "cognome": cognome,
+                "gruppo": gruppo, "confermato": True}
+
+    guests = ([guest(i, 1, "Rossi", "family-his") for i in (1, 2, 3)]
+              + [guest(i, 2, "Bianchi", "family-hers") for i in (4, 5)]
+              + [guest(6, 3, "Rossi", "family-his"), guest(7, 4, "Verdi", "friends"), guest(8, 5, "Neri", "friends")])
+    tables = [{"id": 10, "capacita_max": 4, "lato": "sposo"}, {"id": 11, "capacita_max": 4, "lato": "sposa"},
+              {"id": 12, "capacita_max": 4, "lato": "centro"}]
+    graph = infer_relationships(guests, overrides=[
+        {"invitato_a_id": 7, "invitato_b_id": 8, "punteggio": 6, "tipo_relazione": "amici"}])
+    plan = seed_plan(guests, tables, graph)
+
+    check_constraints(plan, guests, tables)
+    assert not plan.unseated
+    assert {plan.assignments[i] for i in (1, 2, 3, 6)} == {10}          # unit plus the Rossi cousin
+    assert plan.assignments[4] == plan.assignments[5]
+    assert plan.assignments[7] == plan.assignments[8]
+
+    tight = seed_plan(guests, tables[:1], graph)
+    assert sorted(tight.assignments) == [1, 2, 3, 6] and tight.unseated == [4, 5, 7, 8]
+
+
+def test_clustering_beats_first_fit_and_refinement_never_hurts():
+    data = generate_dataset(1, 400, seed=9, assign=False)
+    guests = [g for g in data["invitati"] if guest_status(g) != "deleted"]
+    graph = infer_relationships(guests)
+    groups = {g["id"]: guest_category(g) for g in guests}
+
+    seeded = seed_plan(guests, data["tavoli"], graph, refine=False)
+    refined = seed_plan(guests, data["tavoli"], graph)
+    check_constraints(refined, guests, data["tavoli"])
+    assert not refined.unseated and len(refined.assignments) == len(guests)
+    assert refined.score >= seeded.score == plan_score(graph, seeded.assignments, groups)
+    # Refining the seeded plan on its own lands where seeding with refinement does
+    assert refine_plan(seeded, guests, data["tavoli"], graph).assignments == refined.assignments
+
+    free = {t["id"]: t["capacita_max"] for t in data["tavoli"]}
+    first_fit = {}
+    for g in guests:
+        tid = next(t["id"] for t in data["tavoli"] if free[t["id"]] and table_accepts(t["lato"], guest_side(g)))
+        free[tid] -= 1
+        first_fit[g["id"]] = tid
+    assert refined.score > 1.2 * plan_score(graph, first_fit, groups)
+
+
+def test_seed_endpoint(app_factory):
+    data = generate_dataset(1, 40, seed=2, assign=False)
+    app = app_factory("seating", supabase_webhook_secret="hook")
+    with TestClient(app) as client:
+        client.post("/api/webhooks/supabase", headers={"X-Webhook-Secret": "hook"},
+                    json=[{"type": "INSERT", "table": table, "record": row}
+                          for table in ("invitati", "tavoli") for row in data[table]])
+        user_id = data["invitati"][0]["user_id"]
+        body = client.post("/api/seating/seed", params={"user_id": user_id}).json()
+    active = [g for g in data["invitati"] if guest_status(g) != "deleted"]
+    assert body["seated"] == len(active) and body["unseated"] == []
+    assert sum(len(t["guests"]) for t in body["tables"]) == len(active)
+    assert body["score"] == round(sum(t["score"] for t in body["tables"]), 3)
@@ -0,0 +1,59 @@
+import subprocess
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from memory_mongo import MemoryMongoClient
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory("test_database")
+
+
+def test_create_app_is_lazy_and_reports_startup(app_factory, monkeypatch):
+    clients = []
+    monkeypatch.setattr("database.create_client", lambda url, slow_ms: clients.append(url) or MemoryMongoClient(url))
+    app = app_factory()
+    assert clients == []
+    with TestClient(app) as client:
+        client.get("/api/")
+        assert set(app.state.startup_report) == {"imports_ms", "build_ms", "ready_ms"}
+        assert 'app_startup_seconds{phase="ready"}' in client.get("/metrics").text
+    # One client for the app's lifetime, created on first use
+    assert clients == ["memory://"]
+
+
+def test_apps_do_not_share_data(app_factory):
+    first = TestClient(app_factory("a"))
+    second = TestClient(app_factory("a"))
+    first.post("/api/status", json={"client_name": "solo qui"})
+    assert second.get("/api/status").json() == []
+
+
+def test_status_roundtrip_trusted_and_validated_reads_match(app):
+    client = TestClient(app)
+    created = client.post("/api/status", json={"client_name": "Maria e Giuseppe"})
+    assert created.status_code == 200
+    assert set(created.json()) == {"id", "client_name", "timestamp"}
+
+    trusted = client.get("/api/status")
+    app.state.settings = replace(app.state.settings, validate_db_reads=True)
+    validated = client.get("/api/status")
+
+    assert trusted.headers["content-type"] == "application/json"
+    assert trusted.json() == validated.json()
+    assert any(item["id"] == created.json()["id"] for item in trusted.json())
+    assert all("_id" not in item for item in trusted.json())
+
+
+def test_importing_the_server_leaves_heavy_libraries_unloaded():
+    heavy = ("pymongo", "motor", "bson", "numpy", "pandas")
+    script = f"import sys, server; print(' '.join(m for m in {heavy!r} if m in sys.modules))"
+    backend = Path(__file__).resolve().parent.parent / "backend"
+    loaded = subprocess.run([sys.executable, "-c", script], cwd=backend, capture_output=True, text=True,
+                            check=True).stdout.split()
+    assert loaded == []
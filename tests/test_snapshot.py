@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from outbound import OutboundScheduler
+from postgrest_fake import FakePostgrest
+from snapshot import SnapshotStore, guest_stats
+from supabase_rest import PostgrestClient
+
+
+def client_for(tables):
+    fake = FakePostgrest(tables)
+    return fake, PostgrestClient(url=fake.url, key="anon", session=fake, scheduler=OutboundScheduler())
+
+
+def guest(i, confermato, created_at, gruppo="Amici"):
+    return {"id": i, "unita_invito_id": i, "user_id": "u1", "nome_visualizzato": f"Ospite {i}",
+            "gruppo": gruppo, "confermato": confermato, "is_principale": True,
+            "created_at": created_at, "extra_column": "ignored"}
+
+
+def test_full_then_incremental_refresh(tmp_path):
+    rows = [guest(1, True, "2025-09-10T10:00:00+00:00"), guest(2, None, "2025-09-10T11:00:00+00:00")]
+    fake, client = client_for({"invitati": rows})
+    store = SnapshotStore(tmp_path)
+
+    report = store.refresh(client, ["invitati"], page_size=1)
+    assert report["invitati"] == {"fetched": 2, "deleted": 0, "rows": 2, "mode": "full"}
+
+    # Same timestamp as the watermark, committed after the first refresh read it
+    rows = fake.tables["invitati"]
+    rows.append(guest(4, True, "2025-09-10T11:00:00+00:00"))
+    rows.append(guest(3, False, "2025-09-11T09:00:00+00:00", gruppo="Colleghi"))
+    del rows[0]
+    report = store.refresh(client, ["invitati"])
+    assert report["invitati"] == {"fetched": 3, "deleted": 1, "rows": 3, "mode": "incremental"}
+    assert any(path == "/rest/v1/invitati" and query.get("created_at") == "gte.2025-09-10T11:00:00+00:00"
+               for _, path, query in fake.calls)
+    assert sorted(store.open("invitati")["id"].to_pylist()) == [2, 3, 4]
+
+    stats = guest_stats(store)
+    assert (stats["total"], stats["confirmed"], stats["unconfirmed"], stats["unknown"]) == (3, 1, 1, 1)
+    assert stats["by_group"] == {"Amici": 2, "Colleghi": 1}
+
+    # In-place edits only arrive with a full refresh, forced once the last one is old enough
+    rows[0]["confermato"] = True
+    assert store.refresh(client, ["invitati"])["invitati"]["mode"] == "incremental"
+    assert store.refresh(client, ["invitati"], full_after=timedelta(0))["invitati"]["mode"] == "full"
+    assert guest_stats(store)["confirmed"] == 2
+
+
+def test_snapshot_is_memory_mapped_and_numpy_readable(tmp_path):
+    _, client = client_for({"tavoli": [
+        {"id": i, "user_id": "u1", "capacita_max": 8 + i % 3, "created_at": None} for i in range(100)
+    ]})
+    store = SnapshotStore(tmp_path)
+    store.refresh(client, ["tavoli"])
+    capacity = store.open("tavoli")["capacita_max"].to_numpy()
+    assert capacity.sum() == sum(8 + i % 3 for i in range(100))
+    assert list(store.to_pandas("tavoli", ["id"]).columns) == ["id"]
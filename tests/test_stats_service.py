@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from synthetic_data import generate_dataset
+
+HEADERS = {"X-Webhook-Secret": "hook"}
+
+
+@pytest.fixture
+def client(app_factory):
+    app = app_factory("stats", supabase_webhook_secret="hook")
+    with TestClient(app) as client:
+        yield client
+
+
+def send(client, type_, table, record=None, old_record=None):
+    response = client.post("/api/webhooks/supabase", headers=HEADERS,
+                           json={"type": type_, "table": table, "schema": "public",
+                                 "record": record, "old_record": old_record})
+    assert response.status_code == 200, response.text
+
+
+def load_wedding(client):
+    data = generate_dataset(1, 60, seed=3)
+    events = [{"type": "INSERT", "table": table, "record": row}
+              for table in ("unita_invito", "invitati", "tavoli", "piani_salvati") for row in data[table]]
+    assert client.post("/api/webhooks/supabase", headers=HEADERS, json=events).json() == {"applied": len(events)}
+    return data
+
+
+def test_webhook_requires_secret(client):
+    assert client.post("/api/webhooks/supabase", json={}).status_code == 401
+
+
+def test_counters_follow_webhook_changes_and_match_full_recount(client):
+    data = load_wedding(client)
+    user_id = data["invitati"][0]["user_id"]
+    stats = client.get("/api/stats", params={"user_id": user_id}).json()
+
+    guests = data["invitati"]
+    assert stats["guests"]["total"] == len({g["unita_invito_id"] for g in guests})
+    assert stats["guests"]["confirmed"] + stats["guests"]["pending"] + stats["guests"]["deleted"] == len(guests)
+    assert stats["tables"]["occupiedSeats"] == len(data["piani_salvati"])
+    assert stats["tables"]["totalCapacity"] == sum(t["capacita_max"] for t in data["tavoli"])
+
+    # Soft-delete a confirmed guest, move a table to the other side, drop an assignment
+    guest = next(g for g in guests if g["confermato"] and "deleted_at" not in (g["note"] or ""))
+    send(client, "UPDATE", "invitati", dict(guest, note=json.dumps({"allergies": None, "deleted_at": "2025-10-01"})))
+    table = data["tavoli"][0]
+    send(client, "UPDATE", "tavoli", dict(table, lato="sposa" if table["lato"] != "sposa" else "sposo"))
+    send(client, "DELETE", "piani_salvati", old_record={"id": data["piani_salvati"][0]["id"]})
+    # A whole single-guest unit disappears
+    unit_id = next(u for u, n in _unit_sizes(guests).items() if n == 1)
+    send(client, "DELETE", "invitati", old_record={"id": next(g["id"] for g in guests if g["unita_invito_id"] == unit_id)})
+
+    after = client.get("/api/stats", params={"user_id": user_id}).json()
+    assert after["guests"]["deleted"] >= stats["guests"]["deleted"] + 1
+    assert after["guests"]["total"] == stats["guests"]["total"] - 1
+    assert after["tables"]["occupiedSeats"] == stats["tables"]["occupiedSeats"] - 1
+
+    # Incremental counters agree with a full recount
+    assert client.post("/api/stats/reconcile", params={"user_id": user_id}).json() == {user_id: {}}
+
+
+def test_reconciliation_repairs_drift(client):
+    data = load_wedding(client)
+    user_id = data["invitati"][0]["user_id"]
+    before = client.get("/api/stats", params={"user_id": user_id}).json()
+    db = client.app.state.database.db
+    client.portal.call(db.wedding_stats.update_one, {"user_id": user_id}, {"$inc": {"guests.confirmed": 5}})
+
+    drift = client.post("/api/stats/reconcile").json()
+    assert drift == {user_id: {"guests.confirmed": -5}}
+    assert client.get("/api/stats", params={"user_id": user_id}).json()["guests"] == before["guests"]
+
+
+def _unit_sizes(guests):
+    sizes = {}
+    for g in guests:
+        sizes[g["unita_invito_id"]] = sizes.get(g["unita_invito_id"], 0) + 1
+    return sizes
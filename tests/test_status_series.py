@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from database import Database
+from settings import Settings
+from status_series import COLLECTION, LEGACY_COLLECTION, MIGRATIONS_COLLECTION, ROLLUPS_COLLECTION, StatusSeries
+
+
+def test_pings_roll_up_into_hourly_and_daily_summaries(app_factory):
+    app = app_factory("status", status_ttl_days=7)
+    client = TestClient(app)
+    for name in ("dashboard", "dashboard", "mobile"):
+        assert client.post("/api/status", json={"client_name": name}).status_code == 200
+
+    hourly = client.get("/api/status/summary").json()
+    assert hourly["granularity"] == "hour"
+    totals = {entry["client_name"]: entry["total"] for entry in hourly["clients"]}
+    assert totals == {"dashboard": 2, "mobile": 1}
+    daily = client.get("/api/status/summary", params={"granularity": "day", "client_name": "mobile"}).json()
+    assert [(c["client_name"], c["total"], len(c["buckets"])) for c in daily["clients"]] == [("mobile", 1, 1)]
+    assert client.get("/api/status/summary", params={"granularity": "week"}).status_code == 422
+
+    assert len(client.get("/api/status").json()) == 3
+    options = app.state.database.db[COLLECTION].options
+    assert options["timeseries"]["metaField"] == "client_name" and options["expireAfterSeconds"] == 7 * 86400
+
+
+def test_plain_collection_is_converted_and_backfilled():
+    database = Database(Settings(mongo_url="memory://", db_name="status_legacy"))
+    start = datetime(2025, 9, 1, 10, 15)
+    pings = [{"id": str(i), "client_name": "legacy", "timestamp": start + timedelta(minutes=25 * i)} for i in range(6)]
+
+    async def run():
+        await database.db[COLLECTION].insert_many([dict(p) for p in pings])
+        # The rollup key index of earlier deploys
+        await database.db[ROLLUPS_COLLECTION].create_index(
+            [("client_name", 1), ("granularity", 1), ("start", 1)], unique=True)
+        series = StatusSeries(database)
+        await series.ensure_ready()
+        await series.ensure_ready()
+        stored = await database.db[COLLECTION].find({}, {"_id": 0}).to_list(None)
+        names = await database.db.list_collection_names()
+        summary = await series.summary("hour", since=start, until=start + timedelta(hours=3))
+        days = await database.db[ROLLUPS_COLLECTION].count_documents({"granularity": "day"})
+        return stored, names, summary, days, await database.db[ROLLUPS_COLLECTION].index_information()
+
+    stored, names, summary, days, indexes = asyncio.run(run())
+    assert sorted(p["id"] for p in stored) == [p["id"] for p in pings]
+    assert LEGACY_COLLECTION not in names and "timeseries" in database.db[COLLECTION].options
+    [legacy] = summary["clients"]
+    # 10:15 .. 12:20 in 25-minute steps: 10:15 10:40 | 11:05 11:30 11:55 | 12:20
+    assert [bucket["count"] for bucket in legacy["buckets"]] == [2, 3, 1]
+    assert legacy["first_seen"] == pings[0]["timestamp"] and legacy["last_seen"] == pings[-1]["timestamp"]
+    assert days == 1
+    assert "client_name_1_granularity_1_start_1" not in indexes
+    assert indexes["granularity_1_client_name_1_start_1"]["unique"]
+
+
+def test_conversion_waits_for_the_lease_holder_and_resumes_after_a_crash():
+    database = Database(Settings(mongo_url="memory://", db_name="status_resume"))
+    start = datetime(2025, 9, 1, 10, 0)
+    pings = [{"client_name": "legacy", "timestamp": start + timedelta(minutes=10 * i)} for i in range(12)]
+    locks = database.db[MIGRATIONS_COLLECTION]
+
+    async def run():
+        await database.db[COLLECTION].insert_many([dict(p) for p in pings])
+        legacy = await database.db[COLLECTION].find({}).to_list(None)
+        # Another worker holds the lease: this one renames, serves, and leaves the copying to it
+        await locks.insert_one({"_id": LEGACY_COLLECTION, "owner": "other",
+                                "expires_at": datetime.now(timezone.utc) + timedelta(minutes=1)})
+        await StatusSeries(database).ensure_ready()
+        waiting = (await database.db[COLLECTION].count_documents({}),
+                   await database.db[LEGACY_COLLECTION].count_documents({}))
+
+        # ...then dies after copying and rolling up half of it; the next worker to start finishes the job
+        await database.db[COLLECTION].insert_many(legacy[:6])
+        await database.db[ROLLUPS_COLLECTION].update_one(
+            {"client_name": "legacy", "granularity": "hour", "start": start},
+            {"$set": {"legacy_count": 6, "first": start, "last": start + timedelta(minutes=50)}}, upsert=True)
+        await locks.update_one({"_id": LEGACY_COLLECTION}, {"$set": {
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        series = StatusSeries(database)
+        await series.ensure_ready()
+        await series.record({"client_name": "legacy", "timestamp": start + timedelta(minutes=5)})
+        summary = await series.summary("hour", since=start, until=start + timedelta(hours=3))
+        return (waiting, await database.db[COLLECTION].count_documents({}),
+                await database.db.list_collection_names(), await locks.count_documents({}), summary)
+
+    waiting, stored, names, held, summary = asyncio.run(run())
+    assert waiting == (0, 12)
+    assert stored == 13 and LEGACY_COLLECTION not in names and held == 0
+    assert [bucket["count"] for bucket in summary["clients"][0]["buckets"]] == [7, 6]
@@ -0,0 +1,40 @@
+import time
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+from supabase_auth import AuthError, verified_user
+
+SECRET = "supabase-jwt-secret-for-the-tests"
+
+
+def token(secret=SECRET, **claims):
+    claims = {"sub": "u1", "aud": "authenticated", "exp": int(time.time() + 60), **claims}
+    return f"Bearer {jwt.encode(claims, secret, algorithm='HS256')}"
+
+
+def test_only_a_current_session_signed_by_the_project_verifies():
+    assert verified_user(SECRET, token()) == "u1"
+    for secret, authorization in ((SECRET, None), (SECRET, token().replace("Bearer", "Basic")),
+                                  (SECRET, token(secret="another-projects-jwt-secret-value")),
+                                  (SECRET, token(exp=int(time.time() - 5))), (SECRET, token(aud="anon")),
+                                  ("", token())):
+        with pytest.raises(AuthError):
+            verified_user(secret, authorization)
+
+
+def test_service_key_writes_need_the_wedding_owner(app_factory, bearer):
+    app = app_factory("auth_routes", supabase_write_key="service")
+    with TestClient(app) as client:
+        infer = "/api/relationships/infer"
+        assert client.post(infer, params={"user_id": "u1"}).status_code == 401
+        assert client.post(infer, params={"user_id": "u1"}, headers=bearer("u2")).status_code == 403
+        # A dry run writes nothing, so anyone may preview
+        assert client.post(infer, params={"user_id": "u1", "dry_run": "true"}).status_code == 200
+
+        job = {"kind": "relationships.infer", "user_id": "u1"}
+        assert client.post("/api/jobs", json=job).status_code == 401
+        assert client.post("/api/jobs", json=job, headers=bearer("u2")).status_code == 403
+        assert client.post("/api/jobs", json=job, headers=bearer("u1")).status_code == 202
+        assert client.post("/api/jobs", json=dict(job, params={"dry_run": True})).status_code == 202
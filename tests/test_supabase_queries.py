@@ -0,0 +1,102 @@
+"""The checks supabase_test.py and database_inspection.py ran against the live project, on ``FakePostgrest``."""
+
+import pytest
+
+from outbound import OutboundScheduler
+from postgrest_fake import FakePostgrest
+from supabase_rest import PostgrestClient, PostgrestError
+from synthetic_data import generate_dataset
+
+KEY = "anon-test-key"
+HEADERS = {"apikey": KEY, "Authorization": f"Bearer {KEY}", "Content-Type": "application/json"}
+PLANNER_COLUMNS = "id,nome_visualizzato,cognome,note,gruppo,confermato,user_id,unita_invito_id"
+
+
+@pytest.fixture
+def dataset():
+    return generate_dataset(2, 60, seed=43)
+
+
+@pytest.fixture
+def supabase(dataset):
+    return FakePostgrest(dataset)
+
+
+@pytest.fixture
+def client(supabase):
+    return PostgrestClient(url=supabase.url, key=KEY, session=supabase, scheduler=OutboundScheduler())
+
+
+def test_rest_root_needs_an_api_key(supabase):
+    listing = supabase.get(f"{supabase.url}/rest/v1/", headers=HEADERS)
+    assert listing.status_code == 200 and "/invitati" in listing.json()["paths"]
+    assert supabase.get(f"{supabase.url}/rest/v1/invitati?limit=1").status_code == 401
+    assert supabase.get(f"{supabase.url}/rest/v1/nope", headers=HEADERS).json()["code"] == "42P01"
+
+
+def test_invitati_rows_have_the_planner_columns(client):
+    [row] = client.select("invitati", {"limit": "1"})
+    assert {"id", "nome_visualizzato", "confermato", "gruppo", "user_id"} <= set(row)
+
+
+def test_confirmed_guests_query_matches_the_planner_hook(client, dataset):
+    confirmed = client.select("invitati", {"confermato": "eq.true", "select": PLANNER_COLUMNS})
+    assert len(confirmed) == sum(1 for g in dataset["invitati"] if g["confermato"] is True) > 0
+    assert all(set(row) == set(PLANNER_COLUMNS.split(",")) and row["confermato"] is True for row in confirmed)
+
+
+def test_confirmation_split_accounts_for_every_guest(client, dataset):
+    counts = {status: len(client.select("invitati", {"confermato": f"is.{status}", "select": "id"}))
+              for status in ("true", "false", "null")}
+    assert sum(counts.values()) == len(dataset["invitati"])
+    answered = client.select("invitati", {"confermato": "not.is.null", "select": "id"})
+    assert len(answered) == counts["true"] + counts["false"]
+
+
+def test_related_tables_and_wedding_scoping(client, dataset):
+    assert len(client.select("unita_invito")) == len(dataset["unita_invito"])
+    profiles = client.select("profiles")
+    assert len(profiles) == 2
+    user_id = profiles[0]["user_id"]
+    scoped = client.select("invitati", {"user_id": f"eq.{user_id}", "select": "user_id"})
+    assert scoped and {row["user_id"] for row in scoped} == {user_id}
+
+
+def test_table_planner_mapping(client):
+    guests = client.select("invitati", {"confermato": "eq.true", "select": PLANNER_COLUMNS})
+    mapped = [{"id": str(g["id"]), "name": g["nome_visualizzato"], "category": g["gruppo"] or "Altri invitati",
+               "dietaryRestrictions": g["note"], "tableId": None, "user_id": g["user_id"]} for g in guests]
+    assert all(guest["name"] and guest["category"] for guest in mapped)
+
+
+def test_keyset_pagination_reads_every_row(client, dataset):
+    pages = list(client.paginate("invitati", {"select": "id"}, page_size=25))
+    assert [row["id"] for page in pages for row in page] == sorted(g["id"] for g in dataset["invitati"])
+    pairs = list(client.paginate("piani_salvati", key=None, order=("tavolo_id", "invitato_id"), page_size=10))
+    assert sum(map(len, pairs)) == len(dataset["piani_salvati"])
+
+
+def test_writes_return_representation_and_upsert(supabase, client):
+    url = f"{supabase.url}/rest/v1/tavoli"
+    created = supabase.post(url, json={"user_id": "u9", "nome_tavolo": "Sposi", "capacita_max": 10},
+                            headers={**HEADERS, "Prefer": "return=representation"})
+    assert created.status_code == 201
+    [row] = created.json()
+    assert row["id"] > 0 and row["nome_tavolo"] == "Sposi"
+    assert supabase.post(url, json=row, headers=HEADERS).status_code == 409
+
+    client.upsert("tavoli", [dict(row, capacita_max=12)], on_conflict=["id"])
+    assert client.select("tavoli", {"id": f"eq.{row['id']}"})[0]["capacita_max"] == 12
+    patched = supabase.patch(f"{url}?id=eq.{row['id']}", json={"lato": "sposa"},
+                             headers={**HEADERS, "Prefer": "return=representation"})
+    assert patched.json()[0]["lato"] == "sposa"
+    client.delete("tavoli", {"id": f"eq.{row['id']}"})
+    assert client.select("tavoli", {"id": f"eq.{row['id']}"}) == []
+
+
+def test_unsupported_queries_are_rejected(client):
+    with pytest.raises(PostgrestError) as error:
+        client.select("invitati", {"select": "*,unita_invito(*)"})
+    assert error.value.status_code == 400
+    with pytest.raises(PostgrestError):
+        client.select("invitati", {"or": "(confermato.eq.true,gruppo.eq.friends)"})
@@ -0,0 +1,87 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from guest_rows import guest_status
+from postgrest_fake import FakePostgrest
+from supabase_rest import PostgrestClient
+from synthetic_data import generate_dataset
+from table_mix import TableType, Unit, plan_tables, table_names, wedding_units
+
+
+def test_packs_units_whole_into_the_fewest_tables_then_right_sizes():
+    units = [Unit(i, size) for i, size in enumerate([5, 5, 4, 3, 3, 2, 2, 1, 1])]
+    plan = plan_tables(units, [TableType("round", 8), TableType("round", 10), TableType("square", 4)])
+    assert plan["summary"]["tables"] == plan["lower_bound"] == 3 and plan["minimal"]
+    assert plan["summary"]["seats"] == 26 and plan["summary"]["empty_seats"] == 0
+    assert sorted(t["capacita_max"] for t in plan["tables"]) == [8, 8, 10]
+    assert sorted(key for t in plan["tables"] for key in t["units"]) == list(range(9))
+
+
+def test_sides_limited_stock_and_oversized_units():
+    units = ([Unit(f"his-{i}", 4, "sposo") for i in range(6)] + [Unit(f"hers-{i}", 4, "sposa") for i in range(2)]
+             + [Unit(f"free-{i}", 2) for i in range(8)] + [Unit("coach", 15)])
+    plan = plan_tables(units, [TableType("round", 8, available=3), TableType("rectangular", 12)])
+    for table in plan["tables"]:
+        keys = "".join(map(str, table["units"]))
+        assert not ("his" in keys and "hers" in keys)
+        assert table["guests"] <= table["capacita_max"]
+        if "his" in keys:
+            assert table["lato"] == "sposo"
+    assert plan["summary"]["by_type"].get("round 8", 0) <= 3
+    assert plan["split_units"] == ["coach"] and plan["unplaced"] == []
+    assert plan["guests"] == 6 * 4 + 2 * 4 + 8 * 2 + 15
+    by_side = plan["summary"]["by_side"]
+    assert abs(by_side["sposo"] - by_side["sposa"]) <= 12
+
+
+def test_units_that_no_remaining_table_seats_are_left_unplaced():
+    sizes = [7, 5, 6, 3, 2, 4, 7, 6, 5, 3] * 3
+    plan = plan_tables([Unit(i, size, "centro") for i, size in enumerate(sizes)],
+                       [TableType("square", 4, available=1), TableType("round", 17, available=2)])
+    assert all(table["guests"] <= table["capacita_max"] for table in plan["tables"])
+    assert plan["summary"]["by_type"] == {"round 17": 2, "square 4": 1}
+    placed = sum(table["guests"] for table in plan["tables"])
+    assert placed + sum(unit["size"] for unit in plan["unplaced"]) == sum(sizes) and placed == 38
+
+
+def test_new_table_names_skip_the_ones_in_use():
+    assert table_names(["Tavolo 1", "Tavolo 3", None, "Sposi"], 3) == ["Tavolo 2", "Tavolo 4", "Tavolo 5"]
+
+
+def test_thousand_guests_plan_and_apply_in_bulk(monkeypatch, app_factory, bearer):
+    data = generate_dataset(1, 1000, seed=48, assign=False)
+    user_id = data["invitati"][0]["user_id"]
+    started = time.perf_counter()
+    plan = plan_tables(wedding_units(data["invitati"], "all"))
+    # About 30 ms; the bound only catches a return to per-guest quadratic packing, even on a loaded runner
+    assert time.perf_counter() - started < 5
+    assert plan["guests"] == sum(guest_status(g) != "deleted" for g in data["invitati"])
+    assert plan["summary"]["tables"] <= plan["lower_bound"] + 1 and not plan["unplaced"]
+
+    fake = FakePostgrest({"tavoli": []})
+    with TestClient(app_factory("table_mix_readonly")) as client:
+        assert client.post("/api/tables/plan/apply", params={"user_id": user_id}).status_code == 503
+    app = app_factory("table_mix", supabase_write_key="service")
+    server_client = PostgrestClient(url=fake.url, key="service", session=fake)
+    monkeypatch.setenv("SUPABASE_URL", fake.url)
+    monkeypatch.setattr("supabase_rest.requests.Session", lambda: fake)
+    with TestClient(app) as client:
+        client.portal.call(app.state.mirror.replace_wedding, user_id, dict(data, tavoli=[]))
+        params = {"user_id": user_id, "source": "confirmed"}
+        body = {"table_types": [{"shape": "round", "seats": 10}, {"shape": "square", "seats": 4}]}
+        preview = client.post("/api/tables/plan", params=params, json=body).json()
+        anonymous = client.post("/api/tables/plan/apply", params=params, json=body)
+        stranger = client.post("/api/tables/plan/apply", params=params, json=body, headers=bearer("someone-else"))
+        applied = client.post("/api/tables/plan/apply", params=params, json=body, headers=bearer(user_id))
+        bad = client.post("/api/tables/plan", params=params, json={"table_types": [{"shape": "oval", "seats": 8}]})
+        stats = client.get("/api/stats", params={"user_id": user_id}).json()
+
+    assert (anonymous.status_code, stranger.status_code) == (401, 403)
+    assert applied.status_code == 201 and bad.status_code == 422
+    tables = applied.json()["tables"]
+    assert [t["capacita_max"] for t in tables] == [t["capacita_max"] for t in preview["tables"]]
+    stored = server_client.select("tavoli", {"user_id": f"eq.{user_id}"})
+    assert sorted(row["id"] for row in stored) == sorted(t["id"] for t in tables)
+    assert stats["tables"]["total"] == len(tables)
+    assert stats["tables"]["totalCapacity"] == preview["summary"]["seats"]